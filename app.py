@@ -6,9 +6,9 @@
 # Wersja: 2.3.0
 # Licencja: MIT
 # Data wydania: 17.06.2025
-# 
+#
 # Aplikacja wykorzystująca metodę sokratejską do nauczania przez pytania
-# prowadzące zamiast podawania gotowych odpowiedzi. Każdy uczeń ma 
+# prowadzące zamiast podawania gotowych odpowiedzi. Każdy uczeń ma
 # indywidualny profil z automatycznie wykrywanymi preferencjami nauki.
 # =============================================================================
 #
@@ -21,24 +21,51 @@
 # 6. System pamięci długoterminowej (zapis/odczyt faktów)
 # 7. Ekstrakcja faktów z tekstu (AI)
 # 8. Główna logika chatbota sokratejskiego
-# 9. Sidebar: klucz API, liczniki, FAQ
-# 10. Blokada funkcji do czasu weryfikacji klucza
-# 11. Logowanie ucznia i główny interfejs
-# 12. Interfejs czatu i obsługa rozmowy
+# 9. Strona czatu: logowanie ucznia i obsługa rozmowy
+# 10. Strona panelu administracyjnego
+# 11. Liczniki w sidebarze
+# 12. Nawigacja między stronami
+# 13. Sidebar: klucz API, liczniki, przejście do panelu
+# 14. Blokada funkcji do czasu weryfikacji klucza i uruchomienie strony
 #
 # Każda funkcja posiada docstring z opisem działania i argumentów.
 # =============================================================================
 
 # USUNIĘTO: import os
 import json
+import html
+import time
+import hashlib
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
 import streamlit as st
-from openai import OpenAI
+import httpx
+from openai import (OpenAI, DefaultHttpxClient, APIError, AuthenticationError,
+                    PermissionDeniedError)
 from dotenv import dotenv_values
-from typing import List, Dict, Any
-import pandas as pd
-import zipfile
-import io
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+from sokrates.storage import ProfileStore, display_name_from_key, student_key
+from sokrates.export import ProfilesArchive
+from sokrates import activity_log
+from sokrates.activity_log import ActivityLog
+from sokrates.metrics import KIND_VERIFY, MetricsStore
+from sokrates.response_cache import ResponseCache
+from sokrates.retrieval import DEFAULT_TOP_K, FactRetriever
+from sokrates.extraction import FactExtractionPipeline, extract_facts
+from sokrates.context import ContextBudget
+from sokrates.history import ConversationStore
+from sokrates import ratelimit
+from sokrates.ratelimit import QueueTimeoutError, RateLimiter
+from sokrates.routing import DEFAULT_COMPLEX_PHRASES, ModelRouter, RoutingRules
+from sokrates.hedging import HedgeController, HedgePolicy
+from sokrates.intents import DEFAULT_DONT_KNOW_PHRASES, DEFAULT_HELP_PHRASES
+from sokrates.shared_state import (DEFAULT_PREFIX, LockTimeoutError, SharedState,
+                                   SharedStateError, open_shared_state)
+from sokrates.engine import (DEFAULT_PERSONALITY, EngineConfig, SocraticEngine,
+                             StudentState)
+# pandas (kosztowny import) ładowany jest dopiero na stronie panelu administracyjnego
+
 
 # ===============================
 # INICJALIZACJA STANU SESJI (musi być tuż po importach!)
@@ -48,17 +75,25 @@ def get_state(key, default):
         st.session_state[key] = default
     return st.session_state[key]
 
+
 get_state('student_name', '')
 get_state('messages', [])
 get_state('facts_to_confirm', [])
+get_state('extraction_watermark', 0)
+get_state('conversation_summary', '')
+get_state('summary_upto', 0)
+get_state('history_offset', 0)
+get_state('history_pages', 0)
+get_state('last_context', None)
 get_state('nie_wiem_counter', 0)
 get_state('current_topic', None)
 get_state('show_faq', False)
-get_state('chatbot_personality', "Jesteś Sokratesem - mądrym filozofem i nauczycielem. Twoim celem jest prowadzić ucznia do samodzielnego myślenia poprzez pytania.")
+get_state('chatbot_personality', DEFAULT_PERSONALITY)
 get_state('openai_api_key', '')
 get_state('api_key_verified', False)
+get_state('api_key_hash', '')
+get_state('api_key_verified_at', 0.0)
 get_state('cost_total_pln', 0.0)
-get_state('show_admin_panel', False)
 
 # =============================================================================
 # KONFIGURACJA APLIKACJI
@@ -76,10 +111,12 @@ st.set_page_config(
 model_pricings = {
     "gpt-4o": {
         "input_tokens": 5.00 / 1_000_000,  # per token
+        "cached_input_tokens": 2.50 / 1_000_000,  # per token (cache promptu)
         "output_tokens": 15.00 / 1_000_000,  # per token
     },
     "gpt-4o-mini": {
         "input_tokens": 0.150 / 1_000_000,  # per token
+        "cached_input_tokens": 0.075 / 1_000_000,  # per token (cache promptu)
         "output_tokens": 0.600 / 1_000_000,  # per token
     }
 }
@@ -87,10 +124,33 @@ model_pricings = {
 # Konfiguracja globalna
 MODEL = "gpt-4o-mini"  # Ekonomiczny model dla edukacji
 USD_TO_PLN = 3.92  # Aktualny kurs USD->PLN (aktualizować okresowo)
-PRICING = model_pricings[MODEL]
 
 # Inicjalizacja klienta OpenAI
 
+
+@st.cache_data(show_spinner=False)
+def _parse_env_file(path: str, mtime: float) -> Dict[str, str]:
+    """
+    Parsuje plik .env - wynik jest cache'owany do czasu zmiany pliku (mtime).
+    """
+    return {k: v for k, v in dotenv_values(path).items() if v is not None}
+
+
+def load_env() -> Dict[str, str]:
+    """
+    Zwraca zmienne z pliku .env bez ponownego parsowania przy każdym odświeżeniu.
+
+    Returns:
+        Dict[str, str]: Zmienne z pliku .env (pusty słownik jeśli brak pliku)
+    """
+    env_path = Path(".env")
+    try:
+        mtime = env_path.stat().st_mtime
+    except OSError:
+        return {}
+    return _parse_env_file(str(env_path), mtime)
+
+
 def get_api_key() -> str:
     """
     Pobiera klucz OpenAI API z sesji, pliku .env lub zwraca pusty string.
@@ -100,279 +160,1388 @@ def get_api_key() -> str:
     if "openai_api_key" in st.session_state and st.session_state["openai_api_key"]:
         return st.session_state["openai_api_key"]
     # Następnie sprawdź plik .env
-    env_local = dotenv_values(".env")  # zmiana nazwy zmiennej
-    value = env_local.get("OPENAI_API_KEY", "")
-    return value if value is not None else ""
+    return load_env().get("OPENAI_API_KEY", "")
 
-def verify_api_key(api_key: str) -> bool:
+
+def get_config(name: str, default: str) -> str:
     """
-    Weryfikuje poprawność klucza OpenAI API przez próbę wykonania prostego zapytania.
-    Zwraca True jeśli klucz jest poprawny, False w przeciwnym razie.
+    Zwraca wartość opcjonalnego ustawienia z pliku .env lub wartość domyślną.
+    """
+    value = load_env().get(name)
+    return value if value else default
+
+
+def get_config_list(name: str, default: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Zwraca listę fraz z ustawienia .env (oddzielonych przecinkami) lub listę domyślną.
+    """
+    value = get_config(name, ",".join(default))
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+# Parametry połączenia z API (nadpisywalne w .env)
+OPENAI_CONNECT_TIMEOUT = float(get_config("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(get_config("OPENAI_READ_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(get_config("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONNECTIONS = int(get_config("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(get_config("OPENAI_MAX_KEEPALIVE", "20"))
+# Limity API po stronie klienta - jeden harmonogram na klucz w procesie
+# (0 wyłącza limit)
+OPENAI_RPM = float(get_config("OPENAI_RPM", "500"))
+OPENAI_TPM = float(get_config("OPENAI_TPM", "200000"))
+OPENAI_MAX_CONCURRENCY = int(get_config("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_QUEUE_TIMEOUT = float(get_config("OPENAI_QUEUE_TIMEOUT", "60"))
+# Termin odpowiedzi Sokratesa w sekundach, łącznie z kolejką i ponowieniami
+# (0 - bez terminu)
+REPLY_DEADLINE = float(get_config("REPLY_DEADLINE", "90"))
+# Zapytania zabezpieczające: druga próba, gdy pierwsza nie odpowie przed
+# HEDGE_PERCENTILE ostatnich czasów odpowiedzi (nie krócej niż HEDGE_MIN_DELAY s);
+# dodatkowe tokeny najwyżej HEDGE_MAX_EXTRA_SHARE wszystkich tokenów
+# (HEDGE_REQUESTS=1 włącza)
+HEDGE_REQUESTS = get_config("HEDGE_REQUESTS", "0") != "0"
+HEDGE_POLICY = HedgePolicy(
+    percentile=float(get_config("HEDGE_PERCENTILE", "95")),
+    min_delay_s=float(get_config("HEDGE_MIN_DELAY", "2")),
+    max_extra_share=float(get_config("HEDGE_MAX_EXTRA_SHARE", "0.1")),
+)
+# Stan współdzielony kilku instancji aplikacji: weryfikacje kluczy, blokady tur
+# i profili, łączne liczniki (pusty lub "local" - tylko ten proces, redis://... - Redis)
+SHARED_STATE_URL = get_config("SHARED_STATE_URL", "")
+SHARED_STATE_PREFIX = get_config("SHARED_STATE_PREFIX", DEFAULT_PREFIX)
+# Strumieniowanie odpowiedzi (STREAM_RESPONSES=0 wyłącza)
+STREAM_RESPONSES = get_config("STREAM_RESPONSES", "1") != "0"
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _build_openai_client(key_hash: str, _api_key: str) -> OpenAI:
+    """
+    Tworzy klienta OpenAI z pulą połączeń keep-alive (jeden na klucz w procesie).
+
+    Args:
+        key_hash (str): Skrót klucza - klucz cache (sam klucz nie jest hashowany)
+        _api_key (str): Klucz OpenAI API
+
+    Returns:
+        OpenAI: Klient współdzielony przez wszystkie sesje używające tego klucza
+
+    Note:
+        Klient nie ponawia zapytań sam - ponowienia (OPENAI_MAX_RETRIES) wykonuje
+        harmonogram klucza, wspólnie dla wszystkich sesji (zob. get_rate_limiter()).
+    """
+    timeout = httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+    http_client = DefaultHttpxClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=60.0,
+        ),
+    )
+    return OpenAI(
+        api_key=_api_key,
+        timeout=timeout,
+        max_retries=0,
+        http_client=http_client,
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _build_rate_limiter(key_hash: str) -> RateLimiter:
+    """
+    Tworzy harmonogram zapytań do API dla klucza (jeden na klucz w procesie).
+
+    Args:
+        key_hash (str): Skrót klucza API - limity konta są wspólne dla wszystkich
+            sesji
+
+    Returns:
+        RateLimiter: Limity OPENAI_RPM/OPENAI_TPM, OPENAI_MAX_CONCURRENCY zapytań
+        w toku, kolejka sprawiedliwa według uczniów i ponowienia z opóźnieniem
+    """
+    return RateLimiter(rpm=OPENAI_RPM, tpm=OPENAI_TPM,
+                       max_concurrency=OPENAI_MAX_CONCURRENCY,
+                       max_retries=OPENAI_MAX_RETRIES,
+                       queue_timeout=OPENAI_QUEUE_TIMEOUT or None)
+
+
+def get_rate_limiter(api_key: Optional[str] = None) -> RateLimiter:
+    """
+    Zwraca współdzielony harmonogram zapytań dla klucza API (domyślnie klucza sesji).
+    """
+    key = api_key if api_key is not None else get_api_key()
+    return _build_rate_limiter(hash_api_key(key))
+
+
+def get_client_for_key(api_key: str) -> OpenAI:
+    """
+    Zwraca współdzielonego klienta OpenAI dla podanego klucza API.
+    """
+    return _build_openai_client(hash_api_key(api_key), api_key)
+
+
+# Czas ważności weryfikacji klucza API w sekundach (API_KEY_VERIFY_TTL w .env)
+API_KEY_VERIFY_TTL = int(get_config("API_KEY_VERIFY_TTL", "3600"))
+
+
+def hash_api_key(api_key: str) -> str:
+    """
+    Zwraca skrót SHA-256 klucza API - w cache nie przechowujemy samego klucza.
+    """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_state() -> SharedState:
+    """
+    Zwraca stan współdzielony instancji aplikacji (SHARED_STATE_URL; domyślnie
+    w pamięci procesu).
+    """
+    return open_shared_state(SHARED_STATE_URL, SHARED_STATE_PREFIX)
+
+
+def _check_api_key(api_key: str) -> Any:
+    """
+    Najtańsza możliwa weryfikacja klucza: pobranie opisu modelu (bez tokenów).
+
+    Returns:
+        True/False dla jednoznacznego wyniku, None przy błędzie przejściowym
+        (sieć, limit zapytań) - taki wynik nie trafia do cache.
     """
     try:
-        client = OpenAI(api_key=api_key)
-        api_response = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": "ping"}]
-        )
-        return bool(api_response.choices[0].message.content)
-    except (ValueError, KeyError, AttributeError) as e:
-        st.error(f"Błąd weryfikacji klucza API: {e}")
+        client = get_client_for_key(api_key)
+        # Weryfikacja zawsze na tanim modelu (bez względu na wybór modelu tur)
+        model = get_model_router().cheap_model
+        with get_metrics_store().track(KIND_VERIFY, model):
+            get_rate_limiter(api_key).run(
+                "", 0, lambda permit: client.models.retrieve(model))
+        return True
+    except (AuthenticationError, PermissionDeniedError):
         return False
+    except (APIError, QueueTimeoutError, ValueError) as e:
+        st.error(f"Błąd weryfikacji klucza API: {e}")
+        return None
+
+
+def verify_api_key(api_key: str) -> bool:
+    """
+    Weryfikuje poprawność klucza OpenAI API, korzystając z cache wyników.
+
+    Wynik jest zapamiętywany pod skrótem klucza na API_KEY_VERIFY_TTL sekund,
+    zarówno w sesji, jak i w stanie współdzielonym instancji. Zmiana klucza
+    unieważnia wynik sesji, a stan `api_key_verified` jest zawsze aktualizowany.
+
+    Args:
+        api_key (str): Klucz OpenAI API do sprawdzenia
+
+    Returns:
+        bool: True jeśli klucz jest poprawny, False w przeciwnym razie
+    """
+    key_hash = hash_api_key(api_key)
+    now = time.time()
+    if st.session_state.get("api_key_hash") != key_hash:
+        # Nowy klucz - poprzedni wynik weryfikacji przestaje obowiązywać
+        st.session_state["api_key_hash"] = key_hash
+        st.session_state["api_key_verified"] = False
+        st.session_state["api_key_verified_at"] = 0.0
+    elif now - st.session_state.get("api_key_verified_at", 0.0) < API_KEY_VERIFY_TTL:
+        return st.session_state.get("api_key_verified", False)
+
+    shared = get_shared_state()
+    try:
+        entry = shared.get("verify:" + key_hash)
+    except SharedStateError:
+        entry = None  # magazyn niedostępny - weryfikacja bezpośrednio w API
+    if entry:
+        valid, checked_at = json.loads(entry)
+    else:
+        valid, checked_at = _check_api_key(api_key), now
+        if valid is not None:
+            try:
+                shared.set("verify:" + key_hash, json.dumps([valid, checked_at]),
+                           ttl=API_KEY_VERIFY_TTL)
+            except SharedStateError:
+                pass
+        else:
+            # Błąd przejściowy - spróbuj ponownie przy kolejnym odświeżeniu
+            checked_at = 0.0
+
+    st.session_state["api_key_verified"] = bool(valid)
+    st.session_state["api_key_verified_at"] = checked_at
+    return bool(valid)
+
 
 # Inicjalizacja klienta OpenAI (dynamicznie na podstawie klucza)
 def get_openai_client() -> OpenAI:
     """
-    Tworzy klienta OpenAI na podstawie aktualnego klucza API (z sidebaru lub .env).
+    Zwraca współdzielonego klienta OpenAI dla aktualnego klucza API
+    (z sidebaru lub .env).
     """
-    api_key = get_api_key()
-    return OpenAI(api_key=api_key)
+    return get_client_for_key(get_api_key())
 
 # =============================================================================
 # ZARZĄDZANIE PROFILAMI UCZNIÓW
 # =============================================================================
 
+
+# Baza profili uczniów (SQLite) i katalog dawnych plików JSONL do migracji
+SOKRATES_DB_PATH = get_config("SOKRATES_DB_PATH", "db/sokrates.db")
+# Liczba profili trzymanych we współdzielonej pamięci podręcznej
+PROFILE_CACHE_SIZE = int(get_config("PROFILE_CACHE_SIZE", "256"))
+# Liczba uczniów na stronie listy w panelu administracyjnym
+ADMIN_PAGE_SIZE = int(get_config("ADMIN_PAGE_SIZE", "20"))
+# Dziennik aktywności (JSONL z rotacją według rozmiaru)
+ACTIVITY_LOG_MAX_BYTES = int(get_config("ACTIVITY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+ACTIVITY_LOG_BACKUPS = int(get_config("ACTIVITY_LOG_BACKUPS", "5"))
+# Wydobywanie faktów w tle: "confirm" (do potwierdzenia), "auto" (od razu do profilu),
+# "off"
+EXTRACTION_MODE = get_config("EXTRACTION_MODE", "confirm")
+EXTRACTION_BATCH_TURNS = int(get_config("EXTRACTION_BATCH_TURNS", "3"))
+EXTRACTION_WORKERS = int(get_config("EXTRACTION_WORKERS", "2"))
+# Scalanie podobnych faktów i limit faktów w profilu (0 - bez limitu)
+FACT_SIMILARITY_THRESHOLD = float(get_config("FACT_SIMILARITY_THRESHOLD", "0.75"))
+MAX_FACTS_PER_STUDENT = int(get_config("MAX_FACTS_PER_STUDENT", "50"))
+# Liczba faktów z profilu wybieranych do promptu według trafności (0 - wszystkie)
+RETRIEVAL_TOP_K = int(get_config("RETRIEVAL_TOP_K", str(DEFAULT_TOP_K)))
+# Cache odpowiedzi dla powtarzających się tur: liczba wpisów w pamięci (0 wyłącza),
+# czas ważności w sekundach i zapis do pliku db/response_cache.db
+RESPONSE_CACHE_SIZE = int(get_config("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(get_config("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_PERSIST = get_config(
+    "RESPONSE_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+# Budżet tokenów wejściowych jednej tury: łącznie, część na profil, rozmiar
+# podsumowania i zapas zwalniany przy przesunięciu okna rozmowy (stały prefiks
+# dla cache promptu)
+CONTEXT_BUDGET = ContextBudget(
+    total=int(get_config("CONTEXT_TOKEN_BUDGET", "3000")),
+    profile_share=float(get_config("CONTEXT_PROFILE_SHARE", "0.25")),
+    summary_tokens=int(get_config("CONTEXT_SUMMARY_TOKENS", "300")),
+    window_slack=float(get_config("CONTEXT_WINDOW_SLACK", "0.25")),
+)
+# Historia rozmów (db/conversations.db): liczba ostatnich tur trzymanych w pamięci
+# sesji i liczba wiadomości wczytywanych jednorazowo przyciskiem "Wczytaj wcześniejsze"
+HISTORY_SESSION_TURNS = int(get_config("HISTORY_SESSION_TURNS", "20"))
+HISTORY_PAGE_SIZE = int(get_config("HISTORY_PAGE_SIZE", "20"))
+# Wybór modelu tury: MODEL dla pytań prowadzących, MODEL_STRONG dla pełnych
+# odpowiedzi (licznik "nie wiem"), długich i złożonych wypowiedzi
+# (MODEL_ROUTING=off - zawsze MODEL)
+MODEL_ROUTING = get_config("MODEL_ROUTING", "auto")
+ROUTING_RULES = RoutingRules(
+    default_model=get_config("MODEL", MODEL),
+    strong_model=get_config("MODEL_STRONG", "gpt-4o") if MODEL_ROUTING != "off" else "",
+    full_answer_counter=int(get_config("ROUTING_FULL_ANSWER_COUNTER", "4")),
+    long_prompt_tokens=int(get_config("ROUTING_LONG_PROMPT_TOKENS", "250")),
+    complex_phrases=get_config_list("ROUTING_COMPLEX_PHRASES", DEFAULT_COMPLEX_PHRASES),
+)
+# Słownik intencji ucznia sterujących licznikiem "nie wiem" (frazy oddzielone
+# przecinkami, polskie znaki opcjonalne, końcówki odmiany w nawiasie - "wiem(|y)";
+# zob. sokrates/intents.py)
+INTENT_DONT_KNOW_PHRASES = get_config_list("INTENT_DONT_KNOW_PHRASES",
+                                           DEFAULT_DONT_KNOW_PHRASES)
+INTENT_HELP_PHRASES = get_config_list("INTENT_HELP_PHRASES", DEFAULT_HELP_PHRASES)
+STUDENTS_DIR = Path("db/students")
+
+
+@st.cache_resource(show_spinner=False)
+def get_profile_store() -> ProfileStore:
+    """
+    Zwraca współdzielony magazyn profili uczniów (SQLite, tryb WAL).
+
+    Przy pierwszym wywołaniu w procesie importuje jednorazowo profile z
+    plików `db/students/*_memory.json`. Wczytane profile są współdzielone
+    między sesjami przez pamięć podręczną LRU magazynu.
+    """
+    return ProfileStore(Path(SOKRATES_DB_PATH), legacy_dir=STUDENTS_DIR,
+                        cache_size=PROFILE_CACHE_SIZE)
+
+
+@st.cache_resource(show_spinner=False)
+def get_activity_log() -> ActivityLog:
+    """
+    Zwraca współdzielony dziennik aktywności (db/activity.log).
+    """
+    return ActivityLog(Path("db/activity.log"), max_bytes=ACTIVITY_LOG_MAX_BYTES,
+                       backup_count=ACTIVITY_LOG_BACKUPS)
+
+
+@st.cache_resource(show_spinner=False)
+def get_fact_retriever() -> FactRetriever:
+    """
+    Zwraca współdzielone indeksy BM25 faktów uczniów (aktualizowane przy zapisie).
+    """
+    return FactRetriever(get_profile_store(), max_students=PROFILE_CACHE_SIZE)
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache() -> ResponseCache:
+    """
+    Zwraca współdzieloną pamięć podręczną odpowiedzi (opcjonalnie zapisywaną w db/).
+    """
+    path = Path("db/response_cache.db") if RESPONSE_CACHE_PERSIST else None
+    return ResponseCache(RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, path=path)
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_store() -> MetricsStore:
+    """
+    Zwraca współdzielony rejestr wywołań OpenAI (db/metrics.db, tylko dopisywanie).
+    """
+    return MetricsStore(Path("db/metrics.db"), pricing=model_pricings,
+                        usd_to_pln=USD_TO_PLN)
+
+
+@st.cache_resource(show_spinner=False)
+def get_conversation_store() -> ConversationStore:
+    """
+    Zwraca współdzieloną historię rozmów uczniów (db/conversations.db,
+    tylko dopisywanie).
+    """
+    return ConversationStore(Path("db/conversations.db"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_router() -> ModelRouter:
+    """
+    Zwraca współdzielony wybór modelu tury (reguły ROUTING_RULES, liczniki decyzji).
+    """
+    return ModelRouter(ROUTING_RULES)
+
+
+@st.cache_resource(show_spinner=False)
+def get_hedge_controller() -> Optional[HedgeController]:
+    """
+    Zwraca współdzielony licznik zapytań zabezpieczających (None - wyłączone,
+    HEDGE_REQUESTS).
+    """
+    return HedgeController(HEDGE_POLICY) if HEDGE_REQUESTS else None
+
+
+@st.cache_resource(show_spinner=False)
+def get_engine() -> SocraticEngine:
+    """
+    Zwraca współdzielony silnik rozmowy (logika tury i profilu, bez Streamlit).
+
+    Klient OpenAI przekazywany jest przy każdej turze - zależy od klucza sesji.
+    """
+    config = EngineConfig(model=ROUTING_RULES.default_model, budget=CONTEXT_BUDGET,
+                          retrieval_top_k=RETRIEVAL_TOP_K,
+                          fact_similarity_threshold=FACT_SIMILARITY_THRESHOLD,
+                          max_facts_per_student=MAX_FACTS_PER_STUDENT,
+                          pricing=model_pricings, usd_to_pln=USD_TO_PLN,
+                          history_window=2 * HISTORY_SESSION_TURNS,
+                          deadline_s=REPLY_DEADLINE,
+                          dont_know_phrases=INTENT_DONT_KNOW_PHRASES,
+                          help_phrases=INTENT_HELP_PHRASES)
+    return SocraticEngine(get_profile_store(), config, retriever=get_fact_retriever(),
+                          response_cache=get_response_cache(),
+                          metrics=get_metrics_store(),
+                          history=get_conversation_store(), router=get_model_router(),
+                          hedger=get_hedge_controller(), shared=get_shared_state())
+
+
+def log_activity(event: str, student: Optional[str] = None, **details: Any) -> None:
+    """
+    Zapisuje zdarzenie w dzienniku aktywności.
+
+    Args:
+        event (str): Typ zdarzenia (stałe EVENT_* z sokrates.activity_log)
+        student (str, optional): Uczeń, którego dotyczy zdarzenie
+            (domyślnie aktualnie zalogowany)
+        **details: Dodatkowe dane zdarzenia
+    """
+    if student is None:
+        student = st.session_state.get("student_name", "")
+    try:
+        get_activity_log().log(event, student, **details)
+    except OSError:
+        pass  # Brak możliwości zapisu dziennika nie może blokować nauki
+
+
+@st.cache_resource(show_spinner=False)
+def get_profiles_archive() -> ProfilesArchive:
+    """
+    Zwraca współdzielone archiwum ZIP wszystkich profili (budowane na żądanie).
+    """
+    return ProfilesArchive(get_profile_store(), Path("db/exports"))
+
+
 def get_student_memory_file(student_name: str) -> Path:
     """
     Zwraca ścieżkę do pliku pamięci dla konkretnego ucznia.
-    
+
     Funkcja tworzy bezpieczną nazwę pliku poprzez sanityzację nazwy ucznia
     i zapewnia istnienie katalogu students/.
-    
+
     Args:
         student_name (str): Imię/nazwa ucznia
-        
+
     Returns:
         Path: Ścieżka do pliku JSON z profilem ucznia
-        
+
     Note:
-        Pliki profili są zapisywane lokalnie zgodnie z RODO.
+        Profile są przechowywane w bazie SQLite; ścieżka określa nazwę pliku
+        przy eksporcie oraz lokalizację dawnych profili JSONL (migracja).
         Format: db/students/{nazwa_ucznia}_memory.json
     """
-    students_dir = Path("db/students")
-    students_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Sanityzacja nazwy dla bezpieczeństwa systemu plików
-    safe_name = "".join(c for c in student_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-    safe_name = safe_name.replace(' ', '_').lower()
-    
-    return students_dir / f"{safe_name}_memory.json"
+    STUDENTS_DIR.mkdir(parents=True, exist_ok=True)
+    return STUDENTS_DIR / f"{student_key(student_name)}_memory.json"
 
 # =============================================================================
 # SYSTEM PAMIĘCI DŁUGOTERMINOWEJ
 # =============================================================================
 
-def zapisz_do_pamieci(fact: str) -> None:
+
+def biezacy_stan() -> StudentState:
+    """
+    Zwraca stan rozmowy zalogowanego ucznia zbudowany ze stanu sesji.
+
+    Note:
+        Po zmianach wykonanych przez silnik stan należy zapisać z powrotem:
+        `stan.save_to(st.session_state)`.
+    """
+    return StudentState.from_mapping(st.session_state)
+
+
+def zapisz_do_pamieci(fact: str, source: str = "manual") -> None:
     """
     Dodaje nowy fakt do profilu aktualnie zalogowanego ucznia.
-    
+
     Args:
         fact (str): Fakt edukacyjny do zapisania (styl nauki, preferencje, etc.)
-        
+        source (str): Źródło faktu zapisywane razem z nim (domyślnie "manual")
+
     Note:
         Funkcja sprawdza czy uczeń jest zalogowany przed zapisem.
-        Każdy fakt jest zapisywany jako osobna linia JSON.
+        Każdy fakt jest osobnym wierszem w bazie (z datą i źródłem).
+        Starsze fakty bardzo podobne do nowego są usuwane, a profil
+        przycinany do MAX_FACTS_PER_STUDENT faktów.
     """
-    if "student_name" not in st.session_state or not st.session_state.get("student_name", ""):
+    wynik = get_engine().add_fact(biezacy_stan(), fact, source=source)
+    if not wynik["fact_id"]:
         return
-    
-    memory_file = get_student_memory_file(st.session_state.get("student_name", ""))
-    memory_file.parent.mkdir(exist_ok=True)
-    
-    with open(memory_file, "a", encoding="utf-8") as f_mem:
-        f_mem.write(json.dumps({"fact": fact}, ensure_ascii=False) + "\n")
+    log_activity(activity_log.EVENT_FACT_ADD, fact_id=wynik["fact_id"], source=source)
+    if wynik["removed"]:
+        log_activity(activity_log.EVENT_FACT_DELETE, removed=wynik["removed"],
+                     by="consolidation")
+
 
 def wczytaj_pamiec() -> List[str]:
     """
     Ładuje wszystkie fakty z profilu aktualnie zalogowanego ucznia.
-    
+
     Returns:
         List[str]: Lista faktów o uczniu (pusta jeśli brak profilu)
-        
+
     Note:
-        Zwraca pustą listę jeśli uczeń nie jest zalogowany lub brak pliku.
+        Zwraca pustą listę jeśli uczeń nie jest zalogowany lub nie ma profilu.
     """
-    if "student_name" not in st.session_state or not st.session_state.get("student_name", ""):
-        return []
-    
-    memory_file = get_student_memory_file(st.session_state.get("student_name", ""))
-    if not memory_file.exists():
-        return []
-    
-    try:
-        with open(memory_file, "r", encoding="utf-8") as f_mem:
-            return [json.loads(line.strip())["fact"] for line in f_mem.readlines() if line.strip()]
-    except (json.JSONDecodeError, KeyError):
-        return []
+    return get_engine().load_facts(biezacy_stan())
+
+
+def wybierz_fakty(query: str) -> List[Dict[str, Any]]:
+    """
+    Wybiera z profilu zalogowanego ucznia fakty najbardziej związane z zapytaniem.
+
+    Args:
+        query (str): Pytanie ucznia (razem z aktualnym tematem)
+
+    Returns:
+        List[Dict[str, Any]]: Do RETRIEVAL_TOP_K faktów ("id", "fact", "score"),
+        od najtrafniejszego
+
+    Note:
+        Ranking BM25 liczony jest na indeksie w pamięci, bez czytania całego
+        profilu przy każdej turze.
+    """
+    return get_engine().select_facts(biezacy_stan(), query)
+
 
 def zapisz_pamiec(fakty: List[str]) -> None:
     """
     Przepisuje cały profil ucznia z nową listą faktów.
-    
+
     Args:
         fakty (List[str]): Kompletna lista faktów do zapisania
-        
+
     Note:
-        Używane przy edycji/usuwaniu faktów z profilu.
+        Używane przy edycji/usuwaniu faktów z profilu. Zmiana wykonywana jest
+        w jednej transakcji; niezmienione fakty zachowują swoje metadane.
     """
-    if "student_name" not in st.session_state or not st.session_state.get("student_name", ""):
+    if not st.session_state.get("student_name", ""):
         return
-    
-    memory_file = get_student_memory_file(st.session_state.get("student_name", ""))
-    memory_file.parent.mkdir(exist_ok=True)
-    
-    with open(memory_file, "w", encoding="utf-8") as f_mem:
-        for fact in fakty:
-            f_mem.write(json.dumps({"fact": fact}, ensure_ascii=False) + "\n")
+    get_engine().replace_facts(biezacy_stan(), fakty)
+    log_activity(activity_log.EVENT_PROFILE_REPLACE, facts=len(fakty))
+
 
 def usun_fact(index: int) -> None:
     """
     Usuwa fakt o podanym indeksie z profilu ucznia.
-    
+
     Args:
         index (int): Indeks faktu do usunięcia (0-based)
-        
+
     Note:
-        Funkcja automatycznie przeładowuje i zapisuje profil bez usuniętego faktu.
+        Usuwany jest tylko jeden wiersz bazy - profil nie jest przepisywany.
     """
-    fakty = wczytaj_pamiec()
-    if 0 <= index < len(fakty):
-        del fakty[index]
-        zapisz_pamiec(fakty)
+    if get_engine().delete_fact_at(biezacy_stan(), index):
+        log_activity(activity_log.EVENT_FACT_DELETE, index=index)
 
 # =============================================================================
 # EKSTRAKCJA FAKTÓW Z TEKSTU (AI)
 # =============================================================================
 
+
 def wyciagnij_fakty_z_tekstu(text: str) -> List[str]:
     """
     Wykorzystuje AI do wydobycia faktów edukacyjnych z tekstu ucznia.
-    
+
     Analizuje wypowiedzi ucznia i identyfikuje informacje przydatne
     dla personalizacji procesu nauczania.
-    
+
     Args:
         text (str): Tekst do analizy (pytanie/odpowiedź ucznia)
-        
+
     Returns:
         List[str]: Lista wykrytych faktów edukacyjnych
-        
+
     Note:
-        Wykorzystuje model GPT do inteligentnej analizy stylu nauki.
+        Wykorzystuje model GPT do inteligentnej analizy stylu nauki
+        (odpowiedź w formacie JSON). W trakcie rozmowy fakty wydobywane są
+        w tle - zob. zaplanuj_wyciaganie_faktow().
     """
     try:
-        client = get_openai_client()
-        ai_response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": """Wydobądź z tekstu fakty o uczniu, które warto zapamiętać dla procesu nauczania:
-- poziom wiedzy w różnych dziedzinach
-- zainteresowania naukowe  
-- sposób uczenia się
-- trudności w nauce
-- postępy w nauce
-- preferowane metody wyjaśniania
-Wypisz jako listę wypunktowaną, krótko i konkretnie."""},
-                {"role": "user", "content": text}
-            ]
-        )
-        content = ai_response.choices[0].message.content
-        if content is None:
-            return []
-        return [line.strip() for line in content.split("\n") if line.strip()]
-    except (ValueError, KeyError, AttributeError) as e:
+        return extract_facts(get_openai_client(), get_model_router().cheap_model,
+                             text, get_metrics_store(),
+                             st.session_state.get("student_name", ""),
+                             get_rate_limiter())
+    except (APIError, QueueTimeoutError, ValueError, KeyError, AttributeError) as e:
         st.error(f"Błąd podczas analizy tekstu: {e}")
         return []
 
+
+def _fact_saver(engine: SocraticEngine,
+                log: ActivityLog) -> Callable[[str, List[str]], None]:
+    """
+    Tworzy funkcję zapisującą wydobyte fakty od razu do profilu
+    (tryb EXTRACTION_MODE=auto).
+
+    Note:
+        Funkcja wywoływana jest z wątku roboczego - silnik i dziennik dostaje
+        przy tworzeniu puli, bez stanu sesji i zasobów Streamlit. Fakty trafiają
+        do profilu tą samą ścieżką co dodane ręcznie
+        (`SocraticEngine.add_facts`), a błędy zapisu (np. zajęta blokada
+        profilu) liczy pula wydobywania.
+    """
+    def save(student: str, facts: List[str]) -> None:
+        result = engine.add_facts(student, facts, source="ai_extraction")
+        for fact_id in result["fact_ids"]:
+            log.log(activity_log.EVENT_FACT_ADD, student, fact_id=fact_id,
+                    source="ai_extraction")
+        if result["removed"]:
+            log.log(activity_log.EVENT_FACT_DELETE, student, removed=result["removed"],
+                    by="consolidation")
+
+    return save
+
+
+@st.cache_resource(show_spinner=False)
+def get_fact_pipeline() -> FactExtractionPipeline:
+    """
+    Zwraca współdzieloną pulę wątków wydobywającą fakty w tle.
+    """
+    on_facts = None
+    if EXTRACTION_MODE == "auto":
+        on_facts = _fact_saver(get_engine(), get_activity_log())
+    return FactExtractionPipeline(max_workers=EXTRACTION_WORKERS, on_facts=on_facts,
+                                  metrics=get_metrics_store())
+
+
+def zaplanuj_wyciaganie_faktow(force: bool = False) -> None:
+    """
+    Przekazuje nowe wypowiedzi ucznia do analizy w tle.
+
+    Wypowiedzi od znacznika `extraction_watermark` (pozycja w całej rozmowie) są
+    wysyłane jedną partią, gdy zbierze się ich EXTRACTION_BATCH_TURNS (lub od
+    razu przy `force`).
+
+    Args:
+        force (bool): Wyślij zaległe wypowiedzi niezależnie od rozmiaru partii
+    """
+    if EXTRACTION_MODE == "off" or not st.session_state.get("student_name", ""):
+        return
+    messages = st.session_state["messages"]
+    # Znacznik liczony jest w całej rozmowie (część starszych wiadomości nie jest
+    # już w sesji)
+    offset = st.session_state.get("history_offset", 0)
+    watermark = st.session_state.get("extraction_watermark", 0) - offset
+    watermark = min(max(watermark, 0), len(messages))
+    new_turns = [m["content"] for m in messages[watermark:] if m.get("role") == "user"]
+    if not new_turns or (len(new_turns) < EXTRACTION_BATCH_TURNS and not force):
+        return
+    get_fact_pipeline().submit(st.session_state["student_name"], new_turns,
+                               get_openai_client(), get_model_router().cheap_model,
+                               get_rate_limiter())
+    st.session_state["extraction_watermark"] = offset + len(messages)
+
+
+def odbierz_wyciagniete_fakty() -> None:
+    """
+    Przenosi fakty wydobyte w tle do kolejki `facts_to_confirm` (bez duplikatów).
+    """
+    if not st.session_state.get("student_name", ""):
+        return
+    facts = get_fact_pipeline().pop_results(st.session_state["student_name"])
+    if not facts:
+        return
+    known = set(wczytaj_pamiec()) | set(st.session_state["facts_to_confirm"])
+    for fact in facts:
+        if fact not in known:
+            known.add(fact)
+            st.session_state["facts_to_confirm"].append(fact)
+
+
 # =============================================================================
 # GŁÓWNA LOGIKA CHATBOTA SOKRATEJSKIEGO
 # =============================================================================
-def chatbot_reply(user_prompt: str, memory: List[Dict[str, Any]]) -> Dict[str, Any]:
+def chatbot_reply(user_prompt: str, on_token: Optional[Callable[[str], None]] = None,
+                  use_cache: bool = True,
+                  on_wait: Optional[Callable[[Dict[str, Any]], None]] = None
+                  ) -> Dict[str, Any]:
     """
     Główna funkcja generująca odpowiedzi Sokratesa.
-    
+
     Implementuje metodę sokratejską - zadaje pytania prowadzące zamiast
     podawać bezpośrednie odpowiedzi. System progresywnie zwiększa pomoc
     w zależności od liczby "nie wiem" od ucznia.
-    
+
     Args:
         user_prompt (str): Pytanie/wypowiedź ucznia
-        memory (List[Dict]): Ostatnie wiadomości z konwersacji
-        
+        on_token (Callable, optional): Jeśli podana, odpowiedź jest strumieniowana,
+            a funkcja otrzymuje kolejne fragmenty tekstu
+        use_cache (bool): False - pomiń cache odpowiedzi i wygeneruj nową
+            (zapamiętywana jest nowa odpowiedź)
+        on_wait (Callable, optional): Funkcja otrzymująca opis oczekiwania w kolejce
+            do API (zob. opis_oczekiwania())
+
     Returns:
-        Dict[str, Any]: Odpowiedź zawierająca treść i statystyki użycia API
-        
+        Dict[str, Any]: Odpowiedź zawierająca treść, statystyki użycia API,
+        metryki czasu ("ttft_s" - czas do pierwszego tokenu, "latency_s" - całkowity),
+        opis doboru kontekstu ("context") i koszt tury ("cost_pln")
+
     Note:
+        Logika tury znajduje się w SocraticEngine (sokrates/engine.py); tutaj
+        stan sesji jest tylko przekazywany do silnika i zapisywany z powrotem.
+        Pytanie i odpowiedź są dopisywane do historii rozmowy, a koszt do
+        licznika kosztów sesji.
         - Licznik "nie wiem" 0-2: tylko pytania prowadzące
-        - Licznik "nie wiem" 3: wskazówki i częściowe odpowiedzi  
+        - Licznik "nie wiem" 3: wskazówki i częściowe odpowiedzi
         - Licznik "nie wiem" 4+: pełna odpowiedź z wyjaśnieniem
+        - Do promptu trafia RETRIEVAL_TOP_K faktów najbardziej związanych z pytaniem
+        - Kontekst mieści się w CONTEXT_BUDGET; starsze tury trafiają do podsumowania
+        - Powtórzona tura (to samo pytanie, poziom pomocy, temat, kontekst i profil)
+          zwracana jest z cache odpowiedzi, bez zapytania do API
+        - Zapytanie czeka w kolejce harmonogramu klucza (limity RPM/TPM
+          i zapytań w toku)
+        - Tura ma termin REPLY_DEADLINE; wolne zapytanie może zostać zabezpieczone
+          drugim (HEDGE_REQUESTS), a odpowiedź daje to, które odpowie pierwsze
+        - Zalogowany uczeń ma jedną turę naraz we wszystkich instancjach aplikacji
+          (blokada w stanie współdzielonym, SHARED_STATE_URL)
     """
-    # Wczytanie profilu ucznia dla personalizacji
-    facts = wczytaj_pamiec()
-    memory_context = "\n".join(facts) if facts else "Brak informacji o uczniu."
-    
-    # Wykrywanie frazy "nie wiem" i jej wariantów
-    nie_wiem_phrases = ["nie wiem", "nie mam pojęcia", "bez pojęcia", "nie znam", "nie umiem"]
-    user_said_nie_wiem = any(phrase in user_prompt.lower() for phrase in nie_wiem_phrases)
-    
-    # Aktualizacja licznika pomocy
-    if user_said_nie_wiem:
-        st.session_state["nie_wiem_counter"] += 1
-    else:
-        # Reset licznika jeśli użytkownik nie prosi o pomoc
-        help_phrases = ["pytanie", "pomocy", "wyjaśnij"]
-        if not any(phrase in user_prompt.lower() for phrase in help_phrases):
-            st.session_state["nie_wiem_counter"] = 0
-    
-    # Przygotowanie kontekstu dla modelu AI
-    socratic_context = f"""
-Licznik "nie wiem": {st.session_state["nie_wiem_counter"]}/4
-Aktualny temat: {st.session_state.get("current_topic", "Nieokreślony")}
-
-INSTRUKCJE ZACHOWANIA:
-- Jeśli licznik "nie wiem" < 3: Zadawaj pytania prowadzące, NIE udzielaj bezpośredniej odpowiedzi
-- Jeśli licznik "nie wiem" = 3: Udziel wskazówki lub częściowej odpowiedzi
-- Jeśli licznik "nie wiem" >= 4: MUSISZ udzielić pełnej, jasnej odpowiedzi na pytanie ucznia. Zakończ proces sokratejski i podaj konkretne wyjaśnienie.
-
-Profil ucznia: {memory_context}
-"""
-
-    # Budowanie listy wiadomości dla API
-    messages = [
-        {"role": "system", "content": st.session_state["chatbot_personality"] + "\n" + socratic_context},
-        *[{"role": m["role"], "content": m["content"]} 
-          for m in memory[-6:] if "role" in m and "content" in m],  # Ostatnie 6 wiadomości dla kontekstu
-        {"role": "user", "content": user_prompt},
-    ]
+    stan = biezacy_stan()
+    try:
+        with _turn_lock(stan.student_name):
+            response = get_engine().reply(stan, user_prompt, client=get_openai_client(),
+                                          on_token=on_token, use_cache=use_cache,
+                                          limiter=get_rate_limiter(), on_wait=on_wait)
+    except LockTimeoutError:
+        response = {"content": "", "usage": None, "raw": None, "metrics": None,
+                    "error": "Sokrates odpowiada jeszcze na Twoje pytanie w innej "
+                             "karcie - spróbuj za chwilę."}
+    except SharedStateError as e:
+        response = {"content": "", "usage": None, "raw": None, "metrics": None,
+                    "error": f"Błąd stanu współdzielonego aplikacji: {e}"}
+    finally:
+        stan.save_to(st.session_state)
+    if response.get("error"):
+        st.error(response["error"])
+    return response
+
+
+def _turn_lock(student: str) -> Any:
+    """
+    Blokada tury ucznia wspólna dla instancji aplikacji.
+
+    Bez zalogowanego ucznia zwracana jest atrapa (nullcontext).
+
+    Note:
+        Blokada wygasa po terminie tury (REPLY_DEADLINE) z zapasem, więc przerwana
+        instancja nie zablokuje ucznia na stałe.
+    """
+    if not student:
+        return nullcontext()
+    ttl = (REPLY_DEADLINE or OPENAI_READ_TIMEOUT) + 30
+    return get_shared_state().lock("turn:" + student_key(student), ttl=ttl, timeout=10)
+
+
+def opis_oczekiwania(info: Dict[str, Any]) -> str:
+    """
+    Zamienia opis oczekiwania z harmonogramu API na komunikat dla ucznia.
+
+    Args:
+        info (Dict[str, Any]): "reason", "position", "wait_s" (opcjonalnie "attempt")
+
+    Returns:
+        str: Komunikat wyświetlany w miejscu odpowiedzi Sokratesa
+    """
+    reason = info.get("reason")
+    wait_s = info.get("wait_s") or 0.0
+    if reason == ratelimit.WAIT_QUEUE:
+        return f"⏳ Czekasz w kolejce (pozycja {info.get('position', 0) + 1})…"
+    if reason == ratelimit.WAIT_CONCURRENCY:
+        return "⏳ Sokrates odpowiada teraz innym uczniom - za chwilę Twoja kolej…"
+    if reason == ratelimit.WAIT_RETRY:
+        attempt = info.get("attempt", 1) + 1
+        return f"🔁 Ponawiam zapytanie (próba {attempt}) za {wait_s:.0f} s…"
+    return f"⏳ Osiągnięto limit zapytań - odpowiedź za ok. {max(wait_s, 1):.0f} s…"
+
+
+# =============================================================================
+# STRONA CZATU: LOGOWANIE UCZNIA I ROZMOWA
+# =============================================================================
+def strona_czatu() -> None:
+    """
+    Strona czatu: logowanie ucznia, historia rozmowy i formularz pytania.
+
+    Note:
+        Strona korzysta tylko z modułów potrzebnych do rozmowy - ciężkie
+        zależności panelu administracyjnego (pandas) nie są tu importowane.
+    """
+    if not st.session_state.get("student_name", ""):
+        st.markdown("""
+        <h2 style='text-align: center;'>🧠 Sokrates - Twój cyfrowy nauczyciel</h2>
+        <div style='text-align: center;'>
+            <p>Odkrywaj wiedzę z pomocą AI, która prowadzi Cię pytaniami – ucz się
+            skuteczniej, myśl samodzielnie i rozwijaj swój potencjał!</p>
+        </div>
+        """, unsafe_allow_html=True)
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            student_input = st.text_input("Podaj swoje imię:",
+                                          placeholder="np. Anna, Tomek...",
+                                          key="student_name_input")
+        with col2:
+            st.markdown("<div style='height: 1.7em'></div>", unsafe_allow_html=True)
+            if st.button("🚀 Start") and student_input.strip():
+                st.session_state["student_name"] = student_input.strip()
+                log_activity(activity_log.EVENT_LOGIN)
+                # Nowy uczeń: ostatnie tury jego zapisanej rozmowy (liczniki od nowa)
+                stan = biezacy_stan()
+                get_engine().restore_conversation(stan)
+                stan.save_to(st.session_state)
+                st.session_state["extraction_watermark"] = (stan.history_offset
+                                                            + len(stan.messages))
+                st.session_state["history_pages"] = 0
+                st.session_state["facts_to_confirm"] = []
+                st.rerun()
+        st.stop()
+
+    st.markdown("""
+    <h2 style='text-align: center;'>🧠 Sokrates - Twój cyfrowy nauczyciel</h2>
+    <div style='text-align: center;'>
+        <p>Zadaj pytanie lub napisz, czego chcesz się nauczyć. Sokrates poprowadzi
+        Cię pytaniami!</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Starsze wiadomości (spoza pamięci sesji) - wczytywane stronami z historii rozmów
+    offset = st.session_state.get("history_offset", 0)
+    shown = min(st.session_state.get("history_pages", 0) * HISTORY_PAGE_SIZE, offset)
+    if shown < offset:
+        st.button(f"⬆️ Wczytaj wcześniejsze wiadomości ({offset - shown})",
+                  key="load_earlier", on_click=wczytaj_wczesniejsze)
+    if shown:
+        older = get_conversation_store().page(st.session_state["student_name"],
+                                              before=offset, limit=shown)
+        for msg in older:
+            st.chat_message(msg["role"]).write(msg["content"])
+
+    # Historia rozmowy - rysowana tylko w pełnym przebiegu;
+    # nowe tury dopisuje fragment rozmowy
+    for msg in st.session_state["messages"]:
+        st.chat_message(msg["role"]).write(msg["content"])
+    st.session_state["history_rendered_upto"] = (offset
+                                                 + len(st.session_state["messages"]))
+    rozmowa()
+
+
+def wczytaj_wczesniejsze() -> None:
+    """
+    Pokazuje kolejną stronę starszych wiadomości (HISTORY_PAGE_SIZE)
+    nad bieżącą rozmową.
+    """
+    st.session_state["history_pages"] = st.session_state.get("history_pages", 0) + 1
 
+
+def _odswiez_po_turze() -> None:
+    """
+    Po wysłaniu pytania odświeża tylko fragmenty rozmowy i liczników (w tej kolejności).
+    """
+    st.rerun(["czat", "liczniki"])
+
+
+def potwierdz_fakt(index: int, zapisz: bool) -> None:
+    """
+    Zapisuje w profilu lub odrzuca fakt wydobyty z rozmowy
+    (przed odświeżeniem fragmentu).
+
+    Args:
+        index (int): Pozycja faktu na liście do potwierdzenia
+        zapisz (bool): True - zapisz w profilu, False - odrzuć
+    """
+    fact_item = st.session_state["facts_to_confirm"].pop(index)
+    if zapisz:
+        zapisz_do_pamieci(fact_item, source="ai_extraction")
+
+
+@st.fragment(key="czat")
+def rozmowa() -> None:
+    """
+    Bieżąca rozmowa: tury od ostatniego pełnego przebiegu, fakty do potwierdzenia
+    i formularz.
+
+    Note:
+        Fragment odświeżany jest niezależnie od reszty aplikacji - nowa tura
+        nie wykonuje ponownie sidebaru, weryfikacji klucza ani rysowania
+        wcześniejszej historii, więc jej koszt nie rośnie z długością rozmowy.
+    """
+    # Pozycje liczone w całej rozmowie - stan sesji mógł w międzyczasie zostać przycięty
+    rendered = (st.session_state.get("history_rendered_upto", 0)
+                - st.session_state.get("history_offset", 0))
+    if rendered < 0 and st.button("⬆️ Wczytaj wcześniejsze wiadomości",
+                                  key="load_earlier_recent"):
+        wczytaj_wczesniejsze()
+        st.rerun()  # starsze strony rysuje pełny przebieg strony czatu
+    for msg in st.session_state["messages"][max(rendered, 0):]:
+        st.chat_message(msg["role"]).write(msg["content"])
+
+    # Miejsce na bieżącą wymianę (strumieniowana odpowiedź pojawia się nad formularzem)
+    current_turn = st.container()
+
+    # Fakty wydobyte w tle z wypowiedzi ucznia - do potwierdzenia przed zapisem
+    odbierz_wyciagniete_fakty()
+    facts_to_confirm = st.session_state["facts_to_confirm"]
+    if facts_to_confirm:
+        with st.expander(f"🧩 Sokrates zauważył coś o Tobie ({len(facts_to_confirm)})"):
+            for idx, fact_item in enumerate(list(st.session_state["facts_to_confirm"])):
+                col1, col2, col3 = st.columns([6, 1, 1])
+                with col1:
+                    st.markdown(fact_item)
+                with col2:
+                    st.button("Zapisz", key=f"confirm_fact_{idx}",
+                              on_click=potwierdz_fakt, args=(idx, True))
+                with col3:
+                    st.button("Odrzuć", key=f"reject_fact_{idx}",
+                              on_click=potwierdz_fakt, args=(idx, False))
+
+    # Pole do wpisania nowej wiadomości
+    with st.form(key="chat_form", clear_on_submit=True):
+        user_input = st.text_area("Napisz czego będziesz się uczyć z Sokratesem:",
+                                  height=70, key="user_input")
+        bypass_cache = RESPONSE_CACHE_SIZE > 0 and st.checkbox(
+            "🔄 Nowa odpowiedź (bez cache)", key="bypass_response_cache",
+            help="Wygeneruj odpowiedź od nowa, nawet jeśli to samo pytanie "
+                 "padło już wcześniej.")
+        submit = st.form_submit_button("Wyślij", on_click=_odswiez_po_turze)
+
+    # Nowa tura zostaje w kontenerze nad formularzem - bez odświeżania całej aplikacji
+    if submit and user_input.strip():
+        with current_turn:
+            st.chat_message("user").write(user_input.strip())
+            with st.chat_message("assistant"):
+                placeholder = st.empty()
+                streamed: List[str] = []
+
+                def show_token(token: str) -> None:
+                    """Dopisuje fragment odpowiedzi do wyświetlanej wiadomości."""
+                    streamed.append(token)
+                    placeholder.markdown("".join(streamed) + "▌")
+
+                def show_wait(info: Dict[str, Any]) -> None:
+                    """Pokazuje stan oczekiwania w kolejce do API zamiast odpowiedzi."""
+                    placeholder.markdown(opis_oczekiwania(info))
+
+                # Pytanie, odpowiedź (z metrykami czasu) i koszt trafiają do stanu sesji
+                response = chatbot_reply(
+                    user_input.strip(),
+                    on_token=show_token if STREAM_RESPONSES else None,
+                    use_cache=not bypass_cache, on_wait=show_wait)
+                placeholder.markdown(response["content"])
+        usage = response.get("usage")
+        log_activity(activity_log.EVENT_TURN, metrics=response.get("metrics"),
+                     context=response.get("context"),
+                     prompt_tokens=getattr(usage, "prompt_tokens", None),
+                     completion_tokens=getattr(usage, "completion_tokens", None))
+        # Profil ucznia uczy się w tle - bez wydłużania czasu odpowiedzi
+        zaplanuj_wyciaganie_faktow()
+
+
+# =============================================================================
+# STRONA PANELU ADMINISTRACYJNEGO
+# =============================================================================
+# Linia oddzielająca sekcje panelu administracyjnego
+ADMIN_SEPARATOR = ("<hr style='margin:14px 0; border: none; "
+                   "border-top: 1px solid #555;'>")
+
+
+@st.fragment(key="panel_admina")
+def panel_administracyjny() -> None:
+    """
+    Panel administracyjny: statystyki, konta, eksport, logi, metryki API
+    i edycja profili.
+
+    Note:
+        pandas importowany jest dopiero tutaj, więc koszt importu ponosi
+        tylko pierwsze otwarcie panelu, a nie zimny start strony czatu.
+        Panel jest fragmentem - wyszukiwanie, stronicowanie i eksport
+        odświeżają tylko panel, bez sidebaru i weryfikacji klucza.
+    """
+    import pandas as pd
+
+    st.markdown("<h2 style='text-align: center;'>🛡️ Panel administracyjny</h2>",
+                unsafe_allow_html=True)
+    # Statystyki użytkowników (z indeksu statystyk - bez czytania profili)
+    store = get_profile_store()
+    summary = store.stats_summary()
+    liczba_uczniow = summary["students"]
+    liczba_faktow = summary["facts"]
+    cache_stats = store.cache.stats()
+    response_stats = get_response_cache().stats()
+    limiter_stats = get_rate_limiter().stats()
+    hedger = get_hedge_controller()
+    if hedger is not None:
+        hedge_stats = hedger.stats()
+        if hedge_stats["threshold_s"] is None:
+            threshold = "brak (za mało pomiarów)"
+        else:
+            threshold = f"{hedge_stats['threshold_s']:.2f} s"
+        hedge_line = (
+            "<li>Zapytania zabezpieczające (wysłane / wygrane / pominięte z braku "
+            "budżetu): <span style='color:#90caf9;'>"
+            f"{hedge_stats['fired']} / {hedge_stats['hedge_wins']} / "
+            f"{hedge_stats['skipped_budget']} ({hedge_stats['fired_rate']:.1%} tur), "
+            f"dodatkowe tokeny: {hedge_stats['extra_tokens']} "
+            f"({hedge_stats['extra_share']:.1%}), próg: {threshold}</span></li>")
+    else:
+        hedge_line = ""
     try:
-        client = get_openai_client()
-        chat_response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            stream=False
-        )
-        return {
-            "content": chat_response.choices[0].message.content if chat_response.choices else "",
-            "usage": getattr(chat_response, "usage", None),
-            "raw": chat_response
-        }
-    except (ValueError, KeyError, AttributeError) as e:
-        st.error(f"Błąd podczas komunikacji z AI: {e}")
-        return {"content": "", "usage": None, "raw": None}
+        shared_stats = get_engine().shared_counters()
+        shared_line = (
+            f"<li>Wszystkie instancje ({get_shared_state().name}) - tury / błędy / "
+            "z cache: <span style='color:#90caf9;'>"
+            f"{shared_stats['turns']:.0f} / {shared_stats['errors']:.0f} / "
+            f"{shared_stats['cache_hits']:.0f}, tokeny (wejście / wyjście / z cache "
+            f"promptu): {shared_stats['prompt_tokens']:.0f} / "
+            f"{shared_stats['completion_tokens']:.0f} / "
+            f"{shared_stats['cached_tokens']:.0f}, "
+            f"koszt: {shared_stats['cost_pln']:.4f} zł</span></li>")
+    except SharedStateError as e:
+        shared_line = ("<li>Stan współdzielony niedostępny: "
+                       "<span style='color:#ef9a9a;'>"
+                       f"{html.escape(str(e))}</span></li>")
+    st.markdown(f"""
+    <div style='background: #33393f; color: #f2f2f2; border-radius: 10px;
+        padding: 20px 18px; margin: 12px 0; box-shadow: 0 1px 4px #bdbdbd;'>
+        <b style='font-size:1.15em;'>Panel administracyjny</b><br><br>
+        <b>Statystyki użytkowników:</b><br>
+        <ul style='margin-top: 8px; margin-bottom: 0;'>
+          <li>Liczba unikalnych uczniów:
+            <span style='color:#90caf9;'>{liczba_uczniow}</span></li>
+          <li>Liczba profili: <span style='color:#90caf9;'>{liczba_uczniow}</span></li>
+          <li>Liczba wszystkich zapisanych faktów:
+            <span style='color:#90caf9;'>{liczba_faktow}</span></li>
+          <li>Rozmiar profili: <span style='color:#90caf9;'>
+            {summary['size_bytes'] / 1024:.1f} KB</span></li>
+          <li>Cache profili (trafienia / chybienia):
+            <span style='color:#90caf9;'>{cache_stats['hits']} / {cache_stats['misses']}
+            ({cache_stats['hit_rate']:.0%})</span></li>
+          <li>Cache odpowiedzi (trafienia / chybienia / pominięcia):
+            <span style='color:#90caf9;'>{response_stats['hits']}
+            / {response_stats['misses']} / {response_stats['bypasses']}
+            ({response_stats['hit_rate']:.0%}),
+            zaoszczędzone tokeny: {response_stats['saved_tokens']}</span></li>
+          <li>Kolejka API (w toku / oczekujące / ponowienia, w tym 429 /
+            przekroczenia czasu):
+            <span style='color:#90caf9;'>{limiter_stats['in_flight']}
+            / {limiter_stats['queued']} / {limiter_stats['retries']}
+            ({limiter_stats['rate_limited']}) / {limiter_stats['timeouts']},
+            średnio w kolejce: {limiter_stats['avg_queued_s']:.2f} s</span></li>
+          {hedge_line}
+          {shared_line}
+        </ul>
+        <hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>
+    """, unsafe_allow_html=True)
+    # Diagnostyka: fakty i tury użyte w ostatniej odpowiedzi tej sesji
+    last_context = st.session_state.get("last_context")
+    if last_context:
+        tokens_est = last_context["input_tokens_est"]
+        with st.expander(f"🔎 Kontekst ostatniej odpowiedzi (~{tokens_est} tokenów)"):
+            st.caption(f"Tury w oknie: {last_context['turns']}, "
+                       f"streszczone: {last_context['summarized_turns']}")
+            for item, fact in zip(last_context["selected_facts"],
+                                  last_context["fact_texts"]):
+                score = ("najnowszy" if item["score"] is None
+                         else f"BM25 {item['score']}")
+                st.markdown(f"- {html.escape(fact)} "
+                            f"<span style='color:#9e9e9e;'>({score})</span>",
+                            unsafe_allow_html=True)
+    # Wyszukiwanie i stronicowanie listy uczniów (stały koszt niezależnie
+    # od liczby profili)
+    admin_query = st.text_input("Szukaj ucznia", key="admin_search",
+                                placeholder="np. anna")
+    liczba_wynikow = store.count_students(admin_query)
+    liczba_stron = max(1, -(-liczba_wynikow // ADMIN_PAGE_SIZE))
+    if st.session_state.get("admin_page", 1) > liczba_stron:
+        st.session_state["admin_page"] = liczba_stron  # np. po zawężeniu wyszukiwania
+    admin_page = int(st.number_input(f"Strona (z {liczba_stron})", min_value=1,
+                                     max_value=liczba_stron, step=1, key="admin_page"))
+    students = store.list_student_stats(admin_query,
+                                        offset=(admin_page - 1) * ADMIN_PAGE_SIZE,
+                                        limit=ADMIN_PAGE_SIZE)
+    # Zarządzanie kontami
+    st.markdown("<b>Zarządzanie kontami:</b>", unsafe_allow_html=True)
+    if not students:
+        st.info("Brak profili uczniów do wyświetlenia.")
+    else:
+        for s_row in students:
+            name = s_row["name"]
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                zmiana = time.strftime("%d.%m.%Y %H:%M",
+                                       time.localtime(s_row["updated_at"]))
+                st.markdown(f"<span style='color:#90caf9;'>{name}</span> "
+                            "<span style='font-size:0.85em;color:#bbb;'>"
+                            f"({s_row['fact_count']} faktów, {zmiana})</span>",
+                            unsafe_allow_html=True)
+            with col2:
+                if st.button("Usuń", key=f"usun_{s_row['key']}"):
+                    try:
+                        get_engine().delete_student(s_row["key"])
+                    except (LockTimeoutError, SharedStateError) as e:
+                        st.error(f"Profil ucznia jest właśnie zapisywany ({e}). "
+                                 "Spróbuj ponownie.")
+                    else:
+                        log_activity(activity_log.EVENT_PROFILE_DELETE, s_row["key"],
+                                     by="admin")
+                        st.success(f"Usunięto profil ucznia: {name}")
+                        st.rerun()
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # Eksport danych
+    st.markdown("<b>Eksport danych:</b>", unsafe_allow_html=True)
+    if liczba_uczniow == 0:
+        st.info("Brak profili do eksportu.")
+    else:
+        # Eksport generowany tylko na żądanie - pojedynczy profil z bieżącej strony
+        if students:
+            nazwy_uczniow = {s_row["key"]: s_row["name"] for s_row in students}
+            export_key = st.selectbox("Profil do pobrania", list(nazwy_uczniow),
+                                      key="export_student",
+                                      format_func=nazwy_uczniow.get)
+            # Dane pobierane są dopiero po kliknięciu (funkcja zamiast treści)
+            # - raz na pobranie
+            if st.download_button(f"Pobierz profil {nazwy_uczniow[export_key]}",
+                                  partial(store.export_jsonl, export_key),
+                                  file_name=get_student_memory_file(export_key).name,
+                                  mime="application/json", key="download_profile"):
+                log_activity(activity_log.EVENT_EXPORT, export_key, scope="profile")
+        # Eksport wszystkich profili naraz (ZIP) - budowany po kliknięciu
+        # i zapamiętany do zmiany profili
+        archive = get_profiles_archive()
+        if st.download_button(
+            "Pobierz wszystkie profile (ZIP)",
+            lambda: archive.path().read_bytes(),
+            file_name="wszystkie_profile.zip",
+            mime="application/zip",
+            key="download_all_zip"
+        ):
+            log_activity(activity_log.EVENT_EXPORT, "", scope="all",
+                         students=liczba_uczniow)
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # Logi aktywności i audyt (dziennik JSONL, odczyt od końca pliku)
+    st.markdown("<b>Logi aktywności i audyt:</b>", unsafe_allow_html=True)
+    log_col1, log_col2 = st.columns(2)
+    with log_col1:
+        log_student = st.text_input("Uczeń", key="log_student_filter",
+                                    placeholder="wszyscy")
+    with log_col2:
+        log_event = st.selectbox("Zdarzenie", ("",) + activity_log.EVENTS,
+                                 key="log_event_filter",
+                                 format_func=lambda ev: ev or "wszystkie")
+    logs = get_activity_log().tail(10, student=log_student.strip(), event=log_event)
+    if logs:
+        for entry in logs:
+            details = ""
+            if entry.get("details"):
+                details = json.dumps(entry["details"], ensure_ascii=False)
+            log_line = (f"{entry.get('ts', '')} · {entry.get('event', '')} · "
+                        f"{entry.get('student') or '-'} {details}")
+            st.markdown("<span style='font-size:0.95em;color:#bbb;'>"
+                        f"{html.escape(log_line)}</span>", unsafe_allow_html=True)
+    else:
+        st.info("Brak logów aktywności.")
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # Usunięto placeholdery funkcji enterprise, które nie są jeszcze dostępne
+    st.markdown("""
+        <b>Pełna dokumentacja techniczna:</b>
+        <a href='https://github.com/AlanSteinbarth/Sokrates#readme'
+           style='color:#90caf9;' target='_blank'>Zobacz README</a>
+    """, unsafe_allow_html=True)
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # Podstawowe informacje
+    st.markdown("""
+        <b>Podstawowe informacje:</b><br>
+        <ul style='margin-top: 6px; margin-bottom: 0;'>
+          <li><b>Wersja aplikacji:</b> 2.2.0</li>
+          <li><b>Data builda:</b> 16.06.2025</li>
+        </ul>
+    """, unsafe_allow_html=True)
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # Bezpieczeństwo i zgodność
+    st.markdown("""
+        <b>Bezpieczeństwo i zgodność:</b><br>
+        <ul style='margin-top: 6px; margin-bottom: 0;'>
+          <li>RODO/GDPR, FERPA, COPPA</li>
+        </ul>
+    """, unsafe_allow_html=True)
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # Dashboard z wykresami (liczba uczniów, liczba faktów)
+    st.markdown("<b>Dashboard:</b>", unsafe_allow_html=True)
+    if liczba_uczniow > 0:
+        top_students = store.list_student_stats(order="facts", limit=ADMIN_PAGE_SIZE)
+        st.caption(f"Uczniowie z największą liczbą faktów "
+                   f"(top {len(top_students)})")
+        df = pd.DataFrame({
+            "Uczeń": [s_row["name"] for s_row in top_students],
+            "Fakty": [s_row["fact_count"] for s_row in top_students]
+        })
+        st.bar_chart(df.set_index("Uczeń"))
+    else:
+        st.info("Brak danych do wyświetlenia wykresu.")
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # Wydajność i koszty wywołań API (z trwałego rejestru db/metrics.db)
+    st.markdown("<b>Wydajność i koszty API:</b>", unsafe_allow_html=True)
+    metrics_days = st.selectbox(
+        "Okres", [1, 7, 30], index=1, key="metrics_days",
+        format_func=lambda d: f"ostatnie {d} dni" if d > 1 else "ostatnia doba")
+    metrics_since = time.time() - metrics_days * 86400
+    metrics_store = get_metrics_store()
+    latency_rows = metrics_store.latency_summary(metrics_since)
+    if latency_rows:
+        nazwy_wywolan = {"chat": "Odpowiedzi", "verify": "Weryfikacja klucza",
+                         "extract": "Wydobywanie faktów"}
+        st.dataframe(pd.DataFrame({
+            "Wywołanie": [nazwy_wywolan.get(r["kind"], r["kind"])
+                          for r in latency_rows],
+            "Liczba": [r["calls"] for r in latency_rows],
+            "Błędy": [r["errors"] for r in latency_rows],
+            "Z cache": [r["cache_hits"] for r in latency_rows],
+            "p50 [ms]": [r["p50_ms"] for r in latency_rows],
+            "p95 [ms]": [r["p95_ms"] for r in latency_rows],
+            "p99 [ms]": [r["p99_ms"] for r in latency_rows],
+        }), hide_index=True)
+        turn_tokens = metrics_store.tokens_per_turn(metrics_since)
+        st.caption(f"Tokeny na turę: średnio {turn_tokens['avg_prompt']} wejściowych + "
+                   f"{turn_tokens['avg_completion']} wyjściowych, "
+                   f"p95 łącznie: {turn_tokens['p95_total'] or 0} "
+                   f"(z cache promptu: {turn_tokens['cached_share']:.0%} "
+                   f"tokenów wejściowych, {turn_tokens['cache_hit_rate']:.0%} tur)")
+        routing_rows = metrics_store.routing_summary(metrics_since)
+        if routing_rows:
+            nazwy_powodow = {"default": "pytania prowadzące",
+                             "full_answer": "pełna odpowiedź",
+                             "long_prompt": "długa wypowiedź",
+                             "complex": "złożone zadanie",
+                             "fixed": "stały model", "": "-"}
+            st.caption("Wybór modelu odpowiedzi")
+            st.dataframe(pd.DataFrame({
+                "Model": [r["model"] for r in routing_rows],
+                "Powód": [nazwy_powodow.get(r["route"], r["route"])
+                          for r in routing_rows],
+                "Tury": [r["calls"] for r in routing_rows],
+                "p50 [ms]": [r["p50_ms"] for r in routing_rows],
+                "Tokeny na turę": [r["avg_tokens"] for r in routing_rows],
+                "Koszt [zł]": [round(r["cost_pln"], 4) for r in routing_rows],
+            }), hide_index=True)
+        cost_rows = metrics_store.cost_by_student_day(metrics_since)
+        st.caption("Najwyższe koszty (uczeń / dzień)")
+        st.dataframe(pd.DataFrame({
+            "Dzień": [r["day"] for r in cost_rows],
+            "Uczeń": [display_name_from_key(r["student"]) if r["student"] else "-"
+                      for r in cost_rows],
+            "Wywołania": [r["calls"] for r in cost_rows],
+            "Tokeny": [r["tokens"] for r in cost_rows],
+            "Koszt [zł]": [round(r["cost_pln"], 4) for r in cost_rows],
+        }), hide_index=True)
+    else:
+        st.info("Brak zarejestrowanych wywołań API w tym okresie.")
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # System zgłoszeń i wsparcia (formularz kontaktowy)
+    st.markdown("<b>System zgłoszeń i wsparcia:</b>", unsafe_allow_html=True)
+    with st.form(key="support_form"):
+        zg_email = st.text_input("Twój email (opcjonalnie)")
+        zg_tresc = st.text_area("Opisz swój problem lub sugestię")
+        zg_submit = st.form_submit_button("Wyślij zgłoszenie")
+    if zg_submit and zg_tresc.strip():
+        with open("db/support_tickets.log", "a", encoding="utf-8") as f:
+            f.write(f"Email: {zg_email}\nTreść: {zg_tresc}\n---\n")
+        log_activity(activity_log.EVENT_SUPPORT_TICKET,
+                     with_email=bool(zg_email.strip()))
+        st.success("Zgłoszenie zostało zapisane. Dziękujemy!")
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+    # Edycja profilu ucznia (podgląd i edycja faktów)
+    st.markdown("<b>Edycja profilu ucznia:</b>", unsafe_allow_html=True)
+    if liczba_uczniow > 0 and st.button("🧹 Scal podobne fakty we wszystkich profilach",
+                                        key="consolidate_all"):
+        try:
+            wynik = get_engine().consolidate_all()
+        except (LockTimeoutError, SharedStateError) as e:
+            st.error("Scalanie przerwane - profil ucznia jest właśnie zapisywany "
+                     f"({e}). Spróbuj ponownie.")
+        else:
+            log_activity(activity_log.EVENT_FACT_DELETE, "", removed=wynik["removed"],
+                         by="consolidation")
+            st.success(f"Przejrzano profili: {wynik['students']}, "
+                       f"usunięto faktów: {wynik['removed']}.")
+    if not students:
+        st.info("Brak profili do edycji.")
+    else:
+        for s_row in students:
+            with st.expander(f"Profil: {s_row['name']} ({s_row['fact_count']})"):
+                for fact_record in store.list_fact_records(s_row["key"]):
+                    col1, col2 = st.columns([5, 1])
+                    with col1:
+                        st.markdown(f"{fact_record['fact']}")
+                    with col2:
+                        fact_key = f"usun_fact_{s_row['key']}_{fact_record['id']}"
+                        if st.button("Usuń", key=fact_key):
+                            with get_engine().profile_lock(s_row["key"]):
+                                store.delete_fact(s_row["key"], fact_record["id"])
+                                get_fact_retriever().remove(s_row["key"],
+                                                            [fact_record["id"]])
+                            log_activity(activity_log.EVENT_FACT_DELETE, s_row["key"],
+                                         fact_id=fact_record["id"], by="admin")
+                            st.success("Usunięto fakt.")
+                            st.rerun()
+    st.markdown(ADMIN_SEPARATOR, unsafe_allow_html=True)
+
+
+# ===============================
+# LICZNIKI W SIDEBARZE
+# ===============================
+@st.fragment(key="liczniki")
+def liczniki() -> None:
+    """
+    Licznik "nie wiem" i szacowany koszt rozmowy (fragment odświeżany
+    po każdej turze).
+    """
+    nie_wiem_counter = st.session_state.get("nie_wiem_counter", 0)
+    st.markdown(f"""
+    <style>
+    .sokrates-tooltip-box {{ position: relative; display: block;
+        overflow: visible !important; }}
+    .sokrates-tooltip-icon {{ position: absolute; top: 10px; right: 14px; z-index: 1002;
+        cursor: help; font-size: 1.1em; color: #1976d2; background: #fff;
+        border-radius: 50%; border: 1.5px solid #1976d2; width: 18px; height: 18px;
+        text-align: center; line-height: 16px; display: flex; align-items: center;
+        justify-content: center; overflow: visible !important; }}
+    .sokrates-tooltip-icon .sokrates-tooltiptext {{ visibility: hidden; opacity: 0;
+        background-color: #222; color: #fff; text-align: left; border-radius: 7px;
+        padding: 7px 14px; position: fixed; z-index: 99999; left: 320px;
+        font-size: 0.98em; white-space: nowrap; box-shadow: 0 2px 8px #888;
+        min-width: 180px; max-width: none; width: max-content; text-align: left;
+        pointer-events: none; }}
+    .sokrates-tooltip-icon.niewiem .sokrates-tooltiptext {{ top: 390px; }}
+    .sokrates-tooltip-icon.koszt .sokrates-tooltiptext {{ top: 500px; }}
+    .sokrates-tooltip-icon:hover .sokrates-tooltiptext {{ visibility: visible;
+        opacity: 1; }}
+    @media (max-width: 600px) {{
+        .sokrates-tooltip-box {{ padding: 8px 4vw 14px 4vw !important;
+            font-size: 1em !important; }}
+        .sokrates-tooltip-icon {{ right: 6vw !important; width: 22px !important;
+            height: 22px !important; font-size: 1.3em !important; }}
+        .sokrates-tooltip-icon .sokrates-tooltiptext {{ left: 10vw !important;
+            min-width: 120px !important; font-size: 0.95em !important;
+            padding: 7px 8px !important; }}
+        .sokrates-tooltip-icon.niewiem .sokrates-tooltiptext {{
+            top: 120vw !important; }}
+        .sokrates-tooltip-icon.koszt .sokrates-tooltiptext {{
+            top: 150vw !important; }}
+        .element-container, .stTextInput, .stTextArea, .stButton, .stForm {{
+            font-size: 1.08em !important; }}
+        .stTextInput input, .stTextArea textarea {{ font-size: 1.08em !important;
+            padding: 10px !important; }}
+        .stButton button {{ font-size: 1.08em !important;
+            padding: 10px 18px !important; }}
+        .stMarkdown, .stSubheader, .stHeader {{ font-size: 1.08em !important; }}
+    }}
+    </style>
+    <div class='sokrates-tooltip-box' style='background: #e0e0e0; border-radius: 10px;
+        padding: 10px 16px 18px 16px; margin-bottom: 8px; box-shadow: 0 1px 4px #bdbdbd;
+        position: relative; overflow: visible !important;'>
+        <b style='color: #333;'>Licznik 'nie wiem:'</b>
+        <span style='font-size: 1.3em; font-weight: bold; color: #333; display: block;
+            margin-top: 4px;'>
+            {nie_wiem_counter} / 4
+        </span>
+        <span class=\"sokrates-tooltip-icon niewiem\">?
+            <span class=\"sokrates-tooltiptext\">Licznik zwiększa się, gdy odpowiadasz
+                'nie wiem' lub podobnie. Po 4 razach Sokrates poda pełną
+                odpowiedź.</span>
+        </span>
+    </div>
+    <hr style='margin: 12px 0; border: none; border-top: 1px solid #bbb;'>
+    <div class='sokrates-tooltip-box' style='background: #e0e0e0; border-radius: 10px;
+        padding: 10px 16px 18px 16px; margin-bottom: 8px; box-shadow: 0 1px 4px #bdbdbd;
+        position: relative; overflow: visible !important;'>
+        <b style='color: #333;'>Szacowany koszt rozmowy:</b>
+        <span style='font-size: 1.3em; font-weight: bold; color: #333; display: block;
+            margin-top: 4px;'>
+            {st.session_state['cost_total_pln']:.4f} zł
+        </span>
+        <span class=\"sokrates-tooltip-icon koszt\">?
+            <span class=\"sokrates-tooltiptext\">Koszt liczony na podstawie liczby
+                tokenów zużytych przez model OpenAI (input/output) i aktualnego kursu
+                USD/PLN. To tylko szacunkowa wartość.</span>
+        </span>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+# ===============================
+# NAWIGACJA MIĘDZY STRONAMI
+# ===============================
+czat_page = st.Page(strona_czatu, title="Sokrates - Twój cyfrowy nauczyciel", icon="🧠",
+                    default=True)
+admin_page = st.Page(panel_administracyjny, title="Panel administracyjny", icon="🛡️",
+                     url_path="admin")
+# Panel dostępny dopiero po weryfikacji klucza i zalogowaniu ucznia
+# (przycisk w sidebarze)
+strony = [czat_page]
+if (st.session_state.get("api_key_verified", False)
+        and st.session_state.get("student_name", "")):
+    strony.append(admin_page)
+biezaca_strona = st.navigation(strony, position="hidden")
 
 # ===============================
 # SIDEBAR: WPROWADZANIE KLUCZA API
 # ===============================
 with st.sidebar:
     st.header("🔑 OpenAI API Key")
-    env_sidebar = dotenv_values(".env")  # zmiana nazwy zmiennej
-    env_api_key = env_sidebar.get("OPENAI_API_KEY", "")
+    env_api_key = load_env().get("OPENAI_API_KEY", "")
     api_key_input = st.text_input(
         "Podaj swój OpenAI API Key",
         type="password",
         value=st.session_state.get("openai_api_key", env_api_key),
-        help="Wprowadź swój klucz OpenAI API lub dodaj go do pliku .env jako OPENAI_API_KEY. Klucz jest wymagany do działania aplikacji."
+        help=("Wprowadź swój klucz OpenAI API lub dodaj go do pliku .env jako "
+              "OPENAI_API_KEY. Klucz jest wymagany do działania aplikacji.")
     )
     if api_key_input:
         st.session_state["openai_api_key"] = api_key_input
@@ -382,7 +1551,8 @@ with st.sidebar:
     prev_verified = st.session_state.get("api_key_verified", False)
     if st.session_state["openai_api_key"]:
         if verify_api_key(st.session_state["openai_api_key"]):
-            api_key_status = "✅ Klucz API jest prawidłowy. Możesz korzystać z aplikacji."
+            api_key_status = ("✅ Klucz API jest prawidłowy. "
+                              "Możesz korzystać z aplikacji.")
             st.success(api_key_status)
             st.session_state["api_key_verified"] = True
             if not prev_verified:
@@ -394,192 +1564,26 @@ with st.sidebar:
     else:
         st.info("Podaj swój klucz OpenAI API lub dodaj go do pliku .env.")
         st.session_state["api_key_verified"] = False
+        st.session_state["api_key_hash"] = ""
 
     # Pokaż resztę sidebaru dopiero po podaniu imienia
-    if st.session_state.get("api_key_verified", False) and st.session_state.get("student_name", ""):
-        nie_wiem_counter = st.session_state.get("nie_wiem_counter", 0)
-        st.markdown(f"""
-        <style>
-        .sokrates-tooltip-box {{ position: relative; display: block; overflow: visible !important; }}
-        .sokrates-tooltip-icon {{ position: absolute; top: 10px; right: 14px; z-index: 1002; cursor: help; font-size: 1.1em; color: #1976d2; background: #fff; border-radius: 50%; border: 1.5px solid #1976d2; width: 18px; height: 18px; text-align: center; line-height: 16px; display: flex; align-items: center; justify-content: center; overflow: visible !important; }}
-        .sokrates-tooltip-icon .sokrates-tooltiptext {{ visibility: hidden; opacity: 0; background-color: #222; color: #fff; text-align: left; border-radius: 7px; padding: 7px 14px; position: fixed; z-index: 99999; left: 320px; font-size: 0.98em; white-space: nowrap; box-shadow: 0 2px 8px #888; min-width: 180px; max-width: none; width: max-content; text-align: left; pointer-events: none; }}
-        .sokrates-tooltip-icon.niewiem .sokrates-tooltiptext {{ top: 390px; }}
-        .sokrates-tooltip-icon.koszt .sokrates-tooltiptext {{ top: 500px; }}
-        .sokrates-tooltip-icon:hover .sokrates-tooltiptext {{ visibility: visible; opacity: 1; }}
-        @media (max-width: 600px) {{ .sokrates-tooltip-box {{ padding: 8px 4vw 14px 4vw !important; font-size: 1em !important; }} .sokrates-tooltip-icon {{ right: 6vw !important; width: 22px !important; height: 22px !important; font-size: 1.3em !important; }} .sokrates-tooltip-icon .sokrates-tooltiptext {{ left: 10vw !important; min-width: 120px !important; font-size: 0.95em !important; padding: 7px 8px !important; }} .sokrates-tooltip-icon.niewiem .sokrates-tooltiptext {{ top: 120vw !important; }} .sokrates-tooltip-icon.koszt .sokrates-tooltiptext {{ top: 150vw !important; }} .element-container, .stTextInput, .stTextArea, .stButton, .stForm {{ font-size: 1.08em !important; }} .stTextInput input, .stTextArea textarea {{ font-size: 1.08em !important; padding: 10px !important; }} .stButton button {{ font-size: 1.08em !important; padding: 10px 18px !important; }} .stMarkdown, .stSubheader, .stHeader {{ font-size: 1.08em !important; }} }}
-        </style>
-        <div class='sokrates-tooltip-box' style='background: #e0e0e0; border-radius: 10px; padding: 10px 16px 18px 16px; margin-bottom: 8px; box-shadow: 0 1px 4px #bdbdbd; position: relative; overflow: visible !important;'>
-            <b style='color: #333;'>Licznik 'nie wiem:'</b>
-            <span style='font-size: 1.3em; font-weight: bold; color: #333; display: block; margin-top: 4px;'>
-                {nie_wiem_counter} / 4
-            </span>
-            <span class=\"sokrates-tooltip-icon niewiem\">?
-                <span class=\"sokrates-tooltiptext\">Licznik zwiększa się, gdy odpowiadasz 'nie wiem' lub podobnie. Po 4 razach Sokrates poda pełną odpowiedź.</span>
-            </span>
-        </div>
-        <hr style='margin: 12px 0; border: none; border-top: 1px solid #bbb;'>
-        <div class='sokrates-tooltip-box' style='background: #e0e0e0; border-radius: 10px; padding: 10px 16px 18px 16px; margin-bottom: 8px; box-shadow: 0 1px 4px #bdbdbd; position: relative; overflow: visible !important;'>
-            <b style='color: #333;'>Szacowany koszt rozmowy:</b>
-            <span style='font-size: 1.3em; font-weight: bold; color: #333; display: block; margin-top: 4px;'>
-                {st.session_state['cost_total_pln']:.4f} zł
-            </span>
-            <span class=\"sokrates-tooltip-icon koszt\">?
-                <span class=\"sokrates-tooltiptext\">Koszt liczony na podstawie liczby tokenów zużytych przez model OpenAI (input/output) i aktualnego kursu USD/PLN. To tylko szacunkowa wartość.</span>
-            </span>
-        </div>
-        """, unsafe_allow_html=True)
-        # Panel administracyjny - przycisk na całą szerokość i wyśrodkowany
+    if (st.session_state.get("api_key_verified", False)
+            and st.session_state.get("student_name", "")):
+        liczniki()
+        # Panel administracyjny (osobna strona) - przycisk na całą szerokość,
+        # wyśrodkowany
         st.markdown("""
-        <div style='display: flex; justify-content: center; align-items: center; width: 100%;'>
+        <div style='display: flex; justify-content: center; align-items: center;
+            width: 100%;'>
         <div style='flex:1; max-width: 100%;'>
         """, unsafe_allow_html=True)
-        admin_clicked = st.button("🛡️ Panel administracyjny", key="admin_btn_sidebar", use_container_width=True)
+        na_panelu = biezaca_strona.url_path == admin_page.url_path
+        admin_clicked = st.button(
+            "💬 Powrót do czatu" if na_panelu else "🛡️ Panel administracyjny",
+            key="admin_btn_sidebar", use_container_width=True)
         st.markdown("</div></div>", unsafe_allow_html=True)
         if admin_clicked:
-            st.session_state["show_admin_panel"] = not st.session_state.get("show_admin_panel", False)
-        if st.session_state.get("show_admin_panel", False):
-            # Statystyki użytkowników
-            students_dir_path = Path("db/students")
-            student_files = list(students_dir_path.glob("*_memory.json")) if students_dir_path.exists() else []
-            liczba_uczniow = len(student_files)
-            liczba_faktow = 0
-            for file in student_files:
-                try:
-                    with open(file, "r", encoding="utf-8") as f:
-                        liczba_faktow += sum(1 for _ in f)
-                except (OSError, ValueError, KeyError):
-                    pass
-            st.markdown(f"""
-            <div style='background: #33393f; color: #f2f2f2; border-radius: 10px; padding: 20px 18px; margin: 12px 0; box-shadow: 0 1px 4px #bdbdbd;'>
-                <b style='font-size:1.15em;'>Panel administracyjny</b><br><br>
-                <b>Statystyki użytkowników:</b><br>
-                <ul style='margin-top: 8px; margin-bottom: 0;'>
-                  <li>Liczba unikalnych uczniów: <span style='color:#90caf9;'>{liczba_uczniow}</span></li>
-                  <li>Liczba profili (plików): <span style='color:#90caf9;'>{liczba_uczniow}</span></li>
-                  <li>Liczba wszystkich zapisanych faktów: <span style='color:#90caf9;'>{liczba_faktow}</span></li>
-                </ul>
-                <hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>
-            """, unsafe_allow_html=True)
-            # Zarządzanie kontami
-            st.markdown("<b>Zarządzanie kontami:</b>", unsafe_allow_html=True)
-            if liczba_uczniow == 0:
-                st.info("Brak profili uczniów do wyświetlenia.")
-            else:
-                for file in student_files:
-                    name = file.stem.replace('_memory','').replace('_',' ').title()
-                    col1, col2 = st.columns([3,1])
-                    with col1:
-                        st.markdown(f"<span style='color:#90caf9;'>{name}</span>", unsafe_allow_html=True)
-                    with col2:
-                        if st.button("Usuń", key=f"usun_{file}"):
-                            file.unlink(missing_ok=True)
-                            st.success(f"Usunięto profil ucznia: {name}")
-                            st.rerun()
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
-            # Eksport danych
-            st.markdown("<b>Eksport danych:</b>", unsafe_allow_html=True)
-            if liczba_uczniow == 0:
-                st.info("Brak profili do eksportu.")
-            else:
-                for file in student_files:
-                    name = file.stem.replace('_memory','').replace('_',' ').title()
-                    with open(file, "r", encoding="utf-8") as f:
-                        data = f.read()
-                    st.download_button(f"Pobierz profil {name}", data, file_name=f"{file.name}", mime="application/json", key=f"download_{file}")
-                # Eksport wszystkich profili naraz (ZIP)
-                if liczba_uczniow > 0:
-                    zip_buffer = io.BytesIO()
-                    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-                        for file in student_files:
-                            with open(file, "rb") as f:
-                                zipf.writestr(file.name, f.read())
-                    zip_buffer.seek(0)
-                    st.download_button(
-                        "Pobierz wszystkie profile (ZIP)",
-                        zip_buffer,
-                        file_name="wszystkie_profile.zip",
-                        mime="application/zip",
-                        key="download_all_zip"
-                    )
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
-            # Logi aktywności i audyt (prosty log)
-            st.markdown("<b>Logi aktywności i audyt:</b>", unsafe_allow_html=True)
-            log_path = Path("db/activity.log")
-            if log_path.exists():
-                with open(log_path, "r", encoding="utf-8") as f:
-                    logs = f.readlines()[-10:]
-                for line in logs:
-                    st.markdown(f"<span style='font-size:0.95em;color:#bbb;'>{line.strip()}</span>", unsafe_allow_html=True)
-            else:
-                st.info("Brak logów aktywności.")
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
-            # Usunięto placeholdery funkcji enterprise, które nie są jeszcze dostępne
-            st.markdown("""
-                <b>Pełna dokumentacja techniczna:</b> <a href='https://github.com/AlanSteinbarth/Sokrates#readme' style='color:#90caf9;' target='_blank'>Zobacz README</a>
-            """, unsafe_allow_html=True)
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
-            # Podstawowe informacje
-            st.markdown("""
-                <b>Podstawowe informacje:</b><br>
-                <ul style='margin-top: 6px; margin-bottom: 0;'>
-                  <li><b>Wersja aplikacji:</b> 2.2.0</li>
-                  <li><b>Data builda:</b> 16.06.2025</li>
-                </ul>
-            """, unsafe_allow_html=True)
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
-            # Bezpieczeństwo i zgodność
-            st.markdown("""
-                <b>Bezpieczeństwo i zgodność:</b><br>
-                <ul style='margin-top: 6px; margin-bottom: 0;'>
-                  <li>RODO/GDPR, FERPA, COPPA</li>
-                </ul>
-            """, unsafe_allow_html=True)
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
-            # Dashboard z wykresami (liczba uczniów, liczba faktów)
-            st.markdown("<b>Dashboard:</b>", unsafe_allow_html=True)
-            if liczba_uczniow > 0:
-                df = pd.DataFrame({
-                    "Uczeń": [file.stem.replace('_memory','').replace('_',' ').title() for file in student_files],
-                    "Fakty": [sum(1 for _ in open(file, "r", encoding="utf-8")) for file in student_files]
-                })
-                st.bar_chart(df.set_index("Uczeń"))
-            else:
-                st.info("Brak danych do wyświetlenia wykresu.")
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
-            # System zgłoszeń i wsparcia (formularz kontaktowy)
-            st.markdown("<b>System zgłoszeń i wsparcia:</b>", unsafe_allow_html=True)
-            with st.form(key="support_form"):
-                zg_email = st.text_input("Twój email (opcjonalnie)")
-                zg_tresc = st.text_area("Opisz swój problem lub sugestię")
-                zg_submit = st.form_submit_button("Wyślij zgłoszenie")
-            if zg_submit and zg_tresc.strip():
-                with open("db/support_tickets.log", "a", encoding="utf-8") as f:
-                    f.write(f"Email: {zg_email}\nTreść: {zg_tresc}\n---\n")
-                st.success("Zgłoszenie zostało zapisane. Dziękujemy!")
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
-            # Edycja profilu ucznia (podgląd i edycja faktów)
-            st.markdown("<b>Edycja profilu ucznia:</b>", unsafe_allow_html=True)
-            if liczba_uczniow == 0:
-                st.info("Brak profili do edycji.")
-            else:
-                for file in student_files:
-                    name = file.stem.replace('_memory','').replace('_',' ').title()
-                    with st.expander(f"Profil: {name}"):
-                        with open(file, "r", encoding="utf-8") as f:
-                            fakty_lista = [json.loads(line)["fact"] for line in f if line.strip()]
-                        for idx, fact_item in enumerate(fakty_lista):
-                            col1, col2 = st.columns([5,1])
-                            with col1:
-                                st.markdown(f"{fact_item}")
-                            with col2:
-                                if st.button("Usuń", key=f"usun_fact_{file}_{idx}"):
-                                    fakty_lista.pop(idx)
-                                    with open(file, "w", encoding="utf-8") as fw:
-                                        for fct in fakty_lista:
-                                            fw.write(json.dumps({"fact": fct}, ensure_ascii=False)+"\n")
-                                    st.success("Usunięto fakt.")
-                                    st.rerun()
-            st.markdown("<hr style='margin:14px 0; border: none; border-top: 1px solid #555;'>", unsafe_allow_html=True)
+            st.switch_page(czat_page if na_panelu else admin_page)
 # ===============================
 # BLOKADA FUNKCJI DO CZASU WERYFIKACJI KLUCZA
 # ===============================
@@ -587,69 +1591,12 @@ if not st.session_state.get("api_key_verified", False):
     st.markdown("""
     <h2 style='text-align: center;'>🧠 Sokrates - Twój cyfrowy nauczyciel</h2>
     <div style='text-align: center;'>
-        <p>Odkrywaj wiedzę z pomocą AI, która prowadzi Cię pytaniami – ucz się skuteczniej, myśl samodzielnie i rozwijaj swój potencjał!</p>
+        <p>Odkrywaj wiedzę z pomocą AI, która prowadzi Cię pytaniami – ucz się
+        skuteczniej, myśl samodzielnie i rozwijaj swój potencjał!</p>
     </div>
     """, unsafe_allow_html=True)
     st.stop()
 
-# ===============================
-# LOGOWANIE UCZNIA I INTERFEJS GŁÓWNY
-# ===============================
-if not st.session_state.get("student_name", ""):
-    st.markdown("""
-    <h2 style='text-align: center;'>🧠 Sokrates - Twój cyfrowy nauczyciel</h2>
-    <div style='text-align: center;'>
-        <p>Odkrywaj wiedzę z pomocą AI, która prowadzi Cię pytaniami – ucz się skuteczniej, myśl samodzielnie i rozwijaj swój potencjał!</p>
-    </div>
-    """, unsafe_allow_html=True)
-    col1, col2 = st.columns([3, 1])
-    with col1:
-        student_input = st.text_input("Podaj swoje imię:", placeholder="np. Anna, Tomek...", key="student_name_input")
-    with col2:
-        st.markdown("<div style='height: 1.7em'></div>", unsafe_allow_html=True)
-        if st.button("🚀 Start") and student_input.strip():
-            st.session_state["student_name"] = student_input.strip()
-            st.session_state["messages"] = []  # Reset rozmowy dla nowego ucznia
-            st.session_state["nie_wiem_counter"] = 0
-            st.rerun()
-    st.stop()
-
-# =============================================================================
-# INTERFEJS CZATU I OBSŁUGA ROZMOWY
-# =============================================================================
-
-st.markdown("""
-<h2 style='text-align: center;'>🧠 Sokrates - Twój cyfrowy nauczyciel</h2>
-<div style='text-align: center;'>
-    <p>Zadaj pytanie lub napisz, czego chcesz się nauczyć. Sokrates poprowadzi Cię pytaniami!</p>
-</div>
-""", unsafe_allow_html=True)
-
-# Wyświetlanie historii rozmowy
-for msg in st.session_state["messages"]:
-    if msg["role"] == "user":
-        st.chat_message("user").write(msg["content"])
-    else:
-        st.chat_message("assistant").write(msg["content"])
-
-# Pole do wpisania nowej wiadomości
-with st.form(key="chat_form", clear_on_submit=True):
-    user_input = st.text_area("Napisz czego będziesz się uczyć z Sokratesem:", height=70, key="user_input")
-    submit = st.form_submit_button("Wyślij")
-
-# --- AKTUALIZACJA KOSZTU ROZMOWY ---
-# W sekcji obsługi czatu, po uzyskaniu odpowiedzi AI:
-if submit and user_input.strip():
-    st.session_state["messages"].append({"role": "user", "content": user_input.strip()})
-    response = chatbot_reply(user_input.strip(), st.session_state["messages"])
-    ai_content = response.get("content", "[Brak odpowiedzi od AI]")
-    # --- koszt rozmowy ---
-    usage = response.get("usage")
-    if usage and hasattr(usage, 'prompt_tokens') and hasattr(usage, 'completion_tokens'):
-        input_tokens = usage.prompt_tokens
-        output_tokens = usage.completion_tokens
-        cost = (input_tokens * PRICING["input_tokens"] + output_tokens * PRICING["output_tokens"]) * USD_TO_PLN
-        st.session_state["cost_total_pln"] += cost
-    st.session_state["messages"].append({"role": "assistant", "content": ai_content})
-    st.rerun()
 
+# Uruchomienie wybranej strony (czat lub panel administracyjny)
+biezaca_strona.run()
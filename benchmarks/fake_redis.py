@@ -0,0 +1,327 @@
+"""
+Serwer zgodny z protokołem Redis (RESP2) działający w procesie - do benchmarków
+i sprawdzania `RedisState` bez instalowania Redisa.
+
+Obsługuje podzbiór poleceń używany przez `sokrates/shared_state.py`:
+PING, AUTH, SELECT, GET, SET (EX/PX/NX/XX), DEL, EXISTS, INCRBY,
+INCRBYFLOAT, MGET, WATCH/UNWATCH, MULTI/EXEC/DISCARD, DBSIZE, FLUSHDB
+oraz EVAL znanych skryptów (`UNLOCK_SCRIPT` - zamiast interpretera Lua
+wykonywany jest jego odpowiednik w Pythonie). Czas ważności kluczy
+i optymistyczne transakcje (WATCH) działają jak w Redisie; wszystkie
+polecenia wykonywane są pod jedną blokadą, więc są atomowe względem siebie.
+
+Uruchomienie samodzielne:
+    python -m benchmarks.fake_redis --port 6380
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sokrates.shared_state import UNLOCK_SCRIPT
+
+
+class _Error(Exception):
+    pass
+
+
+def _encode(value: Any) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, _Error):
+        return b"-%s\r\n" % str(value).encode("utf-8")
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    if isinstance(value, tuple):  # prosty napis (+OK)
+        return b"+%s\r\n" % value[0].encode("utf-8")
+    data = value if isinstance(value, bytes) else str(value).encode("utf-8")
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+_OK = ("OK",)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+    # Odpowiedzi na polecenia potokowe idą osobnymi zapisami - bez Nagle'a nie czekają
+    # na ACK
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        self.watched: Dict[bytes, int] = {}
+        self.queued: Optional[List[List[bytes]]] = None
+        self.authorized = self.server.password is None
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self) -> None:
+        while True:
+            try:
+                command = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if command is None:
+                return
+            if not command:
+                continue
+            self.server.count()
+            if self.server.delay:
+                time.sleep(self.server.delay)
+            try:
+                reply = self._dispatch(command)
+            except _Error as e:
+                reply = e
+            try:
+                self.wfile.write(_encode(reply))
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    def _dispatch(self, command: List[bytes]) -> Any:
+        name = command[0].upper().decode("ascii", "replace")
+        if name == "AUTH":
+            password = self.server.password
+            if password is not None and command[-1].decode("utf-8") != password:
+                raise _Error("WRONGPASS invalid username-password pair")
+            self.authorized = True
+            return _OK
+        if not self.authorized:
+            raise _Error("NOAUTH Authentication required.")
+        if name == "MULTI":
+            self.queued = []
+            return _OK
+        if name == "DISCARD":
+            self.queued, self.watched = None, {}
+            return _OK
+        if name == "EXEC":
+            if self.queued is None:
+                raise _Error("ERR EXEC without MULTI")
+            queued, self.queued = self.queued, None
+            with self.server.lock:
+                watched, self.watched = self.watched, {}
+                if any(self.server.version(key) != version
+                       for key, version in watched.items()):
+                    return None
+                return [self._run(command) for command in queued]
+        if self.queued is not None and name not in ("WATCH", "UNWATCH"):
+            self.queued.append(command)
+            return ("QUEUED",)
+        if name == "WATCH":
+            with self.server.lock:
+                for key in command[1:]:
+                    self.watched[key] = self.server.version(key)
+            return _OK
+        if name == "UNWATCH":
+            self.watched = {}
+            return _OK
+        with self.server.lock:
+            return self._run(command)
+
+    def _run(self, command: List[bytes]) -> Any:
+        """
+        Wykonuje polecenie na danych (wywoływane pod blokadą serwera).
+        """
+        try:
+            return self.server.execute(command)
+        except _Error as e:
+            return e
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], password: Optional[str],
+                 delay: float = 0.0):
+        super().__init__(address, _Handler)
+        self.password = password
+        self.delay = delay
+        self.lock = threading.RLock()
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.versions: Dict[bytes, int] = {}
+        self.commands = 0
+
+    def count(self) -> None:
+        with self.lock:
+            self.commands += 1
+
+    def version(self, key: bytes) -> int:
+        self._live(key)
+        return self.versions.get(key, 0)
+
+    def _touch(self, key: bytes) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _live(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and time.monotonic() >= entry[1]:
+            del self.data[key]
+            self._touch(key)
+            return None
+        return entry[0]
+
+    def execute(self, command: List[bytes]) -> Any:
+        name = command[0].upper().decode("ascii", "replace")
+        args = command[1:]
+        if name == "PING":
+            return ("PONG",)
+        if name == "SELECT":
+            return _OK
+        if name == "GET":
+            return self._live(args[0])
+        if name == "MGET":
+            return [self._live(key) for key in args]
+        if name == "EXISTS":
+            return sum(1 for key in args if self._live(key) is not None)
+        if name == "SET":
+            return self._set(args)
+        if name == "DEL":
+            removed = 0
+            for key in args:
+                if self._live(key) is not None:
+                    del self.data[key]
+                    self._touch(key)
+                    removed += 1
+            return removed
+        if name in ("INCRBY", "INCRBYFLOAT"):
+            current = self._live(args[0]) or b"0"
+            try:
+                if name == "INCRBY":
+                    value = int(current) + int(args[1])
+                else:
+                    value = float(current) + float(args[1])
+            except ValueError:
+                raise _Error("ERR value is not a valid number")
+            expires = self.data.get(args[0], (b"", None))[1]
+            text = str(value) if name == "INCRBY" else repr(value)
+            self.data[args[0]] = (text.encode("ascii"), expires)
+            self._touch(args[0])
+            return value if name == "INCRBY" else text
+        if name == "EVAL":
+            return self._eval(args)
+        if name == "DBSIZE":
+            return sum(1 for key in list(self.data) if self._live(key) is not None)
+        if name == "FLUSHDB":
+            for key in list(self.data):
+                self._touch(key)
+            self.data.clear()
+            return _OK
+        raise _Error(f"ERR unknown command '{name}'")
+
+    def _eval(self, args: List[bytes]) -> Any:
+        script, keys_count = args[0].decode("utf-8"), int(args[1])
+        keys, argv = args[2:2 + keys_count], args[2 + keys_count:]
+        if script == UNLOCK_SCRIPT:
+            if self._live(keys[0]) != argv[0]:
+                return 0
+            return self.execute([b"DEL", keys[0]])
+        raise _Error("ERR unknown script "
+                     "(fake server runs only scripts used by RedisState)")
+
+    def _set(self, args: List[bytes]) -> Any:
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        expires = None
+        if b"EX" in options:
+            expires = time.monotonic() + float(args[2 + options.index(b"EX") + 1])
+        if b"PX" in options:
+            milliseconds = float(args[2 + options.index(b"PX") + 1])
+            expires = time.monotonic() + milliseconds / 1000
+        exists = self._live(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        self.data[key] = (value, expires)
+        self._touch(key)
+        return _OK
+
+
+class FakeRedisServer:
+    """
+    Serwer testowy uruchamiany w wątku w tle (menedżer kontekstu).
+
+    Example:
+        with FakeRedisServer() as server:
+            shared = RedisState(server.url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 password: Optional[str] = None,
+                 delay: float = 0.0):
+        """
+        Args:
+            host (str): Adres nasłuchu
+            port (int): Port (0 - dowolny wolny)
+            password (str, optional): Hasło (AUTH) - brak oznacza serwer bez hasła
+            delay (float): Opóźnienie każdej odpowiedzi w sekundach (wolna sieć
+                lub przeciążony serwer - do sprawdzania limitów czasu)
+        """
+        self._server = _Server((host, port), password, delay)
+        self._password = password
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        auth = f":{self._password}@" if self._password else ""
+        return f"redis://{auth}{host}:{port}/0"
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Zwraca liczbę wykonanych poleceń i kluczy.
+        """
+        with self._server.lock:
+            return {"commands": self._server.commands, "keys": len(self._server.data)}
+
+    def start(self) -> "FakeRedisServer":
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="fake-redis", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeRedisServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serwer zgodny z protokołem Redis w procesie (benchmarki).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    parser.add_argument("--password", default=None)
+    args = parser.parse_args()
+    server = FakeRedisServer(args.host, args.port, args.password)
+    print(f"Fake Redis: {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Korpus wypowiedzi uczniów z oczekiwaną intencją - do benchmarku `intents`
+(trafność i szybkość rozpoznawania intencji sterujących licznikiem "nie wiem").
+
+Każdy wpis to (wypowiedź, intencja): INTENT_DONT_KNOW, INTENT_HELP lub
+INTENT_OTHER z `sokrates/intents.py`. Korpus zawiera typowe warianty pisowni
+uczniów (bez polskich znaków, sklejone słowa, skróty, odmiany) oraz
+wypowiedzi, które nie powinny zmieniać licznika mimo podobnych słów.
+"""
+
+from typing import List, Tuple
+
+from sokrates.intents import INTENT_DONT_KNOW, INTENT_HELP, INTENT_OTHER
+
+# Frazy i sprawdzanie sprzed `IntentMatcher` (podciągi w tekście po lower()) - punkt
+# odniesienia
+LEGACY_DONT_KNOW_PHRASES = ("nie wiem", "nie mam pojęcia", "bez pojęcia", "nie znam",
+                            "nie umiem")
+LEGACY_HELP_PHRASES = ("pytanie", "pomocy", "wyjaśnij")
+
+
+def legacy_classify(text: str) -> str:
+    """
+    Rozpoznawanie intencji sprzed `IntentMatcher` (podciągi w tekście po lower()).
+    """
+    text = text.lower()
+    if any(phrase in text for phrase in LEGACY_DONT_KNOW_PHRASES):
+        return INTENT_DONT_KNOW
+    if any(phrase in text for phrase in LEGACY_HELP_PHRASES):
+        return INTENT_HELP
+    return INTENT_OTHER
+
+
+CORPUS: List[Tuple[str, str]] = [
+    # "nie wiem" - pisownia poprawna i potoczna
+    ("nie wiem", INTENT_DONT_KNOW),
+    ("Nie wiem.", INTENT_DONT_KNOW),
+    ("NIE WIEM!!!", INTENT_DONT_KNOW),
+    ("niewiem", INTENT_DONT_KNOW),
+    ("Niewiem :(", INTENT_DONT_KNOW),
+    ("nie-wiem", INTENT_DONT_KNOW),
+    ("nie  wiem", INTENT_DONT_KNOW),
+    ("nw", INTENT_DONT_KNOW),
+    ("nwm", INTENT_DONT_KNOW),
+    ("nwm co to jest", INTENT_DONT_KNOW),
+    ("hmm, nie wiem co odpowiedzieć", INTENT_DONT_KNOW),
+    ("Nie wiemy tego z kolegą", INTENT_DONT_KNOW),
+    ("Nie wiedziałam tego", INTENT_DONT_KNOW),
+    ("nie wiedziałyśmy", INTENT_DONT_KNOW),
+    ("nie wiedzialem", INTENT_DONT_KNOW),
+    ("nie mam pojęcia", INTENT_DONT_KNOW),
+    ("nie mam pojecia", INTENT_DONT_KNOW),
+    ("Nie mamy pojęcia", INTENT_DONT_KNOW),
+    ("nie mam zielonego pojęcia", INTENT_DONT_KNOW),
+    ("zielonego pojecia", INTENT_DONT_KNOW),
+    ("pojęcia nie mam", INTENT_DONT_KNOW),
+    ("bez pojecia", INTENT_DONT_KNOW),
+    ("nie mam pomysłu", INTENT_DONT_KNOW),
+    ("brak pomyslu", INTENT_DONT_KNOW),
+    ("nie znam odpowiedzi", INTENT_DONT_KNOW),
+    ("nie znamy tego wzoru", INTENT_DONT_KNOW),
+    ("nie umiem tego rozwiązać", INTENT_DONT_KNOW),
+    ("Nie umiemy", INTENT_DONT_KNOW),
+    ("nie potrafię", INTENT_DONT_KNOW),
+    ("nie potrafie tego zrobic", INTENT_DONT_KNOW),
+    ("nie rozumiem", INTENT_DONT_KNOW),
+    ("Nie rozumiem!", INTENT_DONT_KNOW),
+    ("Nie rozumiem pytania", INTENT_DONT_KNOW),
+    ("nic nie rozumiem z tego", INTENT_DONT_KNOW),
+    ("nie kumam", INTENT_DONT_KNOW),
+    ("nie wiem, pomóż mi", INTENT_DONT_KNOW),
+    # prośby o pomoc - licznik bez zmian
+    ("Pomóż mi", INTENT_HELP),
+    ("pomoz", INTENT_HELP),
+    ("potrzebuję pomocy", INTENT_HELP),
+    ("potrzebuje pomocy", INTENT_HELP),
+    ("Czy możesz mi pomóc?", INTENT_HELP),
+    ("zadaj mi pytanie pomocnicze", INTENT_HELP),
+    ("Mam pytanie", INTENT_HELP),
+    ("mam problem z pytaniem", INTENT_HELP),
+    ("utknęłam na trzecim pytaniu", INTENT_HELP),
+    ("Mam kilka pytań", INTENT_HELP),
+    ("wyjaśnij", INTENT_HELP),
+    ("wyjasnij to jeszcze raz", INTENT_HELP),
+    ("Wyjaśnisz mi to?", INTENT_HELP),
+    ("podpowiedz mi", INTENT_HELP),
+    ("podpowiesz coś?", INTENT_HELP),
+    ("daj wskazówkę", INTENT_HELP),
+    ("help", INTENT_HELP),
+    # próby odpowiedzi i pytania merytoryczne - licznik zerowany
+    ("Fotosynteza to proces wytwarzania glukozy", INTENT_OTHER),
+    ("Wiem, że to mitochondrium", INTENT_OTHER),
+    ("Chyba wiem - to jest 42", INTENT_OTHER),
+    ("Już wiem!", INTENT_OTHER),
+    ("Dowiem się tego jutro", INTENT_OTHER),
+    ("Konie wiedzą, gdzie jest stajnia", INTENT_OTHER),
+    ("To nie. Wiem już, to tlen", INTENT_OTHER),
+    ("Kiedy był chrzest Polski?", INTENT_OTHER),
+    ("Co to jest atom?", INTENT_OTHER),
+    ("2 + 2 = 4", INTENT_OTHER),
+    ("Wydaje mi się, że chodzi o siłę ciężkości", INTENT_OTHER),
+    ("Znam ten wzór: a^2 + b^2 = c^2", INTENT_OTHER),
+    ("To jest znane zjawisko", INTENT_OTHER),
+    ("Umiem już to policzyć", INTENT_OTHER),
+    ("Rozumiem, dzięki!", INTENT_OTHER),
+    ("Nie, to jest ssak", INTENT_OTHER),
+    ("Nie wszystkie ptaki latają", INTENT_OTHER),
+    # podobne słowa spoza odmiany fraz "nie wiem" - licznik zerowany
+    ("Nie znamienny", INTENT_OTHER),
+    ("To nie znamienne dla ssaków, tylko dla ptaków", INTENT_OTHER),
+    ("nie rozumiem czemu, ale odpowiedź to tlen", INTENT_OTHER),
+    ("Nie potrafiłbym tego lepiej ująć: to tlen", INTENT_OTHER),
+    ("Nie wiedzieć czemu wszyscy mówią, że to azot", INTENT_OTHER),
+    ("Ta roślina nie umiera zimą", INTENT_OTHER),
+    ("Pomocnik kucharza też jest w tej historii", INTENT_OTHER),
+]
@@ -0,0 +1,328 @@
+"""
+Lokalny serwer zgodny z API OpenAI - do benchmarków bez sieci i bez kosztów.
+
+Obsługuje endpointy używane przez aplikację:
+- GET  /v1/models/{model}       - weryfikacja klucza
+- POST /v1/chat/completions     - odpowiedzi (także strumieniowane, SSE)
+  oraz wydobywanie faktów (`response_format` -> {"facts": [...]})
+
+Opóźnienie odpowiedzi, tempo strumieniowania i długość odpowiedzi są
+konfigurowalne; klucze zaczynające się od `sk-bench` są akceptowane,
+pozostałe dostają 401. Opcjonalny limit zapytań na sekundę (`max_rps`)
+działa jak limit konta OpenAI: nadmiarowe zapytania dostają 429 z
+nagłówkiem `retry-after-ms`. Serwer naśladuje też automatyczny cache
+promptu: jeśli początkowe wiadomości zapytania (co najmniej
+`CACHE_MIN_TOKENS` tokenów) były już wysłane, ich tokeny zwracane są jako
+`prompt_tokens_details.cached_tokens`. Część zapytań (`slow_rate`) może
+odpowiadać z dużym opóźnieniem (`slow_latency`) - jak przeciążony serwer
+tworzący ogon rozkładu czasów odpowiedzi. GET /_stats zwraca liczniki zapytań.
+
+Uruchomienie samodzielne:
+    python -m benchmarks.mock_openai --port 8765 --latency 0.2 --token-delay 0.01
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+VALID_KEY_PREFIX = "sk-bench"
+
+REPLY_TEXT = ("Zanim odpowiem, zastanówmy się razem. Co już wiesz na ten temat "
+              "i od czego zacząłbyś szukanie odpowiedzi?")
+FACTS_REPLY = {"facts": ["Uczeń interesuje się biologią"]}
+
+# Cache promptu jak w API OpenAI: od 1024 tokenów prefiksu, w krokach po 128 tokenów
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+CACHE_MAX_PREFIXES = 10000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Obsługa zapytań - parametry pochodzą z obiektu serwera (MockOpenAIServer).
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.count("cancelled")
+
+    def _authorized(self) -> bool:
+        auth = self.headers.get("Authorization", "")
+        if auth.startswith(f"Bearer {VALID_KEY_PREFIX}"):
+            return True
+        self._send_json(401, {"error": {"message": "Incorrect API key provided",
+                                        "type": "invalid_request_error",
+                                        "code": "invalid_api_key"}})
+        return False
+
+    def do_GET(self) -> None:
+        if self.path == "/_stats":
+            self._send_json(200, self.server.stats())
+            return
+        self.server.count("models")
+        if not self._authorized():
+            return
+        model = self.path.rsplit("/", 1)[-1]
+        self._send_json(200, {"id": model, "object": "model", "created": 0,
+                              "owned_by": "benchmark"})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self._authorized():
+            return
+        retry_after = self.server.rate_limit()
+        if retry_after is not None:
+            self.server.count("rate_limited")
+            error = {"message": "Rate limit reached for requests", "type": "requests",
+                     "code": "rate_limit_exceeded"}
+            body = json.dumps({"error": error}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("retry-after-ms", str(int(retry_after * 1000)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.server.count("chat_completions")
+        time.sleep(self.server.request_latency())
+        model = body.get("model", "gpt-4o-mini")
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        cached_tokens = self.server.cached_prefix(body.get("messages", []))
+        text = self.server.reply_text
+        if body.get("response_format"):
+            text = json.dumps(FACTS_REPLY, ensure_ascii=False)
+        words = text.split(" ")
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words),
+                 "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+        if body.get("stream"):
+            try:
+                include_usage = (body.get("stream_options") or {}).get("include_usage")
+                self._stream(model, words, usage, bool(include_usage))
+            except (BrokenPipeError, ConnectionResetError):
+                self.server.count("cancelled")
+            return
+        self._send_json(200, {
+            "id": "chatcmpl-bench", "object": "chat.completion",
+            "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, model: str, words: list, usage: Dict[str, Any],
+                include_usage: bool) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(data: Any) -> None:
+            text = data if isinstance(data, str) else json.dumps(data)
+            payload = ("data: " + text + "\n\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(payload), payload))
+            self.wfile.flush()
+
+        chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk",
+                 "created": int(time.time()), "model": model}
+        for index, word in enumerate(words):
+            if index and self.server.token_delay:
+                time.sleep(self.server.token_delay)
+            content = word if index == len(words) - 1 else word + " "
+            event(dict(chunk, choices=[{"index": 0, "delta": {"content": content},
+                                        "finish_reason": None}]))
+        event(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if include_usage:
+            event(dict(chunk, choices=[], usage=usage))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float, token_delay: float, max_rps: float = 0,
+                 reply_text: str = REPLY_TEXT, slow_rate: float = 0.0,
+                 slow_latency: float = 0.0):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(0)
+        self.reply_text = reply_text
+        self.token_delay = token_delay
+        self.max_rps = max_rps
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._window = 0
+        self._window_calls = 0
+        self._prefixes: "OrderedDict[str, None]" = OrderedDict()
+
+    def cached_prefix(self, messages: list) -> int:
+        """
+        Zwraca liczbę tokenów najdłuższego wcześniej widzianego prefiksu wiadomości
+        (0 poniżej CACHE_MIN_TOKENS) i zapamiętuje prefiksy bieżącego zapytania.
+        """
+        digest = hashlib.sha256()
+        tokens = cached = 0
+        with self._lock:
+            for message in messages:
+                serialized = json.dumps(message, sort_keys=True, ensure_ascii=False)
+                digest.update(serialized.encode("utf-8"))
+                tokens += len(str(message.get("content", ""))) // 4
+                key = digest.hexdigest()
+                if key in self._prefixes:
+                    self._prefixes.move_to_end(key)
+                    cached = tokens
+                else:
+                    self._prefixes[key] = None
+            while len(self._prefixes) > CACHE_MAX_PREFIXES:
+                self._prefixes.popitem(last=False)
+        if cached < CACHE_MIN_TOKENS:
+            return 0
+        return cached // CACHE_STEP_TOKENS * CACHE_STEP_TOKENS
+
+    def rate_limit(self) -> Optional[float]:
+        """
+        Liczy zapytanie w bieżącym oknie jednej sekundy; zwraca czas do końca
+        okna, gdy limit `max_rps` jest już wyczerpany (None - zapytanie przyjęte).
+        """
+        if not self.max_rps:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if int(now) != self._window:
+                self._window, self._window_calls = int(now), 0
+            if self._window_calls >= self.max_rps:
+                return self._window + 1 - now
+            self._window_calls += 1
+        return None
+
+    def request_latency(self) -> float:
+        """
+        Opóźnienie bieżącej odpowiedzi (z prawdopodobieństwem `slow_rate` -
+        `slow_latency`).
+        """
+        with self._lock:
+            slow = self.slow_rate and self._random.random() < self.slow_rate
+        if slow:
+            self.count("slow")
+            return self.slow_latency
+        return self.latency
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+class MockOpenAIServer:
+    """
+    Serwer testowy uruchamiany w wątku w tle (menedżer kontekstu).
+
+    Example:
+        with MockOpenAIServer(latency=0.2) as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+    """
+
+    def __init__(self, latency: float = 0.05, token_delay: float = 0.005,
+                 host: str = "127.0.0.1", port: int = 0, max_rps: float = 0,
+                 reply_text: str = REPLY_TEXT, slow_rate: float = 0.0,
+                 slow_latency: float = 0.0):
+        """
+        Args:
+            latency (float): Opóźnienie przed odpowiedzią (czas "myślenia" modelu)
+                w sekundach
+            token_delay (float): Odstęp między fragmentami strumienia w sekundach
+            host (str): Adres nasłuchu
+            port (int): Port (0 - dowolny wolny)
+            max_rps (float): Limit odpowiedzi na sekundę, powyżej którego serwer
+                zwraca 429 (0 - bez limitu)
+            reply_text (str): Treść odpowiedzi Sokratesa
+            slow_rate (float): Odsetek zapytań odpowiadających z opóźnieniem
+                `slow_latency`
+            slow_latency (float): Opóźnienie wolnych odpowiedzi w sekundach
+        """
+        self._server = _Server((host, port), latency, token_delay, max_rps,
+                               reply_text, slow_rate, slow_latency)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Zwraca liczniki obsłużonych zapytań ("models", "chat_completions",
+        "rate_limited", "slow", "cancelled" - zapytania przerwane przez klienta).
+        """
+        return self._server.stats()
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Lokalny serwer zgodny z API OpenAI (benchmarki).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="opóźnienie odpowiedzi [s]")
+    parser.add_argument("--token-delay", type=float, default=0.005,
+                        help="odstęp fragmentów strumienia [s]")
+    parser.add_argument("--max-rps", type=float, default=0,
+                        help="limit zapytań na sekundę (429 powyżej)")
+    args = parser.parse_args()
+    server = MockOpenAIServer(args.latency, args.token_delay, args.host, args.port,
+                              args.max_rps)
+    print(f"Mock OpenAI: {server.base_url} (klucz: {VALID_KEY_PREFIX}...)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,899 @@
+"""
+Benchmarki Sokratesa - offline, na lokalnym serwerze zgodnym z API OpenAI.
+
+Scenariusze:
+- chat     - tury rozmowy (`chatbot_reply` przez pełne odświeżenie aplikacji)
+             dla N równoczesnych uczniów: przepustowość, czas tury, czas
+             odpowiedzi modelu i czas do pierwszego tokenu (p50/p95/p99)
+- profile  - zapis i odczyt profilu z 10 000 faktów (operacje magazynu, na
+             których opierają się `zapisz_do_pamieci`, `wczytaj_pamiec`,
+             `zapisz_pamiec`) oraz wybór faktów trafnych dla pytania
+- admin    - koszt renderowania aplikacji z otwartym panelem administracyjnym
+             przy tysiącach syntetycznych profili
+- startup  - zimny start w świeżym procesie (jak po restarcie lub dołożeniu
+             instancji): import Streamlit, pierwsze wyrenderowanie strony
+             czatu, pierwsze otwarcie panelu i to, czy czat załadował pandas
+- ratelimit - cała klasa naraz przy limicie konta (serwer zwraca 429 powyżej
+             `--max-rps`): tury silnika wysyłane wprost (ponowienia SDK)
+             i przez harmonogram `RateLimiter` - przepustowość, błędy, 429
+- tail     - ogon czasów odpowiedzi przy serwerze, który część zapytań
+             obsługuje bardzo wolno: tury bez zabezpieczenia i z zapytaniami
+             zabezpieczającymi (`HedgeController`) - p50/p95/p99, odsetek
+             zabezpieczonych tur i dodatkowe tokeny
+- prefix   - jedna długa rozmowa przez silnik przy serwerze naśladującym
+             cache promptu dostawcy: udział tokenów z cache, odsetek tur
+             z trafieniem i koszt wejścia z cache i bez niego
+- intents  - rozpoznawanie intencji "nie wiem" i prośby o pomoc na korpusie
+             wypowiedzi (`benchmarks/intent_corpus.py`): trafność i czas
+             jednego sprawdzenia `IntentMatcher` wobec dawnego szukania
+             podciągów
+- shared   - stan współdzielony kilku instancji aplikacji: każda "instancja"
+             ma własnego klienta `RedisState` do serwera z `fake_redis.py`
+             (dla porównania `LocalState` w jednym procesie) - operacje na
+             sekundę, czas oczekiwania na blokadę ucznia, zgodność liczników
+             i brak utraconych zapisów pod blokadą
+
+Każdy symulowany uczeń działa we własnym procesie (AppTest Streamlit nie
+jest bezpieczny wątkowo), więc współdzielone są baza SQLite i serwer API -
+tak jak między sesjami jednego serwera. Wszystko odbywa się w katalogu
+tymczasowym; wyniki są zapisywane jako JSON do porównań między wersjami.
+
+Uruchomienie (z katalogu głównego repozytorium):
+    python -m benchmarks.run --output wyniki.json
+    python -m benchmarks.run --only chat --students 16 --turns 5 --latency 0.5
+    python -m benchmarks.run --baseline poprzednie.json --output wyniki.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = REPO_ROOT / "app.py"
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.fake_redis import FakeRedisServer  # noqa: E402
+from benchmarks.intent_corpus import CORPUS, legacy_classify  # noqa: E402
+from benchmarks.mock_openai import (  # noqa: E402
+    REPLY_TEXT, VALID_KEY_PREFIX, MockOpenAIServer)
+from sokrates import __version__  # noqa: E402
+from sokrates.engine import EngineConfig, SocraticEngine, StudentState  # noqa: E402
+from sokrates.hedging import HedgeController, HedgePolicy  # noqa: E402
+from sokrates.intents import INTENT_DONT_KNOW, IntentMatcher  # noqa: E402
+from sokrates.metrics import percentile, price_usd, usage_tokens  # noqa: E402
+from sokrates.ratelimit import RateLimiter  # noqa: E402
+from sokrates.retrieval import FactRetriever  # noqa: E402
+from sokrates.shared_state import LocalState, RedisState, SharedState  # noqa: E402
+from sokrates.storage import ProfileStore  # noqa: E402
+
+SCENARIOS = ("chat", "profile", "admin", "startup", "ratelimit", "prefix", "tail",
+             "shared", "intents")
+API_KEY = f"{VALID_KEY_PREFIX}-benchmark"
+APP_TIMEOUT = 120
+
+TOPICS = ["fotosynteza", "ułamki", "grawitacja", "układ okresowy",
+          "rewolucja francuska", "równania kwadratowe", "komórka roślinna",
+          "prąd elektryczny", "Mickiewicz", "DNA"]
+# Cennik gpt-4o-mini (USD za token) - koszt wejścia w scenariuszu prefix
+BENCH_PRICES = {"input_tokens": 0.15 / 1e6, "cached_input_tokens": 0.075 / 1e6,
+                "output_tokens": 0.60 / 1e6}
+
+FACT_TEMPLATES = [
+    "Uczeń lubi przykłady z dziedziny: {topic}",
+    "Uczeń ma trudności z tematem: {topic}",
+    "Uczeń dobrze rozumie podstawy tematu: {topic}",
+    "Uczeń woli krótkie wyjaśnienia przy temacie: {topic}",
+    "Uczeń przygotowuje się do sprawdzianu z tematu: {topic}",
+]
+
+
+def summarize(values: List[float], scale: float = 1000.0,
+              digits: int = 2) -> Dict[str, Any]:
+    """
+    Statystyki próbki (domyślnie w milisekundach): liczba, średnia, p50/p95/p99,
+    maksimum.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * scale, digits),
+        "p50": round(percentile(ordered, 50) * scale, digits),
+        "p95": round(percentile(ordered, 95) * scale, digits),
+        "p99": round(percentile(ordered, 99) * scale, digits),
+        "max": round(ordered[-1] * scale, digits),
+    }
+
+
+def timed(function: Callable[[], Any], repeat: int) -> List[float]:
+    """
+    Czasy (w sekundach) `repeat` wywołań funkcji.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def synthetic_fact(index: int) -> str:
+    """
+    Zwraca syntetyczny fakt o uczniu (unikalny dzięki numerowi).
+    """
+    template = FACT_TEMPLATES[index % len(FACT_TEMPLATES)]
+    topic = TOPICS[index // len(FACT_TEMPLATES) % len(TOPICS)]
+    return f"{template.format(topic=topic)} (#{index})"
+
+
+def write_env(workdir: Path, settings: Dict[str, Any]) -> None:
+    """
+    Zapisuje plik .env aplikacji w katalogu roboczym benchmarku.
+    """
+    lines = [f"OPENAI_API_KEY={API_KEY}"]
+    lines += [f"{name}={value}" for name, value in settings.items()]
+    (workdir / ".env").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def new_app_session(student: Optional[str] = None):
+    """
+    Tworzy sesję aplikacji (AppTest) z zalogowanym uczniem i zweryfikowanym kluczem.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(APP_PATH), default_timeout=APP_TIMEOUT)
+    app.session_state["openai_api_key"] = API_KEY
+    if student:
+        app.session_state["student_name"] = student
+    app.run()
+    return app
+
+
+def open_admin_page(app) -> None:
+    """
+    Przełącza sesję AppTest na stronę panelu administracyjnego (url_path "admin").
+
+    Note:
+        `AppTest.switch_page` obsługuje tylko strony z plików, a strony
+        aplikacji są funkcjami - ustawiamy więc skrót strony zarejestrowanej
+        przez `st.navigation` w poprzednim przebiegu.
+    """
+    app._page_hash = next(page_hash for page_hash, info in app._registered_pages.items()
+                          if info.get("url_pathname") == "admin")
+
+
+# =============================================================================
+# SCENARIUSZ: ROZMOWA (N RÓWNOCZESNYCH UCZNIÓW)
+# =============================================================================
+
+def _student_worker(index: int, turns: int, workdir: str, base_url: str,
+                    barrier: Any, results: Any) -> None:
+    """
+    Proces jednego ucznia: logowanie, a po starcie wszystkich - `turns` tur rozmowy.
+    """
+    os.chdir(workdir)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    record: Dict[str, Any] = {"turn_s": [], "latency_s": [], "ttft_s": [], "errors": 0}
+    try:
+        app = new_app_session(f"Uczen bench {index}")
+        barrier.wait(timeout=APP_TIMEOUT)
+        rng = random.Random(index)
+        for turn in range(turns):
+            app.text_area(key="user_input").input(
+                f"Wyjaśnij mi proszę temat: {rng.choice(TOPICS)} "
+                f"(uczeń {index}, tura {turn})")
+            send = next(button for button in app.button if button.label == "Wyślij")
+            start = time.perf_counter()
+            send.click()
+            app.run()
+            record["turn_s"].append(time.perf_counter() - start)
+            metrics = app.session_state["messages"][-1].get("metrics") or {}
+            if app.exception or not metrics:
+                record["errors"] += 1
+                continue
+            record["latency_s"].append(metrics["latency_s"])
+            record["ttft_s"].append(metrics["ttft_s"])
+    except Exception as e:  # wynik procesu musi trafić do rodzica także przy błędzie
+        record["errors"] += 1
+        record["error"] = f"{type(e).__name__}: {e}"
+        barrier.abort()
+    results.put(record)
+
+
+def bench_chat(workdir: Path, students: int, turns: int, latency: float,
+               token_delay: float, stream: bool) -> Dict[str, Any]:
+    """
+    Tury rozmowy dla `students` równoczesnych uczniów (każdy we własnym procesie).
+    """
+    write_env(workdir, {"STREAM_RESPONSES": int(stream), "RESPONSE_CACHE_SIZE": 0})
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(students + 1)
+    results = context.Queue()
+    with MockOpenAIServer(latency=latency, token_delay=token_delay) as server:
+        processes = [context.Process(target=_student_worker,
+                                     args=(i, turns, str(workdir), server.base_url,
+                                           barrier, results))
+                     for i in range(students)]
+        for process in processes:
+            process.start()
+        try:
+            barrier.wait(timeout=APP_TIMEOUT * 2)
+        except threading.BrokenBarrierError:
+            pass  # któryś proces nie wystartował - jego błąd trafi do wyników
+        start = time.perf_counter()
+        records = [results.get(timeout=APP_TIMEOUT * turns) for _ in processes]
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+        api_calls = server.stats()
+    turn_times = [t for r in records for t in r["turn_s"]]
+    return {
+        "students": students,
+        "turns_per_student": turns,
+        "mock_latency_s": latency,
+        "stream": stream,
+        "elapsed_s": round(elapsed, 3),
+        "turns_completed": len(turn_times),
+        "throughput_turns_per_s": (round(len(turn_times) / elapsed, 3)
+                                   if elapsed else None),
+        "errors": sum(r["errors"] for r in records),
+        "error_samples": [r["error"] for r in records if "error" in r][:3],
+        "turn_ms": summarize(turn_times),
+        "chatbot_reply_ms": summarize([t for r in records for t in r["latency_s"]]),
+        "ttft_ms": summarize([t for r in records for t in r["ttft_s"]]),
+        "api_calls": api_calls,
+    }
+
+
+# =============================================================================
+# SCENARIUSZ: PROFIL Z 10 000 FAKTÓW
+# =============================================================================
+
+def bench_profile(workdir: Path, facts: int, repeat: int) -> Dict[str, Any]:
+    """
+    Zapis i odczyt dużego profilu na poziomie magazynu (bez interfejsu).
+    """
+    store = ProfileStore(workdir / "db" / "profile_bench.db", cache_size=256)
+    student = "Uczen profil"
+    contents = [synthetic_fact(i) for i in range(facts)]
+
+    start = time.perf_counter()
+    for fact in contents:
+        store.add_fact(student, fact)
+    add_elapsed = time.perf_counter() - start
+
+    def read_cold() -> None:
+        store.cache.clear()
+        store.list_facts(student)
+
+    edited = list(contents)
+
+    def replace_one() -> None:
+        edited[len(edited) // 2] = f"Edytowany fakt {time.perf_counter()}"
+        store.replace_facts(student, edited)
+
+    retriever = FactRetriever(store)
+
+    def rebuild_index() -> None:
+        retriever.cache.clear()
+        retriever.select(student, "ułamki", 8)
+
+    build_samples = timed(rebuild_index, repeat)
+    queries = [f"Nie rozumiem tematu {topic}" for topic in TOPICS]
+    select_samples = timed(lambda: retriever.select(student, random.choice(queries), 8),
+                           repeat * 10)
+    result = {
+        "facts": facts,
+        "add_fact_per_s": round(facts / add_elapsed, 1),
+        "add_fact_ms": round(add_elapsed / facts * 1000, 4),
+        "list_facts_cold_ms": summarize(timed(read_cold, repeat)),
+        "list_facts_cached_ms": summarize(
+            timed(lambda: store.list_facts(student), repeat * 10), digits=4),
+        "replace_facts_ms": summarize(timed(replace_one, repeat)),
+        "export_jsonl_ms": summarize(
+            timed(lambda: store.export_jsonl(student), repeat)),
+        "retrieval_select_ms": summarize(select_samples, digits=4),
+        "retrieval_index_build_ms": summarize(build_samples),
+    }
+    store.close()
+    return result
+
+
+# =============================================================================
+# SCENARIUSZ: PANEL ADMINISTRACYJNY
+# =============================================================================
+
+def bench_admin(workdir: Path, profiles: int, facts_per_profile: int,
+                repeat: int) -> Dict[str, Any]:
+    """
+    Czas odświeżenia strony czatu i strony panelu administracyjnego.
+    """
+    write_env(workdir, {})
+    store = ProfileStore(workdir / "db" / "sokrates.db")
+    start = time.perf_counter()
+    for i in range(profiles):
+        for j in range(facts_per_profile):
+            store.add_fact(f"Uczen admin {i}",
+                           synthetic_fact(i * facts_per_profile + j))
+    seed_elapsed = time.perf_counter() - start
+    queries = {
+        "stats_summary_ms": summarize(timed(store.stats_summary, repeat * 10),
+                                      digits=4),
+        "list_student_stats_ms": summarize(
+            timed(lambda: store.list_student_stats(limit=20), repeat * 10), digits=4),
+        "search_students_ms": summarize(
+            timed(lambda: store.list_student_stats("admin 1", limit=20), repeat * 10),
+            digits=4),
+    }
+    store.close()
+
+    with MockOpenAIServer(latency=0.0, token_delay=0.0) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        app = new_app_session("Admin bench")  # panel dostępny po zalogowaniu
+        closed = timed(app.run, repeat)
+        open_admin_page(app)
+        app.run()  # pierwsze otwarcie (import pandas, rozgrzanie cache)
+        opened = timed(app.run, repeat)
+        exceptions = [str(e.value)[:200] for e in app.exception]
+    return {
+        "profiles": profiles,
+        "facts_per_profile": facts_per_profile,
+        "seed_s": round(seed_elapsed, 3),
+        "rerun_panel_closed_ms": summarize(closed),
+        "rerun_panel_open_ms": summarize(opened),
+        "queries": queries,
+        "errors": exceptions,
+    }
+
+
+# =============================================================================
+# SCENARIUSZ: ZIMNY START
+# =============================================================================
+
+def _startup_worker(workdir: str, base_url: str, results: Any) -> None:
+    """
+    Świeży proces: import Streamlit, pierwsze odświeżenie czatu, potem panelu.
+    """
+    os.chdir(workdir)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    record: Dict[str, Any] = {}
+    try:
+        start = time.perf_counter()
+        from streamlit.testing.v1 import AppTest
+        record["streamlit_import_s"] = time.perf_counter() - start
+
+        app = AppTest.from_file(str(APP_PATH), default_timeout=APP_TIMEOUT)
+        app.session_state["openai_api_key"] = API_KEY
+        app.session_state["student_name"] = "Uczen startup"
+        start = time.perf_counter()
+        app.run()
+        record["first_chat_run_s"] = time.perf_counter() - start
+        record["chat_ready_at"] = time.time()
+        record["pandas_loaded_by_chat"] = "pandas" in sys.modules
+        record["warm_chat_run_s"] = timed(app.run, 1)[0]
+        open_admin_page(app)
+        record["first_admin_run_s"] = timed(app.run, 1)[0]
+        record["pandas_loaded_by_admin"] = "pandas" in sys.modules
+        if app.exception:
+            record["error"] = str(app.exception[0].value)[:200]
+    except Exception as e:  # wynik procesu musi trafić do rodzica także przy błędzie
+        record["error"] = f"{type(e).__name__}: {e}"
+    results.put(record)
+
+
+def bench_startup(workdir: Path, repeat: int) -> Dict[str, Any]:
+    """
+    Zimny start aplikacji w `repeat` kolejnych, świeżych procesach.
+
+    "cold_start_ms" liczone jest od uruchomienia procesu (start interpretera,
+    importy, zasoby współdzielone, weryfikacja klucza) do wyrenderowania
+    strony czatu.
+    """
+    write_env(workdir, {})
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    records = []
+    with MockOpenAIServer(latency=0.0, token_delay=0.0) as server:
+        for _ in range(repeat):
+            process = context.Process(target=_startup_worker,
+                                      args=(str(workdir), server.base_url, results))
+            started = time.time()
+            process.start()
+            record = results.get(timeout=APP_TIMEOUT)
+            process.join()
+            if "chat_ready_at" in record:
+                record["cold_start_s"] = record["chat_ready_at"] - started
+            records.append(record)
+    ok = [r for r in records if "error" not in r]
+
+    def ms(name: str) -> Dict[str, Any]:
+        return summarize([r[name] for r in ok if name in r])
+
+    return {
+        "runs": repeat,
+        "cold_start_ms": ms("cold_start_s"),
+        "streamlit_import_ms": ms("streamlit_import_s"),
+        "first_chat_run_ms": ms("first_chat_run_s"),
+        "warm_chat_run_ms": ms("warm_chat_run_s"),
+        "first_admin_run_ms": ms("first_admin_run_s"),
+        "pandas_loaded_by_chat": any(r.get("pandas_loaded_by_chat") for r in ok),
+        "pandas_loaded_by_admin": any(r.get("pandas_loaded_by_admin") for r in ok),
+        "errors": [r["error"] for r in records if "error" in r][:3],
+    }
+
+
+# =============================================================================
+# SCENARIUSZ: LIMIT ZAPYTAŃ (CAŁA KLASA NARAZ)
+# =============================================================================
+
+def _class_burst(engine: SocraticEngine, client: Any, students: int, turns: int,
+                 limiter: Optional[RateLimiter]) -> Dict[str, Any]:
+    """
+    `students` wątków zaczyna naraz i wykonuje po `turns` tur silnika (bez
+    Streamlit).
+    """
+    barrier = threading.Barrier(students)
+    lock = threading.Lock()
+    turn_times: List[float] = []
+    queued: List[float] = []
+    errors: List[str] = []
+
+    def student(index: int) -> None:
+        state = StudentState(student_name=f"Uczen limit {index}")
+        barrier.wait()
+        for turn in range(turns):
+            start = time.perf_counter()
+            topic = TOPICS[(index + turn) % len(TOPICS)]
+            result = engine.reply(state, f"Wyjaśnij mi temat: {topic}",
+                                  client=client, limiter=limiter)
+            with lock:
+                if result.get("error"):
+                    errors.append(result["error"])
+                else:
+                    turn_times.append(time.perf_counter() - start)
+                    queued.append(result["metrics"].get("queued_s", 0.0))
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(students)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "turns_completed": len(turn_times),
+        "throughput_turns_per_s": (round(len(turn_times) / elapsed, 3)
+                                   if elapsed else None),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "turn_ms": summarize(turn_times),
+        "queued_ms": summarize(queued),
+    }
+
+
+def bench_ratelimit(workdir: Path, students: int, turns: int, latency: float,
+                    max_rps: float) -> Dict[str, Any]:
+    """
+    Tury `students` równoczesnych uczniów przy limicie serwera `max_rps` zapytań
+    na sekundę.
+
+    "direct" - zapytania wprost, ponawiane przez SDK (domyślnie 2 razy);
+    "limiter" - harmonogram z limitem 90% przepustowości serwera i ponowieniami.
+    """
+    from openai import OpenAI
+
+    store = ProfileStore(workdir / "db" / "ratelimit_bench.db")
+    engine = SocraticEngine(store, EngineConfig(history_window=0))
+    results: Dict[str, Any] = {"students": students, "turns_per_student": turns,
+                               "mock_latency_s": latency, "max_rps": max_rps}
+    for mode in ("direct", "limiter"):
+        with MockOpenAIServer(latency=latency, token_delay=0.0,
+                              max_rps=max_rps) as server:
+            if mode == "direct":
+                client = OpenAI(api_key=API_KEY, base_url=server.base_url)
+                limiter = None
+            else:
+                client = OpenAI(api_key=API_KEY, base_url=server.base_url,
+                                max_retries=0)
+                limiter = RateLimiter(rpm=max_rps * 60 * 0.9, max_concurrency=students,
+                                      max_retries=4)
+            result = _class_burst(engine, client, students, turns, limiter)
+            result["quota_turns_per_s"] = max_rps
+            result["api_calls"] = server.stats()
+            if limiter is not None:
+                result["limiter"] = limiter.stats()
+            client.close()
+        results[mode] = result
+    return results
+
+
+# =============================================================================
+# SCENARIUSZ: CACHE PROMPTU (STAŁY PREFIKS)
+# =============================================================================
+
+def bench_prefix(workdir: Path, turns: int, facts: int = 100) -> Dict[str, Any]:
+    """
+    `turns` tur jednej rozmowy ucznia z `facts` faktami w profilu.
+
+    Serwer testowy zwraca `cached_tokens` dla powtórzonego prefiksu
+    wiadomości (jak automatyczny cache promptu OpenAI), więc wynik pokazuje,
+    jaka część wejścia trafia do cache przy obecnym układzie promptu.
+    """
+    from openai import OpenAI
+
+    student = "Uczen prefix"
+    store = ProfileStore(workdir / "db" / "prefix_bench.db")
+    store.replace_facts(student, [synthetic_fact(i) for i in range(facts)])
+    engine = SocraticEngine(store, EngineConfig(pricing={"gpt-4o-mini": BENCH_PRICES}))
+    state = StudentState(student_name=student)
+    prompt_tokens = cached_tokens = hits = errors = 0
+    uncached_usd = cached_usd = 0.0
+    # Odpowiedzi o typowej długości (kilka akapitów), a nie jedno zdanie serwera
+    # testowego
+    reply_text = " ".join([REPLY_TEXT] * 8)
+    with MockOpenAIServer(latency=0.0, token_delay=0.0,
+                          reply_text=reply_text) as server:
+        client = OpenAI(api_key=API_KEY, base_url=server.base_url)
+        for turn in range(turns):
+            topic = TOPICS[turn % len(TOPICS)]
+            prompt = "nie wiem"
+            if turn % 5 != 4:
+                prompt = f"Co wiesz o temacie {topic}? Dlaczego tak jest?"
+            result = engine.reply(state, prompt, client=client, use_cache=False)
+            if result.get("error"):
+                errors += 1
+                continue
+            tokens = usage_tokens(result.get("usage"))
+            prompt_tokens += tokens["prompt_tokens"]
+            cached_tokens += tokens["cached_tokens"]
+            hits += 1 if tokens["cached_tokens"] else 0
+            cached_usd += price_usd(BENCH_PRICES, tokens)
+            uncached_usd += price_usd(BENCH_PRICES, dict(tokens, cached_tokens=0))
+        client.close()
+    store.close()
+    completed = turns - errors
+    return {
+        "turns": turns,
+        "facts": facts,
+        "errors": errors,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "cached_share": (round(cached_tokens / prompt_tokens, 4)
+                         if prompt_tokens else 0.0),
+        "turn_hit_rate": round(hits / completed, 4) if completed else 0.0,
+        "cost_usd": round(cached_usd, 6),
+        "cost_usd_without_cache": round(uncached_usd, 6),
+    }
+
+
+# =============================================================================
+# SCENARIUSZ: OGON CZASÓW ODPOWIEDZI (ZAPYTANIA ZABEZPIECZAJĄCE)
+# =============================================================================
+
+def bench_tail(workdir: Path, students: int, turns: int, latency: float,
+               slow_rate: float, slow_latency: float) -> Dict[str, Any]:
+    """
+    Tury `students` uczniów (po `turns`), gdy odsetek `slow_rate` zapytań trwa
+    `slow_latency` s.
+
+    "single" - jedno zapytanie na turę; "hedged" - druga próba po p95
+    ostatnich czasów odpowiedzi (limit dodatkowych tokenów 10%).
+    """
+    from openai import OpenAI
+
+    store = ProfileStore(workdir / "db" / "tail_bench.db")
+    results: Dict[str, Any] = {"students": students, "turns_per_student": turns,
+                               "mock_latency_s": latency, "slow_rate": slow_rate,
+                               "slow_latency_s": slow_latency}
+    config = EngineConfig(history_window=0, deadline_s=slow_latency * 4)
+    for mode in ("single", "hedged"):
+        hedger = None
+        if mode == "hedged":
+            hedger = HedgeController(HedgePolicy(min_delay_s=latency))
+        engine = SocraticEngine(store, config, hedger=hedger)
+        with MockOpenAIServer(latency=latency, token_delay=0.001, slow_rate=slow_rate,
+                              slow_latency=slow_latency) as server:
+            client = OpenAI(api_key=API_KEY, base_url=server.base_url, max_retries=0)
+            lock = threading.Lock()
+            turn_times: List[float] = []
+            errors: List[str] = []
+
+            def student(index: int) -> None:
+                for turn in range(turns):
+                    state = StudentState(student_name=f"Uczen ogon {index}")
+                    start = time.perf_counter()
+                    topic = TOPICS[(index + turn) % len(TOPICS)]
+                    result = engine.reply(state, f"Pytanie {turn}: {topic}",
+                                          client=client, on_token=lambda text: None,
+                                          use_cache=False)
+                    with lock:
+                        if result.get("error"):
+                            errors.append(result["error"])
+                        else:
+                            turn_times.append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=student, args=(i,))
+                       for i in range(students)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            client.close()
+            result = {"turn_ms": summarize(turn_times), "errors": len(errors),
+                      "api_calls": server.stats()}
+        if hedger is not None:
+            result["hedging"] = hedger.stats()
+        results[mode] = result
+    store.close()
+    return results
+
+
+# =============================================================================
+# SCENARIUSZ: INTENCJE UCZNIA (LICZNIK "NIE WIEM")
+# =============================================================================
+
+def bench_intents(repeat: int, rounds: int = 200) -> Dict[str, Any]:
+    """
+    Trafność i czas rozpoznawania intencji na korpusie (`rounds` przejść,
+    `repeat` pomiarów).
+
+    "missed_dont_know" to wypowiedzi "nie wiem" nierozpoznane - każda zeruje
+    licznik zamiast go zwiększyć, więc uczeń dostaje kolejne tury pytań
+    prowadzących zamiast wskazówki lub pełnej odpowiedzi. Błędnie rozpoznane
+    wypowiedzi `IntentMatcher` trafiają do "misclassified" (benchmark kończy
+    się wtedy kodem błędu).
+    """
+    results: Dict[str, Any] = {"corpus": len(CORPUS)}
+    texts = [text for text, _ in CORPUS]
+    classifiers = (("legacy", legacy_classify), ("matcher", IntentMatcher().classify))
+    for name, classify in classifiers:
+        wrong = [(text, expected) for text, expected in CORPUS
+                 if classify(text) != expected]
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for text in texts:
+                    classify(text)
+            timings.append((time.perf_counter() - start) / (rounds * len(texts)))
+        results[name] = {
+            "accuracy": round(1 - len(wrong) / len(CORPUS), 4),
+            "missed_dont_know": sum(1 for _, expected in wrong
+                                    if expected == INTENT_DONT_KNOW),
+            "errors": len(wrong),
+            "us_per_call": summarize(timings, scale=1e6, digits=3),
+        }
+        if name == "matcher":
+            results[name]["misclassified"] = [
+                {"text": text, "expected": expected, "got": classify(text)}
+                for text, expected in wrong]
+    return results
+
+
+# =============================================================================
+# SCENARIUSZ: STAN WSPÓŁDZIELONY INSTANCJI
+# =============================================================================
+
+def _shared_replicas(replicas: List[SharedState], students: int,
+                     ops: int) -> Dict[str, Any]:
+    """
+    Każda instancja (wątek) wykonuje `ops` tur: odczyt weryfikacji klucza,
+    zapis profilu pod blokadą ucznia (odczyt-zmiana-zapis) i liczniki tury.
+    """
+    lock = threading.Lock()
+    lock_waits: List[float] = []
+
+    def replica(index: int, shared: SharedState) -> None:
+        waits = []
+        for op in range(ops):
+            student = f"uczen{(index + op) % students}"
+            shared.get("verify:bench")
+            start = time.perf_counter()
+            with shared.lock("profile:" + student, ttl=10, timeout=30):
+                waits.append(time.perf_counter() - start)
+                value = int(shared.get("profile_rev:" + student) or 0)
+                shared.set("profile_rev:" + student, str(value + 1))
+            shared.incr_many({"counters:turns": 1, "counters:cost_pln": 0.0005})
+        with lock:
+            lock_waits.extend(waits)
+
+    threads = [threading.Thread(target=replica, args=(i, shared))
+               for i, shared in enumerate(replicas)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    total = len(replicas) * ops
+    revisions = sum(int(replicas[0].get(f"profile_rev:uczen{i}") or 0)
+                    for i in range(students))
+    counters = replicas[0].counters(["counters:turns", "counters:cost_pln"])
+    return {
+        "turns": total,
+        "seconds": round(elapsed, 3),
+        "turns_per_s": round(total / elapsed, 1) if elapsed else 0.0,
+        "lock_wait_ms": summarize(lock_waits),
+        "lost_updates": total - revisions,
+        "counter_turns": int(counters["counters:turns"]),
+        "counter_cost_error": round(
+            abs(counters["counters:cost_pln"] - total * 0.0005), 9),
+    }
+
+
+def bench_shared(replicas: int, students: int, ops: int) -> Dict[str, Any]:
+    """
+    `replicas` instancji aplikacji wykonuje po `ops` tur `students` uczniów na
+    wspólnym stanie.
+
+    "local" - jeden `LocalState` (wszystkie instancje w jednym procesie);
+    "redis" - osobny `RedisState` na instancję, serwer RESP w procesie.
+    """
+    results: Dict[str, Any] = {"replicas": replicas, "students": students,
+                               "turns_per_replica": ops}
+    local = LocalState()
+    results["local"] = _shared_replicas([local] * replicas, students, ops)
+    with FakeRedisServer() as server:
+        clients: List[SharedState] = [RedisState(server.url) for _ in range(replicas)]
+        try:
+            results["redis"] = _shared_replicas(clients, students, ops)
+        finally:
+            for client in clients:
+                client.close()
+        results["redis"]["server"] = server.stats()
+    return results
+
+
+# =============================================================================
+# URUCHOMIENIE I PORÓWNANIE WYNIKÓW
+# =============================================================================
+
+def _numeric_leaves(data: Any, prefix: str = "") -> Dict[str, float]:
+    leaves: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            leaves.update(_numeric_leaves(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        leaves[prefix] = float(data)
+    return leaves
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """
+    Zestawia wyniki z poprzednim plikiem JSON (zmiana procentowa każdej wartości
+    liczbowej).
+    """
+    old = _numeric_leaves(baseline.get("results", {}))
+    new = _numeric_leaves(current.get("results", {}))
+    lines = [f"Porównanie z wersją {baseline.get('version', '?')}:"]
+    for key in sorted(old.keys() & new.keys()):
+        if old[key]:
+            change = (new[key] - old[key]) / old[key]
+            lines.append(f"  {key}: {old[key]:g} -> {new[key]:g} ({change:+.1%})")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmarki Sokratesa na lokalnym serwerze API.")
+    parser.add_argument("--only", default=",".join(SCENARIOS),
+                        help="scenariusze oddzielone przecinkami "
+                             f"({', '.join(SCENARIOS)})")
+    parser.add_argument("--students", type=int, default=8,
+                        help="równocześni uczniowie (chat)")
+    parser.add_argument("--turns", type=int, default=3, help="tury na ucznia (chat)")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="opóźnienie serwera API [s]")
+    parser.add_argument("--token-delay", type=float, default=0.005,
+                        help="odstęp fragmentów strumienia [s]")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="odpowiedzi bez strumieniowania")
+    parser.add_argument("--class-size", type=int, default=30,
+                        help="uczniowie startujący naraz (ratelimit)")
+    parser.add_argument("--max-rps", type=float, default=10,
+                        help="limit serwera API [zapytania/s] (ratelimit)")
+    parser.add_argument("--slow-rate", type=float, default=0.02,
+                        help="odsetek wolnych odpowiedzi serwera (tail)")
+    parser.add_argument("--slow-latency", type=float, default=3.0,
+                        help="opóźnienie wolnych odpowiedzi [s] (tail)")
+    parser.add_argument("--tail-turns", type=int, default=50,
+                        help="tury na ucznia (tail)")
+    parser.add_argument("--facts", type=int, default=10000,
+                        help="fakty w profilu (profile)")
+    parser.add_argument("--conversation-turns", type=int, default=30,
+                        help="tury jednej rozmowy (prefix)")
+    parser.add_argument("--replicas", type=int, default=4,
+                        help="instancje aplikacji (shared)")
+    parser.add_argument("--shared-turns", type=int, default=500,
+                        help="tury na instancję (shared)")
+    parser.add_argument("--profiles", type=int, default=2000,
+                        help="syntetyczne profile (admin)")
+    parser.add_argument("--facts-per-profile", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5, help="powtórzenia pomiarów")
+    parser.add_argument("--output",
+                        help="plik wynikowy JSON (domyślnie: standardowe wyjście)")
+    parser.add_argument("--baseline", help="poprzedni plik JSON do porównania")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"nieznane scenariusze: {', '.join(sorted(unknown))}")
+
+    report: Dict[str, Any] = {
+        "benchmark": "sokrates",
+        "version": __version__,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "results": {},
+    }
+    original_cwd = os.getcwd()
+    for name in scenarios:
+        with tempfile.TemporaryDirectory(prefix=f"sokrates-bench-{name}-") as tmp:
+            workdir = Path(tmp)
+            os.chdir(workdir)
+            print(f"[benchmark] {name}...", file=sys.stderr)
+            try:
+                if name == "chat":
+                    result = bench_chat(workdir, args.students, args.turns,
+                                        args.latency, args.token_delay,
+                                        not args.no_stream)
+                elif name == "profile":
+                    result = bench_profile(workdir, args.facts, args.repeat)
+                elif name == "admin":
+                    result = bench_admin(workdir, args.profiles, args.facts_per_profile,
+                                         args.repeat)
+                elif name == "ratelimit":
+                    result = bench_ratelimit(workdir, args.class_size, args.turns,
+                                             args.latency, args.max_rps)
+                elif name == "tail":
+                    result = bench_tail(workdir, args.students, args.tail_turns,
+                                        args.latency, args.slow_rate,
+                                        args.slow_latency)
+                elif name == "prefix":
+                    result = bench_prefix(workdir, args.conversation_turns)
+                elif name == "intents":
+                    result = bench_intents(args.repeat)
+                elif name == "shared":
+                    result = bench_shared(args.replicas, args.students,
+                                          args.shared_turns)
+                else:
+                    result = bench_startup(workdir, args.repeat)
+            finally:
+                os.chdir(original_cwd)
+            report["results"][name] = result
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        print("\n".join(compare(baseline, report)), file=sys.stderr)
+    matcher = report["results"].get("intents", {}).get("matcher", {})
+    misclassified = matcher.get("misclassified")
+    if misclassified:
+        for item in misclassified:
+            print(f"[intents] {item['text']!r}: oczekiwano {item['expected']}, "
+                  f"rozpoznano {item['got']}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
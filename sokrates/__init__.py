@@ -0,0 +1,8 @@
+"""
+🧠 Sokrates - moduły wspólne aplikacji.
+
+Kod niezależny od interfejsu Streamlit (przechowywanie profili uczniów,
+pamięć podręczna itp.), importowany przez `app.py`.
+"""
+
+__version__ = "2.3.0"
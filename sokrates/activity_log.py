@@ -0,0 +1,270 @@
+"""
+Dziennik aktywności i audytu w formacie JSON Lines z rotacją według rozmiaru.
+
+Każde zdarzenie (logowanie, tura rozmowy, edycja/usunięcie profilu, eksport)
+to jedna linia JSON. Podgląd ostatnich wpisów czyta plik od końca, więc jego
+koszt nie zależy od rozmiaru dziennika. Filtrowanie po uczniu i typie
+zdarzenia korzysta z przyrostowych indeksów pozycji linii każdego pliku
+dziennika (także starszych, po rotacji) - pasujące wpisy czytane są
+bezpośrednio, bez przeglądania całych plików.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sokrates.storage import student_key
+
+# Typy zdarzeń zapisywanych w dzienniku
+EVENT_LOGIN = "login"
+EVENT_TURN = "turn"
+EVENT_FACT_ADD = "fact_add"
+EVENT_FACT_DELETE = "fact_delete"
+EVENT_PROFILE_REPLACE = "profile_replace"
+EVENT_PROFILE_DELETE = "profile_delete"
+EVENT_EXPORT = "export"
+EVENT_SUPPORT_TICKET = "support_ticket"
+
+EVENTS = (
+    EVENT_LOGIN, EVENT_TURN, EVENT_FACT_ADD, EVENT_FACT_DELETE,
+    EVENT_PROFILE_REPLACE, EVENT_PROFILE_DELETE, EVENT_EXPORT, EVENT_SUPPORT_TICKET,
+)
+
+_BLOCK_SIZE = 8192
+
+
+def _iter_lines_reversed(path: Path) -> Iterator[bytes]:
+    """
+    Zwraca linie pliku od końca, czytając go blokami od ostatniego bajtu.
+    """
+    try:
+        f_log = open(path, "rb")
+    except OSError:
+        return
+    with f_log:
+        position = f_log.seek(0, os.SEEK_END)
+        remainder = b""
+        while position > 0:
+            step = min(_BLOCK_SIZE, position)
+            position -= step
+            f_log.seek(position)
+            lines = (f_log.read(step) + remainder).split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+
+class _SegmentIndex:
+    """
+    Indeks jednego pliku dziennika: (pole, wartość) -> pozycje linii.
+    """
+
+    __slots__ = ("entries", "indexed_upto")
+
+    def __init__(self):
+        self.entries: Dict[Tuple[str, str], List[int]] = {}
+        self.indexed_upto = 0
+
+
+def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Dekoduje linię dziennika (uszkodzone linie są pomijane).
+    """
+    try:
+        record = json.loads(line.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    return record if isinstance(record, dict) else None
+
+
+class ActivityLog:
+    """
+    Dziennik zdarzeń JSONL z rotacją (activity.log, activity.log.1, ...).
+    """
+
+    def __init__(self, path: Path, max_bytes: int = 5 * 1024 * 1024,
+                 backup_count: int = 5):
+        """
+        Args:
+            path (Path): Plik dziennika
+            max_bytes (int): Rozmiar pliku, po przekroczeniu którego następuje rotacja
+            backup_count (int): Liczba przechowywanych starszych plików
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        # Indeksy plików dziennika według i-węzła - rotacja zmienia nazwę pliku,
+        # nie i-węzeł
+        self._indexes: Dict[int, _SegmentIndex] = {}
+
+    def log(self, event: str, student: str = "", **details: Any) -> None:
+        """
+        Dopisuje zdarzenie do dziennika.
+
+        Args:
+            event (str): Typ zdarzenia (np. EVENT_LOGIN)
+            student (str): Imię/nazwa ucznia, którego dotyczy zdarzenie
+            **details: Dodatkowe dane zdarzenia (muszą być serializowalne do JSON)
+        """
+        record: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "event": event,
+            "student": student_key(student) if student else "",
+        }
+        if details:
+            record["details"] = details
+        payload = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        line = payload.encode("utf-8")
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._rotate_if_needed(len(line))
+            with open(self.path, "ab") as f_log:
+                f_log.write(line)
+
+    def _rotate_if_needed(self, incoming: int) -> None:
+        """
+        Przesuwa pliki dziennika, jeśli nowy wpis przekroczyłby `max_bytes`.
+        """
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            return
+        if size + incoming <= self.max_bytes:
+            return
+        if self.backup_count <= 0:
+            self.path.unlink()
+        else:
+            for number in range(self.backup_count - 1, 0, -1):
+                older = self.path.with_name(f"{self.path.name}.{number}")
+                if older.exists():
+                    older.replace(self.path.with_name(f"{self.path.name}.{number + 1}"))
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        # Usunięty plik zwalnia i-węzeł, który może dostać nowy plik - jego indeks
+        # znika od razu
+        self._prune_indexes()
+
+    def _segments(self) -> List[Path]:
+        """
+        Zwraca pliki dziennika od najnowszego do najstarszego.
+        """
+        rotated = [self.path.with_name(f"{self.path.name}.{number}")
+                   for number in range(1, self.backup_count + 1)]
+        return [self.path] + [path for path in rotated if path.exists()]
+
+    def _segment_index(self, f_log: BinaryIO) -> _SegmentIndex:
+        """
+        Zwraca indeks otwartego pliku dziennika, dopisując linie dodane od
+        ostatniego odświeżenia (wywoływane pod blokadą dziennika).
+
+        Czytane są tylko nowe bajty; plik krótszy niż zindeksowana część
+        (np. nowy plik pod tym samym i-węzłem) indeksowany jest od nowa.
+        """
+        stat = os.fstat(f_log.fileno())
+        index = self._indexes.get(stat.st_ino)
+        if index is None or stat.st_size < index.indexed_upto:
+            index = self._indexes[stat.st_ino] = _SegmentIndex()
+        if stat.st_size == index.indexed_upto:
+            return index
+        f_log.seek(index.indexed_upto)
+        position = index.indexed_upto
+        for line in f_log:
+            if not line.endswith(b"\n"):
+                break  # niedokończony zapis - zostanie zindeksowany później
+            record = _parse(line)
+            if record is not None:
+                for field in ("event", "student"):
+                    entry = (field, str(record.get(field, "")))
+                    index.entries.setdefault(entry, []).append(position)
+            position += len(line)
+        index.indexed_upto = position
+        return index
+
+    def _prune_indexes(self) -> None:
+        """
+        Usuwa indeksy plików, które wypadły z rotacji (wywoływane pod blokadą
+        dziennika).
+        """
+        live = set()
+        for segment in self._segments():
+            try:
+                live.add(segment.stat().st_ino)
+            except OSError:
+                continue
+        for inode in set(self._indexes) - live:
+            del self._indexes[inode]
+
+    def tail(self, limit: int = 10, student: str = "",
+             event: str = "") -> List[Dict[str, Any]]:
+        """
+        Zwraca ostatnie wpisy dziennika (najnowsze pierwsze), opcjonalnie filtrowane.
+
+        Args:
+            limit (int): Maksymalna liczba wpisów
+            student (str): Tylko zdarzenia tego ucznia (puste - wszyscy)
+            event (str): Tylko zdarzenia tego typu (puste - wszystkie)
+
+        Returns:
+            List[Dict[str, Any]]: Wpisy z kluczami "ts", "event", "student"
+            i opcjonalnie "details"
+        """
+        key = student_key(student) if student else ""
+        if key or event:
+            return self._tail_indexed(limit, key, event)
+        records: List[Dict[str, Any]] = []
+        for segment in self._segments():
+            if len(records) >= limit:
+                break
+            for line in _iter_lines_reversed(segment):
+                record = _parse(line)
+                if record is None:
+                    continue
+                records.append(record)
+                if len(records) >= limit:
+                    break
+        return records
+
+    def _tail_indexed(self, limit: int, key: str, event: str) -> List[Dict[str, Any]]:
+        """
+        Wyszukuje pasujące wpisy wszystkich plików dziennika przez indeksy
+        pozycji linii.
+
+        Note:
+            Indeks i odczyt wpisów dotyczą tego samego otwartego pliku, a całość
+            działa pod blokadą dziennika - rotacja w trakcie nie przesunie pozycji
+            na inny plik.
+        """
+        records: List[Dict[str, Any]] = []
+        with self._lock:
+            for segment in self._segments():
+                if len(records) >= limit:
+                    break
+                try:
+                    f_log = open(segment, "rb")
+                except OSError:
+                    continue
+                with f_log:
+                    index = self._segment_index(f_log)
+                    by_student = index.entries.get(("student", key), [])
+                    by_event = index.entries.get(("event", event), [])
+                    candidates = [by_student if key else None,
+                                  by_event if event else None]
+                    # Przy dwóch filtrach przeglądana jest krótsza lista, a drugi
+                    # warunek sprawdzany na wpisie
+                    offsets = min((c for c in candidates if c is not None), key=len)
+                    for offset in reversed(offsets):
+                        f_log.seek(offset)
+                        record = _parse(f_log.readline())
+                        if record is None or (key and record.get("student") != key) \
+                                or (event and record.get("event") != event):
+                            continue
+                        records.append(record)
+                        if len(records) >= limit:
+                            break
+        return records
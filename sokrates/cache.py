@@ -0,0 +1,116 @@
+"""
+Współdzielona pamięć podręczna LRU z licznikami trafień.
+
+Wpisy mogą nieść znacznik wersji (np. numer rewizji profilu) - odczyt z
+innym znacznikiem traktowany jest jak chybienie, a nieaktualny wpis usuwany.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Ograniczona liczbą wpisów pamięć podręczna LRU, bezpieczna wątkowo.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Args:
+            max_entries (int): Maksymalna liczba wpisów (0 wyłącza cache)
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, token: Any = None) -> Optional[Any]:
+        """
+        Zwraca wartość z cache lub None (chybienie).
+
+        Args:
+            key (Hashable): Klucz wpisu
+            token (Any, optional): Oczekiwany znacznik wersji wpisu
+
+        Returns:
+            Optional[Any]: Zapamiętana wartość lub None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if token is not None and entry[0] != token:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any, token: Any = None) -> None:
+        """
+        Zapisuje wartość, usuwając najdawniej używane wpisy ponad limit.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (token, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Usuwa wpis (np. po zapisie zmieniającym dane).
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        Usuwa wpisy, dla których `predicate(klucz, wartość)` zwraca True.
+
+        Returns:
+            int: Liczba usuniętych wpisów
+        """
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if predicate(key, entry[1])]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """
+        Usuwa wszystkie wpisy (liczniki pozostają bez zmian).
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Zwraca liczniki pracy cache.
+
+        Returns:
+            Dict[str, Any]: "entries", "hits", "misses", "evictions",
+            "invalidations" oraz "hit_rate" (0.0-1.0)
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,175 @@
+"""
+Scalanie podobnych faktów i limit rozmiaru profilu ucznia (lokalnie, offline).
+
+Fakty porównywane są po normalizacji (małe litery, bez polskich znaków
+diakrytycznych i interpunkcji) jako zbiory 4-znakowych fragmentów
+(shingles); podobieństwo Jaccarda powyżej progu oznacza duplikat. Z grupy
+duplikatów zostaje najnowsze sformułowanie, a po przekroczeniu limitu
+usuwane są najstarsze fakty. Dzięki temu rozmiar profilu, a więc i promptu,
+pozostaje ograniczony.
+
+Uruchomienie dla wszystkich profili:
+    python -m sokrates.consolidation [ścieżka_bazy] [--threshold 0.75] [--max-facts 50]
+"""
+
+import argparse
+import re
+import unicodedata
+from bisect import bisect_left
+from contextlib import nullcontext
+from pathlib import Path
+from typing import (Any, Callable, ContextManager, Dict, FrozenSet, Iterable, List,
+                    Optional)
+
+from sokrates.storage import ProfileStore
+
+DEFAULT_THRESHOLD = 0.75
+DEFAULT_MAX_FACTS = 50
+SHINGLE_SIZE = 4
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_fact(text: str) -> str:
+    """
+    Sprowadza fakt do postaci porównywalnej: małe litery, bez diakrytyków
+    i interpunkcji.
+    """
+    text = text.lower().replace("ł", "l")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> FrozenSet[str]:
+    """
+    Zwraca zbiór fragmentów znakowych długości `size` znormalizowanego tekstu.
+    """
+    normalized = f" {normalize_fact(text)} "
+    if len(normalized) <= size:
+        return frozenset([normalized])
+    return frozenset(normalized[i:i + size] for i in range(len(normalized) - size + 1))
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """
+    Podobieństwo Jaccarda dwóch zbiorów fragmentów (0.0-1.0).
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def plan_consolidation(records: List[Dict[str, Any]],
+                       threshold: float = DEFAULT_THRESHOLD,
+                       max_facts: int = DEFAULT_MAX_FACTS,
+                       new_ids: Optional[Iterable[int]] = None) -> List[int]:
+    """
+    Wyznacza fakty do usunięcia: starsze duplikaty i nadmiar ponad limit.
+
+    Args:
+        records (List[Dict]): Fakty ucznia z kluczami "id" i "fact" (kolejność dodania)
+        threshold (float): Próg podobieństwa, od którego fakty uznawane są za duplikaty
+        max_facts (int): Maksymalna liczba faktów w profilu (0 - bez limitu)
+        new_ids (Iterable[int], optional): Porównuj tylko pary z tymi faktami
+            (tryb przyrostowy przy zapisie - O(n·k) dla k nowych faktów
+            zamiast O(n²))
+
+    Returns:
+        List[int]: Identyfikatory faktów do usunięcia
+    """
+    ordered = sorted(records, key=lambda record: record["id"])
+    signatures = {record["id"]: shingles(record["fact"]) for record in ordered}
+    only = set(new_ids) if new_ids is not None else None
+    # Pozycje nowych faktów (rosnąco) - w trybie przyrostowym jedyni kandydaci
+    # na starsze duplikaty faktów sprzed zapisu
+    new_positions = [index for index, record in enumerate(ordered)
+                     if only is not None and record["id"] in only]
+    removed = set()
+    # Od najnowszych: każdy zachowany fakt "wchłania" swoje starsze duplikaty
+    for i in range(len(ordered) - 1, -1, -1):
+        newer = ordered[i]["id"]
+        if newer in removed:
+            continue
+        if only is None or newer in only:
+            candidates: Iterable[int] = range(i - 1, -1, -1)
+        else:
+            candidates = reversed(new_positions[:bisect_left(new_positions, i)])
+        for j in candidates:
+            older = ordered[j]["id"]
+            if older in removed:
+                continue
+            if similarity(signatures[newer], signatures[older]) >= threshold:
+                removed.add(older)
+    kept = [record["id"] for record in ordered if record["id"] not in removed]
+    if max_facts > 0 and len(kept) > max_facts:
+        removed.update(kept[:len(kept) - max_facts])
+    return sorted(removed)
+
+
+def consolidate_student(store: ProfileStore, student: str,
+                        threshold: float = DEFAULT_THRESHOLD,
+                        max_facts: int = DEFAULT_MAX_FACTS,
+                        new_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Scala duplikaty i egzekwuje limit faktów w profilu jednego ucznia.
+
+    Returns:
+        int: Liczba usuniętych faktów
+    """
+    records = store.list_fact_records(student)
+    to_delete = plan_consolidation(records, threshold, max_facts, new_ids)
+    return store.delete_facts(student, to_delete) if to_delete else 0
+
+
+def consolidate_all(store: ProfileStore, threshold: float = DEFAULT_THRESHOLD,
+                    max_facts: int = DEFAULT_MAX_FACTS,
+                    lock: Optional[Callable[[str], ContextManager[Any]]] = None
+                    ) -> Dict[str, int]:
+    """
+    Porządkuje wszystkie profile (zadanie zbiorcze).
+
+    Args:
+        store (ProfileStore): Magazyn profili
+        threshold (float): Próg podobieństwa faktów
+        max_facts (int): Limit faktów na ucznia
+        lock (Callable, optional): Blokada zapisu profilu ucznia (klucz -> menedżer
+            kontekstu), brana osobno dla każdego profilu - fakt dodany w tym
+            czasie przez inną sesję nie zostanie usunięty w trakcie scalania
+
+    Returns:
+        Dict[str, int]: "students" - liczba przejrzanych profili,
+        "removed" - liczba usuniętych faktów
+    """
+    students = [student["key"] for student in store.iter_students()]
+    removed = 0
+    for key in students:
+        with lock(key) if lock is not None else nullcontext():
+            removed += consolidate_student(store, key, threshold, max_facts)
+    return {"students": len(students), "removed": removed}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Uruchamia porządkowanie wszystkich profili z linii poleceń.
+    """
+    parser = argparse.ArgumentParser(
+        description="Scalanie duplikatów faktów w profilach uczniów")
+    parser.add_argument("db_path", nargs="?", default="db/sokrates.db",
+                        help="ścieżka bazy profili")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="próg podobieństwa")
+    parser.add_argument("--max-facts", type=int, default=DEFAULT_MAX_FACTS,
+                        help="limit faktów na ucznia")
+    args = parser.parse_args(argv)
+    db_path = Path(args.db_path)
+    store = ProfileStore(db_path, legacy_dir=db_path.parent / "students")
+    result = consolidate_all(store, args.threshold, args.max_facts)
+    print(f"Przejrzano profili: {result['students']}, "
+          f"usunięto faktów: {result['removed']}")
+
+
+if __name__ == "__main__":
+    main()
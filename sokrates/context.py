@@ -0,0 +1,193 @@
+"""
+Budowanie kontekstu rozmowy w ramach budżetu tokenów wejściowych.
+
+Tokeny liczone są lokalnie (bez sieci i dodatkowych bibliotek) przybliżeniem
+zbliżonym do tokenizerów modeli GPT, zawyżonym raczej niż zaniżonym.
+Budżet dzielony jest między prompt systemowy, fakty z profilu ucznia i
+ostatnie tury rozmowy; tury, które wypadają z okna, są dołączane do
+krótkiego podsumowania rozmowy zamiast być pomijane.
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+# Stały narzut tokenów na każdą wiadomość w formacie czatu (rola, separatory)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Średnia liczba znaków słowa przypadająca na jeden token (dla języka polskiego)
+CHARS_PER_TOKEN = 3.5
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Szacuje liczbę tokenów tekstu (offline).
+
+    Każde słowo to co najmniej jeden token, a dłuższe słowa liczone są
+    proporcjonalnie do długości; każdy znak interpunkcyjny to osobny token.
+    """
+    if not text:
+        return 0
+    return sum(max(1, math.ceil(len(piece) / CHARS_PER_TOKEN))
+               if piece[0].isalnum() or piece[0] == "_" else 1
+               for piece in _TOKEN_PATTERN.findall(text))
+
+
+def count_message_tokens(message: Dict[str, Any]) -> int:
+    """
+    Szacuje liczbę tokenów wiadomości czatu razem z narzutem formatu.
+    """
+    return MESSAGE_OVERHEAD_TOKENS + count_tokens(str(message.get("content", "")))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Przycina tekst (od końca) tak, aby zmieścił się w `max_tokens`.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens - 1:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + "…"
+
+
+@dataclass
+class ContextBudget:
+    """
+    Podział budżetu tokenów wejściowych jednej tury.
+
+    Attributes:
+        total (int): Łączny budżet tokenów wejściowych
+        profile_share (float): Maksymalna część budżetu na fakty z profilu
+        summary_tokens (int): Maksymalny rozmiar podsumowania rozmowy
+        window_slack (float): Część budżetu tur zwalniana, gdy okno rozmowy musi się
+            przesunąć - okno przesuwa się skokowo, więc początek zapytania (prefiks
+            dla cache promptu dostawcy) pozostaje taki sam przez kilka kolejnych tur
+    """
+    total: int = 3000
+    profile_share: float = 0.25
+    summary_tokens: int = 300
+    window_slack: float = 0.25
+
+
+@dataclass
+class ContextSelection:
+    """
+    Wynik doboru kontekstu.
+
+    Attributes:
+        facts (List[str]): Fakty z profilu, które zmieściły się w budżecie
+        history (List[Dict]): Tury rozmowy w oknie (od najstarszej)
+        window_start (int): Indeks pierwszej tury okna w pełnej historii
+        tokens (int): Szacowana liczba tokenów wejściowych całego zapytania
+    """
+    facts: List[str] = field(default_factory=list)
+    history: List[Dict[str, Any]] = field(default_factory=list)
+    window_start: int = 0
+    tokens: int = 0
+
+
+def select_context(fixed_tokens: int, facts: List[str], history: List[Dict[str, Any]],
+                   user_prompt: str, budget: ContextBudget,
+                   min_start: int = 0) -> ContextSelection:
+    """
+    Dobiera fakty i ostatnie tury rozmowy mieszczące się w budżecie.
+
+    Kolejność wypełniania: stała część promptu i pytanie ucznia (zawsze),
+    następnie fakty (do `profile_share` budżetu, w podanej kolejności),
+    a resztę budżetu zajmują tury rozmowy od najnowszej. Gdy nie wszystkie
+    tury od `min_start` się mieszczą, okno zaczyna się na tyle późno, by
+    zostało `window_slack` budżetu tur na kolejne wypowiedzi.
+
+    Args:
+        fixed_tokens (int): Tokeny stałej części promptu (osobowość, instrukcje,
+            podsumowanie)
+        facts (List[str]): Fakty z profilu w kolejności ważności
+        history (List[Dict]): Dotychczasowe tury (bez bieżącego pytania)
+        user_prompt (str): Bieżące pytanie ucznia
+        budget (ContextBudget): Budżet tokenów
+        min_start (int): Tury przed tym indeksem są już w podsumowaniu i nie trafiają
+            do okna
+
+    Returns:
+        ContextSelection: Wybrane fakty i tury oraz szacowana liczba tokenów
+    """
+    used = fixed_tokens + count_message_tokens({"content": user_prompt})
+    selection = ContextSelection(window_start=len(history))
+
+    facts_budget = min(int(budget.total * budget.profile_share),
+                       max(0, budget.total - used))
+    facts_used = 0
+    for fact in facts:
+        cost = count_tokens(fact) + 1
+        if facts_used + cost > facts_budget:
+            break
+        selection.facts.append(fact)
+        facts_used += cost
+    used += facts_used
+
+    history_budget = budget.total - used
+    limit = budget.total
+    history_tokens = sum(count_message_tokens(m) for m in history[min_start:]
+                         if "role" in m and "content" in m)
+    if history_tokens > history_budget:
+        # Okno musi się przesunąć - przesuwamy je od razu o zapas na kolejne tury
+        limit -= int(max(history_budget, 0) * budget.window_slack)
+    for index in range(len(history) - 1, min_start - 1, -1):
+        message = history[index]
+        if "role" not in message or "content" not in message:
+            continue
+        cost = count_message_tokens(message)
+        if used + cost > limit:
+            break
+        selection.history.insert(0, {"role": message["role"],
+                                     "content": message["content"]})
+        selection.window_start = index
+        used += cost
+    selection.tokens = used
+    return selection
+
+
+def _first_sentence(text: str, max_chars: int = 160) -> str:
+    """
+    Zwraca pierwsze zdanie wypowiedzi (skrócone do `max_chars` znaków).
+    """
+    sentence = _SENTENCE_END.split(text.strip().replace("\n", " "), maxsplit=1)[0]
+    if len(sentence) <= max_chars:
+        return sentence
+    return sentence[:max_chars].rstrip() + "…"
+
+
+def fold_into_summary(summary: str, turns: List[Dict[str, Any]],
+                      max_tokens: int) -> str:
+    """
+    Dołącza tury wypadające z okna do podsumowania rozmowy (lokalnie, bez API).
+
+    Każda tura skracana jest do pierwszego zdania; gdy podsumowanie przekracza
+    `max_tokens`, usuwane są jego najstarsze linie.
+
+    Args:
+        summary (str): Dotychczasowe podsumowanie (linie "Uczeń: ..."/"Sokrates: ...")
+        turns (List[Dict]): Tury do dołączenia (od najstarszej)
+        max_tokens (int): Maksymalny rozmiar podsumowania
+
+    Returns:
+        str: Zaktualizowane podsumowanie
+    """
+    lines = [line for line in summary.split("\n") if line.strip()]
+    for turn in turns:
+        content = str(turn.get("content", "")).strip()
+        if content:
+            speaker = "Uczeń" if turn.get("role") == "user" else "Sokrates"
+            lines.append(f"{speaker}: {_first_sentence(content)}")
+    while lines and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
@@ -0,0 +1,948 @@
+"""
+Silnik rozmowy sokratejskiej niezależny od interfejsu (bez Streamlit).
+
+`SocraticEngine` obejmuje logikę jednej tury - licznik "nie wiem", dobór
+faktów i kontekstu w budżecie tokenów, cache odpowiedzi, wywołanie modelu,
+rejestr metryk i koszt - oraz operacje na profilu ucznia i zapis historii
+rozmowy. Model każdej tury może wybierać `ModelRouter` (tani model dla
+pytań prowadzących, mocniejszy dla pełnych i złożonych odpowiedzi), a
+zapytania mogą przechodzić przez harmonogram limitów API (`RateLimiter`).
+Tura ma termin (`EngineConfig.deadline_s`), a wolne zapytanie może zostać
+zabezpieczone drugim, identycznym (`HedgeController`). Cały stan rozmowy
+ucznia przekazywany jest jawnie (`StudentState`), więc jeden proces może
+obsługiwać wielu uczniów naraz: z wątków (`reply`) lub z pętli asyncio
+(`areply`, klient `AsyncOpenAI`). Interfejs Streamlit jest cienkim klientem,
+który przechowuje `StudentState` w stanie sesji.
+
+Example:
+    engine = SocraticEngine(ProfileStore(Path("db/sokrates.db")), client=OpenAI())
+    state = StudentState(student_name="Anna")
+    response = engine.reply(state, "Co to jest fotosynteza?")
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, fields
+from typing import (Any, Callable, ContextManager, Dict, List, MutableMapping, Optional,
+                    Tuple)
+
+from openai import (NOT_GIVEN, APIError, APITimeoutError, AsyncOpenAI, OpenAI,
+                    RateLimitError)
+
+from sokrates.consolidation import (DEFAULT_MAX_FACTS, DEFAULT_THRESHOLD,
+                                    consolidate_all, consolidate_student)
+from sokrates.context import (ContextBudget, count_message_tokens, fold_into_summary,
+                              select_context, truncate_to_tokens)
+from sokrates.hedging import (Attempt, Deadline, DeadlineExceededError, HedgeController,
+                              ahedged_call, hedged_call)
+from sokrates.history import ConversationStore
+from sokrates.intents import (DEFAULT_DONT_KNOW_PHRASES, DEFAULT_HELP_PHRASES,
+                              INTENT_DONT_KNOW, INTENT_OTHER, IntentMatcher)
+from sokrates.metrics import KIND_CHAT, MetricsStore, price_usd, usage_tokens
+from sokrates.ratelimit import Permit, QueueTimeoutError, RateLimiter
+from sokrates.response_cache import ResponseCache, response_cache_key
+from sokrates.retrieval import DEFAULT_TOP_K, FactRetriever
+from sokrates.routing import ROUTE_FIXED, ModelRouter, RouteDecision
+from sokrates.shared_state import SharedState, SharedStateError
+from sokrates.storage import SOURCE_MANUAL, ProfileStore, student_key
+
+DEFAULT_PERSONALITY = ("Jesteś Sokratesem - mądrym filozofem i nauczycielem. "
+                       "Twoim celem jest "
+                       "prowadzić ucznia do samodzielnego myślenia poprzez pytania.")
+
+# Stała część promptu systemowego - identyczna w każdej turze (prefiks cache promptu)
+SOCRATIC_INSTRUCTIONS = """
+INSTRUKCJE ZACHOWANIA:
+Przed każdą wypowiedzią ucznia otrzymasz stan rozmowy: licznik "nie wiem", \
+aktualny temat i profil ucznia.
+- Jeśli licznik "nie wiem" < 3: Zadawaj pytania prowadzące, NIE udzielaj \
+bezpośredniej odpowiedzi
+- Jeśli licznik "nie wiem" = 3: Udziel wskazówki lub częściowej odpowiedzi
+- Jeśli licznik "nie wiem" >= 4: MUSISZ udzielić pełnej, jasnej odpowiedzi na \
+pytanie ucznia. Zakończ proces sokratejski i podaj konkretne wyjaśnienie.
+"""
+
+SUMMARY_HEADER = "Podsumowanie wcześniejszej części rozmowy:\n"
+
+# Łączne liczniki tur w stanie współdzielonym (wszystkie instancje aplikacji)
+COUNTER_PREFIX = "counters:"
+SHARED_COUNTERS = ("turns", "errors", "cache_hits", "prompt_tokens",
+                   "completion_tokens", "cached_tokens", "cost_pln")
+# Blokada zapisu profilu ucznia: czas ważności i maksymalne oczekiwanie w sekundach
+PROFILE_LOCK_TTL = 30.0
+PROFILE_LOCK_TIMEOUT = 10.0
+
+# Zmienna część promptu - stan bieżącej tury, wysyłany na końcu (tuż przed pytaniem
+# ucznia)
+TURN_STATE = """Stan rozmowy:
+Licznik "nie wiem": {counter}/4
+Aktualny temat: {topic}
+Profil ucznia: {profile}"""
+
+
+@dataclass
+class StudentState:
+    """
+    Stan rozmowy jednego ucznia (nazwy pól odpowiadają kluczom stanu sesji Streamlit).
+
+    Attributes:
+        student_name (str): Zalogowany uczeń (pusty - brak profilu)
+        messages (List[Dict]): Ostatnie wiadomości rozmowy ("role", "content",
+            opcjonalnie "metrics")
+        nie_wiem_counter (int): Licznik "nie wiem" sterujący poziomem pomocy
+        current_topic (str, optional): Aktualny temat rozmowy
+        chatbot_personality (str): Instrukcja systemowa (osobowość Sokratesa)
+        conversation_summary (str): Podsumowanie tur spoza okna kontekstu
+        summary_upto (int): Liczba początkowych wiadomości `messages` objętych
+            podsumowaniem
+        history_offset (int): Liczba wcześniejszych wiadomości rozmowy, które nie są
+            już trzymane w `messages` (dostępne w historii rozmów)
+        cost_total_pln (float): Łączny koszt rozmowy w złotówkach
+        last_context (Dict, optional): Opis kontekstu ostatniej odpowiedzi (diagnostyka)
+    """
+    student_name: str = ""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    nie_wiem_counter: int = 0
+    current_topic: Optional[str] = None
+    chatbot_personality: str = DEFAULT_PERSONALITY
+    conversation_summary: str = ""
+    summary_upto: int = 0
+    history_offset: int = 0
+    cost_total_pln: float = 0.0
+    last_context: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_mapping(cls, data: MutableMapping[str, Any]) -> "StudentState":
+        """
+        Tworzy stan z mapowania (np. `st.session_state`); brakujące pola mają
+        wartości domyślne.
+
+        Lista `messages` nie jest kopiowana - dopisywanie do niej zmienia źródło.
+        """
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+    def save_to(self, data: MutableMapping[str, Any]) -> None:
+        """
+        Zapisuje pola stanu z powrotem do mapowania (np. `st.session_state`).
+        """
+        for f in fields(self):
+            data[f.name] = getattr(self, f.name)
+
+    def reset_conversation(self) -> None:
+        """
+        Czyści rozmowę (np. po zalogowaniu innego ucznia); koszt pozostaje.
+        """
+        self.messages = []
+        self.nie_wiem_counter = 0
+        self.conversation_summary = ""
+        self.summary_upto = 0
+        self.history_offset = 0
+        self.last_context = None
+
+
+@dataclass
+class EngineConfig:
+    """
+    Ustawienia silnika.
+
+    Attributes:
+        model (str): Model odpowiedzi, gdy silnik nie ma wyboru modelu (`ModelRouter`)
+        budget (ContextBudget): Budżet tokenów wejściowych tury
+        retrieval_top_k (int): Liczba faktów z profilu w prompcie (0 - wszystkie)
+        fact_similarity_threshold (float): Próg scalania podobnych faktów
+        max_facts_per_student (int): Limit faktów w profilu (0 - bez limitu)
+        pricing (Dict): Cennik modeli (USD za token: "input_tokens", "output_tokens",
+            opcjonalnie "cached_input_tokens")
+        usd_to_pln (float): Kurs przeliczenia kosztu
+        history_window (int): Liczba ostatnich wiadomości trzymanych w stanie
+            rozmowy (0 - bez limitu); starsze są tylko w historii rozmów
+        reply_tokens_est (int): Szacowana długość odpowiedzi w tokenach (rezerwowana
+            w limicie tokenów na minutę przed wysłaniem zapytania)
+        deadline_s (float): Czas na odpowiedź modelu w sekundach, łącznie z kolejką
+            harmonogramu i ponowieniami (0 - bez terminu)
+        dont_know_phrases (Tuple[str, ...]): Frazy zwiększające licznik "nie wiem"
+            (składnia - zob. sokrates/intents.py)
+        help_phrases (Tuple[str, ...]): Frazy prośby o pomoc, przy których licznik
+            nie jest zerowany
+    """
+    model: str = "gpt-4o-mini"
+    budget: ContextBudget = field(default_factory=ContextBudget)
+    retrieval_top_k: int = DEFAULT_TOP_K
+    fact_similarity_threshold: float = DEFAULT_THRESHOLD
+    max_facts_per_student: int = DEFAULT_MAX_FACTS
+    pricing: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    usd_to_pln: float = 1.0
+    history_window: int = 40
+    reply_tokens_est: int = 400
+    deadline_s: float = 0.0
+    dont_know_phrases: Tuple[str, ...] = DEFAULT_DONT_KNOW_PHRASES
+    help_phrases: Tuple[str, ...] = DEFAULT_HELP_PHRASES
+
+
+@dataclass
+class _PreparedTurn:
+    """
+    Zapytanie przygotowane do wysłania (wspólna część `reply` i `areply`).
+    """
+    messages: List[Dict[str, str]]
+    context: Dict[str, Any]
+    cache_key: str
+    start: float
+    model: str
+    route: str
+    counter_before: int
+    summary_before: str
+    summary_upto_before: int
+
+
+class SocraticEngine:
+    """
+    Logika rozmowy sokratejskiej i profilu ucznia, współdzielona przez wszystkie sesje.
+
+    Bezpieczna wątkowo: stan rozmowy jest przekazywany jawnie, a współdzielone
+    zasoby (magazyn profili, indeksy faktów, cache odpowiedzi, rejestr metryk)
+    są bezpieczne wątkowo.
+    """
+
+    def __init__(self, store: ProfileStore, config: Optional[EngineConfig] = None,
+                 client: Optional[OpenAI] = None,
+                 async_client: Optional[AsyncOpenAI] = None,
+                 retriever: Optional[FactRetriever] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 metrics: Optional[MetricsStore] = None,
+                 history: Optional[ConversationStore] = None,
+                 limiter: Optional[RateLimiter] = None,
+                 router: Optional[ModelRouter] = None,
+                 hedger: Optional[HedgeController] = None,
+                 shared: Optional[SharedState] = None):
+        """
+        Args:
+            store (ProfileStore): Magazyn profili uczniów
+            config (EngineConfig, optional): Ustawienia (domyślne, jeśli brak)
+            client (OpenAI, optional): Domyślny klient dla `reply`
+            async_client (AsyncOpenAI, optional): Domyślny klient dla `areply`
+            retriever (FactRetriever, optional): Indeksy faktów (tworzone, jeśli brak)
+            response_cache (ResponseCache, optional): Cache odpowiedzi (brak -
+                wyłączony)
+            metrics (MetricsStore, optional): Rejestr wywołań API (brak - bez rejestru)
+            history (ConversationStore, optional): Historia rozmów (brak - rozmowa
+                tylko w stanie ucznia)
+            limiter (RateLimiter, optional): Domyślny harmonogram limitów API
+                (brak - zapytania wysyłane od razu)
+            router (ModelRouter, optional): Wybór modelu tury (brak - zawsze
+                `config.model`)
+            hedger (HedgeController, optional): Zapytania zabezpieczające wolne tury
+                (brak - jedno zapytanie na turę)
+            shared (SharedState, optional): Stan współdzielony instancji aplikacji -
+                łączne liczniki tur i kosztów oraz blokady zapisu profilu (brak -
+                bez liczników, blokady tylko w transakcjach bazy)
+        """
+        self.store = store
+        self.config = config or EngineConfig()
+        self.client = client
+        self.async_client = async_client
+        self.retriever = retriever or FactRetriever(store)
+        self.response_cache = response_cache or ResponseCache(max_entries=0)
+        self.metrics = metrics
+        self.history = history
+        self.limiter = limiter
+        self.router = router
+        self.hedger = hedger
+        self.shared = shared
+        self.intents = IntentMatcher(self.config.dont_know_phrases,
+                                     self.config.help_phrases)
+
+    # ------------------------------------------------------------------
+    # Profil ucznia
+    # ------------------------------------------------------------------
+
+    def load_facts(self, state: StudentState) -> List[str]:
+        """
+        Zwraca wszystkie fakty z profilu ucznia (pusta lista bez zalogowanego ucznia).
+        """
+        if not state.student_name:
+            return []
+        return self.store.list_facts(state.student_name)
+
+    def select_facts(self, state: StudentState, query: str) -> List[Dict[str, Any]]:
+        """
+        Wybiera fakty ucznia najbardziej związane z zapytaniem ("id", "fact", "score").
+        """
+        if not state.student_name:
+            return []
+        return self.retriever.select(state.student_name, query,
+                                     self.config.retrieval_top_k)
+
+    def profile_lock(self, student_name: str) -> ContextManager[None]:
+        """
+        Zwraca menedżer kontekstu blokady zapisu profilu ucznia, wspólnej dla
+        wszystkich instancji aplikacji (atrapa bez stanu współdzielonego).
+
+        Dodanie faktu i scalanie profilu to kilka transakcji - blokada chroni
+        przed przeplataniem ich z zapisem z innej karty lub instancji.
+
+        Raises:
+            LockTimeoutError: Gdy profil jest zapisywany dłużej niż PROFILE_LOCK_TIMEOUT
+        """
+        if self.shared is None or not student_name:
+            return nullcontext()
+        return self.shared.lock("profile:" + student_key(student_name),
+                                ttl=PROFILE_LOCK_TTL, timeout=PROFILE_LOCK_TIMEOUT)
+
+    def add_fact(self, state: StudentState, fact: str,
+                 source: str = SOURCE_MANUAL) -> Dict[str, int]:
+        """
+        Dodaje fakt do profilu, scalając go z bardzo podobnymi i pilnując limitu faktów.
+
+        Returns:
+            Dict[str, int]: "fact_id" (0 - brak zalogowanego ucznia lub fakt już
+            jest w profilu) i "removed" (liczba faktów usuniętych przy scalaniu)
+        """
+        result = self.add_facts(state.student_name, [fact], source=source)
+        fact_ids = result["fact_ids"]
+        return {"fact_id": fact_ids[0] if fact_ids else 0, "removed": result["removed"]}
+
+    def add_facts(self, student_name: str, facts: List[str],
+                  source: str = SOURCE_MANUAL) -> Dict[str, Any]:
+        """
+        Dodaje fakty do profilu ucznia pod blokadą profilu: pomija fakty już
+        zapisane, dopisuje nowe do indeksu faktów i scala je z istniejącymi.
+
+        Wspólna ścieżka faktów dodanych ręcznie i wydobytych w tle - nie korzysta
+        ze stanu sesji, więc może być wywoływana z wątku roboczego.
+
+        Returns:
+            Dict[str, Any]: "fact_ids" - identyfikatory dodanych faktów, "removed" -
+            liczba faktów usuniętych przy scalaniu
+
+        Raises:
+            LockTimeoutError: Gdy profil jest zapisywany dłużej niż PROFILE_LOCK_TIMEOUT
+        """
+        if not student_name:
+            return {"fact_ids": [], "removed": 0}
+        with self.profile_lock(student_name):
+            known = set(self.store.list_facts(student_name))
+            fact_ids = []
+            for fact in facts:
+                if fact in known:
+                    continue
+                known.add(fact)
+                fact_id = self.store.add_fact(student_name, fact, source=source)
+                self.retriever.add(student_name, fact_id, fact)
+                fact_ids.append(fact_id)
+            # Przyrostowe scalanie: nowe fakty porównywane są tylko z istniejącymi
+            removed = 0
+            if fact_ids:
+                removed = consolidate_student(self.store, student_name,
+                                              self.config.fact_similarity_threshold,
+                                              self.config.max_facts_per_student,
+                                              new_ids=fact_ids)
+        return {"fact_ids": fact_ids, "removed": removed}
+
+    def consolidate_all(self) -> Dict[str, int]:
+        """
+        Porządkuje wszystkie profile (zadanie zbiorcze), każdy pod blokadą profilu
+        ucznia.
+
+        Returns:
+            Dict[str, int]: "students" i "removed" (zob. `consolidate_all`
+            w consolidation.py)
+        """
+        return consolidate_all(self.store, self.config.fact_similarity_threshold,
+                               self.config.max_facts_per_student,
+                               lock=self.profile_lock)
+
+    def delete_student(self, student_name: str) -> bool:
+        """
+        Usuwa profil ucznia, jego historię rozmów, indeks faktów i zapamiętane
+        odpowiedzi - pod blokadą profilu, więc trwające wydobywanie faktów
+        lub scalanie nie odtworzy profilu zaraz po usunięciu.
+
+        Returns:
+            bool: True jeśli profil istniał
+
+        Raises:
+            LockTimeoutError: Gdy profil jest zapisywany dłużej niż PROFILE_LOCK_TIMEOUT
+        """
+        with self.profile_lock(student_name):
+            deleted = self.store.delete_student(student_name)
+            if self.history is not None:
+                self.history.delete_student(student_name)
+            self.retriever.forget(student_name)
+        self.response_cache.forget_student(student_key(student_name))
+        return deleted
+
+    def replace_facts(self, state: StudentState, facts: List[str]) -> None:
+        """
+        Przepisuje cały profil ucznia nową listą faktów (w jednej transakcji).
+        """
+        if state.student_name:
+            with self.profile_lock(state.student_name):
+                self.store.replace_facts(state.student_name, facts)
+
+    def delete_fact_at(self, state: StudentState, index: int) -> bool:
+        """
+        Usuwa fakt o podanej pozycji z profilu ucznia.
+        """
+        if not state.student_name:
+            return False
+        with self.profile_lock(state.student_name):
+            return self.store.delete_fact_at(state.student_name, index)
+
+    # ------------------------------------------------------------------
+    # Liczniki wspólne dla instancji
+    # ------------------------------------------------------------------
+
+    def _count_turn(self, result: Dict[str, Any]) -> None:
+        """
+        Dolicza turę do łącznych liczników stanu współdzielonego.
+
+        Niedostępny magazyn stanu nie przerywa tury - licznik jest wtedy pomijany.
+        """
+        if self.shared is None:
+            return
+        tokens = usage_tokens(result.get("usage"))
+        amounts = {
+            COUNTER_PREFIX + "turns": 1,
+            COUNTER_PREFIX + "errors": 1 if result.get("error") else 0,
+            COUNTER_PREFIX + "cache_hits": (
+                1 if (result.get("metrics") or {}).get("cached") else 0),
+            COUNTER_PREFIX + "prompt_tokens": tokens["prompt_tokens"],
+            COUNTER_PREFIX + "completion_tokens": tokens["completion_tokens"],
+            COUNTER_PREFIX + "cached_tokens": tokens["cached_tokens"],
+            COUNTER_PREFIX + "cost_pln": result["cost_pln"],
+        }
+        try:
+            self.shared.incr_many({key: amount for key, amount in amounts.items()
+                                   if amount})
+        except SharedStateError:
+            pass
+
+    def shared_counters(self) -> Dict[str, float]:
+        """
+        Zwraca łączne liczniki tur wszystkich instancji (SHARED_COUNTERS; puste
+        bez stanu współdzielonego).
+        """
+        if self.shared is None:
+            return {}
+        values = self.shared.counters([COUNTER_PREFIX + name
+                                       for name in SHARED_COUNTERS])
+        return {name: values[COUNTER_PREFIX + name] for name in SHARED_COUNTERS}
+
+    # ------------------------------------------------------------------
+    # Historia rozmowy
+    # ------------------------------------------------------------------
+
+    def restore_conversation(self, state: StudentState) -> None:
+        """
+        Wczytuje do stanu ostatnie wiadomości zapisanej rozmowy ucznia (np. po
+        zalogowaniu).
+
+        Licznik "nie wiem" i podsumowanie zaczynają się od nowa.
+        """
+        state.reset_conversation()
+        if self.history is None or not state.student_name:
+            return
+        limit = self.config.history_window or self.history.count(state.student_name)
+        state.messages = self.history.page(state.student_name, limit=limit)
+        state.history_offset = state.messages[0]["seq"] if state.messages else 0
+
+    def _trim_history(self, state: StudentState) -> None:
+        """
+        Ogranicza `state.messages` do `history_window` ostatnich wiadomości.
+
+        Usuwane wiadomości, których nie objęło jeszcze podsumowanie, są do
+        niego dołączane - kontekst modelu nie traci więc wcześniejszych tur.
+        """
+        excess = len(state.messages) - self.config.history_window
+        if self.config.history_window <= 0 or excess <= 0:
+            return
+        if state.summary_upto < excess:
+            state.conversation_summary = fold_into_summary(
+                state.conversation_summary, state.messages[state.summary_upto:excess],
+                self.config.budget.summary_tokens)
+            state.summary_upto = excess
+        del state.messages[:excess]
+        state.summary_upto -= excess
+        state.history_offset += excess
+
+    # ------------------------------------------------------------------
+    # Logika tury
+    # ------------------------------------------------------------------
+
+    def update_counter(self, state: StudentState, user_prompt: str) -> None:
+        """
+        Aktualizuje licznik "nie wiem": wzrost przy prośbie o pomoc "nie wiem",
+        zerowanie przy wypowiedzi, która nie jest prośbą o pomoc.
+        """
+        intent = self.intents.classify(user_prompt)
+        if intent == INTENT_DONT_KNOW:
+            state.nie_wiem_counter += 1
+        elif intent == INTENT_OTHER:
+            state.nie_wiem_counter = 0
+
+    def turn_cost(self, usage: Any, model: Optional[str] = None) -> float:
+        """
+        Koszt wywołania w złotówkach według cennika użytego modelu (0 bez danych
+        o zużyciu).
+
+        Tokeny wejściowe z cache promptu dostawcy liczone są po stawce cache.
+        """
+        if usage is None:
+            return 0.0
+        prices = self.config.pricing.get(model or self.config.model)
+        return price_usd(prices, usage_tokens(usage)) * self.config.usd_to_pln
+
+    def _prepare(self, state: StudentState, user_prompt: str) -> _PreparedTurn:
+        """
+        Aktualizuje stan tury i buduje wiadomości dla modelu w budżecie tokenów.
+
+        Dopisuje pytanie do historii, aktualizuje licznik "nie wiem" i
+        podsumowanie rozmowy, wybiera fakty i tury mieszczące się w budżecie.
+        """
+        config = self.config
+        budget = config.budget
+        # Fakty z profilu ucznia najbardziej związane z pytaniem i bieżącym tematem
+        relevant_facts = self.select_facts(
+            state, f"{user_prompt} {state.current_topic or ''}")
+        facts = [item["fact"] for item in relevant_facts]
+        counter_before = state.nie_wiem_counter
+        summary_before = state.conversation_summary
+        summary_upto_before = state.summary_upto
+        self.update_counter(state, user_prompt)
+        # Model tury: tani dla pytań prowadzących, mocniejszy dla pełnej lub
+        # złożonej odpowiedzi
+        if self.router is not None:
+            decision = self.router.route_turn(state.nie_wiem_counter, user_prompt)
+        else:
+            decision = RouteDecision(config.model, ROUTE_FIXED)
+
+        history = list(state.messages)
+        state.messages.append({"role": "user", "content": user_prompt})
+
+        # Układ pod cache promptu dostawcy: stała instrukcja, podsumowanie i tury
+        # rozmowy tworzą niezmienny prefiks, a stan tury (licznik, temat, profil)
+        # idzie na koniec
+        static_system = state.chatbot_personality + "\n" + SOCRATIC_INSTRUCTIONS
+        topic = state.current_topic or "Nieokreślony"
+        turn_state = TURN_STATE.format(counter=state.nie_wiem_counter, topic=topic,
+                                       profile="")
+
+        # Dobór faktów i tur w budżecie tokenów (miejsce na podsumowanie jest
+        # zarezerwowane)
+        fixed_tokens = (count_message_tokens({"content": static_system})
+                        + count_message_tokens({"content": turn_state})
+                        + count_message_tokens({"content": SUMMARY_HEADER})
+                        + budget.summary_tokens)
+        user_prompt = truncate_to_tokens(user_prompt,
+                                         max(budget.total - fixed_tokens, 1))
+        summary_upto = min(state.summary_upto, len(history))
+        selection = select_context(fixed_tokens, facts, history, user_prompt, budget,
+                                   min_start=summary_upto)
+
+        # Tury, które wypadły z okna, trafiają do podsumowania rozmowy
+        if selection.window_start > summary_upto:
+            state.conversation_summary = fold_into_summary(
+                state.conversation_summary,
+                history[summary_upto:selection.window_start], budget.summary_tokens)
+            state.summary_upto = selection.window_start
+
+        memory_context = ("\n".join(selection.facts) if selection.facts
+                          else "Brak informacji o uczniu.")
+        messages = [{"role": "system", "content": static_system}]
+        if state.conversation_summary:
+            messages.append({"role": "system",
+                             "content": SUMMARY_HEADER + state.conversation_summary})
+        messages.extend(selection.history)
+        messages.append({"role": "system", "content": TURN_STATE.format(
+            counter=state.nie_wiem_counter, topic=topic, profile=memory_context)})
+        messages.append({"role": "user", "content": user_prompt})
+        context_info = {
+            "input_tokens_est": sum(count_message_tokens(m) for m in messages),
+            "facts": len(selection.facts),
+            "selected_facts": [{"id": item["id"], "score": item["score"]}
+                               for item in relevant_facts[:len(selection.facts)]],
+            "turns": len(selection.history),
+            "summarized_turns": state.summary_upto,
+            "model": decision.model,
+            "route": decision.reason,
+        }
+        # Do podglądu w panelu administracyjnym (diagnostyka doboru faktów)
+        state.last_context = dict(context_info, fact_texts=selection.facts)
+        cache_key = response_cache_key(user_prompt, state.nie_wiem_counter,
+                                       state.current_topic, selection.history,
+                                       state.conversation_summary, selection.facts,
+                                       decision.model, state.chatbot_personality)
+        return _PreparedTurn(messages, context_info, cache_key, time.perf_counter(),
+                             decision.model, decision.reason, counter_before,
+                             summary_before, summary_upto_before)
+
+    def _from_cache(self, state: StudentState, turn: _PreparedTurn, use_cache: bool,
+                    on_token: Optional[Callable[[str], None]]
+                    ) -> Optional[Dict[str, Any]]:
+        """
+        Zwraca odpowiedź z cache (lub None), odnotowując pominięcie cache.
+        """
+        if not use_cache:
+            self.response_cache.record_bypass()
+            return None
+        cached = self.response_cache.get(turn.cache_key)
+        if cached is None:
+            return None
+        if on_token is not None:
+            on_token(cached["content"])
+        latency = time.perf_counter() - turn.start
+        if self.metrics is not None:
+            self.metrics.record(KIND_CHAT, turn.model, latency,
+                                student=state.student_name,
+                                ttft_s=latency, cache_hit=True, route=turn.route)
+        return {
+            "content": cached["content"],
+            "usage": None,
+            "raw": None,
+            "metrics": {"ttft_s": latency, "latency_s": latency, "streamed": False,
+                        "cached": True},
+            "context": turn.context,
+        }
+
+    def _finish(self, state: StudentState, turn: _PreparedTurn,
+                result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Zapisuje turę w historii, dolicza koszt i zapamiętuje odpowiedź w cache.
+
+        Note:
+            Nieudana tura (błąd API, termin) nie trafia do historii ani do
+            zapisanej rozmowy - pytanie jest z niej usuwane, a licznik "nie wiem"
+            i podsumowanie rozmowy wracają do wartości sprzed tury, więc uczeń
+            może je po prostu ponowić.
+        """
+        result["context"] = turn.context
+        usage = result.get("usage")
+        if result.get("metrics") is not None:
+            result["metrics"]["model"] = turn.model
+            result["metrics"]["cached_tokens"] = usage_tokens(usage)["cached_tokens"]
+        if not result.get("error") and not (result.get("metrics") or {}).get("cached"):
+            tokens = getattr(usage, "total_tokens", 0) if usage is not None else 0
+            student = student_key(state.student_name) if state.student_name else ""
+            self.response_cache.put(turn.cache_key, result["content"], tokens=tokens,
+                                    student=student)
+        result["cost_pln"] = self.turn_cost(usage, turn.model)
+        state.cost_total_pln += result["cost_pln"]
+        self._count_turn(result)
+        if result.get("error"):
+            state.messages.pop()
+            state.nie_wiem_counter = turn.counter_before
+            state.conversation_summary = turn.summary_before
+            state.summary_upto = turn.summary_upto_before
+            return result
+        state.messages.append({"role": "assistant", "content": result["content"],
+                               "metrics": result.get("metrics")})
+        if self.history is not None and state.student_name:
+            self.history.append(state.student_name, state.messages[-2:])
+        self._trim_history(state)
+        return result
+
+    def _track(self, state: StudentState, turn: _PreparedTurn):
+        """
+        Zwraca menedżer kontekstu rejestrujący wywołanie czatu (lub atrapę bez
+        rejestru).
+        """
+        if self.metrics is None:
+            return nullcontext({})
+        return self.metrics.track(KIND_CHAT, turn.model, state.student_name,
+                                  route=turn.route)
+
+    @staticmethod
+    def _error_result(error: Exception, deadline: Deadline) -> Dict[str, Any]:
+        if isinstance(error, DeadlineExceededError) or (
+                isinstance(error, (QueueTimeoutError, APITimeoutError))
+                and deadline.expired()):
+            message = ("Sokrates nie zdążył odpowiedzieć na czas - spróbuj ponownie "
+                       "za chwilę.")
+        elif isinstance(error, QueueTimeoutError):
+            message = ("Sokrates ma teraz zbyt wielu uczniów naraz - spróbuj ponownie "
+                       "za chwilę.")
+        elif isinstance(error, RateLimitError):
+            message = "Przekroczono limit zapytań do AI - spróbuj ponownie za chwilę."
+        else:
+            message = f"Błąd podczas komunikacji z AI: {error}"
+        return {"content": "", "usage": None, "raw": None, "metrics": None,
+                "error": message}
+
+    def _estimate_tokens(self, turn: _PreparedTurn) -> int:
+        """
+        Szacowana liczba tokenów tury rezerwowana w limicie TPM (wejście i odpowiedź).
+        """
+        return turn.context["input_tokens_est"] + self.config.reply_tokens_est
+
+    def _hedge_delay(self, limiter: Optional[RateLimiter]) -> Optional[float]:
+        """
+        Próg zapytania zabezpieczającego tury (None - bez zabezpieczenia).
+
+        Gdy w kolejce harmonogramu czekają zapytania, tura nie jest
+        zabezpieczana - druga próba tylko wydłużyłaby kolejkę.
+        """
+        if self.hedger is None or (limiter is not None and limiter.stats()["queued"]):
+            return None
+        return self.hedger.delay()
+
+    def _charge_hedge(self, turn: _PreparedTurn, result: Dict[str, Any],
+                      race: Dict[str, Any]) -> None:
+        """
+        Rozlicza turę w budżecie zapytań zabezpieczających i dopisuje wynik
+        wyścigu do metryk.
+        """
+        result["metrics"].update(race)
+        if self.hedger is not None:
+            # Przegrana próba to identyczne zapytanie - jej koszt szacowany jest
+            # zużyciem zwycięskiej
+            usage = result.get("usage")
+            if usage is not None:
+                tokens = getattr(usage, "total_tokens", 0)
+            else:
+                tokens = self._estimate_tokens(turn)
+            self.hedger.charge(tokens, tokens if race["hedged"] else 0,
+                               race["hedge_won"])
+
+    def reply(self, state: StudentState, user_prompt: str,
+              client: Optional[OpenAI] = None,
+              on_token: Optional[Callable[[str], None]] = None, use_cache: bool = True,
+              limiter: Optional[RateLimiter] = None,
+              on_wait: Optional[Callable[[Dict[str, Any]], None]] = None
+              ) -> Dict[str, Any]:
+        """
+        Wykonuje jedną turę rozmowy (synchronicznie).
+
+        Pytanie i odpowiedź są dopisywane do `state.messages` (i historii
+        rozmów), a koszt do `state.cost_total_pln`.
+
+        Args:
+            state (StudentState): Stan rozmowy ucznia
+            user_prompt (str): Pytanie/wypowiedź ucznia
+            client (OpenAI, optional): Klient (domyślnie klient silnika)
+            on_token (Callable, optional): Jeśli podana, odpowiedź jest
+                strumieniowana, a funkcja otrzymuje kolejne fragmenty tekstu
+            use_cache (bool): False - pomiń cache odpowiedzi i wygeneruj nową
+            limiter (RateLimiter, optional): Harmonogram limitów API (domyślnie
+                harmonogram silnika)
+            on_wait (Callable, optional): Funkcja otrzymująca opis oczekiwania
+                w kolejce harmonogramu ("reason", "position", "wait_s")
+
+        Returns:
+            Dict[str, Any]: "content", "usage", "raw", "metrics" ("ttft_s",
+            "latency_s", "streamed", "model", "cached_tokens" - tokeny z cache
+            promptu dostawcy, opcjonalnie "queued_s" - czas w kolejce
+            harmonogramu, "hedged" i "hedge_won" - zapytanie zabezpieczające -
+            i "cached"), "context", "cost_pln" oraz "error" przy nieudanym
+            wywołaniu (także po terminie tury)
+        """
+        turn = self._prepare(state, user_prompt)
+        cached = self._from_cache(state, turn, use_cache, on_token)
+        if cached is not None:
+            return self._finish(state, turn, cached)
+        client = client or self.client
+        limiter = limiter or self.limiter
+        deadline = Deadline(self.config.deadline_s)
+
+        def call(attempt: Attempt) -> Dict[str, Any]:
+            def send(permit: Permit) -> Dict[str, Any]:
+                attempt.sent()
+                with _deadline_guard(attempt):
+                    if on_token is not None:
+                        result = self._stream(client, turn, attempt, permit)
+                    else:
+                        chat_response = client.chat.completions.create(
+                            model=turn.model, messages=turn.messages, stream=False,
+                            timeout=_request_timeout(attempt))
+                        result = self._complete(chat_response, turn)
+                return _settled(result, permit)
+
+            if limiter is None:
+                return send(Permit(state.student_name))
+            return limiter.run(state.student_name, self._estimate_tokens(turn),
+                               send, attempt.notify, deadline=deadline)
+
+        try:
+            with self._track(state, turn) as call_info:
+                result, race = hedged_call(call, on_token, on_wait, deadline,
+                                           self._hedge_delay(limiter), self.hedger)
+                self._charge_hedge(turn, result, race)
+                call_info["usage"] = result["usage"]
+                call_info["ttft_s"] = result["metrics"]["ttft_s"]
+        except (APIError, QueueTimeoutError, DeadlineExceededError, ValueError,
+                KeyError, AttributeError) as e:
+            result = self._error_result(e, deadline)
+        return self._finish(state, turn, result)
+
+    async def areply(self, state: StudentState, user_prompt: str,
+                     client: Optional[AsyncOpenAI] = None,
+                     on_token: Optional[Callable[[str], None]] = None,
+                     use_cache: bool = True, limiter: Optional[RateLimiter] = None,
+                     on_wait: Optional[Callable[[Dict[str, Any]], None]] = None
+                     ) -> Dict[str, Any]:
+        """
+        Wykonuje jedną turę rozmowy w pętli asyncio (klient `AsyncOpenAI`).
+
+        Argumenty i wynik jak w `reply`. Oczekiwanie na model (i w kolejce
+        harmonogramu) nie blokuje pętli, więc tury wielu uczniów mogą
+        przebiegać równocześnie.
+        """
+        turn = self._prepare(state, user_prompt)
+        cached = self._from_cache(state, turn, use_cache, on_token)
+        if cached is not None:
+            return self._finish(state, turn, cached)
+        client = client or self.async_client
+        limiter = limiter or self.limiter
+        deadline = Deadline(self.config.deadline_s)
+
+        async def call(attempt: Attempt) -> Dict[str, Any]:
+            async def send(permit: Permit) -> Dict[str, Any]:
+                attempt.sent()
+                with _deadline_guard(attempt):
+                    if on_token is not None:
+                        result = await self._astream(client, turn, attempt, permit)
+                    else:
+                        chat_response = await client.chat.completions.create(
+                            model=turn.model, messages=turn.messages, stream=False,
+                            timeout=_request_timeout(attempt))
+                        result = self._complete(chat_response, turn)
+                return _settled(result, permit)
+
+            if limiter is None:
+                return await send(Permit(state.student_name))
+            return await limiter.arun(state.student_name, self._estimate_tokens(turn),
+                                      send, attempt.notify, deadline=deadline)
+
+        try:
+            with self._track(state, turn) as call_info:
+                result, race = await ahedged_call(call, on_token, on_wait, deadline,
+                                                  self._hedge_delay(limiter),
+                                                  self.hedger)
+                self._charge_hedge(turn, result, race)
+                call_info["usage"] = result["usage"]
+                call_info["ttft_s"] = result["metrics"]["ttft_s"]
+        except (APIError, QueueTimeoutError, DeadlineExceededError, ValueError,
+                KeyError, AttributeError) as e:
+            result = self._error_result(e, deadline)
+        return self._finish(state, turn, result)
+
+    @staticmethod
+    def _complete(chat_response: Any, turn: _PreparedTurn) -> Dict[str, Any]:
+        latency = time.perf_counter() - turn.start
+        return {
+            "content": (chat_response.choices[0].message.content
+                        if chat_response.choices else ""),
+            "usage": getattr(chat_response, "usage", None),
+            "raw": chat_response,
+            "metrics": {"ttft_s": latency, "latency_s": latency, "streamed": False},
+        }
+
+    def _stream(self, client: OpenAI, turn: _PreparedTurn, attempt: Attempt,
+                permit: Permit) -> Dict[str, Any]:
+        """
+        Pobiera odpowiedź strumieniowo, przekazując kolejne fragmenty do
+        `attempt.emit`.
+
+        Zużycie tokenów pochodzi z ostatniego fragmentu strumienia
+        (`stream_options={"include_usage": True}`). Po pierwszym fragmencie
+        zapytania nie wolno już ponowić (`permit.retryable`). Strumień jest
+        zamykany, gdy próba przegra wyścig lub minie termin tury.
+        """
+        stream = client.chat.completions.create(
+            model=turn.model, messages=turn.messages, stream=True,
+            stream_options={"include_usage": True}, timeout=_request_timeout(attempt))
+        collector = _StreamCollector(turn.start, attempt.emit, permit)
+        try:
+            for chunk in stream:
+                attempt.check()
+                collector.add(chunk)
+        finally:
+            stream.close()
+        return collector.result()
+
+    async def _astream(self, client: AsyncOpenAI, turn: _PreparedTurn, attempt: Attempt,
+                       permit: Permit) -> Dict[str, Any]:
+        stream = await client.chat.completions.create(
+            model=turn.model, messages=turn.messages, stream=True,
+            stream_options={"include_usage": True}, timeout=_request_timeout(attempt))
+        collector = _StreamCollector(turn.start, attempt.emit, permit)
+        try:
+            async for chunk in stream:
+                attempt.check()
+                collector.add(chunk)
+        finally:
+            await stream.close()
+        return collector.result()
+
+
+def _request_timeout(attempt: Attempt) -> Any:
+    """
+    Limit czasu zapytania HTTP do końca terminu tury (bez terminu - ustawienie
+    klienta).
+    """
+    timeout = attempt.timeout()
+    return NOT_GIVEN if timeout is None else timeout
+
+
+@contextmanager
+def _deadline_guard(attempt: Attempt):
+    """
+    Zamienia przekroczenie limitu czasu zapytania po terminie tury na
+    `DeadlineExceededError` (harmonogram nie ponawia wtedy zapytania).
+    """
+    try:
+        yield
+    except APITimeoutError as e:
+        if attempt.deadline.expired():
+            raise DeadlineExceededError(
+                "Przekroczono czas oczekiwania na odpowiedź AI") from e
+        raise
+
+
+def _settled(result: Dict[str, Any], permit: Permit) -> Dict[str, Any]:
+    """
+    Rozlicza zużycie tokenów z harmonogramem i dopisuje czas oczekiwania
+    w kolejce.
+    """
+    usage = result.get("usage")
+    permit.settle(getattr(usage, "total_tokens", 0) if usage is not None else 0)
+    result["metrics"]["queued_s"] = permit.queued_s
+    return result
+
+
+class _StreamCollector:
+    """
+    Składa fragmenty strumienia w odpowiedź i mierzy czas do pierwszego tokenu.
+    """
+
+    def __init__(self, start: float, on_token: Callable[[str], None],
+                 permit: Permit):
+        self.start = start
+        self.on_token = on_token
+        self.permit = permit
+        self.parts: List[str] = []
+        self.usage = None
+        self.ttft: Optional[float] = None
+
+    def add(self, chunk: Any) -> None:
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self.start
+                self.permit.retryable = False
+            self.parts.append(delta)
+            self.on_token(delta)
+
+    def result(self) -> Dict[str, Any]:
+        latency = time.perf_counter() - self.start
+        return {
+            "content": "".join(self.parts),
+            "usage": self.usage,
+            "raw": None,
+            "metrics": {"ttft_s": self.ttft if self.ttft is not None else latency,
+                        "latency_s": latency, "streamed": True},
+        }
@@ -0,0 +1,100 @@
+"""
+Eksport profili uczniów na żądanie.
+
+Archiwum ZIP wszystkich profili jest zapisywane przyrostowo do pliku na
+dysku (profil po profilu, fakt po fakcie), więc zużycie pamięci nie zależy
+od liczby profili. Gotowe archiwum jest używane ponownie, dopóki żaden
+profil się nie zmieni (licznik zmian z indeksu statystyk magazynu).
+"""
+
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from sokrates.storage import LEGACY_SUFFIX, ProfileStore
+
+
+def write_profiles_zip(store: ProfileStore, fileobj: BinaryIO) -> int:
+    """
+    Zapisuje wszystkie profile jako archiwum ZIP plików JSONL.
+
+    Args:
+        store (ProfileStore): Magazyn profili
+        fileobj (BinaryIO): Plik docelowy otwarty do zapisu binarnego
+
+    Returns:
+        int: Liczba zapisanych profili
+    """
+    count = 0
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for student in store.iter_students():
+            with zipf.open(f"{student['key']}{LEGACY_SUFFIX}", "w") as entry:
+                for fact in store.iter_facts(student["key"]):
+                    line = json.dumps({"fact": fact}, ensure_ascii=False) + "\n"
+                    entry.write(line.encode("utf-8"))
+            count += 1
+    return count
+
+
+class ProfilesArchive:
+    """
+    Archiwum ZIP wszystkich profili budowane tylko na żądanie i zapamiętywane
+    do czasu zmiany dowolnego profilu.
+    """
+
+    def __init__(self, store: ProfileStore, export_dir: Path,
+                 prefix: str = "wszystkie_profile"):
+        """
+        Args:
+            store (ProfileStore): Magazyn profili
+            export_dir (Path): Katalog na gotowe archiwa
+            prefix (str): Początek nazwy pliku archiwum
+        """
+        self.store = store
+        self.export_dir = Path(export_dir)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._path: Optional[Path] = None
+        self._version: Optional[int] = None
+
+    def path(self) -> Path:
+        """
+        Zwraca ścieżkę aktualnego archiwum, budując je jeśli profile się zmieniły.
+
+        Returns:
+            Path: Plik ZIP gotowy do odczytu (każdy czytelnik otwiera go osobno)
+        """
+        with self._lock:
+            version = self.store.stats_summary()["changes"]
+            if (self._version == version and self._path is not None
+                    and self._path.exists()):
+                return self._path
+            self.export_dir.mkdir(parents=True, exist_ok=True)
+            target = self.export_dir / f"{self.prefix}-{version}.zip"
+            with tempfile.NamedTemporaryFile(dir=self.export_dir, suffix=".tmp",
+                                             delete=False) as tmp:
+                try:
+                    write_profiles_zip(self.store, tmp)
+                except BaseException:
+                    tmp.close()
+                    os.unlink(tmp.name)
+                    raise
+            os.replace(tmp.name, target)
+            self._remove_stale(keep=target)
+            self._path, self._version = target, version
+            return target
+
+    def _remove_stale(self, keep: Path) -> None:
+        """
+        Usuwa starsze wersje archiwum (pliki wciąż otwarte są pomijane).
+        """
+        for old in self.export_dir.glob(f"{self.prefix}-*.zip"):
+            if old != keep:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,268 @@
+"""
+Wydobywanie faktów o uczniu z jego wypowiedzi - poza ścieżką odpowiedzi.
+
+Nowe wypowiedzi ucznia są zbierane i wysyłane w partiach (jedno zapytanie
+na kilka tur) do puli wątków w tle. Model zwraca fakty w formacie JSON,
+a wyniki trafiają do kolejki do potwierdzenia lub od razu do profilu.
+Czas odpowiedzi Sokratesa nie zależy więc od uczenia się profilu.
+"""
+
+import json
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from openai import APIError, OpenAI
+
+from sokrates.context import count_tokens
+from sokrates.metrics import KIND_EXTRACT, MetricsStore
+from sokrates.ratelimit import Permit, QueueTimeoutError, RateLimiter
+from sokrates.storage import student_key
+
+EXTRACTION_PROMPT = """\
+Wydobądź z wypowiedzi ucznia fakty o nim, które warto zapamiętać dla procesu nauczania:
+- poziom wiedzy w różnych dziedzinach
+- zainteresowania naukowe
+- sposób uczenia się
+- trudności w nauce
+- postępy w nauce
+- preferowane metody wyjaśniania
+Każdy fakt zapisz krótko i konkretnie. Pomiń informacje niezwiązane z nauką.
+Odpowiedz wyłącznie obiektem JSON w formacie: {"facts": ["fakt 1", "fakt 2"]}.
+Jeśli nie ma żadnych faktów, zwróć {"facts": []}."""
+
+# Szacowana długość odpowiedzi z faktami (rezerwowana w limicie tokenów na minutę)
+EXTRACTION_REPLY_TOKENS = 150
+# Ponowienia partii po błędzie przejściowym (API, kolejka) i opóźnienie pierwszego
+# z nich
+EXTRACTION_MAX_RETRIES = 2
+EXTRACTION_RETRY_DELAY = 2.0
+
+
+def parse_facts(content: Optional[str]) -> List[str]:
+    """
+    Odczytuje listę faktów z odpowiedzi modelu.
+
+    Oczekiwany jest obiekt JSON {"facts": [...]}; gdy odpowiedź nie jest
+    JSON-em, traktowana jest jak lista wypunktowana (jeden fakt na linię).
+    Poprawny JSON bez listy faktów oznacza brak faktów.
+    """
+    if not content:
+        return []
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    else:
+        facts = data.get("facts") if isinstance(data, dict) else data
+        if not isinstance(facts, list):
+            return []
+        return [str(fact).strip() for fact in facts if str(fact).strip()]
+    return [line.strip().lstrip("-•* ").strip() for line in content.split("\n")
+            if line.strip().lstrip("-•* ").strip()]
+
+
+def extract_facts(client: OpenAI, model: str, text: str,
+                  metrics: Optional[MetricsStore] = None, student: str = "",
+                  limiter: Optional[RateLimiter] = None) -> List[str]:
+    """
+    Wydobywa fakty edukacyjne z tekstu jednym zapytaniem (odpowiedź w JSON).
+
+    Args:
+        client (OpenAI): Klient OpenAI
+        model (str): Nazwa modelu
+        text (str): Wypowiedzi ucznia (może to być kilka tur naraz)
+        metrics (MetricsStore, optional): Rejestr, w którym zapisywane jest wywołanie
+        student (str): Uczeń, którego dotyczy wywołanie (do rejestru i kolejki
+            harmonogramu)
+        limiter (RateLimiter, optional): Harmonogram limitów API (brak - zapytanie
+            od razu)
+
+    Returns:
+        List[str]: Lista wykrytych faktów
+    """
+    def call(permit: Permit) -> Any:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": EXTRACTION_PROMPT},
+                {"role": "user", "content": text},
+            ],
+            response_format={"type": "json_object"},
+        )
+        usage = getattr(response, "usage", None)
+        permit.settle(getattr(usage, "total_tokens", 0) if usage is not None else 0)
+        return response
+
+    if metrics is not None:
+        tracker = metrics.track(KIND_EXTRACT, model, student)
+    else:
+        tracker = nullcontext({})
+    with tracker as call_info:
+        if limiter is None:
+            ai_response = call(Permit(student))
+        else:
+            tokens = (count_tokens(EXTRACTION_PROMPT) + count_tokens(text)
+                      + EXTRACTION_REPLY_TOKENS)
+            ai_response = limiter.run(student, tokens, call)
+        call_info["usage"] = getattr(ai_response, "usage", None)
+    if not ai_response.choices:
+        return []
+    return parse_facts(ai_response.choices[0].message.content)
+
+
+class FactExtractionPipeline:
+    """
+    Pula wątków wydobywająca fakty w tle, w partiach, osobno dla każdego ucznia.
+
+    Dla jednego ucznia działa co najwyżej jedno zadanie naraz - tury zgłoszone
+    w trakcie jego pracy są dołączane do kolejnej partii. Partia, której
+    analiza nie powiodła się z powodu błędu przejściowego, jest ponawiana
+    (najwyżej `max_retries` razy, z rosnącym opóźnieniem).
+    """
+
+    def __init__(self, max_workers: int = 2,
+                 on_facts: Optional[Callable[[str, List[str]], None]] = None,
+                 metrics: Optional[MetricsStore] = None,
+                 max_retries: int = EXTRACTION_MAX_RETRIES,
+                 retry_delay: float = EXTRACTION_RETRY_DELAY):
+        """
+        Args:
+            max_workers (int): Liczba wątków w puli
+            on_facts (Callable, optional): Funkcja (uczeń, fakty) wywoływana z wątku
+                roboczego; gdy brak - fakty czekają na odbiór przez `pop_results`
+            metrics (MetricsStore, optional): Rejestr wywołań API
+            max_retries (int): Ponowienia partii po błędzie API lub kolejki
+            retry_delay (float): Opóźnienie pierwszego ponowienia w sekundach
+                (każde kolejne dwa razy dłuższe)
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="sokrates-facts")
+        self._on_facts = on_facts
+        self._metrics = metrics
+        self._max_retries = max_retries
+        self._retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[str]] = {}
+        self._running: Dict[str, bool] = {}
+        self._results: Dict[str, List[str]] = {}
+        self.batches = 0
+        self.turns = 0
+        self.errors = 0
+        self.retries = 0
+        self.dropped_turns = 0
+
+    def submit(self, student: str, turns: List[str], client: OpenAI, model: str,
+               limiter: Optional[RateLimiter] = None) -> None:
+        """
+        Zgłasza nowe wypowiedzi ucznia do analizy w tle (bez czekania na wynik).
+
+        Args:
+            student (str): Imię/nazwa ucznia
+            turns (List[str]): Wypowiedzi od ostatniego znacznika (watermark)
+            client (OpenAI): Klient OpenAI (współdzielony, bezpieczny wątkowo)
+            model (str): Model użyty do analizy
+            limiter (RateLimiter, optional): Harmonogram limitów API klucza - zapytania
+                w tle czekają w tej samej kolejce co odpowiedzi
+        """
+        turns = [turn for turn in turns if turn.strip()]
+        if not turns:
+            return
+        key = student_key(student)
+        with self._lock:
+            self._pending.setdefault(key, []).extend(turns)
+            if self._running.get(key):
+                return
+            self._running[key] = True
+        self._executor.submit(self._run, key, student, client, model, limiter)
+
+    def _run(self, key: str, student: str, client: OpenAI, model: str,
+             limiter: Optional[RateLimiter]) -> None:
+        """
+        Przetwarza zaległe partie ucznia, dopóki kolejka nie będzie pusta.
+
+        Note:
+            Żaden błąd partii nie kończy pracy wątku - inaczej uczeń zostałby
+            oznaczony jako "w toku" i kolejne zgłoszenia nie byłyby przetwarzane.
+        """
+        attempt = 0
+        while True:
+            with self._lock:
+                batch = self._pending.pop(key, [])
+                if not batch:
+                    self._running[key] = False
+                    return
+            try:
+                facts = extract_facts(client, model, "\n".join(batch), self._metrics,
+                                      student, limiter)
+            except (APIError, QueueTimeoutError) as e:
+                attempt = self._retry_or_drop(key, batch, attempt, e)
+                continue
+            except Exception:
+                self._drop(batch)
+                attempt = 0
+                continue
+            attempt = 0
+            with self._lock:
+                self.batches += 1
+                self.turns += len(batch)
+            if not facts:
+                continue
+            if self._on_facts is None:
+                with self._lock:
+                    self._results.setdefault(key, []).extend(facts)
+                continue
+            try:
+                self._on_facts(student, facts)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+
+    def _drop(self, batch: List[str]) -> None:
+        with self._lock:
+            self.errors += 1
+            self.dropped_turns += len(batch)
+
+    def _retry_or_drop(self, key: str, batch: List[str], attempt: int,
+                       error: Exception) -> int:
+        """
+        Zwraca partię na początek kolejki ucznia i czeka przed ponowieniem
+        albo - po `max_retries` próbach - ją porzuca.
+
+        Returns:
+            int: Numer kolejnej próby (0 - partia porzucona)
+        """
+        if attempt >= self._max_retries:
+            self._drop(batch)
+            return 0
+        with self._lock:
+            self.errors += 1
+            self.retries += 1
+            # Tury zgłoszone w międzyczasie trafiają do tej samej partii
+            self._pending[key] = batch + self._pending.get(key, [])
+        time.sleep(self._retry_delay * (2 ** attempt))
+        return attempt + 1
+
+    def pop_results(self, student: str) -> List[str]:
+        """
+        Zwraca i usuwa fakty wydobyte dla ucznia od ostatniego odbioru.
+        """
+        with self._lock:
+            return self._results.pop(student_key(student), [])
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Zwraca liczniki pracy: przetworzone partie i tury, błędy, ponowienia,
+        tury porzucone po błędach i zadania w toku.
+        """
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "turns": self.turns,
+                "errors": self.errors,
+                "retries": self.retries,
+                "dropped_turns": self.dropped_turns,
+                "running": sum(1 for running in self._running.values() if running),
+            }
@@ -0,0 +1,562 @@
+"""
+Terminy wywołań API i zapytania zabezpieczające (hedging) skracające ogon opóźnień.
+
+Pojedyncze wolne zapytanie do API (przeciążony serwer, zerwane połączenie)
+blokowało turę ucznia bez końca, a p99 czasu odpowiedzi było wielokrotnie
+wyższe niż p50. Moduł dostarcza:
+
+- `Deadline` - termin całej tury (kolejka harmonogramu, ponowienia i samo
+  zapytanie); po jego upływie zapytanie jest przerywane, a tura kończy się
+  błędem `DeadlineExceededError`,
+- `HedgeController` - próg wysłania zapytania zabezpieczającego wyliczany
+  z ostatnich czasów odpowiedzi (domyślnie p95) i limit dodatkowego
+  zużycia tokenów przez zapytania zabezpieczające,
+- `hedged_call` / `ahedged_call` - wykonanie zapytania: jeśli pierwsza próba
+  nie odpowie przed progiem, wysyłana jest druga, identyczna. Wygrywa ta,
+  która pierwsza zwróci odpowiedź (przy strumieniowaniu - pierwszy
+  fragment), a przegrana jest anulowana.
+
+Funkcje zwrotne (`on_token`, `on_wait`) są zawsze wywoływane w wątku
+wywołującym `hedged_call` - próby wykonywane w wątkach roboczych przekazują
+zdarzenia przez kolejkę (Streamlit nie pozwala pisać do strony z innych
+wątków).
+
+Example:
+    hedger = HedgeController(HedgePolicy(percentile=95, max_extra_share=0.1))
+    # wywolaj(attempt) woła attempt.sent() tuż przed wysłaniem zapytania do API
+    result, info = hedged_call(wywolaj, deadline=Deadline(60),
+                               hedge_after=hedger.delay(), hedger=hedger)
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from sokrates.metrics import percentile
+
+# Zdarzenia prób przekazywane do koordynatora
+_EVENT_TOKEN = "token"
+_EVENT_WAIT = "wait"
+_EVENT_SENT = "sent"
+_EVENT_DONE = "done"
+_EVENT_ERROR = "error"
+
+
+class DeadlineExceededError(TimeoutError):
+    """
+    Tura nie zakończyła się przed terminem (`Deadline`).
+    """
+
+
+class AttemptCancelled(Exception):
+    """
+    Próba została anulowana, bo wygrała inna (zgłaszany wewnątrz przegranej próby).
+    """
+
+
+class Deadline:
+    """
+    Termin wykonania tury (zegar monotoniczny).
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        """
+        Args:
+            seconds (float, optional): Czas na wykonanie tury (None lub 0 - bez terminu)
+        """
+        self.at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """
+        Zwraca pozostały czas w sekundach (None - bez terminu, 0 - termin minął).
+        """
+        if self.at is None:
+            return None
+        return max(self.at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+    def check(self) -> None:
+        """
+        Raises:
+            DeadlineExceededError: Gdy termin minął
+        """
+        if self.expired():
+            raise DeadlineExceededError("Przekroczono czas oczekiwania na odpowiedź AI")
+
+
+@dataclass
+class HedgePolicy:
+    """
+    Reguły wysyłania zapytań zabezpieczających.
+
+    Attributes:
+        percentile (float): Percentyl ostatnich czasów odpowiedzi, po którym wysyłana
+            jest druga próba (np. 95 - zabezpieczane jest ok. 5% najwolniejszych tur)
+        min_delay_s (float): Najkrótszy próg w sekundach (chroni przed dublowaniem
+            zapytań przy bardzo szybkim API)
+        min_samples (int): Liczba pomiarów potrzebna przed pierwszym zabezpieczeniem
+        window (int): Liczba ostatnich pomiarów, z których liczony jest próg
+        max_extra_share (float): Limit dodatkowych tokenów zapytań zabezpieczających
+            jako część wszystkich tokenów (np. 0.1 - najwyżej 10% więcej)
+    """
+    percentile: float = 95.0
+    min_delay_s: float = 1.0
+    min_samples: int = 20
+    window: int = 200
+    max_extra_share: float = 0.1
+
+
+class HedgeController:
+    """
+    Próg i budżet zapytań zabezpieczających oraz ich statystyki.
+
+    Bezpieczny wątkowo - współdzielony przez wszystkie sesje (tak jak harmonogram
+    klucza).
+    """
+
+    def __init__(self, policy: Optional[HedgePolicy] = None):
+        """
+        Args:
+            policy (HedgePolicy, optional): Reguły (domyślne, jeśli brak)
+        """
+        self.policy = policy or HedgePolicy()
+        self._lock = threading.Lock()
+        self._samples: Deque[float] = deque(maxlen=max(self.policy.window, 1))
+        self.calls = 0
+        self.fired = 0
+        self.hedge_wins = 0
+        self.skipped_budget = 0
+        self.tokens = 0
+        self.extra_tokens = 0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Dodaje pomiar czasu do pierwszej odpowiedzi (fragmentu strumienia lub
+        całej odpowiedzi).
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def _within_budget(self) -> bool:
+        return self.extra_tokens < self.policy.max_extra_share * self.tokens
+
+    def delay(self) -> Optional[float]:
+        """
+        Zwraca próg wysłania zapytania zabezpieczającego w sekundach (None - bez
+        zabezpieczenia: za mało pomiarów lub wyczerpany budżet tokenów).
+        """
+        with self._lock:
+            if (len(self._samples) < self.policy.min_samples
+                    or self.policy.max_extra_share <= 0):
+                return None
+            if not self._within_budget():
+                self.skipped_budget += 1
+                return None
+            threshold = percentile(sorted(self._samples), self.policy.percentile)
+        return max(threshold, self.policy.min_delay_s)
+
+    def fire(self) -> bool:
+        """
+        Rezerwuje wysłanie zapytania zabezpieczającego (False - budżet wyczerpany
+        w międzyczasie).
+        """
+        with self._lock:
+            if not self._within_budget():
+                self.skipped_budget += 1
+                return False
+            self.fired += 1
+            return True
+
+    def charge(self, tokens: int, extra_tokens: int = 0,
+               hedge_won: bool = False) -> None:
+        """
+        Rozlicza zakończoną turę.
+
+        Args:
+            tokens (int): Tokeny zwycięskiej próby
+            extra_tokens (int): Szacowane tokeny przegranej próby (0 - bez
+                zabezpieczenia)
+            hedge_won (bool): Czy wygrało zapytanie zabezpieczające
+        """
+        with self._lock:
+            self.calls += 1
+            self.tokens += tokens + extra_tokens
+            self.extra_tokens += extra_tokens
+            self.hedge_wins += int(hedge_won)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Zwraca liczniki: tury, wysłane zabezpieczenia (odsetek tur), wygrane
+        zabezpieczenia, pominięte z braku budżetu, dodatkowe tokeny (udział)
+        i bieżący próg.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+            return {
+                "calls": self.calls,
+                "fired": self.fired,
+                "fired_rate": self.fired / self.calls if self.calls else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "skipped_budget": self.skipped_budget,
+                "extra_tokens": self.extra_tokens,
+                "extra_share": self.extra_tokens / self.tokens if self.tokens else 0.0,
+                "threshold_s": (max(percentile(samples, self.policy.percentile),
+                                    self.policy.min_delay_s)
+                                if len(samples) >= self.policy.min_samples else None),
+            }
+
+
+class Attempt:
+    """
+    Jedna próba zapytania przekazywana do funkcji wykonującej zapytanie.
+
+    Attributes:
+        index (int): 0 - pierwsza próba, 1 - zapytanie zabezpieczające
+        deadline (Deadline): Termin tury
+        sent_at (float, optional): Chwila wysłania zapytania (time.monotonic(),
+            None - jeszcze w kolejce harmonogramu)
+    """
+
+    def __init__(self, index: int, deadline: Deadline,
+                 on_token: Optional[Callable[[str], None]] = None,
+                 on_wait: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_sent: Optional[Callable[[], None]] = None):
+        self.index = index
+        self.deadline = deadline
+        self.cancelled = threading.Event()
+        self.sent_at: Optional[float] = None
+        self._on_token = on_token
+        self._on_wait = on_wait
+        self._on_sent = on_sent
+
+    def emit(self, text: str) -> None:
+        """
+        Przekazuje fragment odpowiedzi (strumieniowanie).
+        """
+        if self._on_token is not None:
+            self._on_token(text)
+
+    def notify(self, info: Dict[str, Any]) -> None:
+        """
+        Przekazuje opis oczekiwania w kolejce harmonogramu.
+        """
+        if self._on_wait is not None:
+            self._on_wait(info)
+
+    def sent(self) -> None:
+        """
+        Odnotowuje wysłanie zapytania - od tej chwili liczony jest czas odpowiedzi.
+        """
+        self.sent_at = time.monotonic()
+        if self._on_sent is not None:
+            self._on_sent()
+
+    def timeout(self) -> Optional[float]:
+        """
+        Limit czasu pojedynczego zapytania HTTP (pozostały czas tury, None - bez
+        limitu).
+        """
+        remaining = self.deadline.remaining()
+        return None if remaining is None else max(remaining, 0.001)
+
+    def check(self) -> None:
+        """
+        Przerywa próbę, gdy wygrała inna lub minął termin tury.
+
+        Raises:
+            AttemptCancelled: Gdy wygrała inna próba
+            DeadlineExceededError: Gdy minął termin tury
+        """
+        if self.cancelled.is_set():
+            raise AttemptCancelled()
+        self.deadline.check()
+
+
+class _Race:
+    """
+    Stan wyścigu prób (wspólny dla `hedged_call` i `ahedged_call`).
+
+    Czas odpowiedzi i próg zapytania zabezpieczającego liczone są od wysłania
+    pierwszej próby (`Attempt.sent`), a nie od jej wejścia do kolejki
+    harmonogramu - oczekiwanie na limit API nie jest opóźnieniem serwera.
+    """
+
+    def __init__(self, hedger: Optional[HedgeController], hedge_after: Optional[float],
+                 deadline: Deadline):
+        self.hedger = hedger
+        self.deadline = deadline
+        self.start = time.monotonic()
+        self.hedge_after = hedge_after if hedger is not None else None
+        self.hedge_at: Optional[float] = None
+        self.attempts: Dict[int, Attempt] = {}
+        self.winner: Optional[int] = None
+        self.running = 0
+        self.error: Optional[BaseException] = None
+
+    def next_timeout(self) -> Optional[float]:
+        moments = [moment for moment in (self.hedge_at, self.deadline.at)
+                   if moment is not None]
+        return max(min(moments) - time.monotonic(), 0.0) if moments else None
+
+    def sent(self, index: int) -> None:
+        """
+        Ustala próg zapytania zabezpieczającego po wysłaniu pierwszej próby.
+        """
+        attempt = self.attempts[index]
+        if (index == 0 and self.hedge_after is not None and self.winner is None
+                and self.running):
+            self.hedge_at = attempt.sent_at + self.hedge_after
+            self.hedge_after = None
+
+    def hedge_due(self) -> bool:
+        """
+        Sprawdza, czy nadszedł czas zapytania zabezpieczającego (i rezerwuje je
+        w budżecie).
+        """
+        if self.hedge_at is None or time.monotonic() < self.hedge_at:
+            return False
+        self.hedge_at = None
+        return self.winner is None and self.hedger.fire()
+
+    def claim(self, index: int) -> bool:
+        """
+        Ustala zwycięzcę przy pierwszej odpowiedzi; zwraca True dla zwycięskiej próby.
+        """
+        if self.winner is None:
+            self.winner = index
+            attempt = self.attempts.get(index)
+            if self.hedger is not None:
+                sent_at = self.start
+                if attempt is not None and attempt.sent_at is not None:
+                    sent_at = attempt.sent_at
+                self.hedger.observe(time.monotonic() - sent_at)
+        return self.winner == index
+
+    def failed(self, index: int, error: BaseException) -> bool:
+        """
+        Odnotowuje błąd próby; zwraca True, gdy turę trzeba zakończyć tym błędem
+        (błąd zwycięzcy albo brak innej próby w toku).
+        """
+        self.running -= 1
+        if isinstance(error, AttemptCancelled):
+            return False
+        if self.error is None:
+            self.error = error
+        if self.winner == index:
+            return True
+        if self.winner is None and self.running == 0:
+            # Zapytanie zabezpieczające nie zostanie już wysłane po błędzie jedynej
+            # próby
+            self.hedge_at = None
+            return True
+        return False
+
+    def direct(self, on_token: Optional[Callable[[str], None]],
+               on_wait: Optional[Callable[[Dict[str, Any]], None]]) -> Attempt:
+        """
+        Jedyna próba wykonywana w bieżącym wątku (pierwszy fragment kończy pomiar
+        czasu).
+        """
+        def emit(text: str) -> None:
+            self.claim(0)
+            on_token(text)
+
+        attempt = Attempt(0, self.deadline, emit if on_token is not None else None,
+                          on_wait)
+        self.attempts[0] = attempt
+        return attempt
+
+
+def hedged_call(func: Callable[[Attempt], Any],
+                on_token: Optional[Callable[[str], None]] = None,
+                on_wait: Optional[Callable[[Dict[str, Any]], None]] = None,
+                deadline: Optional[Deadline] = None,
+                hedge_after: Optional[float] = None,
+                hedger: Optional[HedgeController] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Wykonuje `func(attempt)` z terminem i opcjonalnym zapytaniem zabezpieczającym.
+
+    Bez progu (`hedge_after` None) zapytanie wykonywane jest w bieżącym
+    wątku. Z progiem pierwsza próba startuje w wątku roboczym, a po
+    `hedge_after` sekundach bez odpowiedzi - druga (o ile pozwala budżet
+    `hedger`). Przegrana próba jest anulowana: `attempt.check()` zgłasza w niej
+    `AttemptCancelled` (strumień zostaje zamknięty przy następnym fragmencie).
+    Zapytania bez strumieniowania nie da się przerwać w trakcie - przegrana
+    kończy się w tle, a jej wynik jest odrzucany.
+
+    Args:
+        func (Callable): Funkcja wykonująca jedną próbę; fragmenty odpowiedzi
+            przekazuje przez `attempt.emit`, oczekiwanie przez `attempt.notify`,
+            a wysłanie zapytania (po kolejce harmonogramu) zgłasza przez
+            `attempt.sent()` - dopiero od niego liczony jest próg zabezpieczenia
+        on_token (Callable, optional): Funkcja otrzymująca fragmenty zwycięskiej
+            próby
+        on_wait (Callable, optional): Funkcja otrzymująca opis oczekiwania
+            pierwszej próby
+        deadline (Deadline, optional): Termin tury (brak - bez terminu)
+        hedge_after (float, optional): Próg zapytania zabezpieczającego w sekundach
+        hedger (HedgeController, optional): Budżet i statystyki zabezpieczeń
+
+    Returns:
+        Tuple[Any, Dict[str, Any]]: Wynik zwycięskiej próby i opis wyścigu
+        ("hedged", "hedge_won")
+
+    Raises:
+        DeadlineExceededError: Gdy żadna próba nie odpowiedziała przed terminem
+    """
+    deadline = deadline or Deadline()
+    race = _Race(hedger, hedge_after, deadline)
+    if race.hedge_after is None:
+        result = func(race.direct(on_token, on_wait))
+        race.claim(0)
+        return result, {"hedged": False, "hedge_won": False}
+
+    events: "queue.Queue[Tuple[int, str, Any]]" = queue.Queue()
+    attempts: List[Attempt] = []
+
+    def launch(index: int) -> None:
+        on_wait_event = ((lambda info: events.put((index, _EVENT_WAIT, info)))
+                         if index == 0 else None)
+        attempt = Attempt(index, deadline,
+                          lambda text: events.put((index, _EVENT_TOKEN, text)),
+                          on_wait_event,
+                          lambda: events.put((index, _EVENT_SENT, None)))
+        attempts.append(attempt)
+        race.attempts[index] = attempt
+        race.running += 1
+
+        def run() -> None:
+            try:
+                events.put((index, _EVENT_DONE, func(attempt)))
+            except Exception as e:
+                events.put((index, _EVENT_ERROR, e))
+
+        threading.Thread(target=run, name=f"sokrates-attempt-{index}",
+                         daemon=True).start()
+
+    def cancel_others(winner: int) -> None:
+        for attempt in attempts:
+            if attempt.index != winner:
+                attempt.cancelled.set()
+
+    launch(0)
+    while True:
+        try:
+            index, kind, payload = events.get(timeout=race.next_timeout())
+        except queue.Empty:
+            if race.hedge_due():
+                launch(1)
+            elif deadline.expired():
+                cancel_others(-1)
+                raise DeadlineExceededError(
+                    "Przekroczono czas oczekiwania na odpowiedź AI")
+            continue
+        if kind == _EVENT_SENT:
+            race.sent(index)
+        elif kind == _EVENT_WAIT:
+            if on_wait is not None and race.winner is None:
+                on_wait(payload)
+        elif kind == _EVENT_TOKEN:
+            if race.claim(index):
+                cancel_others(index)
+                if on_token is not None:
+                    on_token(payload)
+        elif kind == _EVENT_DONE:
+            race.running -= 1
+            if race.claim(index):
+                cancel_others(index)
+                return payload, {"hedged": len(attempts) > 1, "hedge_won": index == 1}
+        elif race.failed(index, payload):
+            cancel_others(-1)
+            raise payload
+
+
+async def ahedged_call(func: Callable[[Attempt], Awaitable[Any]],
+                       on_token: Optional[Callable[[str], None]] = None,
+                       on_wait: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       deadline: Optional[Deadline] = None,
+                       hedge_after: Optional[float] = None,
+                       hedger: Optional[HedgeController] = None
+                       ) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Odpowiednik `hedged_call` dla pętli asyncio.
+
+    Próby są zadaniami asyncio, więc przegraną (i próbę po terminie) można
+    anulować w każdej chwili, także bez strumieniowania.
+    """
+    deadline = deadline or Deadline()
+    race = _Race(hedger, hedge_after, deadline)
+    if race.hedge_after is None:
+        try:
+            result = await asyncio.wait_for(func(race.direct(on_token, on_wait)),
+                                            timeout=deadline.remaining())
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceededError(
+                "Przekroczono czas oczekiwania na odpowiedź AI") from e
+        race.claim(0)
+        return result, {"hedged": False, "hedge_won": False}
+
+    events: "asyncio.Queue[Tuple[int, str, Any]]" = asyncio.Queue()
+    tasks: Dict[int, "asyncio.Task[Any]"] = {}
+
+    def launch(index: int) -> None:
+        on_wait_event = ((lambda info: events.put_nowait((index, _EVENT_WAIT, info)))
+                         if index == 0 else None)
+        attempt = Attempt(index, deadline,
+                          lambda text: events.put_nowait((index, _EVENT_TOKEN, text)),
+                          on_wait_event,
+                          lambda: events.put_nowait((index, _EVENT_SENT, None)))
+        race.attempts[index] = attempt
+        race.running += 1
+
+        async def run() -> None:
+            try:
+                events.put_nowait((index, _EVENT_DONE, await func(attempt)))
+            except Exception as e:
+                events.put_nowait((index, _EVENT_ERROR, e))
+
+        tasks[index] = asyncio.ensure_future(run())
+
+    def cancel_others(winner: int) -> None:
+        for index, task in tasks.items():
+            if index != winner:
+                task.cancel()
+
+    launch(0)
+    try:
+        while True:
+            try:
+                index, kind, payload = await asyncio.wait_for(
+                    events.get(), timeout=race.next_timeout())
+            except asyncio.TimeoutError:
+                if race.hedge_due():
+                    launch(1)
+                elif deadline.expired():
+                    raise DeadlineExceededError(
+                        "Przekroczono czas oczekiwania na odpowiedź AI")
+                continue
+            if kind == _EVENT_SENT:
+                race.sent(index)
+            elif kind == _EVENT_WAIT:
+                if on_wait is not None and race.winner is None:
+                    on_wait(payload)
+            elif kind == _EVENT_TOKEN:
+                if race.claim(index):
+                    cancel_others(index)
+                    if on_token is not None:
+                        on_token(payload)
+            elif kind == _EVENT_DONE:
+                race.running -= 1
+                if race.claim(index):
+                    return payload, {"hedged": len(tasks) > 1, "hedge_won": index == 1}
+            elif race.failed(index, payload):
+                raise payload
+    finally:
+        winner = race.winner if race.winner is not None else -1
+        cancel_others(winner)
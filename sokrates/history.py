@@ -0,0 +1,181 @@
+"""
+Trwała historia rozmów uczniów (SQLite, tylko dopisywanie).
+
+Każda wiadomość rozmowy - pytanie ucznia i odpowiedź Sokratesa - zapisywana
+jest jako osobny wiersz z kolejnym numerem (`seq`) w rozmowie ucznia, w
+pliku obok profili (np. `db/conversations.db`). Wiadomości nie są nigdy
+zmieniane (wyzwalacz odrzuca UPDATE); usuwana jest tylko cała historia
+ucznia razem z jego profilem (RODO).
+
+Sesja trzyma w pamięci tylko ostatnie tury, a starsze wiadomości
+odczytywane są stronami (`page`) na indeksie (student, seq) - koszt
+odczytu nie zależy od długości rozmowy.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from sokrates.storage import student_key
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    metrics TEXT,
+    UNIQUE (student, seq)
+);
+CREATE TRIGGER IF NOT EXISTS messages_no_update BEFORE UPDATE ON messages
+BEGIN
+    SELECT RAISE(ABORT, 'messages is append-only');
+END;
+"""
+
+
+def _row_to_message(row: sqlite3.Row) -> Dict[str, Any]:
+    message: Dict[str, Any] = {"role": row["role"], "content": row["content"],
+                               "seq": row["seq"]}
+    if row["metrics"]:
+        message["metrics"] = json.loads(row["metrics"])
+    return message
+
+
+class ConversationStore:
+    """
+    Historia rozmów w SQLite (tryb WAL, połączenie na wątek).
+
+    Bezpieczna wątkowo - dopisują do niej wszystkie sesje procesu.
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        Args:
+            db_path (Path): Ścieżka do pliku bazy historii rozmów
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Zwraca połączenie bieżącego wątku (tworzone przy pierwszym użyciu).
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30.0,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Otwiera transakcję zapisu (BEGIN IMMEDIATE) - zatwierdzaną lub wycofywaną
+        w całości.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """
+        Zamyka połączenie bieżącego wątku.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def append(self, student_name: str, messages: List[Dict[str, Any]]) -> int:
+        """
+        Dopisuje wiadomości na koniec rozmowy ucznia (w jednej transakcji).
+
+        Args:
+            student_name (str): Uczeń
+            messages (List[Dict]): Wiadomości ("role", "content", opcjonalnie "metrics")
+
+        Returns:
+            int: Liczba wiadomości w rozmowie ucznia po zapisie
+        """
+        key = student_key(student_name)
+        now = time.time()
+        with self._transaction() as conn:
+            seq = self._count(conn, key)
+            for message in messages:
+                metrics = message.get("metrics")
+                conn.execute(
+                    "INSERT INTO messages (student, seq, ts, role, content, metrics) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, seq, now, message["role"], message.get("content") or "",
+                     json.dumps(metrics) if metrics else None))
+                seq += 1
+        return seq
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT MAX(seq) FROM messages WHERE student = ?",
+                           (key,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def count(self, student_name: str) -> int:
+        """
+        Zwraca liczbę wiadomości w rozmowie ucznia.
+        """
+        return self._count(self._connection(), student_key(student_name))
+
+    def page(self, student_name: str, before: Optional[int] = None,
+             limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Zwraca do `limit` wiadomości poprzedzających pozycję `before` (od najstarszej).
+
+        Args:
+            student_name (str): Uczeń
+            before (int, optional): Numer wiadomości (`seq`), przed którą kończy się
+                strona (None - koniec rozmowy)
+            limit (int): Maksymalna liczba wiadomości
+
+        Returns:
+            List[Dict[str, Any]]: Wiadomości ("role", "content", "seq",
+            opcjonalnie "metrics")
+        """
+        if limit <= 0:
+            return []
+        key = student_key(student_name)
+        if before is None:
+            rows = self._connection().execute(
+                "SELECT seq, role, content, metrics FROM messages WHERE student = ? "
+                "ORDER BY seq DESC LIMIT ?", (key, limit)).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT seq, role, content, metrics FROM messages "
+                "WHERE student = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?", (key, before, limit)).fetchall()
+        return [_row_to_message(row) for row in reversed(rows)]
+
+    def delete_student(self, student_name: str) -> int:
+        """
+        Usuwa całą historię rozmów ucznia (np. razem z profilem).
+
+        Returns:
+            int: Liczba usuniętych wiadomości
+        """
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM messages WHERE student = ?",
+                                (student_key(student_name),)).rowcount
@@ -0,0 +1,172 @@
+"""
+Rozpoznawanie intencji ucznia sterujących licznikiem "nie wiem".
+
+Każda wypowiedź ucznia sprawdzana jest pod kątem dwóch intencji:
+
+- "nie wiem" - uczeń nie zna odpowiedzi (licznik rośnie, Sokrates stopniowo
+  przechodzi od pytań prowadzących do pełnej odpowiedzi),
+- prośba o pomoc - uczeń prosi o pytanie, wskazówkę lub wyjaśnienie
+  (licznik nie jest zerowany).
+
+Frazy słownika zapisuje się zwykłym tekstem, z polskimi znakami lub bez -
+i tak dopasowują wypowiedź pisaną z polskimi znakami lub bez nich ("pojecia"
+i "pojęcia"). Słowa frazy mogą być w wypowiedzi sklejone lub rozdzielone
+myślnikiem ("niewiem", "nie-wiem"). Końcówki odmiany podaje się w nawiasie
+("wiem(|y)" - "wiem" i "wiemy", "potrafi(e|my)"), a kropka na końcu frazy
+wymaga, by fraza kończyła zdanie ("nie rozumiem." - "Nie rozumiem!", ale nie
+"nie rozumiem czemu, ale to tlen"). Gwiazdka na końcu słowa dopuszcza
+dowolną końcówkę, ale po krótkim rdzeniu łapie też inne słowa ("znam*" -
+"znamienny"), więc domyślny słownik jej nie używa.
+
+Wszystkie frazy intencji kompilowane są do jednego wyrażenia regularnego,
+w którym frazy o wspólnym początku dzielą gałąź ("nie" w "nie wiem" i "nie
+mam pojęcia" sprawdzane jest raz), a litery bez znaków diakrytycznych są
+klasami znaków ("[eę]"). Sprawdzenie wypowiedzi to więc `lower()` i jedno
+przeszukanie - bez przepisywania tekstu znak po znaku.
+
+Example:
+    matcher = IntentMatcher()
+    matcher.classify("Nie mam pojecia...")  # INTENT_DONT_KNOW
+    matcher.classify("Pomóż mi, proszę")    # INTENT_HELP
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, Optional, Pattern, Tuple
+
+# Intencje wypowiedzi ucznia (wynik IntentMatcher.classify)
+INTENT_DONT_KNOW = "dont_know"
+INTENT_HELP = "help"
+INTENT_OTHER = "other"
+
+# Frazy zwiększające licznik "nie wiem"
+DEFAULT_DONT_KNOW_PHRASES = (
+    "nie wiem(|y)", "nie wiedzial(|a|em|am|es|as|y|ysmy)", "nie wiedziel(i|ismy)",
+    "nw", "nwm", "nie mam(|y) pojecia", "bez pojecia", "pojecia nie mam(|y)",
+    "nie mam(|y) zielonego", "zielonego pojecia", "nie mam(|y) pomyslu", "brak pomyslu",
+    "nie znam(|y)", "nie umiem(|y)", "nie potrafi(e|my)",
+    "nie rozumiem.", "nie rozumiem pytania", "nic nie rozumiem", "nie kumam(|y)",
+)
+# Frazy prośby o pomoc - licznik "nie wiem" nie jest przy nich zerowany
+DEFAULT_HELP_PHRASES = (
+    "pytani(e|a|em|u|ach|ami)", "pytan", "pomoc(|y)", "pomoz(|esz|ecie)",
+    "pomog(e|lbys|labys)", "wyjasni(j|jcie|sz|c|enie|enia)", "podpowiedz(|i|cie)",
+    "podpowie(sz|cie)", "wskazow(ka|ke|ki|ek)", "help",
+)
+
+# Litery z polskimi znakami diakrytycznymi odpowiadające literom bez nich
+_POLISH_VARIANTS = {"a": "ą", "c": "ć", "e": "ę", "l": "ł", "n": "ń", "o": "ó",
+                    "s": "ś", "z": "źż"}
+_WORD_GAP = r"[\s\-]*"
+# Słowo frazy: rdzeń i opcjonalnie "*" albo końcówki w nawiasie ("wiem(|y)")
+_PHRASE_WORD = re.compile(r"(\w+)(\*|\(([\w|]*)\))?")
+# Koniec zdania po frazie zakończonej kropką (znak kończący zdanie lub koniec tekstu)
+_SENTENCE_END = r"(?=\s*(?:[.!?]|$))"
+
+
+def fold_text(text: str) -> str:
+    """
+    Sprowadza tekst do małych liter bez diakrytyków (interpunkcja pozostaje).
+    """
+    text = unicodedata.normalize("NFKD", text.lower().replace("ł", "l"))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _letter_pattern(letter: str) -> str:
+    variants = _POLISH_VARIANTS.get(letter)
+    return f"[{letter}{variants}]" if variants else re.escape(letter)
+
+
+def _letters_pattern(text: str) -> str:
+    return "".join(_letter_pattern(letter) for letter in text)
+
+
+def _phrase_words(phrase: str) -> Tuple[str, ...]:
+    """
+    Zamienia frazę słownika na wyrażenia regularne kolejnych słów.
+
+    Fraza zakończona kropką dostaje na końcu warunek końca zdania.
+    """
+    words = []
+    for stem, marker, endings in _PHRASE_WORD.findall(fold_text(phrase)):
+        suffix = ""
+        if marker == "*":
+            suffix = r"\w*"
+        elif marker:
+            options = endings.split("|")
+            alternatives = "|".join(_letters_pattern(ending)
+                                    for ending in options if ending)
+            if alternatives:
+                suffix = f"(?:{alternatives})" + ("?" if "" in options else "")
+        words.append(_letters_pattern(stem) + suffix)
+    if words and phrase.rstrip().endswith("."):
+        words.append(_SENTENCE_END)
+    return tuple(words)
+
+
+def _trie_pattern(trie: Dict[str, Any]) -> str:
+    """
+    Składa drzewo słów fraz w wyrażenie regularne ze wspólnymi początkami.
+    """
+    branches = []
+    for word in sorted(key for key in trie if key):
+        child = trie[word]
+        if len(child) == 1 and "" in child:
+            branches.append(word)
+            continue
+        rest = "(?:" + _trie_pattern(child) + ")"
+        branches.append(word + _WORD_GAP + (rest + "?" if "" in child else rest))
+    return "|".join(branches)
+
+
+def compile_phrases(phrases: Iterable[str]) -> Optional[Pattern[str]]:
+    """
+    Łączy frazy słownika w jedno wyrażenie regularne (None - brak fraz).
+
+    Frazy o wspólnym początku ("nie wiem", "nie mam pojęcia") dzielą jedną
+    gałąź wyrażenia - wspólne słowa są sprawdzane raz.
+    """
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        words = _phrase_words(phrase)
+        if not words:
+            continue
+        node = trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node[""] = {}
+    if not trie:
+        return None
+    return re.compile(r"\b(?:" + _trie_pattern(trie) + r")\b")
+
+
+class IntentMatcher:
+    """
+    Skompilowany słownik intencji ucznia (bezpieczny wątkowo - tylko odczyt).
+    """
+
+    def __init__(self, dont_know_phrases: Iterable[str] = DEFAULT_DONT_KNOW_PHRASES,
+                 help_phrases: Iterable[str] = DEFAULT_HELP_PHRASES):
+        """
+        Args:
+            dont_know_phrases (Iterable[str]): Frazy intencji "nie wiem"
+            help_phrases (Iterable[str]): Frazy prośby o pomoc
+        """
+        self.dont_know_phrases: Tuple[str, ...] = tuple(dont_know_phrases)
+        self.help_phrases: Tuple[str, ...] = tuple(help_phrases)
+        self._dont_know = compile_phrases(self.dont_know_phrases)
+        self._help = compile_phrases(self.help_phrases)
+
+    def classify(self, text: str) -> str:
+        """
+        Zwraca intencję wypowiedzi: INTENT_DONT_KNOW, INTENT_HELP lub INTENT_OTHER.
+
+        Note:
+            Wypowiedź zawierająca obie intencje ("nie wiem, pomóż") to "nie wiem".
+        """
+        text = text.lower()
+        if self._dont_know is not None and self._dont_know.search(text):
+            return INTENT_DONT_KNOW
+        if self._help is not None and self._help.search(text):
+            return INTENT_HELP
+        return INTENT_OTHER
@@ -0,0 +1,339 @@
+"""
+Trwały rejestr wywołań OpenAI (czas, tokeny, koszt) z raportami percentyli.
+
+Każde wywołanie - odpowiedź Sokratesa, weryfikacja klucza, wydobywanie
+faktów - zapisywane jest jako osobny wiersz w pliku SQLite (np.
+`db/metrics.db`). Tabela jest tylko do dopisywania: wyzwalacze odrzucają
+zmianę i usunięcie wierszy. Raporty (p50/p95/p99 czasu odpowiedzi, tokeny
+na turę, koszt na ucznia i dzień) liczone są zapytaniami na indeksach.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from sokrates.storage import student_key
+
+KIND_CHAT = "chat"
+KIND_VERIFY = "verify"
+KIND_EXTRACT = "extract"
+KINDS = (KIND_CHAT, KIND_VERIFY, KIND_EXTRACT)
+
+PERCENTILES = (50, 95, 99)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    student TEXT NOT NULL DEFAULT '',
+    latency_s REAL NOT NULL,
+    ttft_s REAL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    cached_tokens INTEGER NOT NULL DEFAULT 0,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    cost_pln REAL NOT NULL DEFAULT 0,
+    route TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_kind_ts ON calls (kind, ts);
+CREATE INDEX IF NOT EXISTS idx_calls_day_student ON calls (day, student);
+CREATE TRIGGER IF NOT EXISTS calls_no_update BEFORE UPDATE ON calls
+BEGIN
+    SELECT RAISE(ABORT, 'calls is append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS calls_no_delete BEFORE DELETE ON calls
+BEGIN
+    SELECT RAISE(ABORT, 'calls is append-only');
+END;
+"""
+
+
+def usage_tokens(usage: Any) -> Dict[str, int]:
+    """
+    Odczytuje liczby tokenów z obiektu `usage` odpowiedzi OpenAI (lub słownika).
+
+    Returns:
+        Dict[str, int]: "prompt_tokens", "completion_tokens", "cached_tokens"
+    """
+    def read(obj: Any, name: str) -> Any:
+        return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    details = read(usage, "prompt_tokens_details")
+    return {
+        "prompt_tokens": int(read(usage, "prompt_tokens") or 0),
+        "completion_tokens": int(read(usage, "completion_tokens") or 0),
+        "cached_tokens": int((read(details, "cached_tokens")
+                              if details is not None else 0) or 0),
+    }
+
+
+def price_usd(prices: Optional[Dict[str, float]], tokens: Dict[str, int]) -> float:
+    """
+    Koszt wywołania w USD według cennika modelu.
+
+    Tokeny wejściowe z cache promptu dostawcy ("cached_tokens") liczone są
+    po stawce "cached_input_tokens" (gdy cennik jej nie podaje - po zwykłej).
+
+    Args:
+        prices (Dict, optional): "input_tokens", "output_tokens", opcjonalnie
+            "cached_input_tokens" (USD za token); brak cennika - koszt 0
+        tokens (Dict[str, int]): Wynik `usage_tokens`
+    """
+    if not prices:
+        return 0.0
+    cached = min(tokens.get("cached_tokens", 0), tokens["prompt_tokens"])
+    return ((tokens["prompt_tokens"] - cached) * prices["input_tokens"]
+            + cached * prices.get("cached_input_tokens", prices["input_tokens"])
+            + tokens["completion_tokens"] * prices["output_tokens"])
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """
+    Percentyl metodą najbliższej rangi z listy posortowanej rosnąco (None - pusta
+    lista).
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class MetricsStore:
+    """
+    Rejestr wywołań API w SQLite (tryb WAL, połączenie na wątek).
+
+    Bezpieczny wątkowo - zapisują do niego zarówno sesje, jak i wątki
+    wydobywające fakty w tle.
+    """
+
+    def __init__(self, db_path: Path,
+                 pricing: Optional[Dict[str, Dict[str, float]]] = None,
+                 usd_to_pln: float = 1.0):
+        """
+        Args:
+            db_path (Path): Ścieżka do pliku bazy metryk
+            pricing (Dict, optional): Cennik modeli (USD za token: "input_tokens",
+                "output_tokens", opcjonalnie "cached_input_tokens"); modele spoza
+                cennika mają koszt 0
+            usd_to_pln (float): Kurs przeliczenia kosztu na złotówki
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pricing = pricing or {}
+        self.usd_to_pln = usd_to_pln
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        # Rejestry sprzed wyboru modelu nie mają kolumny z powodem wyboru
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(calls)")}
+        if "route" not in columns:
+            conn.execute("ALTER TABLE calls ADD COLUMN route TEXT")
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Zwraca połączenie bieżącego wątku (tworzone przy pierwszym użyciu).
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30.0,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def cost_pln(self, model: str, prompt_tokens: int, completion_tokens: int,
+                 cached_tokens: int = 0) -> float:
+        """
+        Koszt wywołania w złotówkach według cennika modelu (tokeny z cache
+        promptu po stawce cache).
+        """
+        tokens = {"prompt_tokens": prompt_tokens,
+                  "completion_tokens": completion_tokens,
+                  "cached_tokens": cached_tokens}
+        return price_usd(self.pricing.get(model), tokens) * self.usd_to_pln
+
+    def record(self, kind: str, model: str, latency_s: float, usage: Any = None,
+               student: str = "", ttft_s: Optional[float] = None,
+               cache_hit: bool = False,
+               error: Optional[str] = None, route: Optional[str] = None) -> None:
+        """
+        Dopisuje jedno wywołanie do rejestru.
+
+        Args:
+            kind (str): Rodzaj wywołania (KIND_CHAT, KIND_VERIFY, KIND_EXTRACT)
+            model (str): Model
+            latency_s (float): Całkowity czas wywołania w sekundach
+            usage (Any, optional): Obiekt `usage` odpowiedzi (lub słownik z tokenami)
+            student (str): Uczeń, którego dotyczy wywołanie
+            ttft_s (float, optional): Czas do pierwszego tokenu (strumieniowanie)
+            cache_hit (bool): Odpowiedź z cache - bez zapytania do API
+            error (str, optional): Nazwa błędu, jeśli wywołanie się nie powiodło
+            route (str, optional): Powód wyboru modelu (zob. sokrates.routing)
+        """
+        tokens = usage_tokens(usage)
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO calls (ts, day, kind, model, student, latency_s, ttft_s, "
+            "prompt_tokens, completion_tokens, cached_tokens, cache_hit, error, "
+            "cost_pln, route) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (now, time.strftime("%Y-%m-%d", time.localtime(now)), kind, model,
+             student_key(student) if student else "", latency_s, ttft_s,
+             tokens["prompt_tokens"], tokens["completion_tokens"],
+             tokens["cached_tokens"], int(cache_hit), error,
+             self.cost_pln(model, tokens["prompt_tokens"], tokens["completion_tokens"],
+                           tokens["cached_tokens"]),
+             route),
+        )
+
+    @contextmanager
+    def track(self, kind: str, model: str, student: str = "",
+              route: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Mierzy i zapisuje wywołanie wykonane w bloku `with`.
+
+        Blok może uzupełnić zwrócony słownik kluczami "usage", "ttft_s" i
+        "cache_hit". Wyjątek zapisywany jest jako błąd (nazwa klasy) i
+        przekazywany dalej.
+
+        Example:
+            with metrics.track(KIND_VERIFY, MODEL) as call:
+                call["usage"] = client.chat.completions.create(...).usage
+        """
+        call: Dict[str, Any] = {}
+        start = time.perf_counter()
+        try:
+            yield call
+        except BaseException as e:
+            self.record(kind, model, time.perf_counter() - start,
+                        usage=call.get("usage"), student=student,
+                        ttft_s=call.get("ttft_s"), error=type(e).__name__,
+                        route=route)
+            raise
+        self.record(kind, model, time.perf_counter() - start, usage=call.get("usage"),
+                    student=student, ttft_s=call.get("ttft_s"),
+                    cache_hit=call.get("cache_hit", False), error=call.get("error"),
+                    route=route)
+
+    # ------------------------------------------------------------------
+    # Raporty
+    # ------------------------------------------------------------------
+
+    def latency_summary(self, since: float) -> List[Dict[str, Any]]:
+        """
+        Percentyle czasu wywołań API od chwili `since`, osobno dla każdego rodzaju.
+
+        Percentyle liczone są z udanych zapytań do API (bez trafień cache).
+
+        Returns:
+            List[Dict[str, Any]]: Dla każdego rodzaju: "kind", "calls", "errors",
+            "cache_hits" oraz "p50_ms", "p95_ms", "p99_ms"
+        """
+        conn = self._connection()
+        summary = []
+        for kind in KINDS:
+            row = conn.execute(
+                "SELECT COUNT(*), COUNT(error), COALESCE(SUM(cache_hit), 0) FROM calls "
+                "WHERE kind = ? AND ts >= ?", (kind, since)).fetchone()
+            if not row[0]:
+                continue
+            latencies = [r[0] for r in conn.execute(
+                "SELECT latency_s FROM calls WHERE kind = ? AND ts >= ? "
+                "AND error IS NULL AND cache_hit = 0 ORDER BY latency_s",
+                (kind, since))]
+            item: Dict[str, Any] = {"kind": kind, "calls": row[0], "errors": row[1],
+                                    "cache_hits": row[2]}
+            for q in PERCENTILES:
+                value = percentile(latencies, q)
+                item[f"p{q}_ms"] = round(value * 1000) if value is not None else None
+            summary.append(item)
+        return summary
+
+    def tokens_per_turn(self, since: float) -> Dict[str, Any]:
+        """
+        Tokeny na turę rozmowy (zapytania czatu do API) od chwili `since`.
+
+        Returns:
+            Dict[str, Any]: "turns", "avg_prompt", "avg_completion", "p95_total",
+            "cached_share" (część tokenów wejściowych z cache promptu OpenAI) i
+            "cache_hit_rate" (część tur, w których dostawca użył cache promptu)
+        """
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT COUNT(*), AVG(prompt_tokens), AVG(completion_tokens), "
+            "SUM(prompt_tokens), SUM(cached_tokens), SUM(cached_tokens > 0) FROM calls "
+            "WHERE kind = ? AND ts >= ? AND error IS NULL AND cache_hit = 0",
+            (KIND_CHAT, since)).fetchone()
+        totals = [r[0] for r in conn.execute(
+            "SELECT prompt_tokens + completion_tokens FROM calls "
+            "WHERE kind = ? AND ts >= ? AND error IS NULL AND cache_hit = 0 "
+            "ORDER BY 1", (KIND_CHAT, since))]
+        return {
+            "turns": row[0],
+            "avg_prompt": round(row[1] or 0),
+            "avg_completion": round(row[2] or 0),
+            "p95_total": percentile(totals, 95),
+            "cached_share": (row[4] or 0) / row[3] if row[3] else 0.0,
+            "cache_hit_rate": (row[5] or 0) / row[0] if row[0] else 0.0,
+        }
+
+    def routing_summary(self, since: float) -> List[Dict[str, Any]]:
+        """
+        Tury rozmowy według modelu i powodu jego wyboru od chwili `since`.
+
+        Returns:
+            List[Dict[str, Any]]: "model", "route", "calls", "p50_ms", "avg_tokens",
+            "cost_pln" (malejąco według liczby wywołań)
+        """
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT model, COALESCE(route, '') AS route, COUNT(*) AS calls, "
+            "AVG(prompt_tokens + completion_tokens) AS avg_tokens, "
+            "SUM(cost_pln) AS cost_pln FROM calls "
+            "WHERE kind = ? AND ts >= ? AND error IS NULL AND cache_hit = 0 "
+            "GROUP BY model, route ORDER BY calls DESC", (KIND_CHAT, since)).fetchall()
+        summary = []
+        for row in rows:
+            latencies = [r[0] for r in conn.execute(
+                "SELECT latency_s FROM calls WHERE kind = ? AND ts >= ? "
+                "AND error IS NULL AND cache_hit = 0 AND model = ? "
+                "AND COALESCE(route, '') = ? ORDER BY latency_s",
+                (KIND_CHAT, since, row["model"], row["route"]))]
+            p50 = percentile(latencies, 50)
+            summary.append({
+                "model": row["model"],
+                "route": row["route"],
+                "calls": row["calls"],
+                "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "avg_tokens": round(row["avg_tokens"] or 0),
+                "cost_pln": row["cost_pln"] or 0.0,
+            })
+        return summary
+
+    def cost_by_student_day(self, since: float,
+                            limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Najdroższe pary (dzień, uczeń) od chwili `since`, wszystkie rodzaje wywołań.
+
+        Returns:
+            List[Dict[str, Any]]: "day", "student", "calls", "tokens", "cost_pln"
+            (malejąco według kosztu)
+        """
+        day = time.strftime("%Y-%m-%d", time.localtime(since))
+        rows = self._connection().execute(
+            "SELECT day, student, COUNT(*) AS calls, "
+            "SUM(prompt_tokens + completion_tokens) AS tokens, "
+            "SUM(cost_pln) AS cost_pln FROM calls WHERE day >= ? GROUP BY day, student "
+            "ORDER BY cost_pln DESC LIMIT ?", (day, limit)).fetchall()
+        return [dict(r) for r in rows]
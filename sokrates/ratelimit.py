@@ -0,0 +1,562 @@
+"""
+Ograniczanie tempa zapytań do API OpenAI po stronie klienta (jeden harmonogram
+na klucz).
+
+Gdy cała klasa loguje się naraz, każda sesja wysyłałaby zapytania od razu
+i limit konta (zapytania i tokeny na minutę) kończyłby się seriami błędów
+429. `RateLimiter` dopuszcza zapytanie dopiero wtedy, gdy:
+
+- liczba zapytań w toku jest mniejsza niż `max_concurrency`,
+- w wiadrach tokenów (`TokenBucket`) jest miejsce na jedno zapytanie
+  i na szacowaną liczbę tokenów (RPM i TPM),
+- nie trwa wspólna przerwa po odpowiedzi 429 (`Retry-After`).
+
+Oczekujący są obsługiwani po kolei, na zmianę dla każdego ucznia (kolejka
+sprawiedliwa) - uczeń z kilkoma zapytaniami w kolejce (np. odpowiedź i
+wydobywanie faktów) nie blokuje pozostałych. Stan oczekiwania przekazywany
+jest do funkcji `on_wait` (pozycja w kolejce, powód, szacowany czas).
+
+Błędy przejściowe (429, 5xx, sieć) są ponawiane z wykładniczym opóźnieniem
+z losowym rozrzutem (full jitter), z poszanowaniem nagłówków `Retry-After`.
+Z terminem tury (`Deadline`) każda próba czeka w kolejce najwyżej do terminu,
+a ponowienie, które nie zdążyłoby przed nim, kończy się od razu błędem
+`DeadlineExceededError`.
+
+Example:
+    limiter = RateLimiter(rpm=500, tpm=200_000, max_concurrency=8)
+    result = limiter.run(
+        "Anna", 1200, lambda permit: client.chat.completions.create(...))
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from openai import (APIConnectionError, APIStatusError, InternalServerError,
+                    RateLimitError)
+
+from sokrates.hedging import Deadline, DeadlineExceededError
+
+# Powody oczekiwania przekazywane do `on_wait`
+WAIT_QUEUE = "queue"              # przed uczniem są inne zapytania
+WAIT_CONCURRENCY = "concurrency"  # osiągnięty limit zapytań w toku
+WAIT_QUOTA = "quota"              # brak miejsca w limicie zapytań/tokenów na minutę
+WAIT_COOLDOWN = "cooldown"        # wspólna przerwa po odpowiedzi 429
+WAIT_RETRY = "retry"              # ponowienie po błędzie przejściowym
+
+# Błędy przejściowe ponawiane przez harmonogram
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# Maksymalny odstęp między sprawdzeniami kolejki przez oczekujących
+_POLL_INTERVAL = 0.05
+
+
+class QueueTimeoutError(TimeoutError):
+    """
+    Zapytanie nie zostało dopuszczone w wyznaczonym czasie oczekiwania.
+    """
+
+
+class TokenBucket:
+    """
+    Wiadro tokenów uzupełniane ze stałą szybkością (jednostki na minutę).
+
+    Nie jest bezpieczne wątkowo - używa go `RateLimiter` pod własną blokadą.
+    """
+
+    def __init__(self, per_minute: float, burst_s: float = 1.0):
+        """
+        Args:
+            per_minute (float): Limit na minutę (0 - bez limitu)
+            burst_s (float): Pojemność wiadra w sekundach limitu - tyle można
+                wykorzystać naraz po okresie bezczynności
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * burst_s, 1.0) if per_minute > 0 else 0.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Zwraca liczbę sekund do chwili, w której w wiadrze będzie `amount` jednostek.
+
+        Zapytanie większe niż pojemność wiadra czeka na pełne wiadro.
+        """
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float) -> None:
+        """
+        Pobiera jednostki z wiadra (poziom może spaść poniżej zera - dług spłacany
+        jest przez kolejne zapytania).
+        """
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.level -= amount
+
+    def give_back(self, amount: float, now: float) -> None:
+        """
+        Zwraca niewykorzystane jednostki (np. gdy odpowiedź była krótsza od szacunku).
+        """
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Permit:
+    """
+    Zgoda na jedno zapytanie do API (zwalniana po zakończeniu zapytania).
+
+    Attributes:
+        student (str): Uczeń, dla którego wykonywane jest zapytanie
+        tokens (int): Szacowana liczba tokenów zapytania
+        queued_s (float): Czas oczekiwania w kolejce w sekundach
+        retryable (bool): False - zapytania nie wolno już ponowić (np. część
+            strumieniowanej odpowiedzi trafiła do ucznia)
+    """
+
+    def __init__(self, student: str = "", tokens: int = 0,
+                 limiter: Optional["RateLimiter"] = None):
+        self.student = student
+        self.tokens = tokens
+        self.queued_s = 0.0
+        self.retryable = True
+        self._limiter = limiter
+        self._settled = False
+
+    def settle(self, actual_tokens: int) -> None:
+        """
+        Rozlicza rzeczywiste zużycie tokenów z szacunkiem (różnica trafia do
+        wiadra TPM).
+        """
+        if self._limiter is None or self._settled or not actual_tokens:
+            return
+        self._settled = True
+        self._limiter._settle(self.tokens, actual_tokens)
+
+
+class _Ticket:
+    __slots__ = ("student", "tokens", "enqueued")
+
+    def __init__(self, student: str, tokens: int):
+        self.student = student
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Harmonogram zapytań do API jednego klucza: limity RPM/TPM, limit zapytań
+    w toku, kolejka sprawiedliwa według uczniów i ponowienia z opóźnieniem.
+
+    Bezpieczny wątkowo; z pętli asyncio używany przez `aacquire`/`arun`.
+    Limit równy 0 wyłącza daną kontrolę.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_concurrency: int = 0,
+                 max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 30.0,
+                 queue_timeout: Optional[float] = None, burst_s: float = 1.0):
+        """
+        Args:
+            rpm (float): Limit zapytań na minutę
+            tpm (float): Limit tokenów na minutę
+            max_concurrency (int): Maksymalna liczba zapytań w toku
+            max_retries (int): Liczba ponowień przy błędach przejściowych
+            base_delay (float): Początkowe opóźnienie ponowienia w sekundach
+            max_delay (float): Maksymalne opóźnienie ponowienia w sekundach
+            queue_timeout (float, optional): Domyślny maksymalny czas oczekiwania
+                w kolejce (None - bez limitu)
+            burst_s (float): Pojemność wiader w sekundach limitu
+        """
+        self.requests = TokenBucket(rpm, burst_s)
+        self.tokens = TokenBucket(tpm, burst_s)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        # Kolejki uczniów w kolejności obsługi (round-robin): uczeń -> oczekujące
+        # zapytania
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self.admitted = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.timeouts = 0
+        self.queued_s_total = 0.0
+
+    # ------------------------------------------------------------------
+    # Kolejka i dopuszczanie zapytań
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, student: str, tokens: int) -> _Ticket:
+        ticket = _Ticket(student, tokens)
+        with self._cond:
+            self._queues.setdefault(student, deque()).append(ticket)
+        return ticket
+
+    def _remove(self, ticket: _Ticket) -> None:
+        with self._cond:
+            queue = self._queues.get(ticket.student)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.student]
+            self._cond.notify_all()
+
+    def _position(self, ticket: _Ticket) -> int:
+        """
+        Liczba zapytań, które zostaną dopuszczone przed `ticket` (przy obsłudze
+        na zmianę).
+        """
+        rank = self._queues[ticket.student].index(ticket)
+        ahead = 0
+        before = True
+        for student, queue in self._queues.items():
+            if student == ticket.student:
+                ahead += rank
+                before = False
+            else:
+                # Uczniowie wcześniej w kolejności obsługi dostają o jedną turę więcej
+                ahead += min(len(queue), rank + 1 if before else rank)
+        return ahead
+
+    def _try_admit(self, ticket: _Ticket) -> Tuple[float, Dict[str, Any]]:
+        """
+        Dopuszcza zapytanie, jeśli jest pierwsze w kolejce i mieści się w limitach.
+
+        Returns:
+            Tuple[float, Dict]: Czas do kolejnej próby (0 - dopuszczone) i opis
+            oczekiwania ("reason", "position", "wait_s")
+        """
+        with self._cond:
+            now = time.monotonic()
+            head_student = next(iter(self._queues))
+            if (head_student != ticket.student
+                    or self._queues[head_student][0] is not ticket):
+                return _POLL_INTERVAL, {"reason": WAIT_QUEUE,
+                                        "position": self._position(ticket),
+                                        "wait_s": None}
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                return _POLL_INTERVAL, {"reason": WAIT_CONCURRENCY, "position": 0,
+                                        "wait_s": None}
+            if now < self._cooldown_until:
+                wait = self._cooldown_until - now
+                return wait, {"reason": WAIT_COOLDOWN, "position": 0, "wait_s": wait}
+            wait = max(self.requests.wait_time(1, now),
+                       self.tokens.wait_time(ticket.tokens, now))
+            if wait > 0:
+                return wait, {"reason": WAIT_QUOTA, "position": 0, "wait_s": wait}
+            self.requests.take(1, now)
+            self.tokens.take(ticket.tokens, now)
+            self._in_flight += 1
+            self.admitted += 1
+            self.queued_s_total += now - ticket.enqueued
+            # Uczeń obsłużony - trafia na koniec kolejności obsługi
+            queue = self._queues.pop(head_student)
+            queue.popleft()
+            if queue:
+                self._queues[head_student] = queue
+            self._cond.notify_all()
+            return 0.0, {}
+
+    def _release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _settle(self, estimated: int, actual: int) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if actual > estimated:
+                self.tokens.take(actual - estimated, now)
+            else:
+                self.tokens.give_back(estimated - actual, now)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Wstrzymuje dopuszczanie nowych zapytań (wspólna przerwa po odpowiedzi 429).
+        """
+        with self._cond:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + seconds)
+
+    def _permit(self, ticket: _Ticket) -> Permit:
+        permit = Permit(ticket.student, ticket.tokens, self)
+        permit.queued_s = time.monotonic() - ticket.enqueued
+        return permit
+
+    def _deadline(self, timeout: Optional[float]) -> Optional[float]:
+        timeout = self.queue_timeout if timeout is None else timeout
+        return time.monotonic() + timeout if timeout else None
+
+    @staticmethod
+    def _sleep_time(wait: float, deadline: Optional[float]) -> float:
+        if deadline is None:
+            return wait
+        return max(min(wait, deadline - time.monotonic()), 0.0)
+
+    def _expired(self, ticket: _Ticket, deadline: Optional[float]) -> None:
+        if deadline is not None and time.monotonic() >= deadline:
+            with self._cond:
+                self.timeouts += 1
+            waited = time.monotonic() - ticket.enqueued
+            raise QueueTimeoutError(
+                f"Przekroczono czas oczekiwania w kolejce ({waited:.1f} s)")
+
+    def acquire(self, student: str = "", tokens: int = 0,
+                on_wait: Optional[Callable[[Dict[str, Any]], None]] = None,
+                timeout: Optional[float] = None) -> Permit:
+        """
+        Czeka (blokując wątek) na dopuszczenie zapytania. Zgodę trzeba zwolnić
+        przez `release` - wygodniej użyć `run`.
+
+        Args:
+            student (str): Uczeń (klucz kolejki sprawiedliwej)
+            tokens (int): Szacowana liczba tokenów zapytania (wejście i odpowiedź)
+            on_wait (Callable, optional): Funkcja otrzymująca opis oczekiwania przy
+                każdej jego zmianie ("reason", "position", "wait_s")
+            timeout (float, optional): Maksymalny czas oczekiwania (domyślnie
+                `queue_timeout`)
+
+        Returns:
+            Permit: Zgoda na zapytanie
+
+        Raises:
+            QueueTimeoutError: Gdy zapytanie nie zostało dopuszczone w czasie `timeout`
+        """
+        ticket = self._enqueue(student, tokens)
+        deadline = self._deadline(timeout)
+        last_info = None
+        try:
+            while True:
+                wait, info = self._try_admit(ticket)
+                if wait <= 0:
+                    return self._permit(ticket)
+                self._expired(ticket, deadline)
+                if on_wait is not None and info != last_info:
+                    on_wait(info)
+                last_info = info
+                with self._cond:
+                    self._cond.wait(self._sleep_time(min(wait, 1.0), deadline))
+        except BaseException:
+            self._remove(ticket)
+            raise
+
+    async def aacquire(self, student: str = "", tokens: int = 0,
+                       on_wait: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       timeout: Optional[float] = None) -> Permit:
+        """
+        Jak `acquire`, ale oczekiwanie nie blokuje pętli asyncio.
+        """
+        ticket = self._enqueue(student, tokens)
+        deadline = self._deadline(timeout)
+        last_info = None
+        try:
+            while True:
+                wait, info = self._try_admit(ticket)
+                if wait <= 0:
+                    return self._permit(ticket)
+                self._expired(ticket, deadline)
+                if on_wait is not None and info != last_info:
+                    on_wait(info)
+                last_info = info
+                # Zwolnienie miejsca nie budzi korutyn - kolejka sprawdzana jest
+                # co _POLL_INTERVAL
+                await asyncio.sleep(self._sleep_time(min(wait, _POLL_INTERVAL),
+                                                     deadline))
+        except BaseException:
+            self._remove(ticket)
+            raise
+
+    def release(self, permit: Permit) -> None:
+        """
+        Zwalnia zgodę po zakończeniu zapytania (udanego lub nie).
+        """
+        if permit._limiter is self:
+            permit._limiter = None
+            self._release()
+
+    # ------------------------------------------------------------------
+    # Ponowienia
+    # ------------------------------------------------------------------
+
+    def backoff(self, error: Exception, attempt: int) -> float:
+        """
+        Opóźnienie przed ponowieniem: `Retry-After` z odpowiedzi lub wykładnicze
+        opóźnienie z pełnym losowym rozrzutem (full jitter).
+
+        Args:
+            error (Exception): Błąd poprzedniej próby
+            attempt (int): Numer nieudanej próby (od 0)
+        """
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _should_retry(self, error: Exception, permit: Permit, attempt: int,
+                      deadline: Optional[Deadline] = None) -> Optional[float]:
+        """
+        Zwraca opóźnienie ponowienia albo None, gdy błędu nie należy ponawiać.
+
+        Raises:
+            DeadlineExceededError: Gdy ponowienie nie zdążyłoby przed terminem tury
+        """
+        if (not isinstance(error, RETRYABLE_ERRORS) or not permit.retryable
+                or attempt >= self.max_retries):
+            return None
+        delay = self.backoff(error, attempt)
+        if isinstance(error, RateLimitError):
+            # Limit konta jest wspólny - wstrzymaj wszystkie zapytania tego klucza
+            self.pause(delay)
+        remaining = None if deadline is None else deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            raise DeadlineExceededError(
+                "Przekroczono czas oczekiwania na odpowiedź AI") from error
+        with self._cond:
+            self.retries += 1
+            if isinstance(error, RateLimitError):
+                self.rate_limited += 1
+        return delay
+
+    def _attempt_timeout(self, timeout: Optional[float],
+                         deadline: Optional[Deadline]) -> Optional[float]:
+        """
+        Czas oczekiwania próby w kolejce ograniczony terminem tury.
+
+        Raises:
+            DeadlineExceededError: Gdy termin tury już minął
+        """
+        remaining = None if deadline is None else deadline.remaining()
+        if remaining is None:
+            return timeout
+        deadline.check()
+        limit = self.queue_timeout if timeout is None else timeout
+        return min(limit, remaining) if limit else max(remaining, 0.001)
+
+    def run(self, student: str, tokens: int, func: Callable[[Permit], Any],
+            on_wait: Optional[Callable[[Dict[str, Any]], None]] = None,
+            timeout: Optional[float] = None,
+            deadline: Optional[Deadline] = None) -> Any:
+        """
+        Wykonuje `func(permit)` po dopuszczeniu, ponawiając je przy błędach
+        przejściowych.
+
+        Każda próba zajmuje miejsce w limitach (i czeka w kolejce) osobno,
+        ale wszystkie mieszczą się w terminie `deadline`.
+
+        Args:
+            student (str): Uczeń (klucz kolejki sprawiedliwej)
+            tokens (int): Szacowana liczba tokenów zapytania
+            func (Callable): Funkcja wykonująca zapytanie; może rozliczyć tokeny
+                przez `permit.settle` i zablokować ponowienie (`permit.retryable`)
+            on_wait (Callable, optional): Funkcja otrzymująca opis oczekiwania
+            timeout (float, optional): Maksymalny czas oczekiwania w kolejce na próbę
+            deadline (Deadline, optional): Termin tury - ogranicza oczekiwanie
+                w kolejce i ponowienia
+
+        Returns:
+            Any: Wynik `func`
+
+        Raises:
+            QueueTimeoutError: Gdy próba nie została dopuszczona w czasie `timeout`
+            DeadlineExceededError: Gdy termin tury minął lub ponowienie by go
+                przekroczyło
+        """
+        attempt = 0
+        while True:
+            permit = self.acquire(student, tokens, on_wait,
+                                  self._attempt_timeout(timeout, deadline))
+            try:
+                return func(permit)
+            except RETRYABLE_ERRORS as e:
+                delay = self._should_retry(e, permit, attempt, deadline)
+                if delay is None:
+                    raise
+            finally:
+                self.release(permit)
+            attempt += 1
+            if on_wait is not None:
+                on_wait({"reason": WAIT_RETRY, "position": 0, "wait_s": delay,
+                         "attempt": attempt})
+            time.sleep(delay)
+
+    async def arun(self, student: str, tokens: int,
+                   func: Callable[[Permit], Awaitable[Any]],
+                   on_wait: Optional[Callable[[Dict[str, Any]], None]] = None,
+                   timeout: Optional[float] = None,
+                   deadline: Optional[Deadline] = None) -> Any:
+        """
+        Jak `run`, dla korutyn (`await func(permit)`).
+        """
+        attempt = 0
+        while True:
+            permit = await self.aacquire(student, tokens, on_wait,
+                                         self._attempt_timeout(timeout, deadline))
+            try:
+                return await func(permit)
+            except RETRYABLE_ERRORS as e:
+                delay = self._should_retry(e, permit, attempt, deadline)
+                if delay is None:
+                    raise
+            finally:
+                self.release(permit)
+            attempt += 1
+            if on_wait is not None:
+                on_wait({"reason": WAIT_RETRY, "position": 0, "wait_s": delay,
+                         "attempt": attempt})
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Zwraca stan harmonogramu: zapytania w toku i w kolejce, dopuszczone,
+        ponowienia (w tym po 429), przekroczenia czasu i średni czas w kolejce.
+        """
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "admitted": self.admitted,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "timeouts": self.timeouts,
+                "avg_queued_s": (self.queued_s_total / self.admitted
+                                 if self.admitted else 0.0),
+            }
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Odczytuje z odpowiedzi API zalecany czas do ponowienia w sekundach
+    (`retry-after-ms` lub `retry-after`), jeśli jest podany.
+    """
+    if not isinstance(error, APIStatusError):
+        return None
+    headers = error.response.headers
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(float(value) * scale, 0.0)
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,283 @@
+"""
+Pamięć podręczna odpowiedzi Sokratesa dla powtarzających się tur.
+
+Klucz odpowiedzi to skrót SHA-256 wszystkiego, co wpływa na jej treść:
+znormalizowanego pytania, poziomu pomocy (przedział licznika "nie wiem"),
+tematu, skrótu ostatnich tur i podsumowania oraz skrótu faktów z profilu.
+Wpisy wygasają po TTL i są wypierane według LRU; opcjonalnie trafiają też
+do pliku SQLite (np. `db/response_cache.db`), dzięki czemu przetrwają
+restart aplikacji i są współdzielone między procesami. Każdy wpis pamięta
+ucznia, dla którego powstał - po usunięciu profilu jego odpowiedzi są
+usuwane razem z nim (`forget_student`).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sokrates.cache import LRUCache
+from sokrates.consolidation import normalize_fact
+
+DEFAULT_TTL = 24 * 3600
+# Co tyle zapisów z pliku usuwane są wpisy wygasłe i najdawniej używane ponad limit
+_PRUNE_EVERY = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    student TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+"""
+
+
+def counter_bucket(nie_wiem_counter: int) -> str:
+    """
+    Zwraca poziom pomocy odpowiadający licznikowi "nie wiem" (jak w instrukcjach
+    promptu).
+    """
+    if nie_wiem_counter >= 4:
+        return "odpowiedz"
+    if nie_wiem_counter == 3:
+        return "wskazowka"
+    return "pytania"
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def response_cache_key(prompt: str, nie_wiem_counter: int, topic: Optional[str],
+                       history: List[Dict[str, Any]], summary: str, facts: List[str],
+                       model: str, personality: str) -> str:
+    """
+    Buduje klucz odpowiedzi z elementów, od których zależy jej treść.
+
+    Args:
+        prompt (str): Pytanie ucznia (normalizowane - wielkość liter, znaki
+            diakrytyczne i interpunkcja nie mają znaczenia)
+        nie_wiem_counter (int): Licznik "nie wiem" (liczy się tylko poziom pomocy)
+        topic (str, optional): Aktualny temat
+        history (List[Dict]): Tury rozmowy dołączone do zapytania
+        summary (str): Podsumowanie wcześniejszej rozmowy
+        facts (List[str]): Fakty z profilu dołączone do zapytania
+        model (str): Nazwa modelu
+        personality (str): Osobowość (instrukcja systemowa) chatbota
+
+    Returns:
+        str: Skrót SHA-256 (hex)
+    """
+    return _digest({
+        "prompt": normalize_fact(prompt),
+        "level": counter_bucket(nie_wiem_counter),
+        "topic": topic or "",
+        "context": _digest([[m.get("role"), m.get("content")] for m in history]
+                           + [summary]),
+        "profile": _digest(facts),
+        "model": model,
+        "personality": _digest(personality),
+    })
+
+
+class ResponseCache:
+    """
+    Dwupoziomowa pamięć podręczna odpowiedzi: LRU w pamięci i opcjonalny plik SQLite.
+
+    Bezpieczna wątkowo; liczniki trafień obejmują oba poziomy.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = DEFAULT_TTL,
+                 path: Optional[Path] = None, max_disk_entries: int = 10000):
+        """
+        Args:
+            max_entries (int): Liczba odpowiedzi w pamięci (0 wyłącza cache)
+            ttl (float): Czas ważności odpowiedzi w sekundach
+            path (Path, optional): Plik bazy do trwałego przechowywania
+                (None - tylko pamięć)
+            max_disk_entries (int): Maksymalna liczba odpowiedzi w pliku
+        """
+        self.enabled = max_entries > 0
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries)
+        self.path = Path(path) if path is not None and self.enabled else None
+        self.max_disk_entries = max_disk_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.saved_tokens = 0
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connection()
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            if "student" not in columns:
+                # Plik utworzony przez starszą wersję - odpowiedzi bez
+                # przypisanego ucznia
+                conn.execute("ALTER TABLE responses "
+                             "ADD COLUMN student TEXT NOT NULL DEFAULT ''")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_student "
+                         "ON responses (student)")
+            self.prune()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Zwraca połączenie bieżącego wątku z plikiem cache (tworzone przy
+        pierwszym użyciu).
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter: str, tokens: int = 0) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.saved_tokens += tokens
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Zwraca zapamiętaną odpowiedź lub None (brak lub wygasła).
+
+        Returns:
+            Optional[Dict[str, Any]]: {"content": str, "tokens": int} - tokens to
+            liczba tokenów, jaką kosztowało pierwotne zapytanie
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._count("hits", entry[1]["tokens"])
+                return dict(entry[1])
+            self.memory.invalidate(key)
+        if self.path is not None:
+            conn = self._connection()
+            row = conn.execute("SELECT content, tokens, expires_at, student "
+                               "FROM responses WHERE key = ? AND expires_at > ?",
+                               (key, now)).fetchone()
+            if row is not None:
+                value = {"content": row[0], "tokens": row[1]}
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?",
+                             (now, key))
+                self.memory.put(key, (row[2], value, row[3]))
+                self._count("hits", row[1])
+                self._count("disk_hits")
+                return dict(value)
+        self._count("misses")
+        return None
+
+    def put(self, key: str, content: str, tokens: int = 0, student: str = "") -> None:
+        """
+        Zapamiętuje odpowiedź (puste odpowiedzi są pomijane).
+
+        Args:
+            key (str): Klucz z `response_cache_key`
+            content (str): Treść odpowiedzi
+            tokens (int): Liczba tokenów (wejście + wyjście) zapytania, które ją
+                wygenerowało
+            student (str): Klucz ucznia (`student_key`), dla którego powstała odpowiedź
+        """
+        if not self.enabled or not content:
+            return
+        now = time.time()
+        value = {"content": content, "tokens": int(tokens or 0)}
+        self.memory.put(key, (now + self.ttl, value, student))
+        if self.path is not None:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, content, tokens, expires_at, last_used, student) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, content, value["tokens"], now + self.ttl, now, student))
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % _PRUNE_EVERY == 0
+            if prune:
+                self.prune()
+
+    def record_bypass(self) -> None:
+        """
+        Odnotowuje zapytanie, które celowo pominęło cache (np. "nowa odpowiedź").
+        """
+        self._count("bypasses")
+
+    def prune(self) -> int:
+        """
+        Usuwa z pliku wpisy wygasłe i najdawniej używane ponad `max_disk_entries`.
+
+        Returns:
+            int: Liczba usuniętych wpisów
+        """
+        if self.path is None:
+            return 0
+        conn = self._connection()
+        removed = conn.execute("DELETE FROM responses WHERE expires_at <= ?",
+                               (time.time(),)).rowcount
+        removed += conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+            "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)).rowcount
+        return removed
+
+    def forget_student(self, student: str) -> int:
+        """
+        Usuwa z pamięci i pliku odpowiedzi wygenerowane dla ucznia (np. po
+        usunięciu profilu).
+
+        Args:
+            student (str): Klucz ucznia (`student_key`)
+
+        Returns:
+            int: Liczba usuniętych odpowiedzi (w pamięci i w pliku)
+        """
+        if not student:
+            return 0
+        removed = self.memory.invalidate_where(lambda key, entry: entry[2] == student)
+        if self.path is not None:
+            removed += self._connection().execute(
+                "DELETE FROM responses WHERE student = ?", (student,)).rowcount
+        return removed
+
+    def clear(self) -> None:
+        """
+        Usuwa wszystkie odpowiedzi z pamięci i pliku (liczniki pozostają).
+        """
+        self.memory.clear()
+        if self.path is not None:
+            self._connection().execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Zwraca liczniki pracy cache odpowiedzi.
+
+        Returns:
+            Dict[str, Any]: "entries" (w pamięci), "hits", "disk_hits", "misses",
+            "bypasses", "saved_tokens" oraz "hit_rate" (0.0-1.0)
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self.memory.stats()["entries"],
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "saved_tokens": self.saved_tokens,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,284 @@
+"""
+Wybór faktów z profilu ucznia najbardziej związanych z bieżącym pytaniem.
+
+Dla każdego ucznia utrzymywany jest w pamięci indeks leksykalny BM25 jego
+faktów. Tekst jest normalizowany jak przy scalaniu faktów (małe litery, bez
+polskich znaków diakrytycznych), pomijane są najczęstsze polskie słowa
+funkcyjne, a końcówki fleksyjne obcinane prostym stemmerem - dzięki temu
+"fotosynteza", "fotosyntezy" i "fotosyntezę" trafiają na ten sam termin.
+
+Indeks jest aktualizowany przyrostowo przy dopisaniu lub usunięciu faktu i
+budowany od nowa tylko wtedy, gdy profil zmienił się innym zapisem (znacznik
+rewizji profilu z `ProfileStore.profile_token`).
+"""
+
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sokrates.cache import LRUCache
+from sokrates.consolidation import normalize_fact
+from sokrates.storage import ProfileStore, student_key
+
+DEFAULT_TOP_K = 8
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Najczęstsze polskie słowa funkcyjne (po usunięciu diakrytyków)
+STOPWORDS = frozenset("""
+a aby albo ale bo by byc byl byla bylo byly co czy czym dla do gdy go i ich
+ile im ja jak jaka jaki jakie je jego jej jest jestem juz kto ktora ktore
+ktory lub ma mam mi mnie mu na nad nie o od oraz po pod przez przy sa sie
+tak tam te tego tej tez to tu ty w we z za ze zeby
+""".split())
+
+# Końcówki fleksyjne od najdłuższych; obcinane, gdy zostaje co najmniej MIN_STEM znaków
+_SUFFIXES = tuple(sorted("""
+owanie anie enie osci osc owac owie ami ach ego emu owi ych ymi ich imi iem
+uje uja om ow ie ia iu ii ej em ym im ac a e i o u y
+""".split(), key=len, reverse=True))
+MIN_STEM = 4
+MAX_STEM = 8
+
+
+def stem(word: str) -> str:
+    """
+    Obcina polską końcówkę fleksyjną słowa (znormalizowanego) - prosty stemmer.
+    """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    return word[:MAX_STEM]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Zamienia tekst na listę terminów indeksu (normalizacja, słowa funkcyjne, stemming).
+    """
+    return [stem(word) for word in normalize_fact(text).split()
+            if word not in STOPWORDS and (len(word) > 1 or word.isdigit())]
+
+
+class BM25Index:
+    """
+    Indeks odwrócony BM25 z przyrostowym dodawaniem i usuwaniem dokumentów.
+
+    Nie jest bezpieczny wątkowo - synchronizację zapewnia `FactRetriever`.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._lengths
+
+    def add(self, doc_id: int, text: str) -> None:
+        """
+        Dodaje dokument (lub zastępuje dokument o tym samym id).
+        """
+        if doc_id in self._lengths:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+        length = sum(terms.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: int) -> None:
+        """
+        Usuwa dokument z indeksu (brak dokumentu jest ignorowany).
+        """
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in [t for t, docs in self._postings.items() if doc_id in docs]:
+            docs = self._postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Zwraca do `limit` dokumentów z dodatnim wynikiem BM25, od najlepszego.
+
+        Returns:
+            List[Tuple[int, float]]: Pary (id dokumentu, wynik)
+        """
+        if not self._lengths or limit <= 0:
+            return []
+        count = len(self._lengths)
+        average = self._total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            docs = self._postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average)
+                weight = idf * tf * (self.k1 + 1) / (tf + norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit]
+
+
+@dataclass
+class _StudentIndex:
+    """
+    Indeks faktów jednego ucznia wraz z treściami faktów (id -> treść).
+    """
+    index: BM25Index
+    facts: Dict[int, str]
+
+
+class FactRetriever:
+    """
+    Współdzielone (między sesjami) indeksy BM25 faktów uczniów.
+
+    Indeksy przechowywane są w pamięci podręcznej LRU ze znacznikiem
+    rewizji profilu, więc każda zmiana profilu spoza `add`/`remove`
+    powoduje ich odbudowę przy następnym zapytaniu.
+    """
+
+    def __init__(self, store: ProfileStore, max_students: int = 256):
+        """
+        Args:
+            store (ProfileStore): Magazyn profili
+            max_students (int): Maksymalna liczba indeksów trzymanych w pamięci
+        """
+        self.store = store
+        self.cache = LRUCache(max_students)
+        self._lock = threading.Lock()
+
+    def _build(self, student_name: str) -> Tuple[Optional[Tuple[Any, ...]],
+                                                 _StudentIndex]:
+        """
+        Buduje indeks ucznia od zera i zwraca go razem ze znacznikiem rewizji.
+        """
+        token = self.store.profile_token(student_name)
+        entry = _StudentIndex(BM25Index(), {})
+        for record in self.store.list_fact_records(student_name):
+            entry.index.add(record["id"], record["fact"])
+            entry.facts[record["id"]] = record["fact"]
+        # Profil zmieniony w trakcie budowy - indeks nie jest zapamiętywany
+        if token != self.store.profile_token(student_name):
+            token = None
+        return token, entry
+
+    def _get(self, student_name: str) -> _StudentIndex:
+        key = student_key(student_name)
+        token = self.store.profile_token(student_name)
+        if token is None:
+            return _StudentIndex(BM25Index(), {})
+        with self._lock:
+            entry = self.cache.get(key, token=token)
+        if entry is not None:
+            return entry
+        token, entry = self._build(student_name)
+        if token is not None:
+            with self._lock:
+                self.cache.put(key, entry, token=token)
+        return entry
+
+    def _apply(self, student_name: str, update) -> None:
+        """
+        Stosuje zmianę do zapamiętanego indeksu, jeśli odpowiada on rewizji
+        sprzed tego zapisu; w przeciwnym razie indeks zostanie odbudowany.
+        """
+        key = student_key(student_name)
+        token = self.store.profile_token(student_name)
+        if token is None:
+            self.cache.invalidate(key)
+            return
+        previous = token[:-1] + (token[-1] - 1,)
+        with self._lock:
+            entry = self.cache.get(key, token=previous)
+            if entry is not None and update(entry):
+                self.cache.put(key, entry, token=token)
+            else:
+                self.cache.invalidate(key)
+
+    def add(self, student_name: str, fact_id: int, fact: str) -> None:
+        """
+        Dopisuje fakt do indeksu ucznia (wywoływane zaraz po `ProfileStore.add_fact`).
+        """
+        def update(entry: _StudentIndex) -> bool:
+            if fact_id in entry.index:
+                return False
+            entry.index.add(fact_id, fact)
+            entry.facts[fact_id] = fact
+            return True
+        self._apply(student_name, update)
+
+    def remove(self, student_name: str, fact_ids: Iterable[int]) -> None:
+        """
+        Usuwa fakty z indeksu ucznia (wywoływane zaraz po jednym zapisie usuwającym).
+        """
+        ids = list(fact_ids)
+
+        def update(entry: _StudentIndex) -> bool:
+            for fact_id in ids:
+                entry.index.remove(fact_id)
+                entry.facts.pop(fact_id, None)
+            return True
+        self._apply(student_name, update)
+
+    def forget(self, student_name: str) -> None:
+        """
+        Usuwa indeks ucznia z pamięci (np. po usunięciu profilu).
+        """
+        self.cache.invalidate(student_key(student_name))
+
+    def select(self, student_name: str, query: str,
+               top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """
+        Wybiera do `top_k` faktów ucznia najbardziej związanych z zapytaniem.
+
+        Gdy profil ma najwyżej `top_k` faktów, zwracane są wszystkie. W przeciwnym
+        razie najpierw fakty z dodatnim wynikiem BM25 (od najlepszego), a wolne
+        miejsca uzupełniają najnowsze fakty - ogólne preferencje ucznia rzadko
+        pokrywają się słownie z pytaniem.
+
+        Args:
+            student_name (str): Imię/nazwa ucznia
+            query (str): Pytanie ucznia (i aktualny temat)
+            top_k (int): Maksymalna liczba faktów (0 - wszystkie fakty)
+
+        Returns:
+            List[Dict[str, Any]]: Słowniki z kluczami "id", "fact", "score"
+            (score None dla faktów dobranych jako najnowsze)
+        """
+        entry = self._get(student_name)
+        with self._lock:
+            if top_k <= 0 or len(entry.facts) <= top_k:
+                return [{"id": i, "fact": f, "score": None}
+                        for i, f in entry.facts.items()]
+            ranked = entry.index.search(query, top_k)
+            selected = [{"id": i, "fact": entry.facts[i], "score": round(s, 3)}
+                        for i, s in ranked]
+            chosen = {item["id"] for item in selected}
+            for fact_id in sorted(entry.facts, reverse=True):
+                if len(selected) >= top_k:
+                    break
+                if fact_id not in chosen:
+                    selected.append({"id": fact_id, "fact": entry.facts[fact_id],
+                                     "score": None})
+        return selected
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Zwraca liczniki pamięci podręcznej indeksów.
+        """
+        return self.cache.stats()
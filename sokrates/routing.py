@@ -0,0 +1,157 @@
+"""
+Wybór modelu dla każdego wywołania API (tani model domyślnie, mocniejszy tylko tam,
+gdzie trzeba).
+
+Większość tur sokratejskich to krótkie pytania prowadzące - wystarcza im
+szybki i tani model (np. gpt-4o-mini), podobnie jak weryfikacji klucza i
+wydobywaniu faktów. Mocniejszy model (np. gpt-4o) dostają tylko tury, w
+których jakość odpowiedzi ma największe znaczenie:
+
+- licznik "nie wiem" osiągnął próg pełnej odpowiedzi (Sokrates musi
+  wyjaśnić temat od początku do końca),
+- wypowiedź ucznia jest długa (wiele tokenów),
+- wypowiedź jest złożona - zawiera frazy typu "udowodnij", "krok po kroku"
+  lub dużo zapisu matematycznego.
+
+Reguły są konfigurowalne (`RoutingRules`), a każda decyzja ma powód
+(`RouteDecision.reason`), zapisywany w rejestrze wywołań razem z modelem.
+
+Example:
+    router = ModelRouter(RoutingRules(default_model="gpt-4o-mini",
+                                      strong_model="gpt-4o"))
+    decision = router.route_turn(nie_wiem_counter=4, prompt="nie wiem")
+    decision.model, decision.reason  # ("gpt-4o", "full_answer")
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sokrates.consolidation import normalize_fact
+from sokrates.context import count_tokens
+
+# Powody wyboru modelu (zapisywane w rejestrze wywołań)
+ROUTE_DEFAULT = "default"
+ROUTE_FULL_ANSWER = "full_answer"
+ROUTE_LONG_PROMPT = "long_prompt"
+ROUTE_COMPLEX = "complex"
+ROUTE_FIXED = "fixed"
+
+# Frazy (po normalizacji: małe litery, bez polskich znaków) wskazujące na złożone
+# zadanie
+DEFAULT_COMPLEX_PHRASES = (
+    "udowodnij", "dowod", "wyprowadz", "krok po kroku", "szczegolowo", "porownaj",
+    "przeanalizuj", "rozwiaz", "oblicz", "uzasadnij",
+)
+
+_MATH_PATTERN = re.compile(r"[=+\-*/^√∫∑<>]|\d+")
+
+
+@dataclass
+class RoutingRules:
+    """
+    Reguły wyboru modelu tury.
+
+    Attributes:
+        default_model (str): Szybki i tani model - pytania prowadzące, weryfikacja
+            klucza, wydobywanie faktów
+        strong_model (str): Mocniejszy model dla tur wymagających pełnej lub złożonej
+            odpowiedzi (pusty - zawsze `default_model`)
+        full_answer_counter (int): Licznik "nie wiem", od którego Sokrates udziela
+            pełnej odpowiedzi (0 - reguła wyłączona)
+        long_prompt_tokens (int): Długość wypowiedzi ucznia w tokenach, od której tura
+            trafia do mocniejszego modelu (0 - reguła wyłączona)
+        complex_phrases (Tuple[str, ...]): Frazy oznaczające złożone zadanie
+        math_tokens (int): Liczba liczb i symboli matematycznych, od której wypowiedź
+            jest uznawana za złożoną (0 - reguła wyłączona)
+    """
+    default_model: str = "gpt-4o-mini"
+    strong_model: str = "gpt-4o"
+    full_answer_counter: int = 4
+    long_prompt_tokens: int = 250
+    complex_phrases: Tuple[str, ...] = DEFAULT_COMPLEX_PHRASES
+    math_tokens: int = 12
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """
+    Wybrany model i powód wyboru (jedna ze stałych ROUTE_*).
+    """
+    model: str
+    reason: str
+
+
+class ModelRouter:
+    """
+    Wybiera model dla wywołania według `RoutingRules` i zlicza decyzje.
+
+    Bezpieczny wątkowo - współdzielony przez wszystkie sesje.
+    """
+
+    def __init__(self, rules: Optional[RoutingRules] = None):
+        """
+        Args:
+            rules (RoutingRules, optional): Reguły (domyślne, jeśli brak)
+        """
+        self.rules = rules or RoutingRules()
+        self._phrases = tuple(normalize_fact(phrase)
+                              for phrase in self.rules.complex_phrases)
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, str], int] = {}
+
+    @property
+    def cheap_model(self) -> str:
+        """
+        Model wywołań pomocniczych (weryfikacja klucza, wydobywanie faktów).
+        """
+        return self.rules.default_model
+
+    def _count(self, decision: RouteDecision) -> RouteDecision:
+        with self._lock:
+            key = (decision.model, decision.reason)
+            self._counts[key] = self._counts.get(key, 0) + 1
+        return decision
+
+    def is_complex(self, prompt: str) -> bool:
+        """
+        Sprawdza, czy wypowiedź wygląda na złożone zadanie (frazy, zapis matematyczny).
+        """
+        normalized = normalize_fact(prompt)
+        if any(phrase in normalized for phrase in self._phrases):
+            return True
+        math_tokens = self.rules.math_tokens
+        return bool(math_tokens) and len(_MATH_PATTERN.findall(prompt)) >= math_tokens
+
+    def route_turn(self, nie_wiem_counter: int, prompt: str) -> RouteDecision:
+        """
+        Wybiera model tury rozmowy.
+
+        Args:
+            nie_wiem_counter (int): Licznik "nie wiem" po uwzględnieniu bieżącej
+                wypowiedzi
+            prompt (str): Wypowiedź ucznia
+
+        Returns:
+            RouteDecision: Model i powód wyboru
+        """
+        rules = self.rules
+        if not rules.strong_model or rules.strong_model == rules.default_model:
+            return self._count(RouteDecision(rules.default_model, ROUTE_FIXED))
+        if rules.full_answer_counter and nie_wiem_counter >= rules.full_answer_counter:
+            return self._count(RouteDecision(rules.strong_model, ROUTE_FULL_ANSWER))
+        if (rules.long_prompt_tokens
+                and count_tokens(prompt) >= rules.long_prompt_tokens):
+            return self._count(RouteDecision(rules.strong_model, ROUTE_LONG_PROMPT))
+        if self.is_complex(prompt):
+            return self._count(RouteDecision(rules.strong_model, ROUTE_COMPLEX))
+        return self._count(RouteDecision(rules.default_model, ROUTE_DEFAULT))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Zwraca liczbę decyzji według "model/powód" od startu procesu.
+        """
+        with self._lock:
+            return {f"{model}/{reason}": count
+                    for (model, reason), count in sorted(self._counts.items())}
@@ -0,0 +1,482 @@
+"""
+Stan współdzielony między instancjami aplikacji (cache, blokady, liczniki).
+
+Kilka instancji Streamlit za load balancerem nie widzi nawzajem swojej
+pamięci - wynik weryfikacji klucza API, blokady ucznia (dwie karty tego
+samego ucznia na różnych instancjach) i łączne liczniki kosztów muszą
+trafiać do wspólnego magazynu. `SharedState` to interfejs takiego magazynu:
+
+- `LocalState` - w pamięci procesu (jedna instancja, domyślnie),
+- `RedisState` - serwer zgodny z protokołem Redis (RESP2), bez dodatkowych
+  zależności; do testów służy `benchmarks/fake_redis.py` (serwer w procesie).
+
+Wartości to napisy, liczniki to liczby zmiennoprzecinkowe (INCRBYFLOAT),
+a blokady mają czas ważności - blokada instancji, która przestała działać,
+wygasa sama.
+
+Example:
+    shared = open_shared_state("redis://localhost:6379/0")
+    with shared.lock("student:anna", ttl=30, timeout=5):
+        shared.incr_many({"turns": 1, "cost_pln": 0.0042})
+"""
+
+import socket
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, suppress
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+DEFAULT_PREFIX = "sokrates:"
+
+_LOCK_POLL_MIN = 0.01
+_LOCK_POLL_MAX = 0.2
+
+# Zwolnienie blokady: usuwa klucz tylko, jeśli nadal zawiera token właściciela
+# (blokada mogła wygasnąć i zostać przejęta) - porównanie i usunięcie w jednym kroku
+UNLOCK_SCRIPT = (
+    'if redis.call("GET", KEYS[1]) == ARGV[1] then '
+    'return redis.call("DEL", KEYS[1]) end return 0'
+)
+
+
+class SharedStateError(Exception):
+    """
+    Błąd magazynu stanu współdzielonego (np. brak połączenia z serwerem Redis).
+    """
+
+
+class LockTimeoutError(TimeoutError):
+    """
+    Blokada nie została uzyskana w zadanym czasie.
+    """
+
+
+class SharedState(ABC):
+    """
+    Interfejs magazynu stanu współdzielonego między instancjami aplikacji.
+
+    Implementacje muszą być bezpieczne wątkowo.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """
+        Zwraca wartość klucza (None - brak lub wygasła).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """
+        Zapisuje wartość, opcjonalnie z czasem ważności w sekundach.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Usuwa klucz (brak klucza nie jest błędem).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def incr_many(self, amounts: Dict[str, float]) -> None:
+        """
+        Zwiększa liczniki o podane wartości (atomowo każdy licznik).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def counters(self, keys: List[str]) -> Dict[str, float]:
+        """
+        Zwraca wartości liczników (0 dla nieistniejących).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _try_lock(self, key: str, token: str, ttl: float) -> bool:
+        """
+        Zakłada blokadę z tokenem właściciela, jeśli nikt jej nie trzyma.
+
+        Returns:
+            bool: True - blokada założona, False - trzyma ją ktoś inny
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _unlock(self, key: str, token: str) -> None:
+        """
+        Zwalnia blokadę, jeśli nadal należy do właściciela tokenu (atomowo).
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, name: str, ttl: float = 30.0,
+             timeout: Optional[float] = 10.0) -> Iterator[None]:
+        """
+        Blokada o nazwie `name`, wspólna dla wszystkich instancji.
+
+        Args:
+            name (str): Nazwa blokady (np. "student:anna")
+            ttl (float): Czas ważności blokady w sekundach (wygasa, jeśli
+                instancja przestanie działać, zanim ją zwolni)
+            timeout (float, optional): Maksymalny czas oczekiwania (None - bez limitu)
+
+        Raises:
+            LockTimeoutError: Gdy blokada nie została uzyskana w czasie `timeout`
+        """
+        key = "lock:" + name
+        token = uuid.uuid4().hex
+        deadline = None if timeout is None else time.monotonic() + timeout
+        poll = _LOCK_POLL_MIN
+        while not self._try_lock_safe(key, token, ttl):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeoutError(
+                    f"Nie uzyskano blokady {name} w ciągu {timeout:g} s")
+            delay = poll
+            if deadline is not None:
+                delay = max(min(poll, deadline - time.monotonic()), 0.0)
+            time.sleep(delay)
+            poll = min(poll * 2, _LOCK_POLL_MAX)
+        try:
+            yield
+        finally:
+            self._unlock(key, token)
+
+    def _try_lock_safe(self, key: str, token: str, ttl: float) -> bool:
+        try:
+            return self._try_lock(key, token, ttl)
+        except SharedStateError:
+            # Odpowiedź mogła zginąć po założeniu blokady - zwolnij ją, jeśli jest nasza
+            with suppress(SharedStateError):
+                self._unlock(key, token)
+            raise
+
+    def close(self) -> None:
+        """
+        Zamyka połączenia (jeśli są).
+        """
+
+
+class LocalState(SharedState):
+    """
+    Stan w pamięci procesu - wystarcza dla jednej instancji aplikacji.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._counters: Dict[str, float] = {}
+
+    def _live(self, key: str, now: float) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and now >= expires:
+            del self._values[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._live(key, time.monotonic())
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr_many(self, amounts: Dict[str, float]) -> None:
+        with self._lock:
+            for key, amount in amounts.items():
+                self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def counters(self, keys: List[str]) -> Dict[str, float]:
+        with self._lock:
+            return {key: self._counters.get(key, 0.0) for key in keys}
+
+    def _try_lock(self, key: str, token: str, ttl: float) -> bool:
+        with self._lock:
+            if self._live(key, time.monotonic()) is not None:
+                return False
+            self._values[key] = (token, time.monotonic() + ttl)
+            return True
+
+    def _unlock(self, key: str, token: str) -> None:
+        with self._lock:
+            if self._live(key, time.monotonic()) == token:
+                del self._values[key]
+
+
+class _SendError(ConnectionError):
+    """
+    Zapis poleceń do serwera nie powiódł się (`written` - czy dotarła część danych).
+    """
+
+    def __init__(self, message: str, written: bool):
+        super().__init__(message)
+        self.written = written
+
+
+class _RespConnection:
+    """
+    Jedno połączenie z serwerem Redis (protokół RESP2).
+    """
+
+    def __init__(self, host: str, port: int, password: Optional[str], db: int,
+                 timeout: float):
+        self.timeout = timeout
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if password:
+            self.execute(("AUTH", password))
+        if db:
+            self.execute(("SELECT", db))
+
+    @staticmethod
+    def _pack(command: Tuple[Any, ...]) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Serwer Redis zamknął połączenie")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            return SharedStateError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise SharedStateError(f"Nieznana odpowiedź serwera Redis: {line!r}")
+
+    def alive(self) -> bool:
+        """
+        Sprawdza bez czekania, czy serwer nie zamknął bezczynnego połączenia.
+        """
+        try:
+            self.sock.setblocking(False)
+            try:
+                self.sock.recv(1, socket.MSG_PEEK)
+            finally:
+                self.sock.settimeout(self.timeout)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        # Koniec strumienia lub dane bez zapytania - połączenia nie da się użyć
+        return False
+
+    def send(self, commands: List[Tuple[Any, ...]]) -> None:
+        """
+        Wysyła polecenia jednym zapisem.
+
+        Raises:
+            _SendError: Gdy zapis się nie powiódł (`written` - czy cokolwiek wysłano)
+        """
+        data = b"".join(self._pack(command) for command in commands)
+        sent = 0
+        try:
+            while sent < len(data):
+                sent += self.sock.send(data[sent:])
+        except OSError as e:
+            raise _SendError(str(e), written=sent > 0) from e
+
+    def read_replies(self, count: int) -> List[Any]:
+        """
+        Odczytuje `count` odpowiedzi (błędy serwera jako wartości).
+        """
+        return [self._read() for _ in range(count)]
+
+    def pipeline(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        """
+        Wysyła polecenia jednym zapisem i odczytuje odpowiedzi (błędy jako wartości).
+        """
+        self.send(commands)
+        return self.read_replies(len(commands))
+
+    def execute(self, command: Tuple[Any, ...]) -> Any:
+        reply = self.pipeline([command])[0]
+        if isinstance(reply, SharedStateError):
+            raise reply
+        return reply
+
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisState(SharedState):
+    """
+    Stan na serwerze zgodnym z protokołem Redis - wspólny dla wielu instancji aplikacji.
+
+    Każdy wątek ma własne połączenie (otwierane przy pierwszym użyciu).
+    Polecenia są ponawiane na nowym połączeniu tylko wtedy, gdy nie zostały
+    wysłane - po wysłaniu błąd odczytu kończy się `SharedStateError`, bo
+    serwer mógł je już wykonać (np. drugi INCRBYFLOAT). Klucze mają prefiks
+    (`prefix`), więc jeden serwer może obsługiwać kilka szkół lub środowisk.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = DEFAULT_PREFIX, timeout: float = 5.0):
+        """
+        Args:
+            url (str): Adres serwera, np. "redis://:haslo@localhost:6379/0"
+            prefix (str): Prefiks wszystkich kluczy
+            timeout (float): Limit czasu połączenia i odpowiedzi w sekundach
+        """
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Nieobsługiwany adres magazynu stanu: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[_RespConnection] = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self) -> _RespConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and not connection.alive():
+            self._drop_connection()
+            connection = None
+        if connection is None:
+            try:
+                connection = _RespConnection(self.host, self.port, self.password,
+                                             self.db, self.timeout)
+            except OSError as e:
+                raise SharedStateError("Brak połączenia z serwerem Redis "
+                                       f"{self.host}:{self.port}: {e}") from e
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _drop_connection(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+            with self._connections_lock:
+                if connection in self._connections:
+                    self._connections.remove(connection)
+
+    def _pipeline(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        """
+        Wykonuje polecenia; ponawia je raz na nowym połączeniu, jeśli nie zostały
+        wysłane.
+
+        Raises:
+            SharedStateError: Gdy połączenie zerwało się po wysłaniu poleceń
+                (mogły zostać wykonane - nie są ponawiane)
+        """
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.send(commands)
+            except _SendError as e:
+                self._drop_connection()
+                if e.written or attempt:
+                    raise SharedStateError(
+                        f"Błąd połączenia z serwerem Redis: {e}") from e
+                continue
+            try:
+                return connection.read_replies(len(commands))
+            except OSError as e:
+                self._drop_connection()
+                raise SharedStateError(f"Błąd połączenia z serwerem Redis: {e}") from e
+        return []
+
+    def _execute(self, *command: Any) -> Any:
+        reply = self._pipeline([command])[0]
+        if isinstance(reply, SharedStateError):
+            raise reply
+        return reply
+
+    def ping(self) -> bool:
+        return self._execute("PING") == "PONG"
+
+    def get(self, key: str) -> Optional[str]:
+        return self._execute("GET", self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        if ttl:
+            self._execute("SET", self.prefix + key, value, "PX",
+                          max(int(ttl * 1000), 1))
+        else:
+            self._execute("SET", self.prefix + key, value)
+
+    def delete(self, key: str) -> None:
+        self._execute("DEL", self.prefix + key)
+
+    def incr_many(self, amounts: Dict[str, float]) -> None:
+        commands = [("INCRBYFLOAT", self.prefix + key, repr(float(amount)))
+                    for key, amount in amounts.items()]
+        if not commands:
+            return
+        for reply in self._pipeline(commands):
+            if isinstance(reply, SharedStateError):
+                raise reply
+
+    def counters(self, keys: List[str]) -> Dict[str, float]:
+        if not keys:
+            return {}
+        values = self._execute("MGET", *(self.prefix + key for key in keys))
+        return {key: float(value) if value is not None else 0.0
+                for key, value in zip(keys, values)}
+
+    def _try_lock(self, key: str, token: str, ttl: float) -> bool:
+        return self._execute("SET", self.prefix + key, token, "NX", "PX",
+                             max(int(ttl * 1000), 1)) == "OK"
+
+    def _unlock(self, key: str, token: str) -> None:
+        self._execute("EVAL", UNLOCK_SCRIPT, 1, self.prefix + key, token)
+
+    def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+def open_shared_state(url: str = "", prefix: str = DEFAULT_PREFIX) -> SharedState:
+    """
+    Tworzy magazyn stanu według adresu: pusty lub "local" - w pamięci procesu,
+    "redis://..." - serwer Redis.
+    """
+    if not url or url == "local":
+        return LocalState()
+    return RedisState(url, prefix=prefix)
@@ -0,0 +1,679 @@
+"""
+Magazyn profili uczniów oparty na SQLite (tryb WAL).
+
+Każdy fakt jest osobnym wierszem z identyfikatorem, znacznikami czasu i
+źródłem pochodzenia, więc dodanie lub usunięcie faktu nie wymaga
+przepisywania całego profilu. Tryb WAL pozwala wielu sesjom czytać
+równocześnie z zapisem, a edycje wykonywane są w transakcjach.
+
+Przy pierwszym uruchomieniu fakty z dotychczasowych plików
+`db/students/*_memory.json` (JSONL) są jednorazowo importowane do bazy.
+
+Listy faktów trzymane są we współdzielonej pamięci podręcznej LRU,
+unieważnianej numerem rewizji profilu zwiększanym przy każdym zapisie.
+
+Statystyki (liczba faktów, rozmiar, data ostatniej zmiany - per uczeń i
+łącznie) utrzymywane są przez wyzwalacze SQLite przy każdym zapisie, więc
+panel administracyjny nie musi czytać samych profili.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sokrates.cache import LRUCache
+
+# Źródła faktów zapisywane w kolumnie `source`
+SOURCE_MANUAL = "manual"
+SOURCE_LEGACY = "legacy_jsonl"
+
+LEGACY_SUFFIX = "_memory.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    student_key TEXT NOT NULL UNIQUE,
+    display_name TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0,
+    fact_count INTEGER NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS facts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    fact TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_facts_student ON facts(student_id, id);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profile_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    students INTEGER NOT NULL,
+    facts INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    changes INTEGER NOT NULL
+);
+"""
+
+# Indeks statystyk utrzymywany przez wyzwalacze (tworzony po ewentualnej migracji
+# kolumn)
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+_STATS_SCHEMA = f"""
+CREATE INDEX IF NOT EXISTS idx_students_fact_count ON students(fact_count);
+CREATE TRIGGER IF NOT EXISTS trg_students_insert AFTER INSERT ON students BEGIN
+    UPDATE profile_totals SET students = students + 1, changes = changes + 1
+    WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_students_delete AFTER DELETE ON students BEGIN
+    UPDATE profile_totals SET students = students - 1, changes = changes + 1
+    WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_facts_insert AFTER INSERT ON facts BEGIN
+    UPDATE students SET fact_count = fact_count + 1,
+        size_bytes = size_bytes + length(CAST(NEW.fact AS BLOB)),
+        updated_at = NEW.updated_at
+    WHERE id = NEW.student_id;
+    UPDATE profile_totals SET facts = facts + 1,
+        size_bytes = size_bytes + length(CAST(NEW.fact AS BLOB)), changes = changes + 1
+    WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_facts_delete AFTER DELETE ON facts BEGIN
+    UPDATE students SET fact_count = fact_count - 1,
+        size_bytes = size_bytes - length(CAST(OLD.fact AS BLOB)),
+        updated_at = {_NOW}
+    WHERE id = OLD.student_id;
+    UPDATE profile_totals SET facts = facts - 1,
+        size_bytes = size_bytes - length(CAST(OLD.fact AS BLOB)), changes = changes + 1
+    WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_facts_update AFTER UPDATE OF fact ON facts BEGIN
+    UPDATE students SET
+        size_bytes = size_bytes - length(CAST(OLD.fact AS BLOB))
+            + length(CAST(NEW.fact AS BLOB)),
+        updated_at = NEW.updated_at
+    WHERE id = NEW.student_id;
+    UPDATE profile_totals SET
+        size_bytes = size_bytes - length(CAST(OLD.fact AS BLOB))
+            + length(CAST(NEW.fact AS BLOB)),
+        changes = changes + 1
+    WHERE id = 1;
+END;
+"""
+
+# Kolumny sortowania listy uczniów w panelu administracyjnym
+_STUDENT_ORDER = {
+    "name": "student_key ASC",
+    "facts": "fact_count DESC, student_key ASC",
+    "updated": "updated_at DESC, student_key ASC",
+}
+
+
+def student_key(student_name: str) -> str:
+    """
+    Zwraca bezpieczny identyfikator ucznia (jak w nazwach plików profili).
+
+    Args:
+        student_name (str): Imię/nazwa ucznia
+
+    Returns:
+        str: Nazwa po sanityzacji, np. "Anna Maria" -> "anna_maria"
+    """
+    safe_name = "".join(c for c in student_name
+                        if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    return safe_name.replace(' ', '_').lower()
+
+
+def iter_jsonl_facts(path: Path, skipped: Optional[List[int]] = None) -> Iterator[str]:
+    """
+    Strumieniowo czyta fakty z pliku JSONL, pomijając uszkodzone linie.
+
+    Jedna błędna linia nie powoduje utraty całego profilu - jest pomijana,
+    a jej numer dopisywany do listy `skipped` (jeśli podana).
+
+    Args:
+        path (Path): Plik profilu w formacie {"fact": ...} na linię
+        skipped (List[int], optional): Lista na numery pominiętych linii
+
+    Yields:
+        str: Kolejne fakty z pliku
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f_mem:
+        for line_no, line in enumerate(f_mem, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                fact = json.loads(line)["fact"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                fact = None
+            if isinstance(fact, str):
+                yield fact
+            elif skipped is not None:
+                skipped.append(line_no)
+
+
+def display_name_from_key(key: str) -> str:
+    """
+    Odtwarza czytelną nazwę ucznia z identyfikatora (np. "anna_maria" -> "Anna Maria").
+    """
+    return key.replace('_', ' ').title()
+
+
+class ProfileStore:
+    """
+    Indeksowany magazyn faktów o uczniach w jednej bazie SQLite.
+
+    Każdy wątek korzysta z własnego połączenia; zapisy są transakcyjne,
+    a tryb WAL pozwala na równoczesne odczyty z wielu sesji.
+    """
+
+    def __init__(self, db_path: Path, legacy_dir: Optional[Path] = None,
+                 cache_size: int = 256):
+        """
+        Args:
+            db_path (Path): Ścieżka do pliku bazy danych
+            legacy_dir (Path, optional): Katalog z plikami `*_memory.json` do
+                jednorazowej migracji (pomijana jeśli None)
+            cache_size (int): Liczba profili w pamięci podręcznej (0 wyłącza)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.legacy_dir = Path(legacy_dir) if legacy_dir is not None else None
+        self.cache = LRUCache(cache_size)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        self._upgrade_schema(conn)
+        if self.legacy_dir is not None:
+            self.migrate_legacy(self.legacy_dir)
+
+    # ------------------------------------------------------------------
+    # Połączenia i transakcje
+    # ------------------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Zwraca połączenie bieżącego wątku (tworzone przy pierwszym użyciu).
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30.0,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Otwiera transakcję zapisu (BEGIN IMMEDIATE) - zatwierdzaną lub wycofywaną
+        w całości.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _upgrade_schema(self, conn: sqlite3.Connection) -> None:
+        """
+        Dodaje kolumny brakujące w bazach utworzonych przez starsze wersje
+        i zakłada indeks statystyk (wypełniany jednorazowo z istniejących danych).
+        """
+        with self._transaction():
+            columns = {row["name"]
+                       for row in conn.execute("PRAGMA table_info(students)")}
+            if "revision" not in columns:
+                conn.execute("ALTER TABLE students "
+                             "ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            if "fact_count" not in columns:
+                conn.execute("ALTER TABLE students "
+                             "ADD COLUMN fact_count INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE students "
+                             "ADD COLUMN size_bytes INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE students "
+                             "ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+                conn.execute(
+                    "UPDATE students SET "
+                    "fact_count = (SELECT COUNT(*) FROM facts "
+                    "WHERE student_id = students.id), "
+                    "size_bytes = (SELECT COALESCE(SUM(length(CAST(fact AS BLOB))), 0) "
+                    "FROM facts WHERE student_id = students.id), "
+                    "updated_at = (SELECT COALESCE(MAX(updated_at), "
+                    "students.created_at) "
+                    "FROM facts WHERE student_id = students.id)"
+                )
+            conn.execute(
+                "INSERT OR IGNORE INTO profile_totals "
+                "(id, students, facts, size_bytes, changes) "
+                "SELECT 1, (SELECT COUNT(*) FROM students), "
+                "COALESCE(SUM(fact_count), 0), "
+                "COALESCE(SUM(size_bytes), 0), 0 FROM students"
+            )
+        conn.executescript(_STATS_SCHEMA)
+
+    def _touch(self, conn: sqlite3.Connection, student_id: int) -> None:
+        """
+        Zwiększa numer rewizji profilu - wywoływane w każdej transakcji zapisu.
+        """
+        conn.execute("UPDATE students SET revision = revision + 1 WHERE id = ?",
+                     (student_id,))
+
+    def close(self) -> None:
+        """
+        Zamyka połączenie bieżącego wątku.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------------------------------------------
+    # Uczniowie
+    # ------------------------------------------------------------------
+
+    def _student_id(self, conn: sqlite3.Connection, key: str) -> Optional[int]:
+        row = conn.execute("SELECT id FROM students WHERE student_key = ?",
+                           (key,)).fetchone()
+        return row["id"] if row else None
+
+    def _ensure_student(self, conn: sqlite3.Connection, student_name: str,
+                        created_at: Optional[float] = None) -> int:
+        key = student_key(student_name)
+        student_id = self._student_id(conn, key)
+        if student_id is None:
+            created_at = created_at or time.time()
+            cursor = conn.execute(
+                "INSERT INTO students "
+                "(student_key, display_name, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, student_name.strip() or display_name_from_key(key),
+                 created_at, created_at),
+            )
+            student_id = cursor.lastrowid
+        return student_id
+
+    def list_students(self) -> List[Dict[str, Any]]:
+        """
+        Zwraca listę uczniów posiadających profil.
+
+        Returns:
+            List[Dict[str, Any]]: Słowniki z kluczami "key", "name", "created_at"
+        """
+        rows = self._connection().execute(
+            "SELECT student_key, display_name, created_at FROM students "
+            "ORDER BY student_key"
+        ).fetchall()
+        return [{"key": r["student_key"], "name": r["display_name"],
+                 "created_at": r["created_at"]}
+                for r in rows]
+
+    def stats_summary(self) -> Dict[str, int]:
+        """
+        Zwraca łączne statystyki profili z indeksu (bez czytania faktów).
+
+        Returns:
+            Dict[str, int]: "students", "facts", "size_bytes" oraz "changes" -
+            licznik zmian rosnący przy każdym zapisie dowolnego profilu
+        """
+        row = self._connection().execute(
+            "SELECT students, facts, size_bytes, changes FROM profile_totals "
+            "WHERE id = 1"
+        ).fetchone()
+        if row is None:
+            return {"students": 0, "facts": 0, "size_bytes": 0, "changes": 0}
+        return dict(row)
+
+    def count_students(self, query: str = "") -> int:
+        """
+        Zwraca liczbę uczniów, których nazwa zawiera `query` (wszystkich gdy puste).
+        """
+        if not query:
+            return self.stats_summary()["students"]
+        pattern = f"%{query.strip().lower()}%"
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM students "
+            "WHERE student_key LIKE ? OR lower(display_name) LIKE ?",
+            (pattern, pattern),
+        ).fetchone()[0]
+
+    def list_student_stats(self, query: str = "", offset: int = 0, limit: int = 20,
+                           order: str = "name") -> List[Dict[str, Any]]:
+        """
+        Zwraca stronę listy uczniów ze statystykami z indeksu.
+
+        Args:
+            query (str): Fragment nazwy ucznia (puste - wszyscy)
+            offset (int): Liczba pominiętych wierszy (paginacja)
+            limit (int): Rozmiar strony
+            order (str): Sortowanie: "name", "facts" lub "updated"
+
+        Returns:
+            List[Dict[str, Any]]: Słowniki z kluczami "key", "name", "fact_count",
+            "size_bytes", "created_at", "updated_at"
+        """
+        sql = ("SELECT student_key AS key, display_name AS name, fact_count, "
+               "size_bytes, "
+               "created_at, updated_at FROM students")
+        params: List[Any] = []
+        if query:
+            pattern = f"%{query.strip().lower()}%"
+            sql += " WHERE student_key LIKE ? OR lower(display_name) LIKE ?"
+            params += [pattern, pattern]
+        sql += (f" ORDER BY {_STUDENT_ORDER.get(order, _STUDENT_ORDER['name'])}"
+                " LIMIT ? OFFSET ?")
+        params += [limit, offset]
+        return [dict(r) for r in self._connection().execute(sql, params)]
+
+    def delete_student(self, student_name: str) -> bool:
+        """
+        Usuwa profil ucznia razem ze wszystkimi faktami (i kopią z migracji).
+
+        Returns:
+            bool: True jeśli profil istniał
+        """
+        key = student_key(student_name)
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM students WHERE student_key = ?", (key,))
+            deleted = cursor.rowcount > 0
+        self.cache.invalidate(key)
+        if self.legacy_dir is not None:
+            # Kopia zapasowa z migracji również zawiera dane ucznia (RODO)
+            backup = self.legacy_dir / "migrated" / f"{key}{LEGACY_SUFFIX}"
+            backup.unlink(missing_ok=True)
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Fakty
+    # ------------------------------------------------------------------
+
+    def add_fact(self, student_name: str, fact: str,
+                 source: str = SOURCE_MANUAL) -> int:
+        """
+        Dodaje fakt do profilu ucznia (profil jest tworzony w razie potrzeby).
+
+        Args:
+            student_name (str): Imię/nazwa ucznia
+            fact (str): Treść faktu
+            source (str): Źródło faktu (np. "manual", "legacy_jsonl")
+
+        Returns:
+            int: Identyfikator nowego faktu
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            student_id = self._ensure_student(conn, student_name)
+            cursor = conn.execute(
+                "INSERT INTO facts (student_id, fact, source, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (student_id, fact, source, now, now),
+            )
+            self._touch(conn, student_id)
+        self.cache.invalidate(student_key(student_name))
+        return cursor.lastrowid
+
+    def list_fact_records(self, student_name: str) -> List[Dict[str, Any]]:
+        """
+        Zwraca fakty ucznia wraz z metadanymi, w kolejności dodania.
+
+        Returns:
+            List[Dict[str, Any]]: Słowniki z kluczami "id", "fact", "source",
+            "created_at", "updated_at"
+        """
+        rows = self._connection().execute(
+            "SELECT f.id, f.fact, f.source, f.created_at, f.updated_at FROM facts f "
+            "JOIN students s ON s.id = f.student_id WHERE s.student_key = ? "
+            "ORDER BY f.id",
+            (student_key(student_name),),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def profile_token(self, student_name: str) -> Optional[Tuple[Any, ...]]:
+        """
+        Zwraca znacznik wersji profilu ucznia (id, data utworzenia, rewizja).
+
+        Znacznik zmienia się przy każdym zapisie profilu, a także gdy profil
+        zostanie usunięty i założony ponownie. None - brak profilu.
+        """
+        row = self._connection().execute(
+            "SELECT id, created_at, revision FROM students WHERE student_key = ?",
+            (student_key(student_name),)).fetchone()
+        return tuple(row) if row is not None else None
+
+    def list_facts(self, student_name: str) -> List[str]:
+        """
+        Zwraca same treści faktów ucznia, w kolejności dodania.
+
+        Wynik pochodzi z pamięci podręcznej, jeśli rewizja profilu się nie zmieniła.
+        """
+        key = student_key(student_name)
+        token = self.profile_token(student_name)
+        if token is None:
+            return []
+        cached = self.cache.get(key, token=token)
+        if cached is not None:
+            return list(cached)
+        # Odczyt i numer rewizji w jednej transakcji, aby nie zapamiętać niespójnej pary
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute(
+                "SELECT id, created_at, revision FROM students WHERE student_key = ?",
+                (key,)).fetchone()
+            facts: Tuple[str, ...] = ()
+            if row is not None:
+                facts = tuple(r["fact"] for r in conn.execute(
+                    "SELECT fact FROM facts WHERE student_id = ? ORDER BY id",
+                    (row["id"],)))
+        finally:
+            conn.execute("COMMIT")
+        if row is not None:
+            # Znacznik obejmuje id i datę utworzenia - profil usunięty i założony
+            # ponownie nie trafi na stary wpis z tą samą rewizją
+            self.cache.put(key, facts, token=tuple(row))
+        return list(facts)
+
+    def replace_facts(self, student_name: str, facts: List[str],
+                      source: str = SOURCE_MANUAL) -> None:
+        """
+        Zastępuje wszystkie fakty ucznia nową listą (w jednej transakcji).
+
+        Fakty, które już istnieją w profilu (w tej samej kolejności), zachowują
+        swój identyfikator, źródło i datę utworzenia.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            student_id = self._ensure_student(conn, student_name)
+            rows = conn.execute(
+                "SELECT id, fact FROM facts WHERE student_id = ? ORDER BY id",
+                (student_id,)).fetchall()
+            existing: Dict[str, List[int]] = {}
+            for row in rows:
+                existing.setdefault(row["fact"], []).append(row["id"])
+            keep = set()
+            last_id = 0
+            for fact in facts:
+                ids = existing.get(fact)
+                # Istniejący wiersz można zachować tylko, gdy nie zaburza kolejności
+                # (ORDER BY id)
+                while ids and ids[0] <= last_id:
+                    ids.pop(0)
+                if ids:
+                    last_id = ids.pop(0)
+                    keep.add(last_id)
+                else:
+                    cursor = conn.execute(
+                        "INSERT INTO facts "
+                        "(student_id, fact, source, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (student_id, fact, source, now, now),
+                    )
+                    last_id = cursor.lastrowid
+                    keep.add(last_id)
+            stale = [(row["id"],) for row in rows if row["id"] not in keep]
+            conn.executemany("DELETE FROM facts WHERE id = ?", stale)
+            self._touch(conn, student_id)
+        self.cache.invalidate(student_key(student_name))
+
+    def delete_fact(self, student_name: str, fact_id: int) -> bool:
+        """
+        Usuwa fakt o podanym identyfikatorze (tylko z profilu tego ucznia).
+
+        Returns:
+            bool: True jeśli fakt został usunięty
+        """
+        key = student_key(student_name)
+        with self._transaction() as conn:
+            student_id = self._student_id(conn, key)
+            if student_id is None:
+                return False
+            cursor = conn.execute("DELETE FROM facts WHERE id = ? AND student_id = ?",
+                                  (fact_id, student_id))
+            deleted = cursor.rowcount > 0
+            if deleted:
+                self._touch(conn, student_id)
+        self.cache.invalidate(key)
+        return deleted
+
+    def delete_facts(self, student_name: str, fact_ids: List[int]) -> int:
+        """
+        Usuwa wiele faktów ucznia w jednej transakcji.
+
+        Returns:
+            int: Liczba usuniętych faktów
+        """
+        key = student_key(student_name)
+        with self._transaction() as conn:
+            student_id = self._student_id(conn, key)
+            if student_id is None:
+                return 0
+            deleted = 0
+            for fact_id in fact_ids:
+                deleted += conn.execute(
+                    "DELETE FROM facts WHERE id = ? AND student_id = ?",
+                    (fact_id, student_id)).rowcount
+            if deleted:
+                self._touch(conn, student_id)
+        self.cache.invalidate(key)
+        return deleted
+
+    def delete_fact_at(self, student_name: str, index: int) -> bool:
+        """
+        Usuwa fakt o podanej pozycji w profilu (0-based, kolejność dodania).
+
+        Returns:
+            bool: True jeśli fakt został usunięty
+        """
+        if index < 0:
+            return False
+        key = student_key(student_name)
+        with self._transaction() as conn:
+            student_id = self._student_id(conn, key)
+            row = conn.execute(
+                "SELECT id FROM facts WHERE student_id = ? "
+                "ORDER BY id LIMIT 1 OFFSET ?",
+                (student_id, index),
+            ).fetchone() if student_id is not None else None
+            if row is None:
+                return False
+            conn.execute("DELETE FROM facts WHERE id = ?", (row["id"],))
+            self._touch(conn, student_id)
+        self.cache.invalidate(key)
+        return True
+
+    def iter_students(self) -> Iterator[Dict[str, Any]]:
+        """
+        Strumieniowo zwraca uczniów (kursor bazy - bez wczytywania całej listy).
+        """
+        cursor = self._connection().execute(
+            "SELECT student_key AS key, display_name AS name FROM students "
+            "ORDER BY student_key"
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def iter_facts(self, student_name: str) -> Iterator[str]:
+        """
+        Strumieniowo zwraca fakty ucznia z bazy (z pominięciem pamięci podręcznej).
+        """
+        cursor = self._connection().execute(
+            "SELECT f.fact FROM facts f JOIN students s ON s.id = f.student_id "
+            "WHERE s.student_key = ? ORDER BY f.id",
+            (student_key(student_name),),
+        )
+        for row in cursor:
+            yield row["fact"]
+
+    def export_jsonl(self, student_name: str) -> str:
+        """
+        Zwraca profil ucznia w dotychczasowym formacie JSONL ({"fact": ...} w linii).
+        """
+        return "".join(json.dumps({"fact": fact}, ensure_ascii=False) + "\n"
+                       for fact in self.list_facts(student_name))
+
+    # ------------------------------------------------------------------
+    # Migracja z plików JSONL
+    # ------------------------------------------------------------------
+
+    def migrate_legacy(self, legacy_dir: Path) -> int:
+        """
+        Jednorazowo importuje profile z plików `*_memory.json` (JSONL).
+
+        Uszkodzone linie są pomijane (pozostałe fakty zostają zaimportowane).
+        Każdy plik jest importowany w osobnej transakcji i odnotowywany w
+        tabeli `migrations`, a następnie przenoszony do `legacy_dir/migrated/`
+        jako kopia zapasowa - ponowne uruchomienie niczego nie duplikuje.
+
+        Args:
+            legacy_dir (Path): Katalog z plikami profili
+
+        Returns:
+            int: Liczba zaimportowanych faktów
+        """
+        if not legacy_dir.is_dir():
+            return 0
+        imported = 0
+        for path in sorted(legacy_dir.glob(f"*{LEGACY_SUFFIX}")):
+            migration = f"legacy:{path.name}"
+            key = path.name[:-len(LEGACY_SUFFIX)]
+            mtime = path.stat().st_mtime
+            facts = list(iter_jsonl_facts(path))
+            with self._transaction() as conn:
+                already_done = conn.execute("SELECT 1 FROM migrations WHERE name = ?",
+                                            (migration,)).fetchone() is not None
+                if not already_done:
+                    student_id = self._ensure_student(
+                        conn, display_name_from_key(key), created_at=mtime)
+                    conn.executemany(
+                        "INSERT INTO facts "
+                        "(student_id, fact, source, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [(student_id, fact, SOURCE_LEGACY, mtime, mtime)
+                         for fact in facts],
+                    )
+                    conn.execute(
+                        "INSERT INTO migrations (name, applied_at) VALUES (?, ?)",
+                        (migration, time.time()))
+                    self._touch(conn, student_id)
+                    imported += len(facts)
+            backup_dir = legacy_dir / "migrated"
+            backup_dir.mkdir(exist_ok=True)
+            path.replace(backup_dir / path.name)
+        return imported
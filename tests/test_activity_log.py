@@ -0,0 +1,65 @@
+"""
+Testy dziennika aktywności (sokrates/activity_log.py): odczyt od końca,
+filtry przez indeksy pozycji i rotacja plików.
+"""
+
+from sokrates.activity_log import (
+    EVENT_EXPORT,
+    EVENT_LOGIN,
+    EVENT_TURN,
+    ActivityLog,
+)
+
+
+def _events(records):
+    return [(record["event"], record["student"]) for record in records]
+
+
+def test_tail_returns_newest_first(tmp_path):
+    log = ActivityLog(tmp_path / "activity.log")
+    assert log.tail() == []
+    log.log(EVENT_LOGIN, "Anna")
+    log.log(EVENT_TURN, "Anna", model="gpt-4o-mini")
+    log.log(EVENT_EXPORT, scope="all")
+    records = log.tail(limit=2)
+    assert _events(records) == [(EVENT_EXPORT, ""), (EVENT_TURN, "anna")]
+    assert records[1]["details"] == {"model": "gpt-4o-mini"}
+
+
+def test_filters_by_student_and_event(tmp_path):
+    log = ActivityLog(tmp_path / "activity.log")
+    for i in range(5):
+        log.log(EVENT_TURN, "Anna", turn=i)
+        log.log(EVENT_TURN, "Bartek", turn=i)
+    log.log(EVENT_LOGIN, "Anna")
+    assert [r["details"]["turn"] for r in log.tail(3, student="anna")[1:]] == [4, 3]
+    assert _events(log.tail(10, event=EVENT_LOGIN)) == [(EVENT_LOGIN, "anna")]
+    both = log.tail(10, student="Bartek", event=EVENT_TURN)
+    assert len(both) == 5 and {r["student"] for r in both} == {"bartek"}
+    # Indeks dopisuje tylko nowe linie
+    log.log(EVENT_LOGIN, "Bartek")
+    assert _events(log.tail(1, student="Bartek")) == [(EVENT_LOGIN, "bartek")]
+
+
+def test_rotation_keeps_backups_searchable(tmp_path):
+    path = tmp_path / "activity.log"
+    log = ActivityLog(path, max_bytes=300, backup_count=2)
+    for i in range(12):
+        log.log(EVENT_TURN, "Anna" if i % 2 else "Bartek", turn=i)
+    assert path.with_name("activity.log.1").exists()
+    assert not path.with_name("activity.log.3").exists()
+    turns = [r["details"]["turn"] for r in log.tail(20)]
+    assert turns == sorted(turns, reverse=True) and turns[0] == 11
+    anna = [r["details"]["turn"] for r in log.tail(20, student="Anna")]
+    assert anna == [t for t in turns if t % 2]
+
+
+def test_damaged_lines_are_skipped(tmp_path):
+    path = tmp_path / "activity.log"
+    log = ActivityLog(path)
+    log.log(EVENT_LOGIN, "Anna")
+    with open(path, "ab") as f_log:
+        f_log.write(b"{niepoprawny json\n[1, 2]\n")
+    log.log(EVENT_TURN, "Anna")
+    assert _events(log.tail(10)) == [(EVENT_TURN, "anna"), (EVENT_LOGIN, "anna")]
+    assert len(log.tail(10, student="Anna")) == 2
@@ -0,0 +1,121 @@
+"""
+Testy pamięci podręcznych: LRU profili (sokrates/cache.py) i odpowiedzi
+(sokrates/response_cache.py).
+"""
+
+import sqlite3
+import time
+
+from sokrates.cache import LRUCache
+from sokrates.response_cache import ResponseCache, counter_bucket, response_cache_key
+
+
+def _key(prompt="Co to jest atom?", counter=0, facts=("lubi fizykę",)):
+    return response_cache_key(prompt, counter, "fizyka", [], "", list(facts),
+                              "gpt-4o-mini", "Jesteś Sokratesem.")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_lru_token_mismatch_invalidates_entry():
+    cache = LRUCache()
+    cache.put("anna", ["fakt"], token=1)
+    assert cache.get("anna", token=1) == ["fakt"]
+    assert cache.get("anna", token=2) is None
+    assert cache.get("anna") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_lru_disabled_with_zero_entries():
+    cache = LRUCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_response_cache_key_normalizes_prompt_and_counter():
+    assert _key("Co to jest atom?") == _key("co to jest ATOM")
+    assert _key(counter=0) == _key(counter=2)
+    assert counter_bucket(3) != counter_bucket(2)
+    assert _key(counter=2) != _key(counter=3)
+    assert _key(facts=("lubi fizykę",)) != _key(facts=("lubi chemię",))
+
+
+def test_response_cache_hit_miss_and_saved_tokens():
+    cache = ResponseCache(max_entries=8)
+    key = _key()
+    assert cache.get(key) is None
+    cache.put(key, "A co już wiesz o atomach?", tokens=120)
+    cache.put(_key("pusta"), "")
+    assert cache.get(key) == {"content": "A co już wiesz o atomach?", "tokens": 120}
+    assert cache.get(_key("pusta")) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["saved_tokens"] == 120
+
+
+def test_response_cache_expires_after_ttl():
+    cache = ResponseCache(ttl=-1)
+    cache.put(_key(), "odpowiedź")
+    assert cache.get(_key()) is None
+
+
+def test_response_cache_persists_between_instances(tmp_path):
+    path = tmp_path / "response_cache.db"
+    ResponseCache(path=path).put(_key(), "odpowiedź", tokens=50)
+    reopened = ResponseCache(path=path)
+    assert reopened.get(_key()) == {"content": "odpowiedź", "tokens": 50}
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_response_cache_prunes_over_disk_limit(tmp_path):
+    cache = ResponseCache(path=tmp_path / "response_cache.db", max_disk_entries=2)
+    for i in range(4):
+        cache.put(_key(f"pytanie {i}"), f"odpowiedź {i}")
+    assert cache.prune() == 2
+    cache.memory.clear()
+    assert cache.get(_key("pytanie 0")) is None
+    assert cache.get(_key("pytanie 3")) == {"content": "odpowiedź 3", "tokens": 0}
+
+
+def test_lru_invalidate_where():
+    cache = LRUCache()
+    for key in ("anna:1", "anna:2", "bartek:1"):
+        cache.put(key, key.split(":")[0])
+    assert cache.invalidate_where(lambda key, value: value == "anna") == 2
+    assert cache.get("anna:1") is None and cache.get("bartek:1") == "bartek"
+
+
+def test_response_cache_forgets_student_replies(tmp_path):
+    cache = ResponseCache(path=tmp_path / "response_cache.db")
+    cache.put(_key("pytanie Anny"), "odpowiedź", student="anna")
+    cache.put(_key("pytanie Bartka"), "odpowiedź", student="bartek")
+    assert cache.forget_student("anna") == 2  # w pamięci i w pliku
+    assert cache.get(_key("pytanie Anny")) is None
+    reopened = ResponseCache(path=tmp_path / "response_cache.db")
+    assert reopened.get(_key("pytanie Anny")) is None
+    assert reopened.get(_key("pytanie Bartka")) is not None
+
+
+def test_response_cache_upgrades_file_without_student_column(tmp_path):
+    path = tmp_path / "response_cache.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, content TEXT NOT NULL, "
+                 "tokens INTEGER NOT NULL DEFAULT 0, expires_at REAL NOT NULL, "
+                 "last_used REAL NOT NULL)")
+    conn.execute("INSERT INTO responses VALUES (?, 'stara odpowiedź', 5, ?, ?)",
+                 (_key(), time.time() + 60, time.time()))
+    conn.commit()
+    conn.close()
+    cache = ResponseCache(path=path)
+    assert cache.get(_key()) == {"content": "stara odpowiedź", "tokens": 5}
+    cache.put(_key("nowe"), "odpowiedź", student="anna")
+    assert cache.forget_student("anna") == 2
@@ -0,0 +1,91 @@
+"""
+Testy scalania podobnych faktów i limitu profilu (sokrates/consolidation.py).
+"""
+
+import pytest
+
+from sokrates.consolidation import (
+    consolidate_all,
+    consolidate_student,
+    normalize_fact,
+    plan_consolidation,
+    shingles,
+    similarity,
+)
+from sokrates.storage import ProfileStore
+
+
+def _records(*facts):
+    return [{"id": index + 1, "fact": fact} for index, fact in enumerate(facts)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProfileStore(tmp_path / "sokrates.db")
+    yield store
+    store.close()
+
+
+def test_normalize_and_similarity():
+    assert normalize_fact("Uczeń LUBI  biologię!") == "uczen lubi biologie"
+    same = similarity(shingles("Lubi biologię."), shingles("lubi biologie"))
+    assert same == 1.0
+    assert similarity(shingles("lubi biologię"), shingles("gra w szachy")) < 0.2
+
+
+def test_full_mode_keeps_newest_wording_of_duplicates():
+    records = _records("Uczeń lubi biologię", "gra w szachy", "uczen lubi biologie!")
+    assert plan_consolidation(records) == [1]
+
+
+def test_limit_drops_oldest_facts():
+    records = _records("pierwszy fakt", "drugi temat", "trzecia rzecz",
+                       "czwarta sprawa")
+    assert plan_consolidation(records, max_facts=2) == [1, 2]
+    assert plan_consolidation(records, max_facts=0) == []
+
+
+def test_incremental_mode_compares_only_pairs_with_new_facts():
+    records = _records("lubi biologię", "lubi biologie", "gra w szachy",
+                       "Lubi biologię.")
+    # Duplikat sprzed zapisu (1, 2) zostaje, nowy fakt 4 wchłania oba starsze
+    assert plan_consolidation(records, new_ids=[3]) == []
+    assert plan_consolidation(records, new_ids=[4]) == [1, 2]
+    assert plan_consolidation(records) == [1, 2]
+
+
+def test_incremental_mode_matches_full_mode_for_new_facts():
+    facts = [f"uczeń lubi temat numer {i}" for i in range(40)] + ["gra w szachy"]
+    records = _records(*facts, "Gra w szachy!")
+    new_id = records[-1]["id"]
+    full = set(plan_consolidation(records, threshold=0.9, max_facts=0))
+    incremental = plan_consolidation(records, threshold=0.9, max_facts=0,
+                                     new_ids=[new_id])
+    assert incremental == [new_id - 1]
+    assert set(incremental) <= full
+
+
+def test_consolidate_student_and_all(store):
+    store.add_fact("Anna", "lubi biologię")
+    new_id = store.add_fact("Anna", "Lubi biologię!")
+    store.add_fact("Bartek", "gra w szachy")
+    store.add_fact("Bartek", "gra w szachy.")
+    assert consolidate_student(store, "Anna", new_ids=[new_id]) == 1
+    assert store.list_facts("Anna") == ["Lubi biologię!"]
+    locked = []
+    result = consolidate_all(store, lock=lambda key: _Recorder(locked, key))
+    assert result == {"students": 2, "removed": 1}
+    assert locked == ["anna", "bartek"]
+    assert store.list_facts("Bartek") == ["gra w szachy."]
+
+
+class _Recorder:
+    def __init__(self, locked, key):
+        self.locked = locked
+        self.key = key
+
+    def __enter__(self):
+        self.locked.append(self.key)
+
+    def __exit__(self, *exc_info):
+        return False
@@ -0,0 +1,82 @@
+"""
+Testy doboru kontekstu w budżecie tokenów (sokrates/context.py).
+"""
+
+from sokrates.context import (
+    ContextBudget,
+    count_message_tokens,
+    count_tokens,
+    fold_into_summary,
+    select_context,
+    truncate_to_tokens,
+)
+
+
+def _turns(count):
+    return [{"role": "user" if i % 2 == 0 else "assistant",
+             "content": f"wypowiedź numer {i} o fotosyntezie"} for i in range(count)]
+
+
+def test_count_tokens_words_and_punctuation():
+    assert count_tokens("") == 0
+    assert count_tokens("Ala ma kota.") == 5
+    assert count_tokens("fotosynteza") > 1
+
+
+def test_count_message_tokens_adds_overhead():
+    message = {"role": "user", "content": "Ala ma kota."}
+    assert count_message_tokens(message) == count_tokens("Ala ma kota.") + 4
+
+
+def test_truncate_to_tokens():
+    text = "jeden dwa trzy cztery pięć"
+    assert truncate_to_tokens(text, 100) == text
+    truncated = truncate_to_tokens(text, 3)
+    assert truncated.endswith("…")
+    assert count_tokens(truncated) <= 3
+
+
+def test_select_context_keeps_newest_turns_within_budget():
+    history = _turns(20)
+    budget = ContextBudget(total=120, profile_share=0.25)
+    selection = select_context(10, ["lubi biologię"], history, "nowe pytanie", budget)
+    assert selection.facts == ["lubi biologię"]
+    assert selection.tokens <= budget.total
+    assert selection.history == history[selection.window_start:]
+    assert 0 < selection.window_start < len(history)
+
+
+def test_select_context_limits_facts_to_profile_share():
+    facts = [f"fakt numer {i}" for i in range(50)]
+    budget = ContextBudget(total=200, profile_share=0.1)
+    selection = select_context(10, facts, [], "pytanie", budget)
+    assert selection.facts == facts[:len(selection.facts)]
+    assert sum(count_tokens(fact) + 1 for fact in selection.facts) <= 20
+
+
+def test_select_context_respects_min_start():
+    history = _turns(6)
+    selection = select_context(0, [], history, "pytanie", ContextBudget(total=3000),
+                               min_start=4)
+    assert selection.window_start == 4
+    assert selection.history == history[4:]
+
+
+def test_select_context_window_moves_with_slack():
+    history = _turns(30)
+    budget = ContextBudget(total=150, window_slack=0.25)
+    first = select_context(0, [], history, "pytanie", budget)
+    # Kolejna tura nie przesuwa okna - początek zapytania zostaje ten sam
+    second = select_context(0, [], history + _turns(2), "pytanie", budget,
+                            min_start=first.window_start)
+    assert second.window_start == first.window_start
+
+
+def test_fold_into_summary_keeps_first_sentences_within_limit():
+    turns = [{"role": "user", "content": "Co to jest atom? I dlaczego jest mały."},
+             {"role": "assistant", "content": "Dobre pytanie."}]
+    summary = fold_into_summary("", turns, 100)
+    assert summary == "Uczeń: Co to jest atom?\nSokrates: Dobre pytanie."
+    trimmed = fold_into_summary(summary, turns, 12)
+    assert count_tokens(trimmed) <= 12
+    assert trimmed.endswith("Sokrates: Dobre pytanie.")
@@ -0,0 +1,196 @@
+"""
+Testy silnika rozmowy (sokrates/engine.py) - bez sieci.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIConnectionError
+
+from sokrates.context import ContextBudget
+from sokrates.engine import EngineConfig, SocraticEngine, StudentState
+from sokrates.history import ConversationStore
+from sokrates.response_cache import ResponseCache
+from sokrates.shared_state import LocalState
+from sokrates.storage import ProfileStore
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _usage():
+    return SimpleNamespace(prompt_tokens=100, completion_tokens=20, total_tokens=120,
+                           prompt_tokens_details=None)
+
+
+def _chunk(text=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class _FakeStream:
+    """
+    Strumień odpowiedzi: dwa fragmenty tekstu i fragment z zużyciem tokenów.
+    """
+
+    def __init__(self, text):
+        self.chunks = [_chunk(text[:5]), _chunk(text[5:]), _chunk(usage=_usage())]
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class _AsyncFakeStream(_FakeStream):
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeClient:
+    """
+    Atrapa klienta OpenAI: `chat.completions.create` zwraca podane odpowiedzi
+    (lub zgłasza podany wyjątek) i zapamiętuje argumenty wywołań.
+    """
+    stream_class = _FakeStream
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.streams = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        if kwargs.get("stream"):
+            self.streams.append(self.stream_class(reply))
+            return self.streams[-1]
+        message = SimpleNamespace(content=reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               usage=_usage())
+
+
+class _AsyncFakeClient(_FakeClient):
+    stream_class = _AsyncFakeStream
+
+    async def create(self, **kwargs):
+        return super().create(**kwargs)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    store = ProfileStore(tmp_path / "sokrates.db")
+    history = ConversationStore(tmp_path / "history.db")
+    engine = SocraticEngine(store, history=history, shared=LocalState(),
+                            response_cache=ResponseCache(max_entries=8))
+    yield engine
+    history.close()
+    store.close()
+
+
+def test_delete_student_drops_profile_history_and_caches(engine):
+    engine.store.add_fact("Anna", "lubi biologię")
+    engine.history.append("Anna", [{"role": "user", "content": "Cześć"}])
+    assert engine.retriever.select("Anna", "biologia")
+    engine.response_cache.put("klucz", "odpowiedź", student="anna")
+    assert engine.delete_student("Anna")
+    assert engine.store.list_facts("Anna") == []
+    assert engine.history.count("Anna") == 0
+    assert engine.retriever.select("Anna", "biologia") == []
+    assert engine.response_cache.get("klucz") is None
+    assert not engine.delete_student("Anna")
+
+
+def test_failed_turn_restores_counter_and_summary(engine):
+    engine.config = EngineConfig(budget=ContextBudget(total=400, summary_tokens=60))
+    state = StudentState(student_name="Anna", nie_wiem_counter=1)
+    for i in range(12):
+        state.messages.append({"role": "user", "content": f"pytanie {i} " * 20})
+        state.messages.append({"role": "assistant", "content": f"odpowiedź {i} " * 20})
+    before = (list(state.messages), state.conversation_summary, state.summary_upto)
+    client = _FakeClient(APIConnectionError(request=_REQUEST))
+    result = engine.reply(state, "nie wiem", client=client)
+    assert result["error"] and client.calls
+    assert result["context"]["summarized_turns"] > 0  # tura przesunęła okno rozmowy
+    assert state.nie_wiem_counter == 1
+    assert (state.messages, state.conversation_summary, state.summary_upto) == before
+    assert engine.history.count("Anna") == 0
+
+
+def test_reply_appends_turn_to_state_and_history(engine):
+    engine.store.add_fact("Anna", "lubi biologię")
+    state = StudentState(student_name="Anna", current_topic="biologia")
+    client = _FakeClient("A co już wiesz o komórce?")
+    result = engine.reply(state, "Czym jest komórka?", client=client)
+    assert "error" not in result
+    assert result["content"] == "A co już wiesz o komórce?"
+    assert result["metrics"]["streamed"] is False
+    assert result["context"]["facts"] == 1
+    sent = client.calls[0]["messages"]
+    assert sent[0]["role"] == "system" and sent[-1]["content"] == "Czym jest komórka?"
+    assert "lubi biologię" in sent[-2]["content"]
+    assert [m["role"] for m in state.messages] == ["user", "assistant"]
+    assert engine.history.count("Anna") == 2
+
+
+def test_reply_updates_dont_know_counter(engine):
+    state = StudentState(student_name="Anna")
+    engine.reply(state, "nie wiem", client=_FakeClient("Pomyśl o..."))
+    engine.reply(state, "nie mam pojęcia", client=_FakeClient("A może..."))
+    assert state.nie_wiem_counter == 2
+    engine.reply(state, "pomocy", client=_FakeClient("Podpowiem..."))
+    assert state.nie_wiem_counter == 2
+    engine.reply(state, "To jest mitochondrium", client=_FakeClient("Brawo!"))
+    assert state.nie_wiem_counter == 0
+
+
+def test_repeated_turn_is_served_from_cache(engine):
+    client = _FakeClient("Co już wiesz o atomach?", "Od czego zaczniesz?")
+    first = engine.reply(StudentState(), "Co to jest atom?", client=client)
+    again = engine.reply(StudentState(), "co to jest atom", client=client)
+    assert again["content"] == first["content"] and again["metrics"]["cached"]
+    assert len(client.calls) == 1
+    fresh = engine.reply(StudentState(), "Co to jest atom?", client=client,
+                         use_cache=False)
+    assert fresh["content"] == "Od czego zaczniesz?" and len(client.calls) == 2
+
+
+def test_reply_streams_tokens(engine):
+    client = _FakeClient("Zastanów się, co już wiesz.")
+    parts = []
+    result = engine.reply(StudentState(), "Co to jest atom?", client=client,
+                          on_token=parts.append)
+    assert "".join(parts) == result["content"] == "Zastanów się, co już wiesz."
+    assert result["metrics"]["streamed"] and result["usage"].total_tokens == 120
+    assert client.calls[0]["stream"] and client.streams[0].closed
+
+
+def test_areply_with_async_client(engine):
+    client = _AsyncFakeClient("Co już wiesz o atomach?", "Zastanów się.")
+    state = StudentState(student_name="Anna")
+    result = asyncio.run(engine.areply(state, "Co to jest atom?", client=client))
+    assert result["content"] == "Co już wiesz o atomach?"
+    parts = []
+    result = asyncio.run(engine.areply(state, "A elektron?", client=client,
+                                       on_token=parts.append))
+    assert "".join(parts) == result["content"] == "Zastanów się."
+    assert client.streams[0].closed
+    assert len(state.messages) == 4 and engine.history.count("Anna") == 4
+
+
+def test_async_failed_turn_is_rolled_back(engine):
+    state = StudentState(student_name="Anna", nie_wiem_counter=3)
+    client = _AsyncFakeClient(APIConnectionError(request=_REQUEST))
+    result = asyncio.run(engine.areply(state, "nie wiem", client=client))
+    assert result["error"].startswith("Błąd podczas komunikacji z AI")
+    assert state.messages == [] and state.nie_wiem_counter == 3
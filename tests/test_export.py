@@ -0,0 +1,50 @@
+"""
+Testy eksportu profili (sokrates/export.py).
+"""
+
+import io
+import json
+import zipfile
+
+import pytest
+
+from sokrates.export import ProfilesArchive, write_profiles_zip
+from sokrates.storage import ProfileStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProfileStore(tmp_path / "sokrates.db")
+    yield store
+    store.close()
+
+
+def _read_zip(source):
+    with zipfile.ZipFile(source) as zipf:
+        return {name: [json.loads(line)["fact"]
+                       for line in zipf.read(name).decode("utf-8").splitlines()]
+                for name in zipf.namelist()}
+
+
+def test_zip_holds_one_file_per_student(store):
+    store.add_fact("Anna", "lubi biologię")
+    store.add_fact("Anna", "ćwiczy na przykładach")
+    store.add_fact("Bartek", "gra w szachy")
+    buffer = io.BytesIO()
+    assert write_profiles_zip(store, buffer) == 2
+    assert _read_zip(buffer) == {
+        "anna_memory.json": ["lubi biologię", "ćwiczy na przykładach"],
+        "bartek_memory.json": ["gra w szachy"],
+    }
+
+
+def test_archive_is_reused_until_profiles_change(store, tmp_path):
+    archive = ProfilesArchive(store, tmp_path / "exports")
+    store.add_fact("Anna", "lubi biologię")
+    first = archive.path()
+    assert archive.path() == first
+    store.add_fact("Bartek", "gra w szachy")
+    second = archive.path()
+    assert second != first and not first.exists()
+    assert set(_read_zip(second)) == {"anna_memory.json", "bartek_memory.json"}
+    assert [p.name for p in (tmp_path / "exports").iterdir()] == [second.name]
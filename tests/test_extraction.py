@@ -0,0 +1,113 @@
+"""
+Testy wydobywania faktów w tle (sokrates/extraction.py) - bez sieci.
+"""
+
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+from openai import APIConnectionError
+
+from sokrates.extraction import (
+    EXTRACTION_PROMPT,
+    FactExtractionPipeline,
+    extract_facts,
+    parse_facts,
+)
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+class _FakeClient:
+    """
+    Atrapa klienta OpenAI zwracająca kolejno podane odpowiedzi lub wyjątki
+    (ostatnia powtarza się przy kolejnych wywołaniach).
+    """
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, Exception):
+            raise reply
+        message = SimpleNamespace(content=json.dumps({"facts": reply}))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def _pipeline(**kwargs):
+    return FactExtractionPipeline(max_workers=1, max_retries=2, retry_delay=0.001,
+                                  **kwargs)
+
+
+def _wait(pipeline, timeout=5.0):
+    end = time.monotonic() + timeout
+    while pipeline.stats()["running"] and time.monotonic() < end:
+        time.sleep(0.005)
+    return pipeline.stats()
+
+
+def test_parse_facts():
+    assert parse_facts('{"facts": ["lubi biologię", " "]}') == ["lubi biologię"]
+    assert parse_facts('{"facts": null}') == []
+    bullets = "- lubi biologię\n• gra w szachy\n"
+    assert parse_facts(bullets) == ["lubi biologię", "gra w szachy"]
+    assert parse_facts("") == []
+
+
+def test_extract_facts_sends_one_json_request():
+    client = _FakeClient(["lubi biologię"])
+    assert extract_facts(client, "gpt-4o-mini", "Lubię biologię") == ["lubi biologię"]
+    call = client.calls[0]
+    assert call["response_format"] == {"type": "json_object"}
+    assert call["messages"][0]["content"] == EXTRACTION_PROMPT
+    assert call["messages"][1]["content"] == "Lubię biologię"
+
+
+def test_transient_error_is_retried():
+    pipeline = _pipeline()
+    client = _FakeClient(APIConnectionError(request=_REQUEST), ["lubi biologię"])
+    pipeline.submit("Anna", ["Lubię biologię", " "], client, "gpt-4o-mini")
+    stats = _wait(pipeline)
+    assert pipeline.pop_results("anna") == ["lubi biologię"]
+    assert stats["retries"] == 1 and stats["batches"] == 1 and stats["turns"] == 1
+    assert stats["dropped_turns"] == 0
+    assert len(client.calls) == 2
+
+
+def test_batch_is_dropped_after_retries_and_worker_stays_alive():
+    pipeline = _pipeline()
+    failing = _FakeClient(APIConnectionError(request=_REQUEST))
+    pipeline.submit("Anna", ["pierwsza", "druga"], failing, "gpt-4o-mini")
+    stats = _wait(pipeline)
+    assert len(failing.calls) == 3
+    assert stats["retries"] == 2 and stats["dropped_turns"] == 2
+    assert stats["running"] == 0
+    pipeline.submit("Anna", ["trzecia"], _FakeClient(["gra w szachy"]), "gpt-4o-mini")
+    _wait(pipeline)
+    assert pipeline.pop_results("Anna") == ["gra w szachy"]
+
+
+def test_unexpected_errors_do_not_stop_the_worker():
+    received = []
+
+    def on_facts(student, facts):
+        if facts == ["zły fakt"]:
+            raise RuntimeError("zapis nieudany")
+        received.append((student, facts))
+
+    pipeline = _pipeline(on_facts=on_facts)
+    pipeline.submit("Anna", ["zepsuta"], _FakeClient(ValueError("zły JSON")),
+                    "gpt-4o-mini")
+    _wait(pipeline)
+    pipeline.submit("Anna", ["wypowiedź"], _FakeClient(["zły fakt"]), "gpt-4o-mini")
+    _wait(pipeline)
+    pipeline.submit("Anna", ["kolejna"], _FakeClient(["lubi fizykę"]), "gpt-4o-mini")
+    stats = _wait(pipeline)
+    assert received == [("Anna", ["lubi fizykę"])]
+    assert stats["errors"] == 2 and stats["dropped_turns"] == 1
+    assert stats["retries"] == 0 and stats["batches"] == 2
@@ -0,0 +1,156 @@
+"""
+Testy terminów tury i zapytań zabezpieczających (sokrates/hedging.py).
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from sokrates.hedging import (
+    AttemptCancelled,
+    Deadline,
+    DeadlineExceededError,
+    HedgeController,
+    HedgePolicy,
+    ahedged_call,
+    hedged_call,
+)
+
+
+def _hedger(samples=(0.01,), tokens=1000):
+    hedger = HedgeController(HedgePolicy(min_samples=1, min_delay_s=0.05))
+    for seconds in samples:
+        hedger.observe(seconds)
+    hedger.charge(tokens)
+    return hedger
+
+
+def test_deadline():
+    assert Deadline().remaining() is None and not Deadline(0).expired()
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    assert deadline.expired() and deadline.remaining() == 0.0
+    with pytest.raises(DeadlineExceededError):
+        deadline.check()
+
+
+def test_delay_needs_samples_and_budget():
+    hedger = HedgeController(HedgePolicy(min_samples=3, min_delay_s=0.05))
+    hedger.charge(1000)
+    hedger.observe(0.2)
+    assert hedger.delay() is None
+    hedger.observe(0.3)
+    hedger.observe(0.4)
+    assert 0.2 <= hedger.delay() <= 0.4
+    hedger.charge(0, extra_tokens=500)  # dodatkowe tokeny ponad 10% wszystkich
+    assert hedger.delay() is None and not hedger.fire()
+    assert hedger.stats()["skipped_budget"] == 2
+
+
+def test_without_threshold_runs_in_calling_thread():
+    threads = []
+
+    def func(attempt):
+        threads.append(threading.current_thread())
+        attempt.sent()
+        return "odpowiedź"
+
+    result, race = hedged_call(func, hedge_after=None, hedger=_hedger())
+    assert result == "odpowiedź" and race == {"hedged": False, "hedge_won": False}
+    assert threads == [threading.current_thread()]
+
+
+def test_hedge_wins_race_and_loser_is_cancelled():
+    hedger = _hedger()
+    cancelled = threading.Event()
+    tokens = []
+
+    def func(attempt):
+        attempt.sent()
+        if attempt.index == 1:
+            attempt.emit("szybka ")
+            return "zabezpieczenie"
+        try:
+            for _ in range(200):  # wolny strumień sprawdzający anulowanie
+                time.sleep(0.01)
+                attempt.check()
+        except AttemptCancelled:
+            cancelled.set()
+            raise
+        return "pierwsza"
+
+    result, race = hedged_call(func, on_token=tokens.append, hedge_after=hedger.delay(),
+                               hedger=hedger)
+    assert result == "zabezpieczenie" and race == {"hedged": True, "hedge_won": True}
+    assert tokens == ["szybka "]
+    assert cancelled.wait(1.0)
+    assert hedger.stats()["fired"] == 1
+
+
+def test_fast_first_attempt_sends_no_hedge():
+    hedger = _hedger()
+
+    def func(attempt):
+        attempt.sent()
+        return attempt.index
+
+    result, race = hedged_call(func, hedge_after=hedger.delay(), hedger=hedger)
+    assert result == 0 and not race["hedged"]
+    assert hedger.stats()["fired"] == 0
+
+
+def test_deadline_ends_race_and_cancels_attempts():
+    hedger = _hedger()
+    cancelled = threading.Event()
+
+    def func(attempt):
+        attempt.sent()
+        try:
+            while True:
+                time.sleep(0.01)
+                attempt.check()
+        except AttemptCancelled:
+            cancelled.set()
+            raise
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        hedged_call(func, deadline=Deadline(0.2), hedge_after=hedger.delay(),
+                    hedger=hedger)
+    assert time.monotonic() - start < 0.5
+    assert cancelled.wait(1.0)
+
+
+def test_async_hedge_wins_race_and_loser_task_is_cancelled():
+    hedger = _hedger()
+    cancelled = []
+
+    async def func(attempt):
+        attempt.sent()
+        if attempt.index == 1:
+            return "zabezpieczenie"
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(attempt.index)
+            raise
+        return "pierwsza"
+
+    async def main():
+        result = await ahedged_call(func, hedge_after=hedger.delay(), hedger=hedger)
+        await asyncio.sleep(0)
+        return result
+
+    result, race = asyncio.run(main())
+    assert result == "zabezpieczenie" and race["hedge_won"]
+    assert cancelled == [0]
+
+
+def test_async_deadline_without_hedge():
+    async def func(attempt):
+        await asyncio.sleep(5)
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(ahedged_call(func, deadline=Deadline(0.05)))
@@ -0,0 +1,82 @@
+"""
+Testy historii rozmów (sokrates/history.py) i okna rozmowy w stanie
+ucznia (`SocraticEngine.restore_conversation`).
+"""
+
+import sqlite3
+
+import pytest
+
+from sokrates.engine import EngineConfig, SocraticEngine, StudentState
+from sokrates.history import ConversationStore
+from sokrates.storage import ProfileStore
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = ConversationStore(tmp_path / "conversations.db")
+    yield history
+    history.close()
+
+
+def _turns(start, count):
+    messages = []
+    for i in range(start, start + count):
+        messages.append({"role": "user", "content": f"pytanie {i}"})
+        messages.append({"role": "assistant", "content": f"odpowiedź {i}",
+                         "metrics": {"latency_s": 0.5}})
+    return messages
+
+
+def test_append_numbers_messages_per_student(history):
+    assert history.append("Anna", _turns(0, 2)) == 4
+    assert history.append("anna", _turns(2, 1)) == 6
+    assert history.append("Bartek", _turns(0, 1)) == 2
+    assert history.count("Anna") == 6 and history.count("Cezary") == 0
+    last = history.page("Anna", limit=1)
+    assert last == [{"role": "assistant", "content": "odpowiedź 2", "seq": 5,
+                     "metrics": {"latency_s": 0.5}}]
+
+
+def test_pages_walk_back_through_conversation(history):
+    history.append("Anna", _turns(0, 5))
+    newest = history.page("Anna", limit=4)
+    assert [m["seq"] for m in newest] == [6, 7, 8, 9]
+    older = history.page("Anna", before=newest[0]["seq"], limit=4)
+    assert [m["seq"] for m in older] == [2, 3, 4, 5]
+    assert [m["seq"] for m in history.page("Anna", before=2, limit=4)] == [0, 1]
+    assert history.page("Anna", limit=0) == []
+
+
+def test_messages_are_append_only_and_deleted_per_student(history):
+    history.append("Anna", _turns(0, 1))
+    history.append("Bartek", _turns(0, 1))
+    with pytest.raises(sqlite3.DatabaseError):
+        history._connection().execute("UPDATE messages SET content = 'zmiana'")
+    assert history.delete_student("Anna") == 2
+    assert history.count("Anna") == 0 and history.count("Bartek") == 2
+
+
+def test_restore_conversation_loads_last_window(tmp_path, history):
+    store = ProfileStore(tmp_path / "sokrates.db")
+    engine = SocraticEngine(store, EngineConfig(history_window=4), history=history)
+    history.append("Anna", _turns(0, 5))
+    state = StudentState(student_name="Anna", nie_wiem_counter=3)
+    engine.restore_conversation(state)
+    assert [m["content"] for m in state.messages] == ["pytanie 3", "odpowiedź 3",
+                                                      "pytanie 4", "odpowiedź 4"]
+    assert state.history_offset == 6 and state.nie_wiem_counter == 0
+    engine.restore_conversation(StudentState())
+    store.close()
+
+
+def test_trimmed_messages_move_to_summary(tmp_path):
+    store = ProfileStore(tmp_path / "sokrates.db")
+    engine = SocraticEngine(store, EngineConfig(history_window=4))
+    state = StudentState(messages=_turns(0, 3))
+    engine._trim_history(state)
+    assert [m["content"] for m in state.messages] == ["pytanie 1", "odpowiedź 1",
+                                                      "pytanie 2", "odpowiedź 2"]
+    assert state.history_offset == 2 and state.summary_upto == 0
+    assert "pytanie 0" in state.conversation_summary
+    store.close()
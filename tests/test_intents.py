@@ -0,0 +1,78 @@
+"""
+Testy rozpoznawania intencji ucznia (sokrates/intents.py) na korpusie benchmarku.
+"""
+
+import pytest
+
+from benchmarks.intent_corpus import CORPUS, LEGACY_HELP_PHRASES, legacy_classify
+from sokrates.intents import (
+    INTENT_DONT_KNOW,
+    INTENT_HELP,
+    INTENT_OTHER,
+    IntentMatcher,
+    compile_phrases,
+    fold_text,
+)
+
+MATCHER = IntentMatcher()
+
+
+@pytest.mark.parametrize("text, intent", CORPUS)
+def test_default_phrases_classify_corpus(text, intent):
+    assert MATCHER.classify(text) == intent
+
+
+def test_fold_text_removes_diacritics():
+    assert fold_text("Nie mam POJĘCIA, źdźbło łąki") == "nie mam pojecia, zdzblo laki"
+
+
+def test_phrase_without_diacritics_matches_both_spellings():
+    pattern = compile_phrases(["pojecia"])
+    assert pattern.search("pojęcia")
+    assert pattern.search("pojecia")
+
+
+def test_endings_in_parentheses_are_the_only_inflections():
+    matcher = IntentMatcher(dont_know_phrases=["nie znam(|y)"], help_phrases=[])
+    assert matcher.classify("nie znamy") == INTENT_DONT_KNOW
+    assert matcher.classify("nie znamienny") == INTENT_OTHER
+
+
+def test_star_allows_any_ending():
+    matcher = IntentMatcher(dont_know_phrases=["nie znam*"], help_phrases=[])
+    assert matcher.classify("nie znamienny") == INTENT_DONT_KNOW
+
+
+def test_trailing_dot_requires_end_of_sentence():
+    matcher = IntentMatcher(dont_know_phrases=["nie rozumiem."], help_phrases=[])
+    assert matcher.classify("Nie rozumiem!") == INTENT_DONT_KNOW
+    assert matcher.classify("nie rozumiem czemu, ale to tlen") == INTENT_OTHER
+
+
+def test_custom_help_phrases_and_empty_dictionary():
+    matcher = IntentMatcher(dont_know_phrases=[], help_phrases=["ratunku"])
+    assert matcher.classify("Ratunku!") == INTENT_HELP
+    assert matcher.classify("nie wiem") == INTENT_OTHER
+    assert compile_phrases([]) is None
+
+
+@pytest.mark.parametrize("text", [
+    "pomóż mi z tym pytaniem",
+    "mam problem z pytaniem",
+    "Mam pytanie do zadania",
+    "utknąłem na pytaniu, pomocy",
+    "Pomocy!",
+    "wyjaśnijcie mi to",
+])
+def test_help_phrases_cover_legacy_substrings(text):
+    # Regresja: prośba rozpoznana przez dawne podciągi nadal jest prośbą o pomoc
+    assert any(phrase in text.lower() for phrase in LEGACY_HELP_PHRASES)
+    assert legacy_classify(text) == INTENT_HELP
+    assert MATCHER.classify(text) == INTENT_HELP
+
+
+def test_help_phrases_cover_question_inflections():
+    for text in ("pytanie", "pytania", "pytaniem", "pytaniu", "pytaniach", "pytaniami",
+                 "pytań"):
+        assert MATCHER.classify(f"mam kłopot z {text}") == INTENT_HELP, text
+    assert MATCHER.classify("zapytanie ofertowe") == INTENT_OTHER
@@ -0,0 +1,103 @@
+"""
+Testy rejestru wywołań API (sokrates/metrics.py): percentyle, koszt i raporty.
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from sokrates.metrics import (
+    KIND_CHAT,
+    KIND_VERIFY,
+    MetricsStore,
+    percentile,
+    price_usd,
+    usage_tokens,
+)
+
+MINI = "gpt-4o-mini"
+PRICING = {MINI: {"input_tokens": 1e-6, "output_tokens": 4e-6,
+                  "cached_input_tokens": 0.5e-6}}
+
+
+@pytest.fixture
+def metrics(tmp_path):
+    return MetricsStore(tmp_path / "metrics.db", pricing=PRICING, usd_to_pln=4.0)
+
+
+def _usage(prompt, completion, cached=0):
+    return {"prompt_tokens": prompt, "completion_tokens": completion,
+            "prompt_tokens_details": {"cached_tokens": cached}}
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([0.3], 99) == 0.3
+    assert percentile([], 50) is None
+
+
+def test_usage_tokens_and_price():
+    tokens = usage_tokens(_usage(1000, 100, cached=400))
+    assert tokens == {"prompt_tokens": 1000, "completion_tokens": 100,
+                      "cached_tokens": 400}
+    assert usage_tokens(None)["prompt_tokens"] == 0
+    cost = 600 * 1e-6 + 400 * 0.5e-6 + 100 * 4e-6
+    assert price_usd(PRICING[MINI], tokens) == pytest.approx(cost)
+    assert price_usd(None, tokens) == 0.0
+
+
+def test_latency_summary_skips_errors_and_cache_hits(metrics):
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        metrics.record(KIND_CHAT, MINI, latency, usage=_usage(100, 10))
+    metrics.record(KIND_CHAT, MINI, 9.0, error="APITimeoutError")
+    metrics.record(KIND_CHAT, MINI, 0.0, cache_hit=True)
+    metrics.record(KIND_VERIFY, MINI, 0.05)
+    summary = {item["kind"]: item for item in metrics.latency_summary(0)}
+    chat = summary[KIND_CHAT]
+    assert (chat["calls"], chat["errors"], chat["cache_hits"]) == (6, 1, 1)
+    assert (chat["p50_ms"], chat["p95_ms"], chat["p99_ms"]) == (200, 400, 400)
+    assert summary[KIND_VERIFY]["p50_ms"] == 50
+    assert metrics.latency_summary(time.time() + 60) == []
+
+
+def test_tokens_per_turn_and_routing_summary(metrics):
+    metrics.record(KIND_CHAT, MINI, 0.2, usage=_usage(1000, 100, cached=500),
+                   route="default")
+    metrics.record(KIND_CHAT, MINI, 0.4, usage=_usage(1000, 100), route="default")
+    metrics.record(KIND_CHAT, "gpt-4o", 1.0, usage=_usage(2000, 400),
+                   route="full_answer")
+    turns = metrics.tokens_per_turn(0)
+    assert turns["turns"] == 3 and turns["avg_completion"] == 200
+    assert turns["cached_share"] == pytest.approx(500 / 4000)
+    assert turns["cache_hit_rate"] == pytest.approx(1 / 3)
+    routes = metrics.routing_summary(0)
+    assert [(r["model"], r["route"], r["calls"]) for r in routes] == [
+        ("gpt-4o-mini", "default", 2), ("gpt-4o", "full_answer", 1)]
+    assert routes[0]["p50_ms"] == 200 and routes[1]["cost_pln"] == 0.0
+
+
+def test_cost_by_student_day(metrics):
+    metrics.record(KIND_CHAT, MINI, 0.1, usage=_usage(1000, 0), student="Anna")
+    metrics.record(KIND_CHAT, MINI, 0.1, usage=_usage(3000, 0), student="Bartek")
+    metrics.record(KIND_VERIFY, MINI, 0.1, usage=_usage(1000, 0), student="Anna")
+    rows = metrics.cost_by_student_day(time.time() - 60)
+    assert [(r["student"], r["calls"], r["tokens"]) for r in rows] == [
+        ("bartek", 1, 3000), ("anna", 2, 2000)]
+    assert rows[0]["cost_pln"] == pytest.approx(3000 * 1e-6 * 4.0)
+
+
+def test_track_records_errors_and_table_is_append_only(metrics):
+    with pytest.raises(ValueError):
+        with metrics.track(KIND_CHAT, MINI, "Anna", route="default"):
+            raise ValueError("zła odpowiedź")
+    with metrics.track(KIND_CHAT, MINI, "Anna") as call:
+        call["usage"] = _usage(10, 5)
+    conn = metrics._connection()
+    rows = conn.execute("SELECT error, prompt_tokens FROM calls ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [("ValueError", 0), (None, 10)]
+    with pytest.raises(sqlite3.DatabaseError):
+        conn.execute("DELETE FROM calls")
@@ -0,0 +1,156 @@
+"""
+Testy harmonogramu zapytań do API (sokrates/ratelimit.py) - bez sieci.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import APIConnectionError, BadRequestError, RateLimitError
+
+from sokrates.hedging import Deadline, DeadlineExceededError
+from sokrates.ratelimit import (
+    WAIT_CONCURRENCY,
+    WAIT_RETRY,
+    QueueTimeoutError,
+    RateLimiter,
+    TokenBucket,
+)
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _status_error(cls, status, headers=None):
+    response = httpx.Response(status, headers=headers or {}, request=_REQUEST)
+    return cls("błąd", response=response, body=None)
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=60, burst_s=2.0)
+    now = bucket.updated
+    assert bucket.wait_time(2, now) == 0.0
+    bucket.take(2, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == pytest.approx(0.0)
+
+
+def test_token_bucket_give_back_and_unlimited():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    bucket.take(1, now)
+    bucket.give_back(1, now)
+    assert bucket.wait_time(1, now) == 0.0
+    unlimited = TokenBucket(per_minute=0)
+    unlimited.take(10_000, now)
+    assert unlimited.unlimited and unlimited.wait_time(10_000, now) == 0.0
+
+
+def test_run_retries_transient_errors():
+    limiter = RateLimiter(max_retries=2, base_delay=0.001)
+    calls = []
+    waits = []
+
+    def func(permit):
+        calls.append(permit)
+        if len(calls) < 3:
+            raise APIConnectionError(request=_REQUEST)
+        return "ok"
+
+    assert limiter.run("anna", 10, func, on_wait=waits.append) == "ok"
+    assert len(calls) == 3
+    assert [w["reason"] for w in waits] == [WAIT_RETRY, WAIT_RETRY]
+    stats = limiter.stats()
+    assert stats["retries"] == 2 and stats["in_flight"] == 0
+
+
+def test_run_does_not_retry_client_errors_or_blocked_permits():
+    limiter = RateLimiter(max_retries=2, base_delay=0.001)
+
+    def bad_request(permit):
+        raise _status_error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        limiter.run("anna", 10, bad_request)
+
+    def streamed(permit):
+        permit.retryable = False
+        raise APIConnectionError(request=_REQUEST)
+
+    with pytest.raises(APIConnectionError):
+        limiter.run("anna", 10, streamed)
+    assert limiter.stats()["retries"] == 0
+
+
+def test_backoff_honours_retry_after():
+    limiter = RateLimiter(base_delay=0.01, max_delay=30.0)
+    error = _status_error(RateLimitError, 429, {"retry-after-ms": "1500"})
+    assert 1.5 <= limiter.backoff(error, 0) <= 1.51
+    assert 0.0 <= limiter.backoff(APIConnectionError(request=_REQUEST), 3) <= 0.08
+
+
+def test_acquire_times_out_when_concurrency_is_exhausted():
+    limiter = RateLimiter(max_concurrency=1)
+    permit = limiter.acquire("anna")
+    waits = []
+    with pytest.raises(QueueTimeoutError):
+        limiter.acquire("bartek", on_wait=waits.append, timeout=0.1)
+    assert waits and waits[0]["reason"] == WAIT_CONCURRENCY
+    limiter.release(permit)
+    limiter.release(limiter.acquire("bartek", timeout=0.1))
+    stats = limiter.stats()
+    assert stats["timeouts"] == 1 and stats["admitted"] == 2 and stats["queued"] == 0
+
+
+def test_permit_settle_charges_extra_tokens():
+    limiter = RateLimiter(tpm=600, burst_s=10.0)
+    permit = limiter.acquire("anna", tokens=50)
+    permit.settle(100)
+    limiter.release(permit)
+    assert limiter.tokens.wait_time(1, limiter.tokens.updated) > 0
+
+
+def _rate_limited(calls):
+    def func(permit):
+        calls.append(permit)
+        raise _status_error(RateLimitError, 429, {"retry-after": "2"})
+    return func
+
+
+def test_retry_past_deadline_fails_without_sleeping():
+    limiter = RateLimiter(max_retries=3, base_delay=0.01)
+    calls = []
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        limiter.run("anna", 10, _rate_limited(calls), deadline=Deadline(0.5))
+    assert time.monotonic() - start < 0.4
+    assert len(calls) == 1
+    assert limiter.stats()["retries"] == 0
+
+
+def test_async_retry_past_deadline_fails_without_sleeping():
+    limiter = RateLimiter(max_retries=3, base_delay=0.01)
+    calls = []
+
+    async def func(permit):
+        _rate_limited(calls)(permit)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(limiter.arun("anna", 10, func, deadline=Deadline(0.5)))
+    assert time.monotonic() - start < 0.4
+    assert len(calls) == 1
+
+
+def test_queue_wait_is_capped_by_deadline():
+    limiter = RateLimiter(max_concurrency=1, queue_timeout=30)
+    permit = limiter.acquire("anna")
+    start = time.monotonic()
+    with pytest.raises(QueueTimeoutError):
+        limiter.run("bartek", 10, lambda permit: "ok", deadline=Deadline(0.1))
+    assert time.monotonic() - start < 1.0
+    limiter.release(permit)
+    expired = Deadline(0.01)
+    time.sleep(0.02)
+    with pytest.raises(DeadlineExceededError):
+        limiter.run("bartek", 10, lambda permit: "ok", deadline=expired)
@@ -0,0 +1,77 @@
+"""
+Testy wyboru faktów z profilu (sokrates/retrieval.py): indeks BM25
+i jego aktualizacje według znacznika rewizji profilu.
+"""
+
+import pytest
+
+from sokrates.retrieval import BM25Index, FactRetriever, stem, tokenize
+from sokrates.storage import ProfileStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProfileStore(tmp_path / "sokrates.db")
+    yield store
+    store.close()
+
+
+def test_tokenize_folds_inflections_and_skips_stopwords():
+    forms = ("fotosynteza", "fotosyntezy", "fotosyntezę")
+    assert len({stem(word) for word in forms}) == 1
+    assert tokenize("To jest fotosynteza") == tokenize("fotosyntezę")
+    assert tokenize("a i w z") == []
+
+
+def test_bm25_ranks_matching_documents():
+    index = BM25Index()
+    index.add(1, "lubi biologię i fotosyntezę")
+    index.add(2, "gra w szachy")
+    index.add(3, "ma trudności z ułamkami")
+    ranked = index.search("Jak działa fotosynteza?", 3)
+    assert [doc_id for doc_id, score in ranked] == [1]
+    assert ranked[0][1] > 0
+    index.remove(1)
+    assert 1 not in index and index.search("fotosynteza", 3) == []
+
+
+def test_select_ranks_facts_and_fills_with_newest(store):
+    ids = [store.add_fact("Anna", fact) for fact in (
+        "lubi biologię", "gra w szachy", "uczy się na przykładach", "ma kota")]
+    retriever = FactRetriever(store)
+    assert len(retriever.select("Anna", "szachy", top_k=0)) == 4
+    selected = retriever.select("Anna", "Jak grać w szachy?", top_k=2)
+    assert selected[0]["id"] == ids[1] and selected[0]["score"] > 0
+    assert selected[1] == {"id": ids[3], "fact": "ma kota", "score": None}
+    assert retriever.select("Bartek", "szachy") == []
+
+
+def test_add_and_remove_update_cached_index(store):
+    store.add_fact("Anna", "lubi biologię")
+    retriever = FactRetriever(store)
+    retriever.select("Anna", "biologia")
+    new_id = store.add_fact("Anna", "gra w szachy")
+    retriever.add("Anna", new_id, "gra w szachy")
+    assert [item["fact"] for item in retriever.select("Anna", "szachy", top_k=1)] == [
+        "gra w szachy"]
+    store.delete_fact("Anna", new_id)
+    retriever.remove("Anna", [new_id])
+    assert [item["fact"] for item in retriever.select("Anna", "szachy")] == [
+        "lubi biologię"]
+    stats = retriever.stats()
+    assert stats["misses"] == 1 and stats["invalidations"] == 0
+
+
+def test_change_outside_retriever_rebuilds_index(store):
+    store.add_fact("Anna", "lubi biologię")
+    retriever = FactRetriever(store)
+    retriever.select("Anna", "biologia")
+    store.add_fact("Anna", "gra w szachy")  # zapis bez `retriever.add`
+    facts = [item["fact"] for item in retriever.select("Anna", "szachy", top_k=1)]
+    assert facts == ["gra w szachy"]
+    assert retriever.stats()["invalidations"] == 1
+    # Spóźnione `add` dla starszej rewizji nie psuje indeksu - jest odbudowywany
+    late_id = store.add_fact("Anna", "ma kota")
+    store.add_fact("Anna", "lubi fizykę")
+    retriever.add("Anna", late_id, "ma kota")
+    assert len(retriever.select("Anna", "kot", top_k=0)) == 4
@@ -0,0 +1,53 @@
+"""
+Testy wyboru modelu tury (sokrates/routing.py).
+"""
+
+from sokrates.routing import (
+    ROUTE_COMPLEX,
+    ROUTE_DEFAULT,
+    ROUTE_FIXED,
+    ROUTE_FULL_ANSWER,
+    ROUTE_LONG_PROMPT,
+    ModelRouter,
+    RouteDecision,
+    RoutingRules,
+)
+
+ROUTER = ModelRouter()
+
+
+def test_guiding_questions_use_default_model():
+    decision = ROUTER.route_turn(0, "Co to jest atom?")
+    assert decision == RouteDecision("gpt-4o-mini", ROUTE_DEFAULT)
+    assert ROUTER.route_turn(3, "nie wiem").reason == ROUTE_DEFAULT
+    assert ROUTER.cheap_model == "gpt-4o-mini"
+
+
+def test_full_answer_goes_to_strong_model():
+    decision = ROUTER.route_turn(4, "nie wiem")
+    assert decision == RouteDecision("gpt-4o", ROUTE_FULL_ANSWER)
+
+
+def test_long_and_complex_prompts_go_to_strong_model():
+    long_prompt = "Opowiem, co wiem o komórkach roślinnych i zwierzęcych. " * 40
+    assert ROUTER.route_turn(0, long_prompt).reason == ROUTE_LONG_PROMPT
+    assert ROUTER.route_turn(0, "Udowodnij to twierdzenie").reason == ROUTE_COMPLEX
+    assert ROUTER.route_turn(0, "Rozwiąż krok po kroku").reason == ROUTE_COMPLEX
+    assert ROUTER.is_complex("2x + 3 = 7, 4y - 1 = 3, x^2 + y^2 = 25")
+    assert not ROUTER.is_complex("Czy 2 + 2 to 4?")
+
+
+def test_rules_can_disable_routing():
+    fixed = ModelRouter(RoutingRules(strong_model="gpt-4o-mini"))
+    assert fixed.route_turn(4, "udowodnij") == RouteDecision("gpt-4o-mini", ROUTE_FIXED)
+    no_rules = ModelRouter(RoutingRules(full_answer_counter=0, long_prompt_tokens=0,
+                                        complex_phrases=(), math_tokens=0))
+    assert no_rules.route_turn(9, "udowodnij 1 + 1 = 2 " * 100).reason == ROUTE_DEFAULT
+
+
+def test_stats_count_decisions_by_model_and_reason():
+    router = ModelRouter()
+    router.route_turn(0, "Co to jest atom?")
+    router.route_turn(1, "A elektron?")
+    router.route_turn(4, "nie wiem")
+    assert router.stats() == {"gpt-4o-mini/default": 2, "gpt-4o/full_answer": 1}
@@ -0,0 +1,113 @@
+"""
+Testy stanu współdzielonego (sokrates/shared_state.py): `LocalState`
+i `RedisState` na serwerze z `benchmarks/fake_redis.py`.
+"""
+
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_redis import FakeRedisServer
+from sokrates.shared_state import (
+    LocalState,
+    LockTimeoutError,
+    RedisState,
+    SharedState,
+    SharedStateError,
+    open_shared_state,
+)
+
+
+@pytest.fixture(scope="module")
+def redis_server():
+    with FakeRedisServer() as server:
+        yield server
+
+
+@pytest.fixture(params=["local", "redis"])
+def shared(request, redis_server):
+    if request.param == "local":
+        state = LocalState()
+    else:
+        state = RedisState(redis_server.url, prefix=f"test:{request.node.name}:")
+    yield state
+    state.close()
+
+
+def test_values_and_ttl(shared):
+    shared.set("klucz", "wartość")
+    assert shared.get("klucz") == "wartość"
+    shared.set("krótki", "1", ttl=0.05)
+    time.sleep(0.1)
+    assert shared.get("krótki") is None
+    shared.delete("klucz")
+    assert shared.get("klucz") is None
+
+
+def test_counters_have_no_lost_updates(shared):
+    def worker():
+        for _ in range(50):
+            shared.incr_many({"turns": 1, "cost_pln": 0.5})
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shared.counters(["turns", "cost_pln", "brak"]) == {
+        "turns": 200.0, "cost_pln": 100.0, "brak": 0.0}
+
+
+def test_lock_excludes_other_holders(shared):
+    with shared.lock("uczen:anna", ttl=5, timeout=1):
+        with pytest.raises(LockTimeoutError):
+            with shared.lock("uczen:anna", ttl=5, timeout=0.05):
+                pass
+        with shared.lock("uczen:bartek", ttl=5, timeout=0.05):
+            pass
+    with shared.lock("uczen:anna", ttl=5, timeout=0.05):
+        pass
+
+
+def test_expired_lock_can_be_taken_over(shared):
+    assert shared._try_lock("lock:x", "pierwszy", ttl=0.05)
+    time.sleep(0.1)
+    assert shared._try_lock("lock:x", "drugi", ttl=5)
+    # Spóźnione zwolnienie przez pierwszego właściciela nie usuwa cudzej blokady
+    shared._unlock("lock:x", "pierwszy")
+    assert not shared._try_lock("lock:x", "trzeci", ttl=5)
+    shared._unlock("lock:x", "drugi")
+    assert shared._try_lock("lock:x", "trzeci", ttl=5)
+
+
+def test_redis_keys_use_prefix(redis_server):
+    first = RedisState(redis_server.url, prefix="szkola1:")
+    second = RedisState(redis_server.url, prefix="szkola2:")
+    first.set("klucz", "a")
+    assert second.get("klucz") is None
+    assert first.ping()
+    first.close()
+    second.close()
+
+
+def test_redis_unavailable_raises_shared_state_error():
+    with FakeRedisServer() as server:
+        url = server.url
+    state = RedisState(url, timeout=0.5)
+    with pytest.raises(SharedStateError):
+        state.get("klucz")
+
+
+def test_open_shared_state_and_interface():
+    assert isinstance(open_shared_state(""), LocalState)
+    assert isinstance(open_shared_state("redis://localhost:6379/0"), RedisState)
+    with pytest.raises(ValueError):
+        RedisState("http://localhost")
+
+    class Incomplete(SharedState):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
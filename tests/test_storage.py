@@ -0,0 +1,79 @@
+"""
+Testy magazynu profili (sokrates/storage.py) - indeks statystyk utrzymywany
+przez wyzwalacze SQLite.
+"""
+
+import pytest
+
+from sokrates.storage import ProfileStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProfileStore(tmp_path / "sokrates.db")
+    yield store
+    store.close()
+
+
+def _totals(store):
+    summary = store.stats_summary()
+    return summary["students"], summary["facts"], summary["size_bytes"]
+
+
+def _rows(store):
+    return {row["key"]: (row["fact_count"], row["size_bytes"])
+            for row in store.list_student_stats()}
+
+
+def _size(*facts):
+    return sum(len(fact.encode("utf-8")) for fact in facts)
+
+
+def test_stats_follow_added_facts(store):
+    store.add_fact("Anna", "lubi biologię")
+    store.add_fact("Anna", "ćwiczy na przykładach")
+    store.add_fact("Bartek", "gra w szachy")
+    assert _totals(store) == (2, 3, _size("lubi biologię", "ćwiczy na przykładach",
+                                          "gra w szachy"))
+    assert _rows(store) == {
+        "anna": (2, _size("lubi biologię", "ćwiczy na przykładach")),
+        "bartek": (1, _size("gra w szachy"))}
+
+
+def test_stats_follow_deleted_facts_and_students(store):
+    fact_id = store.add_fact("Anna", "lubi biologię")
+    store.add_fact("Anna", "ćwiczy")
+    store.add_fact("Bartek", "gra w szachy")
+    assert store.delete_fact("Anna", fact_id)
+    assert _rows(store)["anna"] == (1, _size("ćwiczy"))
+    assert store.delete_student("Anna")
+    assert _totals(store) == (1, 1, _size("gra w szachy"))
+    assert store.count_students() == 1
+
+
+def test_stats_follow_replaced_facts(store):
+    store.add_fact("Anna", "stary fakt")
+    store.replace_facts("Anna", ["nowy", "drugi nowy"])
+    assert _totals(store) == (1, 2, _size("nowy", "drugi nowy"))
+    assert store.list_facts("Anna") == ["nowy", "drugi nowy"]
+
+
+def test_stats_survive_reopening(tmp_path):
+    path = tmp_path / "sokrates.db"
+    first = ProfileStore(path)
+    first.add_fact("Anna", "lubi biologię")
+    first.close()
+    reopened = ProfileStore(path)
+    assert _totals(reopened) == (1, 1, _size("lubi biologię"))
+    reopened.close()
+
+
+def test_changes_counter_and_ordering(store):
+    before = store.stats_summary()["changes"]
+    store.add_fact("Anna", "fakt")
+    store.add_fact("Bartek", "fakt")
+    store.add_fact("Bartek", "drugi fakt")
+    assert store.stats_summary()["changes"] > before
+    by_facts = store.list_student_stats(order="facts")
+    assert [row["key"] for row in by_facts] == ["bartek", "anna"]
+    assert [row["key"] for row in store.list_student_stats("bar")] == ["bartek"]